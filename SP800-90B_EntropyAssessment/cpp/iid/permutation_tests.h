@@ -638,7 +638,10 @@ void populateTestCase(IidTestCase &tc, int C[][3]){
 //		in the JSON/Python dictionary format, and re-name the function to permutation_tests_res.
 // 		Create a new function, permutation_tests, with the old parameter list so that functions that do not require the result 
 //		do not need to change their interface.
-bool permutation_tests_res(const data_t *dp, const double rawmean, const double median, const int verbose, IidTestCase &tc, string &res){
+//		Add the shuffle_engine parameter to select the shuffle (SHUFFLE_BATCHED or SHUFFLE_FY, see utils.h), 
+//		and the fixed_seed and seed_value parameters to seed the random streams with seed_value (see seed_fixed) instead of /dev/urandom.
+bool permutation_tests_res(const data_t *dp, const double rawmean, const double median, const int verbose, IidTestCase &tc, string &res,
+		const int shuffle_engine = SHUFFLE_BATCHED, const bool fixed_seed = false, const uint64_t seed_value = 0){
 	uint64_t xoshiro256starstarMainSeed[4];
 	bool istty;
 
@@ -666,7 +669,11 @@ bool permutation_tests_res(const data_t *dp, const double rawmean, const double
 
 	// Run initial tests
 	if(verbose == 2) cout << "Beginning initial tests..." << endl;
-	seed(xoshiro256starstarMainSeed);
+	if(fixed_seed) {
+		seed_fixed(seed_value, xoshiro256starstarMainSeed);
+	} else {
+		seed(xoshiro256starstarMainSeed);
+	}
 
 	run_tests(dp, dp->symbols, dp->rawsymbols, rawmean, median, t, test_status);
 
@@ -689,12 +696,15 @@ bool permutation_tests_res(const data_t *dp, const double rawmean, const double
 	{
 		uint8_t *data;
 		uint8_t *rawdata;
+		uint16_t *paired = NULL;
+		bool pairedCurrent = false;
 		uint64_t xoshiro256starstarSeed[4];
 		long double tp[num_tests];
 		int passed_count;
 
 		data = new uint8_t[dp->len];
 		rawdata = new uint8_t[dp->len];
+		if(shuffle_engine == SHUFFLE_BATCHED) paired = new uint16_t[dp->len];
 
 		// Init results
 		for(unsigned int i = 0; i < num_tests; ++i){
@@ -717,7 +727,13 @@ bool permutation_tests_res(const data_t *dp, const double rawmean, const double
 				char statusMessage[1024];
 				size_t statusMessageLength = 0;
 
-				FYshuffle(data, rawdata, dp->len, xoshiro256starstarSeed);
+				if(shuffle_engine == SHUFFLE_BATCHED) {
+					// run_tests does not change data or rawdata, so paired holds them after the first shuffle.
+					FYshuffleBatched(data, rawdata, dp->len, xoshiro256starstarSeed, paired, pairedCurrent);
+					pairedCurrent = true;
+				} else {
+					FYshuffle(data, rawdata, dp->len, xoshiro256starstarSeed);
+				}
 				run_tests(dp, data, rawdata, rawmean, median, tp, test_status);
 
 				// Aggregate results into the counters
@@ -789,6 +805,7 @@ bool permutation_tests_res(const data_t *dp, const double rawmean, const double
 		}
         	delete[](data);
         	delete[](rawdata);
+        	if(paired != NULL) delete[](paired);
 	} //end parallel
 
 	if(verbose > 1) print_results(C, verbose);
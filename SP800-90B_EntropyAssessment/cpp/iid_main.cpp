@@ -60,7 +60,7 @@ using namespace std;
 //      Usage is modified to add the -r <test_to_run> option.
 [[ noreturn ]] void print_usage() {
     // The following line was modified by Teron Labs to add the -r <test_to_run> option:
-    printf("Usage is: ea_iid [-i|-c] [-a|-t] [-v] [-q] [-l <index>,<samples> ] [-r <test_to_run>] <file_name> [bits_per_symbol]\n\n");
+    printf("Usage is: ea_iid [-i|-c] [-a|-t] [-v] [-q] [-l <index>,<samples> ] [-r <test_to_run>] [-s <shuffle>] [-S <seed>] <file_name> [bits_per_symbol]\n\n");
 
     printf("\t <file_name>: Must be relative path to a binary file with at least 1 million entries (samples).\n");
     printf("\t [bits_per_symbol]: Must be between 1-8, inclusive. By default this value is inferred from the data.\n");
@@ -108,6 +108,12 @@ using namespace std;
     printf("\t\t all = All of above tests.\n");
     printf("\t\t abort1fail = Abort the testing and return existing results upon the first failure of a test.\n");
     printf("\t\t If the -r option is not used, all tests are run.\n");
+    printf("\t -s: Specifies the shuffle used by the permutation tests, where shuffle is one of the following:\n");
+    printf("\t\t batched = Batched Fisher-Yates shuffle (the default).\n");
+    printf("\t\t fy = Fisher-Yates shuffle of one element at a time.\n");
+    printf("\t\t Both produce the same permutations from the same random stream.\n");
+    printf("\t -S: Seed the random streams of the permutation tests with the 64-bit integer <seed>, so that the tests can be repeated.\n");
+    printf("\t\t By default the streams are seeded from /dev/urandom.\n");
     // End modification.
 
     exit(-1);
@@ -120,8 +126,11 @@ string iid_main(int argc, char* argv[]) {
     // Modification by Teron Labs:
     //      Reset options to be read from the beginning again.
     //      This is necessary when calling iid_main multiple times during the one program execution.
+    //      optind is set to 0 rather than 1 so that getopt also reinitialises itself, and does not continue
+    //      from its position in the arguments of the previous call (which have since been deleted).
+    //      (iid_main and non_iid_main both use getopt, so calls to them may alternate.)
 
-    optind = 1;
+    optind = 0;
 
     // End modification.
 
@@ -159,6 +168,13 @@ string iid_main(int argc, char* argv[]) {
     bool runPerm = false;
     bool abort1fail = false;
     // End modification.
+
+    // Modification by Teron Labs:
+    //     Declare the shuffle engine of the permutation tests (-s option), and the seed of their random streams (-S option).
+    int shuffleEngine = SHUFFLE_BATCHED;
+    bool fixedSeed = false;
+    uint64_t seedValue = 0;
+    // End modification.
     
     for (int i = 0; i < argc; i++) {
         std::string Str = std::string(argv[i]);
@@ -169,8 +185,8 @@ string iid_main(int argc, char* argv[]) {
     }
 
     // Modification by Teron Labs:
-    //      Add the r: option to the while condition.
-    while ((opt = getopt(argc, argv, "icatvl:qo:r:")) != -1) {
+    //      Add the r:, s: and S: options to the while condition.
+    while ((opt = getopt(argc, argv, "icatvl:qo:r:s:S:")) != -1) {
         switch (opt) {
             case 'i':
                 initial_entropy = true;
@@ -253,6 +269,33 @@ string iid_main(int argc, char* argv[]) {
                 break;
             // End modification.
 
+            // Modification by Teron Labs:
+            //     Read the -s option to select the shuffle engine, and the -S option to seed the random streams of the permutation tests.
+            case 's':
+                {
+                    string shuffleOpt = optarg;
+                    if (shuffleOpt == "batched"){
+                        shuffleEngine = SHUFFLE_BATCHED;
+                    } else if (shuffleOpt == "fy"){
+                        shuffleEngine = SHUFFLE_FY;
+                    } else {
+                        printf("Unknown shuffle: %s\n", optarg);
+                        print_usage();
+                    }
+                }
+                break;
+            case 'S':
+                errno = 0;
+                inint = strtoull(optarg, &nextOption, 0);
+                if ((errno == EINVAL) || (errno == ERANGE) || (nextOption == optarg) || (*nextOption != '\0')) {
+                    printf("Error on seed: %s\n", optarg);
+                    print_usage();
+                }
+                fixedSeed = true;
+                seedValue = (uint64_t)inint;
+                break;
+            // End modification.
+
             case 'q':
                 quietMode = true;
                 break;
@@ -563,7 +606,9 @@ string iid_main(int argc, char* argv[]) {
             res = res + ", ";
         }
 
-        perm_test_pass = permutation_tests_res(&data, rawmean, median, verbose, tc, res);
+        // Modification by Teron Labs:
+        //      Pass the shuffle engine and seed (see the -s and -S options).
+        perm_test_pass = permutation_tests_res(&data, rawmean, median, verbose, tc, res, shuffleEngine, fixedSeed, seedValue);
 
         if ((verbose >= 1) ) {
             if (perm_test_pass) {
@@ -1,5 +1,45 @@
 /* VERSION information is kept in utils.h. Please update when a new version is released */
 
+// non_iid_main.cpp was originally produced by NIST (version 1.1.7) and modified by
+// Teron Labs <https://www.teronlabs.com> <info@teronlabs.com> in July 2024.
+//
+// Modification Author(s):
+// Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+//
+// Modifications by Teron Labs to non_iid_main.cpp in July 2024 are as follows:
+//     Move the body of main into the function non_iid_main, which returns to the calling function the JSON results of the estimators run.
+//     Allow the samples to be read from a buffer in memory instead of a file.
+//     Add the functionality of requesting specific estimators with the -r <estimator_to_run> option.
+//     Add the -p option to run the estimators in parallel.
+// End modification list.
+//
+// Licence for non_iid_main.cpp:
+//
+// NIST-developed software is provided by NIST as a public service.
+// You may use, copy, and distribute copies of the software in any medium, provided that you keep intact this entire notice.
+// You may improve, modify, and create derivative works of the software or any portion of the software,
+// and you may copy and distribute such modifications or works.
+// Modified works should carry a notice stating that you changed the software and should note the date and nature of any such change.
+// Please explicitly acknowledge the National Institute of Standards and Technology as the source of the software.
+
+// NIST-developed software is expressly provided "AS IS." NIST MAKES NO WARRANTY OF ANY KIND, EXPRESS, IMPLIED, IN FACT,
+// OR ARISING BY OPERATION OF LAW, INCLUDING, WITHOUT LIMITATION, THE IMPLIED WARRANTY OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE,
+// NON-INFRINGEMENT, AND DATA ACCURACY. NIST NEITHER REPRESENTS NOR WARRANTS THAT THE OPERATION OF THE SOFTWARE WILL BE UNINTERRUPTED OR ERROR-FREE,
+// OR THAT ANY DEFECTS WILL BE CORRECTED. NIST DOES NOT WARRANT OR MAKE ANY REPRESENTATIONS REGARDING THE USE OF THE SOFTWARE OR THE RESULTS THEREOF,
+// INCLUDING BUT NOT LIMITED TO THE CORRECTNESS, ACCURACY, RELIABILITY, OR USEFULNESS OF THE SOFTWARE.
+
+// You are solely responsible for determining the appropriateness of using and distributing the software and you assume all risks associated
+// with its use, including but not limited to the risks and costs of program errors, compliance with applicable laws, damage to or loss of data,
+// programs or equipment, and the unavailability or interruption of operation. This software is not intended to be used in any situation where a
+// failure could cause risk of injury or damage to property. The software developed by NIST employees is not subject to copyright protection within
+// the United States.
+//
+// End Licence.
+
+// Modification by Teron Labs:
+//      #include "non_iid_main.h" added
+#include "non_iid_main.h"
+
 #include "shared/utils.h"
 #include "shared/most_common.h"
 #include "shared/lrs_test.h"
@@ -19,8 +59,13 @@
 #include <fstream>
 #include <openssl/sha.h>
 
-[[ noreturn ]] void print_usage() {
-    printf("Usage is: ea_non_iid [-i|-c] [-a|-t] [-v] [-q] [-l <index>,<samples> ] <file_name> [bits_per_symbol]\n\n");
+// Modification by Teron Labs:
+//      Usage is modified to add the -r <estimator_to_run> and -p options.
+//      The function is renamed from print_usage to print_non_iid_usage, so that it may be compiled into the stats90b
+//      Python extension module together with the print_usage function of iid_main.cpp.
+[[ noreturn ]] void print_non_iid_usage() {
+    // The following line was modified by Teron Labs to add the -r <estimator_to_run> and -p options:
+    printf("Usage is: ea_non_iid [-i|-c] [-a|-t] [-v] [-q] [-l <index>,<samples> ] [-r <estimator_to_run>] [-p] <file_name> [bits_per_symbol]\n\n");
     printf("\t <file_name>: Must be relative path to a binary file with at least 1 million entries (samples).\n");
     printf("\t [bits_per_symbol]: Must be between 1-8, inclusive. By default this value is inferred from the data.\n");
     printf("\t [-i|-c]: '-i' for initial entropy estimate, '-c' for conditioned sequential dataset entropy estimate. The initial entropy estimate is the default.\n");
@@ -55,20 +100,129 @@
     printf("\n");
     printf("\t --version: Prints tool version information");
     printf("\n");
+    printf("\n");
+
+    // Modification by Teron Labs:
+    //     Add the following usage lines:
+    printf("\t -r: Specifies which estimator to run where estimator_to_run is one of the following:\n");
+    printf("\t\t mcv = Most Common Value Estimate (Section 6.3.1)\n");
+    printf("\t\t collision = Collision Estimate (Section 6.3.2)\n");
+    printf("\t\t markov = Markov Estimate (Section 6.3.3)\n");
+    printf("\t\t compression = Compression Estimate (Section 6.3.4)\n");
+    printf("\t\t tuple = t-Tuple Estimate (Section 6.3.5)\n");
+    printf("\t\t LRS = Longest Repeated Substring (LRS) Estimate (Section 6.3.6)\n");
+    printf("\t\t multimcw = Multi Most Common in Window Prediction Estimate (Section 6.3.7)\n");
+    printf("\t\t lag = Lag Prediction Estimate (Section 6.3.8)\n");
+    printf("\t\t multimmc = Multi Markov Model with Counting Prediction Estimate (Section 6.3.9)\n");
+    printf("\t\t lz78y = LZ78Y Prediction Estimate (Section 6.3.10)\n");
+    printf("\t\t all = All of above estimators.\n");
+    printf("\t\t The -r option may be used multiple times. If the -r option is not used, all estimators are run.\n");
+    printf("\t\t When only some estimators are run, the assessed min-entropy is the minimum of their estimates only.\n");
+    printf("\t -p: Run the estimators in parallel. The results are the same as when the estimators are run one after the other.\n");
+    // End modification.
+
     exit(-1);
 }
 
-int main(int argc, char* argv[]) {
+// Modification by Teron Labs:
+//     Identify each estimator, so that it may be requested with the -r option and run as a separate job.
+//     The t-Tuple and LRS estimates are computed together (by SAalgs), so they share the one job (EST_TUPLE).
+enum NonIidEstimator {EST_MCV, EST_COLLISION, EST_MARKOV, EST_COMPRESSION, EST_TUPLE, EST_MULTI_MCW, EST_LAG, EST_MULTI_MMC, EST_LZ78Y};
+
+// Modification by Teron Labs:
+//     A job runs one estimator on either the bitstring or the literal samples, saving its estimate in the job.
+//     The estimate of most_common is saved in tc as well, so that it may be copied to the test case.
+struct NonIidJob {
+    int estimator;
+    bool bitstring;
+    double estimate = -1.0;
+    double lrsEstimate = -1.0;
+    NonIidTestCase tc;
+};
+
+// Modification by Teron Labs:
+//     Run the estimator of a job, on the bitstring if job.bitstring is true, otherwise on the literal samples.
+//     The estimators only read the data, so the jobs may be run at the same time.
+void run_non_iid_job(NonIidJob &job, data_t &data, const int verbose) {
+    uint8_t *samples = job.bitstring ? data.bsymbols : data.symbols;
+    long len = job.bitstring ? data.blen : data.len;
+    int alphSize = job.bitstring ? 2 : data.alph_size;
+    const char *label = job.bitstring ? "Bitstring" : "Literal";
+
+    switch (job.estimator) {
+        case EST_MCV:
+            job.estimate = most_common(samples, len, alphSize, verbose, label, job.tc);
+            break;
+        case EST_COLLISION:
+            job.estimate = collision_test(samples, len, verbose, label);
+            break;
+        case EST_MARKOV:
+            job.estimate = markov_test(samples, len, verbose, label);
+            break;
+        case EST_COMPRESSION:
+            job.estimate = compression_test(samples, len, verbose, label);
+            break;
+        case EST_TUPLE:
+            SAalgs(samples, len, alphSize, job.estimate, job.lrsEstimate, verbose, label);
+            break;
+        case EST_MULTI_MCW:
+            job.estimate = multi_mcw_test(samples, len, alphSize, verbose, label);
+            break;
+        case EST_LAG:
+            job.estimate = lag_test(samples, len, alphSize, verbose, label);
+            break;
+        case EST_MULTI_MMC:
+            job.estimate = multi_mmc_test(samples, len, alphSize, verbose, label);
+            break;
+        case EST_LZ78Y:
+            job.estimate = LZ78Y_test(samples, len, alphSize, verbose, label);
+            break;
+    }
+}
+
+// Modification by Teron Labs:
+//     Return the job running the estimator on the bitstring (if bitstring is true) or on the literal samples, or NULL if there is no such job.
+NonIidJob *find_non_iid_job(vector<NonIidJob> &jobs, int estimator, bool bitstring) {
+    for (size_t i = 0; i < jobs.size(); i++) {
+        if ((jobs[i].estimator == estimator) && (jobs[i].bitstring == bitstring)) {
+            return &jobs[i];
+        }
+    }
+    return NULL;
+}
+
+// Modification by Teron Labs:
+//     Copy the Most Common Value results saved by most_common from one test case to another.
+void copy_mcv_estimate(const TestCaseBase &from, TestCaseBase &to) {
+    to.mcv_estimate_mode = from.mcv_estimate_mode;
+    to.mcv_estimate_p_hat = from.mcv_estimate_p_hat;
+    to.mcv_estimate_p_u = from.mcv_estimate_p_u;
+    to.literal_mcv_estimate = from.literal_mcv_estimate;
+}
+
+// Modification by Teron Labs:
+//     Have non_iid_main return a string of the results in JSON format (the same as those written to file by the -o option).
+//     If buffer is not NULL, the samples are read from the bufferLen bytes of buffer instead of a file.
+string non_iid_main(int argc, char* argv[], const uint8_t *buffer, long bufferLen) {
+
+    // Modification by Teron Labs:
+    //      Reset options to be read from the beginning again.
+    //      This is necessary when calling non_iid_main multiple times during the one program execution.
+    //      optind is set to 0 rather than 1 so that getopt also reinitialises itself, and does not continue
+    //      from its position in the arguments of the previous call (which have since been deleted).
+    //      (iid_main and non_iid_main both use getopt, so calls to them may alternate.)
+
+    optind = 0;
+
+    // End modification.
 
     bool initial_entropy, all_bits;
     int verbose = 1; //verbose 0 is for JSON output, 1 is the normal mode, 2 is the NIST tool verbose mode, and 3 is for extra verbose output
     bool quietMode = false;
-    char *file_path;
+    char *file_path = NULL;
     double H_original, H_bitstring, ret_min_entropy;
     data_t data;
     int opt;
-    double bin_t_tuple_res = -1.0, bin_lrs_res = -1.0;
-    double t_tuple_res = -1.0, lrs_res = -1.0;
     unsigned long subsetIndex = ULONG_MAX;
     unsigned long subsetSize = 0;
     unsigned long long inint;
@@ -83,6 +237,21 @@ int main(int argc, char* argv[]) {
     testRun.timestamp = timestamp;
     testRun.commandline = commandline;
 
+    // Modification by Teron Labs:
+    //     Declare booleans to indicate which estimators should be run, and whether they should be run in parallel (-p option).
+    bool runMCV = false;
+    bool runCollision = false;
+    bool runMarkov = false;
+    bool runCompression = false;
+    bool runTuple = false;
+    bool runLRS = false;
+    bool runMultiMCW = false;
+    bool runLag = false;
+    bool runMultiMMC = false;
+    bool runLZ78Y = false;
+    bool parallel = false;
+    // End modification.
+
     data.word_size = 0;
 
     initial_entropy = true;
@@ -96,7 +265,9 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    while ((opt = getopt(argc, argv, "icatvql:o:")) != -1) {
+    // Modification by Teron Labs:
+    //      Add the r: and p options to the while condition.
+    while ((opt = getopt(argc, argv, "icatvql:o:r:p")) != -1) {
         switch (opt) {
             case 'i':
                 initial_entropy = true;
@@ -128,7 +299,7 @@ int main(int argc, char* argv[]) {
                         output << testRun.GetAsJson();
                         output.close();
                     }
-                    print_usage();
+                    print_non_iid_usage();
                 }
                 subsetIndex = inint;
 
@@ -145,7 +316,7 @@ int main(int argc, char* argv[]) {
                         output << testRun.GetAsJson();
                         output.close();
                     }
-                    print_usage();
+                    print_non_iid_usage();
                 }
                 subsetSize = inint;
                 break;
@@ -153,33 +324,123 @@ int main(int argc, char* argv[]) {
                 jsonOutput = true;
                 outputfilename = optarg;
                 break;
+
+            // Modification by Teron Labs:
+            //     Read the -r option in the arguments and set the booleans indicating which estimators should be run.
+            case 'r':
+                {
+                    string runOpt = optarg;
+                    if (runOpt == "mcv"){
+                        runMCV = true;
+                    } else if (runOpt == "collision"){
+                        runCollision = true;
+                    } else if (runOpt == "markov"){
+                        runMarkov = true;
+                    } else if (runOpt == "compression"){
+                        runCompression = true;
+                    } else if (runOpt == "tuple"){
+                        runTuple = true;
+                    } else if (runOpt == "LRS"){
+                        runLRS = true;
+                    } else if (runOpt == "multimcw"){
+                        runMultiMCW = true;
+                    } else if (runOpt == "lag"){
+                        runLag = true;
+                    } else if (runOpt == "multimmc"){
+                        runMultiMMC = true;
+                    } else if (runOpt == "lz78y"){
+                        runLZ78Y = true;
+                    } else if (runOpt == "all"){
+                        runMCV = true;
+                        runCollision = true;
+                        runMarkov = true;
+                        runCompression = true;
+                        runTuple = true;
+                        runLRS = true;
+                        runMultiMCW = true;
+                        runLag = true;
+                        runMultiMMC = true;
+                        runLZ78Y = true;
+                    } else {
+                        printf("Invalid estimator: %s.\n", optarg);
+                        print_non_iid_usage();
+                    }
+                }
+                break;
+            // Read the -p option to run the estimators in parallel.
+            case 'p':
+                parallel = true;
+                break;
+            // End modification.
+
             default:
-                print_usage();
+                print_non_iid_usage();
         }
     }
 
     argc -= optind;
     argv += optind;
 
+    // Modification by Teron Labs:
+    //   When the samples are read from a buffer, there is no file name, so the only argument may be bits_per_symbol.
+    //   The arguments are shifted back by one, so that bits_per_symbol is in argv[1] as it is when there is a file name.
+    if (buffer != NULL) {
+        if ((argc != 0) && (argc != 1)) {
+            printf("Incorrect usage.\n");
+            print_non_iid_usage();
+        }
+        argc++;
+        argv--;
+    }
+    // End modification.
+
     // Parse args
     if ((argc != 1) && (argc != 2)) {
         printf("Incorrect usage.\n");
-        print_usage();
+        print_non_iid_usage();
     }
 
+    // Modification by Teron Labs:
+    //   If no particular estimators have been requested, set the booleans to run all of them.
+    if (!runMCV && !runCollision && !runMarkov && !runCompression && !runTuple && !runLRS && !runMultiMCW && !runLag && !runMultiMMC && !runLZ78Y){
+        runMCV = true;
+        runCollision = true;
+        runMarkov = true;
+        runCompression = true;
+        runTuple = true;
+        runLRS = true;
+        runMultiMCW = true;
+        runLag = true;
+        runMultiMMC = true;
+        runLZ78Y = true;
+    }
+    // End modification.
+
     // If quiet mode is enabled, force minimum verbose
     if (quietMode) {
         verbose = 0;
     }
 
-    // get filename
-    file_path = argv[0];
-
     char hash[2*SHA256_DIGEST_LENGTH+1];
-    sha256_file(file_path, hash);
 
-    testRun.sha256 = hash;
-    testRun.filename = file_path;
+    // Modification by Teron Labs:
+    //   Hash the buffer (instead of the file) when the samples are read from a buffer. There is no file name to record.
+    if (buffer != NULL) {
+        unsigned char digest[SHA256_DIGEST_LENGTH];
+        EVP_Digest(buffer, bufferLen, digest, NULL, EVP_sha256(), NULL);
+        sha256_hash_string(digest, hash);
+
+        testRun.sha256 = hash;
+    } else {
+        // get filename
+        file_path = argv[0];
+
+        sha256_file(file_path, hash);
+
+        testRun.sha256 = hash;
+        testRun.filename = file_path;
+    }
+    // End modification.
 
     if (argc == 2) {
         // get bits per word
@@ -197,27 +458,42 @@ int main(int argc, char* argv[]) {
             }
 
             printf("Invalid bits per symbol.\n");
-            print_usage();
+            print_non_iid_usage();
         } else {
             data.word_size = inint;
         }
     }
 
-    if (verbose > 1) {
-        if (subsetSize == 0) printf("Opening file: '%s' (SHA-256 hash %s)\n", file_path, hash);
-        else printf("Opening file: '%s' (SHA-256 hash %s), reading block %ld of size %ld\n", file_path, hash, subsetIndex, subsetSize);
+    // Modification by Teron Labs:
+    //   Read the samples from the buffer if there is one, otherwise from the file.
+    bool readOK;
+    if (buffer != NULL) {
+        if (verbose > 1) {
+            if (subsetSize == 0) printf("Reading buffer of %ld bytes (SHA-256 hash %s)\n", bufferLen, hash);
+            else printf("Reading buffer of %ld bytes (SHA-256 hash %s), reading block %ld of size %ld\n", bufferLen, hash, subsetIndex, subsetSize);
+        }
+
+        readOK = read_buffer_subset(buffer, bufferLen, &data, subsetIndex, subsetSize, &testRun);
+    } else {
+        if (verbose > 1) {
+            if (subsetSize == 0) printf("Opening file: '%s' (SHA-256 hash %s)\n", file_path, hash);
+            else printf("Opening file: '%s' (SHA-256 hash %s), reading block %ld of size %ld\n", file_path, hash, subsetIndex, subsetSize);
+        }
+
+        readOK = read_file_subset(file_path, &data, subsetIndex, subsetSize, &testRun);
     }
 
-    if (!read_file_subset(file_path, &data, subsetIndex, subsetSize, &testRun)) {
+    if (!readOK) {
         if (jsonOutput) {
             ofstream output;
             output.open(outputfilename);
             output << testRun.GetAsJson();
             output.close();
         }
-        printf("Error reading file.\n");
-        print_usage();
+        printf("Error reading %s.\n", (buffer != NULL) ? "buffer" : "file");
+        print_non_iid_usage();
     }
+    // End modification.
 
     if (verbose > 1) printf("Loaded %ld samples of %d distinct %d-bit-wide symbols\n", data.len, data.alph_size, data.word_size);
 
@@ -252,78 +528,138 @@ int main(int argc, char* argv[]) {
     H_original = data.word_size;
     H_bitstring = 1.0;
 
+    // Modification by Teron Labs:
+    //     Run each requested estimator as a separate job, on the bitstring (when it is assessed) and on the literal samples (when they are assessed).
+    //     The collision, Markov and compression estimates are only made of the literal samples when they are binary.
+    //     The jobs do not depend on each other, so with the -p option they are run in parallel. Each job saves its estimate in the job,
+    //     and the estimates are then combined in the sections below in the original order, so the results are the same with and without -p.
+    //     The estimates are printed (verbose == 2) when they are combined, so the estimators' own output (verbose == 3) is printed first.
+    bool bitstringJobs = (data.alph_size > 2) || !initial_entropy;
+    bool estimatorRun[] = {runMCV, runCollision, runMarkov, runCompression, (runTuple || runLRS), runMultiMCW, runLag, runMultiMMC, runLZ78Y};
+    vector<NonIidJob> jobs;
+
+    for (int estimator = EST_MCV; estimator <= EST_LZ78Y; estimator++) {
+        if (!estimatorRun[estimator]) continue;
+
+        bool bitsOnly = (estimator == EST_COLLISION) || (estimator == EST_MARKOV) || (estimator == EST_COMPRESSION);
+
+        if (bitstringJobs) {
+            NonIidJob job;
+            job.estimator = estimator;
+            job.bitstring = true;
+            jobs.push_back(job);
+        }
+
+        if (initial_entropy && (!bitsOnly || (data.alph_size == 2))) {
+            NonIidJob job;
+            job.estimator = estimator;
+            job.bitstring = false;
+            jobs.push_back(job);
+        }
+    }
+
     if ((verbose == 1) || (verbose == 2)) {
         printf("\nRunning non-IID tests...\n\n");
+    }
+
+    #pragma omp parallel for schedule(dynamic, 1) if(parallel)
+    for (int j = 0; j < (int)jobs.size(); j++) {
+        run_non_iid_job(jobs[j], data, verbose);
+    }
+
+    NonIidJob *job;
+    // End modification.
+
+    if (((verbose == 1) || (verbose == 2)) && runMCV) {
         printf("Running Most Common Value Estimate...\n");
     }
 
+    // Modification by Teron Labs:
+    //     In each of the sections below, the estimate is taken from its job (if it was run) instead of running the estimator,
+    //     and the test case is only recorded if the estimator was requested.
+
     // Section 6.3.1 - Estimate entropy with Most Common Value
     NonIidTestCase tc631;
 
-    if (((data.alph_size > 2) || !initial_entropy)) {
-        ret_min_entropy = most_common(data.bsymbols, data.blen, 2, verbose, "Bitstring", tc631);
+    job = find_non_iid_job(jobs, EST_MCV, true);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
+        copy_mcv_estimate(job->tc, tc631);
         if (verbose == 2) printf("\tMost Common Value Estimate (bit string) = %f / 1 bit(s)\n", ret_min_entropy);
         tc631.h_bitstring = ret_min_entropy;
         H_bitstring = min(ret_min_entropy, H_bitstring);
     }
 
-    if (initial_entropy) {
-        ret_min_entropy = most_common(data.symbols, data.len, data.alph_size, verbose, "Literal", tc631);
+    job = find_non_iid_job(jobs, EST_MCV, false);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
+        copy_mcv_estimate(job->tc, tc631);
         if (verbose == 2) printf("\tMost Common Value Estimate = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
         tc631.h_original = ret_min_entropy;
         H_original = min(ret_min_entropy, H_original);
     }
 
-    tc631.testCaseNumber = "Most Common Value";
-    testRun.testCases.push_back(tc631);
+    if (runMCV) {
+        tc631.testCaseNumber = "Most Common Value";
+        testRun.testCases.push_back(tc631);
+    }
 
     // Section 6.3.2 - Estimate entropy with Collision Test (for bit strings only)
     NonIidTestCase tc632;
 
-    if ((verbose == 1) || (verbose == 2)) printf("\nRunning Entropic Statistic Estimates (bit strings only)...\n");
+    if (((verbose == 1) || (verbose == 2)) && (runCollision || runMarkov || runCompression)) printf("\nRunning Entropic Statistic Estimates (bit strings only)...\n");
 
-    if (((data.alph_size > 2) || !initial_entropy)) {
-        ret_min_entropy = collision_test(data.bsymbols, data.blen, verbose, "Bitstring");
+    job = find_non_iid_job(jobs, EST_COLLISION, true);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (verbose == 2) printf("\tCollision Test Estimate (bit string) = %f / 1 bit(s)\n", ret_min_entropy);
         tc632.h_bitstring = ret_min_entropy;
         H_bitstring = min(ret_min_entropy, H_bitstring);
     }
 
-    if (initial_entropy && (data.alph_size == 2)) {
-        ret_min_entropy = collision_test(data.symbols, data.len, verbose, "Literal");
+    job = find_non_iid_job(jobs, EST_COLLISION, false);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (verbose == 2) printf("\tCollision Test Estimate = %f / 1 bit(s)\n", ret_min_entropy);
         tc632.h_original = ret_min_entropy;
         H_original = min(ret_min_entropy, H_original);
     }
 
-    tc632.testCaseNumber = "Collision Test (for bit strings only)";
-    testRun.testCases.push_back(tc632);
+    if (runCollision) {
+        tc632.testCaseNumber = "Collision Test (for bit strings only)";
+        testRun.testCases.push_back(tc632);
+    }
 
     // Section 6.3.3 - Estimate entropy with Markov Test (for bit strings only)
     NonIidTestCase tc633;
 
-    if (((data.alph_size > 2) || !initial_entropy)) {
-        ret_min_entropy = markov_test(data.bsymbols, data.blen, verbose, "Bitstring");
+    job = find_non_iid_job(jobs, EST_MARKOV, true);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (verbose == 2) printf("\tMarkov Test Estimate (bit string) = %f / 1 bit(s)\n", ret_min_entropy);
         tc633.h_bitstring = ret_min_entropy;
         H_bitstring = min(ret_min_entropy, H_bitstring);
     }
 
-    if (initial_entropy && (data.alph_size == 2)) {
-        ret_min_entropy = markov_test(data.symbols, data.len, verbose, "Literal");
+    job = find_non_iid_job(jobs, EST_MARKOV, false);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (verbose == 2) printf("\tMarkov Test Estimate = %f / 1 bit(s)\n", ret_min_entropy);
         tc633.h_original = ret_min_entropy;
         H_original = min(ret_min_entropy, H_original);
     }
 
-    tc633.testCaseNumber = "Markov Test (for bit strings only)";
-    testRun.testCases.push_back(tc633);
+    if (runMarkov) {
+        tc633.testCaseNumber = "Markov Test (for bit strings only)";
+        testRun.testCases.push_back(tc633);
+    }
 
     // Section 6.3.4 - Estimate entropy with Compression Test (for bit strings only)
     NonIidTestCase tc634;
 
-    if (((data.alph_size > 2) || !initial_entropy)) {
-        ret_min_entropy = compression_test(data.bsymbols, data.blen, verbose, "Bitstring");
+    job = find_non_iid_job(jobs, EST_COMPRESSION, true);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose == 2) printf("\tCompression Test Estimate (bit string) = %f / 1 bit(s)\n", ret_min_entropy);
             tc634.h_bitstring = ret_min_entropy;
@@ -331,8 +667,9 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    if (initial_entropy && (data.alph_size == 2)) {
-        ret_min_entropy = compression_test(data.symbols, data.len, verbose, "Literal");
+    job = find_non_iid_job(jobs, EST_COMPRESSION, false);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose == 2) printf("\tCompression Test Estimate = %f / 1 bit(s)\n", ret_min_entropy);
             tc634.h_original = ret_min_entropy;
@@ -340,60 +677,69 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    tc634.testCaseNumber = "Compression Test (for bit strings only)";
-    testRun.testCases.push_back(tc634);
+    if (runCompression) {
+        tc634.testCaseNumber = "Compression Test (for bit strings only)";
+        testRun.testCases.push_back(tc634);
+    }
 
     // Section 6.3.5 - Estimate entropy with t-Tuple Test
     NonIidTestCase tc635;
 
-    if ((verbose == 1) || (verbose == 2)) printf("\nRunning Tuple Estimates...\n");
+    if (((verbose == 1) || (verbose == 2)) && (runTuple || runLRS)) printf("\nRunning Tuple Estimates...\n");
 
-    if (((data.alph_size > 2) || !initial_entropy)) {
-        SAalgs(data.bsymbols, data.blen, 2, bin_t_tuple_res, bin_lrs_res, verbose, "Bitstring");
-        if (bin_t_tuple_res >= 0.0) {
-            if (verbose == 2) printf("\tT-Tuple Test Estimate (bit string) = %f / 1 bit(s)\n", bin_t_tuple_res);
-            tc635.bin_t_tuple_res = bin_t_tuple_res;
-            H_bitstring = min(bin_t_tuple_res, H_bitstring);
+    job = find_non_iid_job(jobs, EST_TUPLE, true);
+    if ((job != NULL) && runTuple) {
+        if (job->estimate >= 0.0) {
+            if (verbose == 2) printf("\tT-Tuple Test Estimate (bit string) = %f / 1 bit(s)\n", job->estimate);
+            tc635.bin_t_tuple_res = job->estimate;
+            H_bitstring = min(job->estimate, H_bitstring);
         }
     }
 
-    if (initial_entropy) {
-        SAalgs(data.symbols, data.len, data.alph_size, t_tuple_res, lrs_res, verbose, "Literal");
-        if (t_tuple_res >= 0.0) {
-            if (verbose == 2) printf("\tT-Tuple Test Estimate = %f / %d bit(s)\n", t_tuple_res, data.word_size);
-            tc635.t_tuple_res = t_tuple_res;
-            H_original = min(t_tuple_res, H_original);
+    job = find_non_iid_job(jobs, EST_TUPLE, false);
+    if ((job != NULL) && runTuple) {
+        if (job->estimate >= 0.0) {
+            if (verbose == 2) printf("\tT-Tuple Test Estimate = %f / %d bit(s)\n", job->estimate, data.word_size);
+            tc635.t_tuple_res = job->estimate;
+            H_original = min(job->estimate, H_original);
         }
     }
 
-    tc635.testCaseNumber = "T-Tuple Test";
-    testRun.testCases.push_back(tc635);
+    if (runTuple) {
+        tc635.testCaseNumber = "T-Tuple Test";
+        testRun.testCases.push_back(tc635);
+    }
 
     // Section 6.3.6 - Estimate entropy with LRS Test
     NonIidTestCase tc636;
 
-    if ((((data.alph_size > 2) || !initial_entropy)) && (bin_lrs_res >= 0.0)) {
-        if (verbose == 2) printf("\tLRS Test Estimate (bit string) = %f / 1 bit(s)\n", bin_lrs_res);
-        tc636.bin_lrs_res = bin_lrs_res;
-        H_bitstring = min(bin_lrs_res, H_bitstring);
+    job = find_non_iid_job(jobs, EST_TUPLE, true);
+    if ((job != NULL) && runLRS && (job->lrsEstimate >= 0.0)) {
+        if (verbose == 2) printf("\tLRS Test Estimate (bit string) = %f / 1 bit(s)\n", job->lrsEstimate);
+        tc636.bin_lrs_res = job->lrsEstimate;
+        H_bitstring = min(job->lrsEstimate, H_bitstring);
     }
 
-    if (initial_entropy && (lrs_res >= 0.0)) {
-        if (verbose == 2) printf("\tLRS Test Estimate = %f / %d bit(s)\n", lrs_res, data.word_size);
-        tc636.lrs_res = lrs_res;
-        H_original = min(lrs_res, H_original);
+    job = find_non_iid_job(jobs, EST_TUPLE, false);
+    if ((job != NULL) && runLRS && (job->lrsEstimate >= 0.0)) {
+        if (verbose == 2) printf("\tLRS Test Estimate = %f / %d bit(s)\n", job->lrsEstimate, data.word_size);
+        tc636.lrs_res = job->lrsEstimate;
+        H_original = min(job->lrsEstimate, H_original);
     }
 
-    tc636.testCaseNumber = "LRS Test";
-    testRun.testCases.push_back(tc636);
+    if (runLRS) {
+        tc636.testCaseNumber = "LRS Test";
+        testRun.testCases.push_back(tc636);
+    }
 
     // Section 6.3.7 - Estimate entropy with Multi Most Common in Window Test
     NonIidTestCase tc637;
 
-    if ((verbose == 1) || (verbose == 2)) printf("\nRunning Predictor Estimates...\n");
+    if (((verbose == 1) || (verbose == 2)) && (runMultiMCW || runLag || runMultiMMC || runLZ78Y)) printf("\nRunning Predictor Estimates...\n");
 
-    if (((data.alph_size > 2) || !initial_entropy)) {
-        ret_min_entropy = multi_mcw_test(data.bsymbols, data.blen, 2, verbose, "Bitstring");
+    job = find_non_iid_job(jobs, EST_MULTI_MCW, true);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose == 2) printf("\tMulti Most Common in Window (MultiMCW) Prediction Test Estimate (bit string) = %f / 1 bit(s)\n", ret_min_entropy);
             tc637.h_bitstring = ret_min_entropy;
@@ -401,8 +747,9 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    if (initial_entropy) {
-        ret_min_entropy = multi_mcw_test(data.symbols, data.len, data.alph_size, verbose, "Literal");
+    job = find_non_iid_job(jobs, EST_MULTI_MCW, false);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose == 2) printf("\tMulti Most Common in Window (MultiMCW) Prediction Test Estimate = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc637.h_original = ret_min_entropy;
@@ -410,14 +757,17 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    tc637.testCaseNumber = "Multi Most Common in Window Test";
-    testRun.testCases.push_back(tc637);
+    if (runMultiMCW) {
+        tc637.testCaseNumber = "Multi Most Common in Window Test";
+        testRun.testCases.push_back(tc637);
+    }
 
     // Section 6.3.8 - Estimate entropy with Lag Prediction Test
     NonIidTestCase tc638;
 
-    if (((data.alph_size > 2) || !initial_entropy)) {
-        ret_min_entropy = lag_test(data.bsymbols, data.blen, 2, verbose, "Bitstring");
+    job = find_non_iid_job(jobs, EST_LAG, true);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose == 2) printf("\tLag Prediction Test Estimate (bit string) = %f / 1 bit(s)\n", ret_min_entropy);
             tc638.h_bitstring = ret_min_entropy;
@@ -425,8 +775,9 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    if (initial_entropy) {
-        ret_min_entropy = lag_test(data.symbols, data.len, data.alph_size, verbose, "Literal");
+    job = find_non_iid_job(jobs, EST_LAG, false);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose == 2) printf("\tLag Prediction Test Estimate = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc638.h_original = ret_min_entropy;
@@ -434,14 +785,17 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    tc638.testCaseNumber = "Lag Prediction Test";
-    testRun.testCases.push_back(tc638);
+    if (runLag) {
+        tc638.testCaseNumber = "Lag Prediction Test";
+        testRun.testCases.push_back(tc638);
+    }
 
     // Section 6.3.9 - Estimate entropy with Multi Markov Model with Counting Test (MultiMMC)
     NonIidTestCase tc639;
 
-    if (((data.alph_size > 2) || !initial_entropy)) {
-        ret_min_entropy = multi_mmc_test(data.bsymbols, data.blen, 2, verbose, "Bitstring");
+    job = find_non_iid_job(jobs, EST_MULTI_MMC, true);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose == 2) printf("\tMulti Markov Model with Counting (MultiMMC) Prediction Test Estimate (bit string) = %f / 1 bit(s)\n", ret_min_entropy);
             tc639.h_bitstring = ret_min_entropy;
@@ -449,8 +803,9 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    if (initial_entropy) {
-        ret_min_entropy = multi_mmc_test(data.symbols, data.len, data.alph_size, verbose, "Literal");
+    job = find_non_iid_job(jobs, EST_MULTI_MMC, false);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose == 2) printf("\tMulti Markov Model with Counting (MultiMMC) Prediction Test Estimate = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc639.h_original = ret_min_entropy;
@@ -458,14 +813,17 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    tc639.testCaseNumber = "Multi Markov Model with Counting Test (MultiMMC)";
-    testRun.testCases.push_back(tc639);
+    if (runMultiMMC) {
+        tc639.testCaseNumber = "Multi Markov Model with Counting Test (MultiMMC)";
+        testRun.testCases.push_back(tc639);
+    }
 
     // Section 6.3.10 - Estimate entropy with LZ78Y Test
     NonIidTestCase tc6310;
 
-    if (((data.alph_size > 2) || !initial_entropy)) {
-        ret_min_entropy = LZ78Y_test(data.bsymbols, data.blen, 2, verbose, "Bitstring");
+    job = find_non_iid_job(jobs, EST_LZ78Y, true);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose == 2) printf("\tLZ78Y Prediction Test Estimate (bit string) = %f / 1 bit(s)\n", ret_min_entropy);
             tc6310.h_bitstring = ret_min_entropy;
@@ -473,8 +831,9 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    if (initial_entropy) {
-        ret_min_entropy = LZ78Y_test(data.symbols, data.len, data.alph_size, verbose, "Literal");
+    job = find_non_iid_job(jobs, EST_LZ78Y, false);
+    if (job != NULL) {
+        ret_min_entropy = job->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose == 2) printf("\tLZ78Y Prediction Test Estimate = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc6310.h_original = ret_min_entropy;
@@ -482,8 +841,12 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    tc6310.testCaseNumber = "LZ78Y Test";
-    testRun.testCases.push_back(tc6310);
+    if (runLZ78Y) {
+        tc6310.testCaseNumber = "LZ78Y Test";
+        testRun.testCases.push_back(tc6310);
+    }
+
+    // End modification.
 
     double h_assessed;
     h_assessed = data.word_size;
@@ -535,13 +898,32 @@ int main(int argc, char* argv[]) {
     testRun.testCases.push_back(tcOverall);
     testRun.errorLevel = 0;
 
+    // Modification by Teron Labs:
+    //    Save the JSON results, to be written to the output file (-o option) and returned.
+    string res = testRun.GetAsJson();
+
     if (jsonOutput) {
         ofstream output;
         output.open(outputfilename);
-        output << testRun.GetAsJson();
+        output << res;
         output.close();
     }
 
     free_data(&data);
+
+    // Modification by Teron Labs:
+    //    Return the JSON results, res.
+    return res;
+    // End modification.
+}
+
+// Modification by Teron Labs:
+//    main calls non_iid_main. It is left out of the stats90b Python extension module (which defines STATS90B_MODULE),
+//    as the module is compiled together with iid_main.cpp, which has its own main.
+#ifndef STATS90B_MODULE
+int main(int argc, char* argv[]) {
+    non_iid_main(argc, argv);
     return 0;
 }
+#endif
+// End modification.
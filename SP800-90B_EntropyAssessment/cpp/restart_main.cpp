@@ -1,5 +1,47 @@
 /* VERSION information is kept in utils.h. Please update when a new version is released */
 
+// restart_main.cpp was originally produced by NIST (version 1.1.7) and modified by
+// Teron Labs <https://www.teronlabs.com> <info@teronlabs.com> in July 2024.
+//
+// Modification Author(s):
+// Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+//
+// Modifications by Teron Labs to restart_main.cpp in July 2024 are as follows:
+//     Move the body of main into the function restart_main, which returns to the calling function the JSON results of the restart tests.
+//     Allow the restart matrix to be read from a buffer in memory instead of a file.
+//     Return the results (rather than exiting) when the data is unsuitable or the sanity check or validation test fails.
+//     Transpose the restart matrix with transpose_matrix (from utils.h).
+//     Add the -p option to run the non-IID estimators on the rows and columns in parallel.
+//     Only print H_I before the sanity check in verbose mode.
+// End modification list.
+//
+// Licence for restart_main.cpp:
+//
+// NIST-developed software is provided by NIST as a public service.
+// You may use, copy, and distribute copies of the software in any medium, provided that you keep intact this entire notice.
+// You may improve, modify, and create derivative works of the software or any portion of the software,
+// and you may copy and distribute such modifications or works.
+// Modified works should carry a notice stating that you changed the software and should note the date and nature of any such change.
+// Please explicitly acknowledge the National Institute of Standards and Technology as the source of the software.
+
+// NIST-developed software is expressly provided "AS IS." NIST MAKES NO WARRANTY OF ANY KIND, EXPRESS, IMPLIED, IN FACT,
+// OR ARISING BY OPERATION OF LAW, INCLUDING, WITHOUT LIMITATION, THE IMPLIED WARRANTY OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE,
+// NON-INFRINGEMENT, AND DATA ACCURACY. NIST NEITHER REPRESENTS NOR WARRANTS THAT THE OPERATION OF THE SOFTWARE WILL BE UNINTERRUPTED OR ERROR-FREE,
+// OR THAT ANY DEFECTS WILL BE CORRECTED. NIST DOES NOT WARRANT OR MAKE ANY REPRESENTATIONS REGARDING THE USE OF THE SOFTWARE OR THE RESULTS THEREOF,
+// INCLUDING BUT NOT LIMITED TO THE CORRECTNESS, ACCURACY, RELIABILITY, OR USEFULNESS OF THE SOFTWARE.
+
+// You are solely responsible for determining the appropriateness of using and distributing the software and you assume all risks associated
+// with its use, including but not limited to the risks and costs of program errors, compliance with applicable laws, damage to or loss of data,
+// programs or equipment, and the unavailability or interruption of operation. This software is not intended to be used in any situation where a
+// failure could cause risk of injury or damage to property. The software developed by NIST employees is not subject to copyright protection within
+// the United States.
+//
+// End Licence.
+
+// Modification by Teron Labs:
+//      #include "restart_main.h" added
+#include "restart_main.h"
+
 #include "shared/utils.h"
 #include "shared/most_common.h"
 #include "shared/lrs_test.h"
@@ -26,8 +68,13 @@
 //Each test has a targeted chance of roughly 0.000005, and we need to witness at least 5 failures, so this should be no less than 1000000
 #define DEFAULT_SIMULATION_ROUNDS 5000000UL
 
-[[ noreturn ]] void print_usage() {
-    printf("Usage is: ea_restart [-i|-n] [-v] [-q] [-s <simulation count>] <file_name> [bits_per_symbol] <H_I>\n\n");
+// Modification by Teron Labs:
+//      Usage is modified to add the -p option.
+//      The function is renamed from print_usage to print_restart_usage, so that it may be compiled into the stats90b
+//      Python extension module together with the print_usage function of iid_main.cpp.
+[[ noreturn ]] void print_restart_usage() {
+    // The following line was modified by Teron Labs to add the -p option:
+    printf("Usage is: ea_restart [-i|-n] [-v] [-q] [-s <simulation count>] [-p] <file_name> [bits_per_symbol] <H_I>\n\n");
     printf("\t <file_name>: Must be relative path to a binary file with at least 1 million entries (samples),\n");
     printf("\t and in the \"row dataset\" format described in SP800-90B Section 3.1.4.1.\n");
     printf("\t [bits_per_symbol]: Must be between 1-8, inclusive.\n");
@@ -51,6 +98,12 @@
     printf("\n");
     printf("\t --version: Prints tool version information");
     printf("\n");
+
+    // Modification by Teron Labs:
+    //     Add the following usage line:
+    printf("\t -p: Run the non-IID estimators on the rows and columns in parallel. The results are the same as when they are run one after the other.\n");
+    // End modification.
+
     exit(-1);
 }
 
@@ -162,11 +215,118 @@ int simulateBound(double alpha, int k, double H_I, unsigned long int simulation_
     return returnValue;
 }
 
-int main(int argc, char* argv[]) {
+// Modification by Teron Labs:
+//     Identify each non-IID estimator run on the rows and columns of the restart matrix, so that it may be run as a separate job.
+//     The t-Tuple and LRS estimates are computed together (by SAalgs), so they share the one job (RESTART_TUPLE).
+enum RestartEstimator {RESTART_MCV, RESTART_COLLISION, RESTART_MARKOV, RESTART_COMPRESSION, RESTART_TUPLE, RESTART_MULTI_MCW, RESTART_LAG, RESTART_MULTI_MMC, RESTART_LZ78Y};
+
+// Modification by Teron Labs:
+//     A job runs one estimator on either the rows or the columns of the restart matrix, saving its estimate in the job.
+struct RestartJob {
+    int estimator;
+    bool columns;
+    double estimate = -1.0;
+    double lrsEstimate = -1.0;
+};
+
+// Modification by Teron Labs:
+//     Run the estimator of a job, on the column data (cdata) if job.columns is true, otherwise on the row data (rdata).
+//     The estimators only read the data, so the jobs may be run at the same time.
+void run_restart_job(RestartJob &job, uint8_t *rdata, uint8_t *cdata, const long len, const int alphSize, const int verbose) {
+    uint8_t *samples = job.columns ? cdata : rdata;
+
+    switch (job.estimator) {
+        case RESTART_MCV:
+            job.estimate = most_common(samples, len, alphSize, verbose, "Literal");
+            break;
+        case RESTART_COLLISION:
+            job.estimate = collision_test(samples, len, verbose, "Literal");
+            break;
+        case RESTART_MARKOV:
+            job.estimate = markov_test(samples, len, verbose, "Literal");
+            break;
+        case RESTART_COMPRESSION:
+            job.estimate = compression_test(samples, len, verbose, "Literal");
+            break;
+        case RESTART_TUPLE:
+            SAalgs(samples, len, alphSize, job.estimate, job.lrsEstimate, verbose, "Literal");
+            break;
+        case RESTART_MULTI_MCW:
+            job.estimate = multi_mcw_test(samples, len, alphSize, verbose, "Literal");
+            break;
+        case RESTART_LAG:
+            job.estimate = lag_test(samples, len, alphSize, verbose, "Literal");
+            break;
+        case RESTART_MULTI_MMC:
+            job.estimate = multi_mmc_test(samples, len, alphSize, verbose, "Literal");
+            break;
+        case RESTART_LZ78Y:
+            job.estimate = LZ78Y_test(samples, len, alphSize, verbose, "Literal");
+            break;
+    }
+}
+
+// Modification by Teron Labs:
+//     Return the job running the estimator on the columns (if columns is true) or on the rows, or NULL if there is no such job.
+RestartJob *find_restart_job(vector<RestartJob> &jobs, int estimator, bool columns) {
+    for (size_t i = 0; i < jobs.size(); i++) {
+        if ((jobs[i].estimator == estimator) && (jobs[i].columns == columns)) {
+            return &jobs[i];
+        }
+    }
+    return NULL;
+}
+
+// Modification by Teron Labs:
+//     Record the error errorMsg in the test run for the type of data tested (IID or non-IID), write the test run to the output file
+//     if one was requested (-o option), and return the test run in JSON format.
+//     This replaces exiting from the program when the data is unsuitable or the restart tests fail, so that restart_main returns its results.
+string restart_error(bool iid, IidTestRun &testRunIid, NonIidTestRun &testRunNonIid, const string &errorMsg, bool jsonOutput, const string &outputfilename) {
+    string res;
+
+    if (iid) {
+        testRunIid.errorLevel = -1;
+        testRunIid.errorMsg = errorMsg;
+        res = testRunIid.GetAsJson();
+    } else {
+        testRunNonIid.errorLevel = -1;
+        testRunNonIid.errorMsg = errorMsg;
+        res = testRunNonIid.GetAsJson();
+    }
+
+    if (jsonOutput) {
+        ofstream output;
+        output.open(outputfilename);
+        output << res;
+        output.close();
+    }
+
+    return res;
+}
+
+// Modification by Teron Labs:
+//     Have restart_main return a string of the results in JSON format (the same as those written to file by the -o option).
+//     If buffer is not NULL, the restart matrix is read from the bufferLen bytes of buffer instead of a file.
+//     If passed is not NULL, it is set to whether the restart data passed the sanity check and validation test.
+string restart_main(int argc, char* argv[], const uint8_t *buffer, long bufferLen, bool *passed) {
+
+    // Modification by Teron Labs:
+    //      Reset options to be read from the beginning again.
+    //      This is necessary when calling restart_main multiple times during the one program execution.
+    //      optind is set to 0 rather than 1 so that getopt also reinitialises itself, and does not continue
+    //      from its position in the arguments of the previous call (which have since been deleted).
+    //      (iid_main, non_iid_main and restart_main all use getopt, so calls to them may alternate.)
+
+    optind = 0;
+
+    if (passed != NULL) *passed = false;
+
+    // End modification.
+
     bool iid;
     int verbose = 1; //verbose 0 is for JSON output, 1 is the normal mode, 2 is the NIST tool verbose mode, and 3 is for extra verbose output
     bool quietMode = false;
-    char *file_path;
+    char *file_path = NULL;
     int r = 1000, c = 1000;
     int counts[256];
     unsigned long int simulation_rounds = DEFAULT_SIMULATION_ROUNDS;
@@ -180,6 +340,11 @@ int main(int argc, char* argv[]) {
     data_t data;
     int opt;
 
+    // Modification by Teron Labs:
+    //     Declare a boolean to indicate whether the non-IID estimators should be run in parallel (-p option).
+    bool parallel = false;
+    // End modification.
+
     iid = false;
     data.word_size = 0;
 
@@ -196,7 +361,9 @@ int main(int argc, char* argv[]) {
         }
     }
 
-    while ((opt = getopt(argc, argv, "invqo:s:")) != -1) {
+    // Modification by Teron Labs:
+    //      Add the p option to the while condition.
+    while ((opt = getopt(argc, argv, "invqo:s:p")) != -1) {
         switch (opt) {
             case 'i':
                 iid = true;
@@ -217,39 +384,67 @@ int main(int argc, char* argv[]) {
             case 's':
                 inul = strtoul(optarg, NULL, 10);
 		if((inul == 0) || (inul == ULONG_MAX) || (inul < simulation_rounds)) {
-                    print_usage();
+                    print_restart_usage();
                 } else {
                     simulation_rounds = inul;
                 }
                 break;
+
+            // Modification by Teron Labs:
+            //     Read the -p option to run the non-IID estimators in parallel.
+            case 'p':
+                parallel = true;
+                break;
+            // End modification.
+
             default:
-                print_usage();
+                print_restart_usage();
         }
     }
 
     argc -= optind;
     argv += optind;
 
+    // Modification by Teron Labs:
+    //   When the restart matrix is read from a buffer, there is no file name, so the arguments are [bits_per_symbol] <H_I>.
+    //   The arguments are shifted back by one, so that they follow argv[0] as they do when there is a file name.
+    if (buffer != NULL) {
+        if ((argc != 2) && (argc != 1)) {
+            printf("Incorrect usage.\n");
+            print_restart_usage();
+        }
+        argc++;
+        argv--;
+    }
+    // End modification.
+
     // Parse args
     if ((argc != 3) && (argc != 2)) {
         printf("Incorrect usage.\n");
-        print_usage();
+        print_restart_usage();
     }
 
-    // get filename
-    file_path = argv[0];
+    // Modification by Teron Labs:
+    //   Hash the buffer (instead of the file) when the restart matrix is read from a buffer. There is no file name to record.
+    char hash[2*SHA256_DIGEST_LENGTH+1];
+    if (buffer != NULL) {
+        unsigned char digest[SHA256_DIGEST_LENGTH];
+        EVP_Digest(buffer, bufferLen, digest, NULL, EVP_sha256(), NULL);
+        sha256_hash_string(digest, hash);
+    } else {
+        // get filename
+        file_path = argv[0];
+        sha256_file(file_path, hash);
+    }
     argv++;
     argc--;
+    // End modification.
 
     if (quietMode) verbose = 0;
 
-    char hash[2*SHA256_DIGEST_LENGTH+1];
-    sha256_file(file_path, hash);
-
     IidTestRun testRunIid;
     testRunIid.type = "Restart";
     testRunIid.timestamp = timestamp;
-    testRunIid.filename = file_path;
     testRunIid.commandline = commandline;
     testRunIid.sha256 = hash;
 
@@ -257,9 +452,16 @@ int main(int argc, char* argv[]) {
     testRunNonIid.type = "Restart";
     testRunNonIid.timestamp = timestamp;
     testRunNonIid.sha256 = hash;
-    testRunNonIid.filename = file_path;
     testRunNonIid.commandline = commandline;
 
+    // Modification by Teron Labs:
+    //   Only record a file name when the restart matrix is read from a file.
+    if (file_path != NULL) {
+        testRunIid.filename = file_path;
+        testRunNonIid.filename = file_path;
+    }
+    // End modification.
+
     if (argc == 2) {
         // get bits per word
         data.word_size = atoi(argv[0]);
@@ -283,7 +485,7 @@ int main(int argc, char* argv[]) {
                 }
             }
 
-            print_usage();
+            print_restart_usage();
         }
         argv++;
         argc--;
@@ -311,13 +513,25 @@ int main(int argc, char* argv[]) {
             }
         }
 
-        print_usage();
+        print_restart_usage();
     }
 
-    if (verbose > 1) printf("Opening file: '%s' (SHA-256 hash %s)\n", file_path, hash);
+    // Modification by Teron Labs:
+    //   Read the restart matrix from the buffer if there is one, otherwise from the file.
+    bool readOK;
+    if (buffer != NULL) {
+        if (verbose > 1) printf("Reading buffer of %ld bytes (SHA-256 hash %s)\n", bufferLen, hash);
+
+        readOK = read_buffer_subset(buffer, bufferLen, &data, ULONG_MAX, 0, &testRunNonIid);
+    } else {
+        if (verbose > 1) printf("Opening file: '%s' (SHA-256 hash %s)\n", file_path, hash);
+
+        readOK = read_file(file_path, &data, &testRunNonIid);
+    }
 
-    if (!read_file(file_path, &data, &testRunNonIid)) {
-        printf("Error reading file.\n");
+    if (!readOK) {
+        printf("Error reading %s.\n", (buffer != NULL) ? "buffer" : "file");
+    // End modification.
 
         if (jsonOutput) {
             if (iid) {
@@ -335,77 +549,30 @@ int main(int argc, char* argv[]) {
             }
         }
 
-        print_usage();
+        print_restart_usage();
     }
 
     if (verbose > 1) printf("Loaded %ld samples made up of %d distinct %d-bit-wide symbols.\n", data.len, data.alph_size, data.word_size);
 
+    // Modification by Teron Labs:
+    //   In each of the checks below, the error is recorded and the results returned by restart_error, rather than exiting from the program.
     if (H_I > data.word_size) {
         printf("H_I (%f) must be at most 'bits_per_symbol' (%d).\n", H_I, data.word_size);
-        if (jsonOutput) {
-            if(iid) {
-                testRunIid.errorLevel = -1;
-                testRunIid.errorMsg = "H_I (" + std::to_string(H_I) + ") must be at most 'bits_per_symbol' (" + std::to_string(data.word_size) + ").";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunIid.GetAsJson();
-                output.close();
-            } else {
-                testRunNonIid.errorLevel = -1;
-                testRunNonIid.errorMsg = "H_I (" + std::to_string(H_I) + ") must be at most 'bits_per_symbol' (" + std::to_string(data.word_size) + ").";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunNonIid.GetAsJson();
-                output.close();
-            }
-        }
         free_data(&data);
-        exit(-1);
+        return restart_error(iid, testRunIid, testRunNonIid, "H_I (" + std::to_string(H_I) + ") must be at most 'bits_per_symbol' (" + std::to_string(data.word_size) + ").", jsonOutput, outputfilename);
     }
 
     if (data.alph_size <= 1) {
         printf("Symbol alphabet consists of 1 symbol. No entropy awarded...\n");
-        if (jsonOutput) {
-            if(iid) {
-                testRunIid.errorLevel = -1;
-                testRunIid.errorMsg = "Symbol alphabet consists of 1 symbol. No entropy awarded...";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunIid.GetAsJson();
-                output.close();
-            } else {
-                testRunNonIid.errorLevel = -1;
-                testRunNonIid.errorMsg = "Symbol alphabet consists of 1 symbol. No entropy awarded...";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunNonIid.GetAsJson();
-                output.close();
-            }
-        }
         free_data(&data);
-        exit(-1);
+        return restart_error(iid, testRunIid, testRunNonIid, "Symbol alphabet consists of 1 symbol. No entropy awarded...", jsonOutput, outputfilename);
     }
 
     if (data.len != MIN_SIZE) {
         printf("\n*** Error: data (len = %ld) does not contain %d samples ***\n\n", data.len, MIN_SIZE);
-        if (jsonOutput) {
-            if (iid) {
-                testRunIid.errorLevel = -1;
-                testRunIid.errorMsg = "*** Error: data (len = " + std::to_string(data.len) + ") does not contain " + std::to_string(MIN_SIZE) + " samples ***";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunIid.GetAsJson();
-                output.close();
-            } else {
-                testRunNonIid.errorLevel = -1;
-                testRunNonIid.errorMsg = "*** Error: data (len = " + std::to_string(data.len) + ") does not contain " + std::to_string(MIN_SIZE) + " samples ***";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunNonIid.GetAsJson();
-                output.close();
-            }
-        }
-        exit(-1);
+        string errorMsg = "*** Error: data (len = " + std::to_string(data.len) + ") does not contain " + std::to_string(MIN_SIZE) + " samples ***";
+        free_data(&data);
+        return restart_error(iid, testRunIid, testRunNonIid, errorMsg, jsonOutput, outputfilename);
     }
 
     if (verbose > 1) {
@@ -416,27 +583,15 @@ int main(int argc, char* argv[]) {
     cdata = (uint8_t*) malloc(data.len);
     if (cdata == NULL) {
         printf("Error: failure to initialize memory for columns\n");
-        if (jsonOutput) {
-            if(iid) {
-                testRunIid.errorLevel = -1;
-                testRunIid.errorMsg = "Error: failure to initialize memory for columns";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunIid.GetAsJson();
-                output.close();
-            } else {
-                testRunNonIid.errorLevel = -1;
-                testRunNonIid.errorMsg = "Error: failure to initialize memory for columns";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunNonIid.GetAsJson();
-                output.close();
-            }
-        }
-        exit(-1);
+        free_data(&data);
+        return restart_error(iid, testRunIid, testRunNonIid, "Error: failure to initialize memory for columns", jsonOutput, outputfilename);
     }
+    // End modification.
 
-    printf("H_I: %f\n", H_I);
+    // Modification by Teron Labs:
+    //   H_I is only printed in verbose mode, so that nothing is printed in quiet mode (-q), e.g. when restart_main is called from Python.
+    if (verbose > 0) printf("H_I: %f\n", H_I);
+    // End modification.
 
     alpha = 1 - exp(log(0.99) / (r + c));
     X_cutoff = simulateBound(alpha, data.alph_size, H_I, simulation_rounds);
@@ -455,43 +610,36 @@ int main(int argc, char* argv[]) {
         if (X_i > X_r) X_r = X_i;
     }
 
-    // construct column data from row data and get maximum column count
+    // Modification by Teron Labs:
+    //   Construct the column data from the row data with transpose_matrix (which is shared with ea_transpose and the stats90b module),
+    //   and then get the maximum column count.
+    transpose_matrix(rdata, cdata, r, c);
+
     X_c = 0;
     for (j = 0; j < c; j++) { //columns
         memset(counts, 0, 256 * sizeof (int));
         X_i = 0;
         for (i = 0; i < r; i++) {
-            //[i*r+j] is row i, column j
+            //[j*c+i] is column j, row i
             //So, we're fixing a column and iterating through various rows
-            cdata[j * c + i] = rdata[i * r + j];
             if (++counts[cdata[j * c + i]] > X_i) X_i = counts[cdata[j * c + i]];
         }
         if (X_i > X_c) X_c = X_i;
     }
+    // End modification.
 
     // perform sanity check on rows and columns of restart data (Section 3.1.4.3)
     X_max = max(X_r, X_c);
     if (verbose > 0) printf("X_max: %d\n", X_max);
     if (X_max > X_cutoff) {
         if (verbose > 0) printf("\n*** Restart Sanity Check Failed ***\n");
-        if (jsonOutput) {
-            if(iid) {
-                testRunIid.errorLevel = -1;
-                testRunIid.errorMsg = "Restart Sanity Check Failed.";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunIid.GetAsJson();
-                output.close();
-            } else {
-                testRunNonIid.errorLevel = -1;
-                testRunNonIid.errorMsg = "Restart Sanity Check Failed.";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunNonIid.GetAsJson();
-                output.close();
-            }
-        }
-        exit(-1);
+
+        // Modification by Teron Labs:
+        //   Return the results rather than exiting.
+        free(cdata);
+        free_data(&data);
+        return restart_error(iid, testRunIid, testRunNonIid, "Restart Sanity Check Failed.", jsonOutput, outputfilename);
+        // End modification.
     } else if (verbose > 1) printf("\nRestart Sanity Check Passed...\n");
 
 
@@ -507,13 +655,46 @@ int main(int argc, char* argv[]) {
     // The maximum min-entropy is -log2(1/2^word_size) = word_size
     H_c = data.word_size;
     H_r = data.word_size;
+
+    // Modification by Teron Labs:
+    //     For non-IID data, run each estimator as a separate job on the rows and on the columns.
+    //     The collision, Markov and compression estimates are only made when the samples are binary.
+    //     The jobs do not depend on each other, so with the -p option they are run in parallel. Each job saves its estimate in the job,
+    //     and the estimates are then combined in the sections below in the original order, so the results are the same with and without -p.
+    //     The Most Common Value estimate is also needed for IID data; its jobs are run in the same way.
+    //     The IID tests are not run as jobs, as the permutation tests of the rows and columns share the one test case (and run in parallel themselves).
+    vector<RestartJob> jobs;
+
+    for (int estimator = RESTART_MCV; estimator <= (iid ? RESTART_MCV : RESTART_LZ78Y); estimator++) {
+        bool bitsOnly = (estimator == RESTART_COLLISION) || (estimator == RESTART_MARKOV) || (estimator == RESTART_COMPRESSION);
+        if (bitsOnly && (data.alph_size != 2)) continue;
+
+        RestartJob job;
+        job.estimator = estimator;
+        job.columns = false;
+        jobs.push_back(job);
+
+        job.columns = true;
+        jobs.push_back(job);
+    }
+
     if (verbose > 0) {
         if (iid) printf("\nRunning IID tests...\n\n");
         else printf("\nRunning non-IID tests...\n\n");
+    }
 
-        printf("Running Most Common Value Estimate...\n");
+    #pragma omp parallel for schedule(dynamic, 1) if(parallel)
+    for (int k = 0; k < (int)jobs.size(); k++) {
+        run_restart_job(jobs[k], rdata, cdata, data.len, data.alph_size, verbose);
     }
 
+    RestartJob *rowJob, *colJob;
+
+    if (verbose > 0) printf("Running Most Common Value Estimate...\n");
+
+    //     In each of the sections below, the estimates are taken from the jobs instead of running the estimators.
+    // End modification.
+
     // Section 6.3.1 - Estimate entropy with Most Common Value
 
     NonIidTestCase tc631nonIid;
@@ -524,14 +705,14 @@ int main(int argc, char* argv[]) {
     tc631Iid.testCaseNumber = "Most Common Value";
     tc631Iid.data_word_size = data.word_size;
 
-    ret_min_entropy = most_common(rdata, data.len, data.alph_size, verbose, "Literal");
+    ret_min_entropy = find_restart_job(jobs, RESTART_MCV, false)->estimate;
     if (verbose > 1) printf("\tMost Common Value Estimate (Rows) = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
     tc631nonIid.h_r = ret_min_entropy;
     tc631Iid.h_r = ret_min_entropy;
 
     H_r = min(ret_min_entropy, H_r);
 
-    ret_min_entropy = most_common(cdata, data.len, data.alph_size, verbose, "Literal");
+    ret_min_entropy = find_restart_job(jobs, RESTART_MCV, true)->estimate;
     if (verbose > 1) printf("\tMost Common Value Estimate (Cols) = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
     tc631nonIid.h_c = ret_min_entropy;
     H_c = min(ret_min_entropy, H_c);
@@ -556,12 +737,12 @@ int main(int argc, char* argv[]) {
             NonIidTestCase tc632;
             tc632.testCaseNumber = "Collision Test (for bit strings only)";
             tc632.data_word_size = 1;
-            ret_min_entropy = collision_test(rdata, data.len, verbose, "Literal");
+            ret_min_entropy = find_restart_job(jobs, RESTART_COLLISION, false)->estimate;
             if (verbose > 1) printf("\tCollision Test Estimate (Rows) = %f / 1 bit(s)\n", ret_min_entropy);
             tc632.h_r = ret_min_entropy;
             H_r = min(ret_min_entropy, H_r);
 
-            ret_min_entropy = collision_test(cdata, data.len, verbose, "Literal");
+            ret_min_entropy = find_restart_job(jobs, RESTART_COLLISION, true)->estimate;
             if (verbose > 1) printf("\tCollision Test Estimate (Cols) = %f / 1 bit(s)\n", ret_min_entropy);
             tc632.h_c = ret_min_entropy;
             H_c = min(ret_min_entropy, H_c);
@@ -574,12 +755,12 @@ int main(int argc, char* argv[]) {
             tc633.testCaseNumber = "Markov Test (for bit strings only)";
             tc633.data_word_size = 1;
 
-            ret_min_entropy = markov_test(rdata, data.len, verbose, "Literal");
+            ret_min_entropy = find_restart_job(jobs, RESTART_MARKOV, false)->estimate;
             if (verbose > 1) printf("\tMarkov Test Estimate (Rows) = %f / 1 bit(s)\n", ret_min_entropy);
             tc633.h_r = ret_min_entropy;
             H_r = min(ret_min_entropy, H_r);
 
-            ret_min_entropy = markov_test(cdata, data.len, verbose, "Literal");
+            ret_min_entropy = find_restart_job(jobs, RESTART_MARKOV, true)->estimate;
             if (verbose > 1) printf("\tMarkov Test Estimate (Cols) = %f / 1 bit(s)\n", ret_min_entropy);
             tc633.h_c = ret_min_entropy;
             H_c = min(ret_min_entropy, H_c);
@@ -592,14 +773,14 @@ int main(int argc, char* argv[]) {
             tc634.testCaseNumber = "Compression Test (for bit strings only)";
             tc634.data_word_size = 1;
 
-            ret_min_entropy = compression_test(rdata, data.len, verbose, "Literal");
+            ret_min_entropy = find_restart_job(jobs, RESTART_COMPRESSION, false)->estimate;
             if (ret_min_entropy >= 0) {
                 if (verbose > 1) printf("\tCompression Test Estimate (Rows) = %f / 1 bit(s)\n", ret_min_entropy);
                 tc634.h_r = ret_min_entropy;
                 H_r = min(ret_min_entropy, H_r);
             }
 
-            ret_min_entropy = compression_test(cdata, data.len, verbose, "Literal");
+            ret_min_entropy = find_restart_job(jobs, RESTART_COMPRESSION, true)->estimate;
             if (ret_min_entropy >= 0) {
                 if (verbose > 1) printf("\tCompression Test Estimate (Cols) = %f / 1 bit(s)\n", ret_min_entropy);
                 tc634.h_c = ret_min_entropy;
@@ -618,10 +799,10 @@ int main(int argc, char* argv[]) {
         tc635.testCaseNumber = "T-Tuple Test";
         tc635.data_word_size = data.word_size;
 
-        double row_t_tuple_res, row_lrs_res;
-        double col_t_tuple_res, col_lrs_res;
-        SAalgs(rdata, data.len, data.alph_size, row_t_tuple_res, row_lrs_res, verbose, "Literal");
-        SAalgs(cdata, data.len, data.alph_size, col_t_tuple_res, col_lrs_res, verbose, "Literal");
+        rowJob = find_restart_job(jobs, RESTART_TUPLE, false);
+        colJob = find_restart_job(jobs, RESTART_TUPLE, true);
+        double row_t_tuple_res = rowJob->estimate, row_lrs_res = rowJob->lrsEstimate;
+        double col_t_tuple_res = colJob->estimate, col_lrs_res = colJob->lrsEstimate;
 
         if (verbose > 1) printf("\tT-Tuple Test Estimate (Rows) = %f / %d bit(s)\n", row_t_tuple_res, data.word_size);
         tc635.h_r = row_t_tuple_res;
@@ -656,14 +837,14 @@ int main(int argc, char* argv[]) {
         tc637.testCaseNumber = "Multi Most Common in Window Test";
         tc637.data_word_size = data.word_size;
 
-        ret_min_entropy = multi_mcw_test(rdata, data.len, data.alph_size, verbose, "Literal");
+        ret_min_entropy = find_restart_job(jobs, RESTART_MULTI_MCW, false)->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose > 1) printf("\tMulti Most Common in Window (MultiMCW) Prediction Test Estimate (Rows) = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc637.h_r = ret_min_entropy;
             H_r = min(ret_min_entropy, H_r);
         }
 
-        ret_min_entropy = multi_mcw_test(cdata, data.len, data.alph_size, verbose, "Literal");
+        ret_min_entropy = find_restart_job(jobs, RESTART_MULTI_MCW, true)->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose > 1) printf("\tMulti Most Common in Window (MultiMCW) Prediction Test Estimate (Cols) = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc637.h_c = ret_min_entropy;
@@ -677,14 +858,14 @@ int main(int argc, char* argv[]) {
         tc638.testCaseNumber = "Lag Prediction Test";
         tc638.data_word_size = data.word_size;
 
-        ret_min_entropy = lag_test(rdata, data.len, data.alph_size, verbose, "Literal");
+        ret_min_entropy = find_restart_job(jobs, RESTART_LAG, false)->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose > 1) printf("\tLag Prediction Test Estimate (Rows) = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc638.h_r = ret_min_entropy;
             H_r = min(ret_min_entropy, H_r);
         }
 
-        ret_min_entropy = lag_test(cdata, data.len, data.alph_size, verbose, "Literal");
+        ret_min_entropy = find_restart_job(jobs, RESTART_LAG, true)->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose > 1) printf("\tLag Prediction Test Estimate (Cols) = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc638.h_c = ret_min_entropy;
@@ -697,14 +878,14 @@ int main(int argc, char* argv[]) {
         tc639.testCaseNumber = "Multi Markov Model with Counting Test (MultiMMC)";
         tc639.data_word_size = data.word_size;
 
-        ret_min_entropy = multi_mmc_test(rdata, data.len, data.alph_size, verbose, "Literal");
+        ret_min_entropy = find_restart_job(jobs, RESTART_MULTI_MMC, false)->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose > 1) printf("\tMulti Markov Model with Counting (MultiMMC) Prediction Test Estimate (Rows) = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc639.h_r = ret_min_entropy;
             H_r = min(ret_min_entropy, H_r);
         }
 
-        ret_min_entropy = multi_mmc_test(cdata, data.len, data.alph_size, verbose, "Literal");
+        ret_min_entropy = find_restart_job(jobs, RESTART_MULTI_MMC, true)->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose > 1) printf("\tMulti Markov Model with Counting (MultiMMC) Prediction Test Estimate (Cols) = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc639.h_c = ret_min_entropy;
@@ -718,14 +899,14 @@ int main(int argc, char* argv[]) {
         tc6310.testCaseNumber = "LZ78Y Test";
         tc6310.data_word_size = data.word_size;
 
-        ret_min_entropy = LZ78Y_test(rdata, data.len, data.alph_size, verbose, "Literal");
+        ret_min_entropy = find_restart_job(jobs, RESTART_LZ78Y, false)->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose > 1) printf("\tLZ78Y Prediction Test Estimate (Rows) = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc6310.h_r = ret_min_entropy;
             H_r = min(ret_min_entropy, H_r);
         }
 
-        ret_min_entropy = LZ78Y_test(cdata, data.len, data.alph_size, verbose, "Literal");
+        ret_min_entropy = find_restart_job(jobs, RESTART_LZ78Y, true)->estimate;
         if (ret_min_entropy >= 0) {
             if (verbose > 1) printf("\tLZ78Y Prediction Test Estimate (Cols) = %f / %d bit(s)\n", ret_min_entropy, data.word_size);
             tc6310.h_c = ret_min_entropy;
@@ -823,31 +1004,9 @@ int main(int argc, char* argv[]) {
         printf("\n");
     }
 
-    if (min(H_r, H_c) < H_I / 2.0) {
-        if (verbose > 0) printf("*** min(H_r, H_c) < H_I/2, Validation Testing Failed ***\n");
-        if (jsonOutput) {
-            if(iid) {
-                testRunIid.errorLevel = -1;
-                testRunIid.errorMsg = "min(H_r, H_c) < H_I/2, Validation Testing Failed.";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunIid.GetAsJson();
-                output.close();
-            } else {
-                testRunNonIid.errorLevel = -1;
-                testRunNonIid.errorMsg = "min(H_r, H_c) < H_I/2, Validation Testing Failed.";
-                ofstream output;
-                output.open(outputfilename);
-                output << testRunNonIid.GetAsJson();
-                output.close();
-            }
-        }
-        exit(-1);
-    }
-
-
+    // Modification by Teron Labs:
+    //   The overall test case is recorded before the validation test, so that H_r, H_c and H_I are in the results even when it fails.
     testRunIid.testCases.push_back(tcOverallIid);
-    testRunIid.errorLevel = 0;
 
     NonIidTestCase tcOverallNonIid;
     tcOverallNonIid.h_r = H_r;
@@ -855,25 +1014,54 @@ int main(int argc, char* argv[]) {
     tcOverallNonIid.h_i = H_I;
     tcOverallNonIid.testCaseNumber = "Overall";
     testRunNonIid.testCases.push_back(tcOverallNonIid);
+
+    if (min(H_r, H_c) < H_I / 2.0) {
+        if (verbose > 0) printf("*** min(H_r, H_c) < H_I/2, Validation Testing Failed ***\n");
+
+        //   Return the results rather than exiting.
+        free(cdata);
+        free_data(&data);
+        return restart_error(iid, testRunIid, testRunNonIid, "min(H_r, H_c) < H_I/2, Validation Testing Failed.", jsonOutput, outputfilename);
+    }
+
+    testRunIid.errorLevel = 0;
     testRunNonIid.errorLevel = 0;
 
+    //    Save the JSON results, to be written to the output file (-o option) and returned.
+    string res = iid ? testRunIid.GetAsJson() : testRunNonIid.GetAsJson();
 
     if (jsonOutput) {
         ofstream output;
         output.open(outputfilename);
-        if (iid) {
-            output << testRunIid.GetAsJson();
-        } else {
-            output << testRunNonIid.GetAsJson();
-        }
+        output << res;
         output.close();
-
     }
+    // End modification.
+
     if (verbose > 0) {
         printf("Validation Test Passed...\n\n");
         printf("min(H_r, H_c, H_I): %f\n\n", min(min(H_r, H_c), H_I));
     }
     free(cdata);
     free_data(&data);
-    return 0;
+
+    // Modification by Teron Labs:
+    //    Record that the restart data passed, and return the JSON results, res.
+    if (passed != NULL) *passed = true;
+
+    return res;
+    // End modification.
+}
+
+// Modification by Teron Labs:
+//    main calls restart_main, and exits with -1 (as before) if the restart data fails the sanity check or validation test.
+//    It is left out of the stats90b Python extension module (which defines STATS90B_MODULE),
+//    as the module is compiled together with iid_main.cpp, which has its own main.
+#ifndef STATS90B_MODULE
+int main(int argc, char* argv[]) {
+    bool passed;
+    restart_main(argc, argv, NULL, 0, &passed);
+    return passed ? 0 : -1;
 }
+#endif
+// End modification.
@@ -0,0 +1,37 @@
+// restart_main.h was created by Teron Labs in July 2024 to facilitate export of restart_main from restart_main.cpp to Python. 
+//       restart_main.cpp was originally produced by NIST (version 1.1.7) and modified by 
+//       Teron Labs <https://www.teronlabs.com> <info@teronlabs.com> in July 2024. 
+//
+// Modification Author(s):
+// Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+// 
+// Licence for restart_main.h:
+//
+// NIST-developed software is provided by NIST as a public service. 
+// You may use, copy, and distribute copies of the software in any medium, provided that you keep intact this entire notice. 
+// You may improve, modify, and create derivative works of the software or any portion of the software, 
+// and you may copy and distribute such modifications or works. 
+// Modified works should carry a notice stating that you changed the software and should note the date and nature of any such change. 
+// Please explicitly acknowledge the National Institute of Standards and Technology as the source of the software.
+
+// NIST-developed software is expressly provided "AS IS." NIST MAKES NO WARRANTY OF ANY KIND, EXPRESS, IMPLIED, IN FACT, 
+// OR ARISING BY OPERATION OF LAW, INCLUDING, WITHOUT LIMITATION, THE IMPLIED WARRANTY OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE, 
+// NON-INFRINGEMENT, AND DATA ACCURACY. NIST NEITHER REPRESENTS NOR WARRANTS THAT THE OPERATION OF THE SOFTWARE WILL BE UNINTERRUPTED OR ERROR-FREE, 
+// OR THAT ANY DEFECTS WILL BE CORRECTED. NIST DOES NOT WARRANT OR MAKE ANY REPRESENTATIONS REGARDING THE USE OF THE SOFTWARE OR THE RESULTS THEREOF, 
+// INCLUDING BUT NOT LIMITED TO THE CORRECTNESS, ACCURACY, RELIABILITY, OR USEFULNESS OF THE SOFTWARE.
+
+// You are solely responsible for determining the appropriateness of using and distributing the software and you assume all risks associated 
+// with its use, including but not limited to the risks and costs of program errors, compliance with applicable laws, damage to or loss of data, 
+// programs or equipment, and the unavailability or interruption of operation. This software is not intended to be used in any situation where a 
+// failure could cause risk of injury or damage to property. The software developed by NIST employees is not subject to copyright protection within 
+// the United States.
+//
+// End Licence.
+
+#include <iostream>
+#include <string>
+#include <stdint.h>
+
+// If buffer is not NULL, the restart matrix is read from the bufferLen bytes of buffer, and argv does not include a file name.
+// If passed is not NULL, it is set to whether the restart data passed the sanity check and validation test.
+std::string restart_main(int argc, char* argv[], const uint8_t *buffer = NULL, long bufferLen = 0, bool *passed = NULL);
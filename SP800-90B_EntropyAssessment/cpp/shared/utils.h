@@ -209,12 +209,113 @@ void free_data(data_t *dp){
 } 
 
 
+// Modification by Teron Labs:
+//		Prepare the symbols read into dp->symbols (previously the second half of read_file_subset, which now calls this function),
+//		so that samples read from a file and samples read from a buffer are prepared in the same way.
+bool prepare_symbols(data_t *dp, TestRunBase *testRun) {
+
+	long i;
+	int mask, j, max_symbols;
+
+	//Do we need to establish the word size?
+	if(dp->word_size == 0) {
+		uint8_t datamask = 0;
+		uint8_t curbit = 0x80;
+
+		for(i = 0; i < dp->len; i++) {
+			datamask = datamask | dp->symbols[i];
+		}
+
+		for(i=8; (i>0) && ((datamask & curbit) == 0); i--) {
+			curbit = curbit >> 1;
+		}
+
+		dp->word_size = i;
+	} else {
+		uint8_t datamask = 0;
+		uint8_t curbit = 0x80;
+
+		for(i = 0; i < dp->len; i++) {
+			datamask = datamask | dp->symbols[i];
+		}
+
+		for(i=8; (i>0) && ((datamask & curbit) == 0); i--) {
+			curbit = curbit >> 1;
+		}
+
+		if( i < dp->word_size ) {
+			printf("Warning: Symbols appear to be narrower than described.\n");
+                        testRun->errorMsg = "Warning: Symbols appear to be narrower than described.";
+		} else if( i > dp->word_size ) {
+                        testRun->errorLevel = -1;
+                        testRun->errorMsg = "Error: Incorrect bit width specification: Data (" + std::to_string(i) + ") does not fit within described bit width: " + std::to_string(dp->word_size) + ".";
+			printf("Incorrect bit width specification: Data (%ld) does not fit within described bit width: %d.\n",i,dp->word_size); 
+                        free(dp->symbols);
+			dp->symbols = NULL;
+			free(dp->rawsymbols);
+			dp->rawsymbols = NULL;
+			return false;
+		}
+	}
+
+	memcpy(dp->rawsymbols, dp->symbols, sizeof(uint8_t)* dp->len);
+	dp->maxsymbol = 0;
+
+	max_symbols = 1 << dp->word_size;
+	int symbol_map_down_table[max_symbols];
+
+	// create symbols (samples) and check if they need to be mapped down
+	dp->alph_size = 0;
+	memset(symbol_map_down_table, 0, max_symbols*sizeof(int));
+	mask = max_symbols-1;
+	for(i = 0; i < dp->len; i++){ 
+		dp->symbols[i] &= mask;
+		if(dp->symbols[i] > dp->maxsymbol) dp->maxsymbol = dp->symbols[i];
+		if(symbol_map_down_table[dp->symbols[i]] == 0) symbol_map_down_table[dp->symbols[i]] = 1;
+	}
+
+	for(i = 0; i < max_symbols; i++){
+		if(symbol_map_down_table[i] != 0) symbol_map_down_table[i] = (uint8_t)dp->alph_size++;
+	}
+
+	// create bsymbols (bitstring) using the non-mapped data
+	dp->blen = dp->len * dp->word_size;
+	if(dp->word_size == 1) dp->bsymbols = dp->symbols;
+	else{
+		dp->bsymbols = (uint8_t*)malloc(dp->blen);
+		if(dp->bsymbols == NULL){
+			printf("Error: failure to initialize memory for bsymbols\n");
+			free(dp->symbols);
+			dp->symbols = NULL;
+			free(dp->rawsymbols);
+			dp->rawsymbols = NULL;
+
+			return false;
+		}
+
+		for(i = 0; i < dp->len; i++){
+			for(j = 0; j < dp->word_size; j++){
+				dp->bsymbols[i*dp->word_size+j] = (dp->symbols[i] >> (dp->word_size-1-j)) & 0x1;
+			}
+		}
+	}
+
+	// map down symbols if less than 2^bits_per_word unique symbols
+	if(dp->alph_size < dp->maxsymbol + 1){
+		for(i = 0; i < dp->len; i++) dp->symbols[i] = (uint8_t)symbol_map_down_table[dp->symbols[i]];
+	} 
+
+	return true;
+}
+// End modification.
+
 // Read in binary file to test
 bool read_file_subset(const char *file_path, data_t *dp, unsigned long subsetIndex, unsigned long subsetSize, TestRunBase *testRun) {
 
 	FILE *file; 
-	int mask, j, max_symbols;
-	long rc, i;
+	// Modification by Teron Labs:
+	//		mask, j, max_symbols and i are now declared in prepare_symbols.
+	long rc;
 	long fileLen;
 
 	file = fopen(file_path, "rb");
@@ -306,96 +407,77 @@ bool read_file_subset(const char *file_path, data_t *dp, unsigned long subsetInd
 	}
 	fclose(file);
 
-	//Do we need to establish the word size?
-	if(dp->word_size == 0) {
-		uint8_t datamask = 0;
-		uint8_t curbit = 0x80;
+	// Modification by Teron Labs:
+	//		The symbols read are prepared (word size, alphabet and bitstring) by prepare_symbols, which is shared with read_buffer_subset.
+	return prepare_symbols(dp, testRun);
+	// End modification.
+}
 
-		for(i = 0; i < dp->len; i++) {
-			datamask = datamask | dp->symbols[i];
-		}
+// Modification by Teron Labs:
+//		Read the samples to test from a buffer in memory (e.g. a Python buffer passed to non_iid_main from stats90b), instead of a file.
+//		The samples are the whole buffer if subsetSize is 0, otherwise the <subsetIndex> substring of length <subsetSize> (as for the -l option).
+bool read_buffer_subset(const uint8_t *buffer, long bufferLen, data_t *dp, unsigned long subsetIndex, unsigned long subsetSize, TestRunBase *testRun) {
 
-		for(i=8; (i>0) && ((datamask & curbit) == 0); i--) {
-			curbit = curbit >> 1;
-		}
-
-		dp->word_size = i;
+	if(subsetSize == 0) {
+		dp->len = bufferLen;
+	} else if(subsetIndex*subsetSize >= (unsigned long)bufferLen) {
+		dp->len = 0;
 	} else {
-		uint8_t datamask = 0;
-		uint8_t curbit = 0x80;
-
-		for(i = 0; i < dp->len; i++) {
-			datamask = datamask | dp->symbols[i];
-		}
-
-		for(i=8; (i>0) && ((datamask & curbit) == 0); i--) {
-			curbit = curbit >> 1;
-		}
-
-		if( i < dp->word_size ) {
-			printf("Warning: Symbols appear to be narrower than described.\n");
-                        testRun->errorMsg = "Warning: Symbols appear to be narrower than described.";
-		} else if( i > dp->word_size ) {
-                        testRun->errorLevel = -1;
-                        testRun->errorMsg = "Error: Incorrect bit width specification: Data (" + std::to_string(i) + ") does not fit within described bit width: " + std::to_string(dp->word_size) + ".";
-			printf("Incorrect bit width specification: Data (%ld) does not fit within described bit width: %d.\n",i,dp->word_size); 
-                        free(dp->symbols);
-			dp->symbols = NULL;
-			free(dp->rawsymbols);
-			dp->rawsymbols = NULL;
-			return false;
-		}
-	}
-
-	memcpy(dp->rawsymbols, dp->symbols, sizeof(uint8_t)* dp->len);
-	dp->maxsymbol = 0;
-
-	max_symbols = 1 << dp->word_size;
-	int symbol_map_down_table[max_symbols];
-
-	// create symbols (samples) and check if they need to be mapped down
-	dp->alph_size = 0;
-	memset(symbol_map_down_table, 0, max_symbols*sizeof(int));
-	mask = max_symbols-1;
-	for(i = 0; i < dp->len; i++){ 
-		dp->symbols[i] &= mask;
-		if(dp->symbols[i] > dp->maxsymbol) dp->maxsymbol = dp->symbols[i];
-		if(symbol_map_down_table[dp->symbols[i]] == 0) symbol_map_down_table[dp->symbols[i]] = 1;
+		dp->len = min((unsigned long)bufferLen - subsetIndex*subsetSize, subsetSize);
 	}
 
-	for(i = 0; i < max_symbols; i++){
-		if(symbol_map_down_table[i] != 0) symbol_map_down_table[i] = (uint8_t)dp->alph_size++;
+	if(dp->len <= 0){
+		testRun->errorLevel = -1;
+		testRun->errorMsg = "Error: buffer is empty";
+		printf("Error: buffer is empty\n");
+		return false;
 	}
 
-	// create bsymbols (bitstring) using the non-mapped data
-	dp->blen = dp->len * dp->word_size;
-	if(dp->word_size == 1) dp->bsymbols = dp->symbols;
-	else{
-		dp->bsymbols = (uint8_t*)malloc(dp->blen);
-		if(dp->bsymbols == NULL){
-			printf("Error: failure to initialize memory for bsymbols\n");
+	dp->symbols = (uint8_t*)malloc(sizeof(uint8_t)*dp->len);
+	dp->rawsymbols = (uint8_t*)malloc(sizeof(uint8_t)*dp->len);
+	if((dp->symbols == NULL) || (dp->rawsymbols == NULL)){
+		testRun->errorLevel = -1;
+		testRun->errorMsg = "Error: failure to initialize memory for symbols";
+		printf("Error: failure to initialize memory for symbols\n");
+		if(dp->symbols != NULL) {
 			free(dp->symbols);
 			dp->symbols = NULL;
+		}
+		if(dp->rawsymbols != NULL) {
 			free(dp->rawsymbols);
 			dp->rawsymbols = NULL;
-
-			return false;
 		}
+		return false;
+	}
 
-		for(i = 0; i < dp->len; i++){
-			for(j = 0; j < dp->word_size; j++){
-				dp->bsymbols[i*dp->word_size+j] = (dp->symbols[i] >> (dp->word_size-1-j)) & 0x1;
+	if(subsetSize == 0) memcpy(dp->symbols, buffer, sizeof(uint8_t)*dp->len);
+	else memcpy(dp->symbols, buffer + subsetIndex*subsetSize, sizeof(uint8_t)*dp->len);
+
+	return prepare_symbols(dp, testRun);
+}
+// End modification.
+
+// Modification by Teron Labs:
+//		Write the transpose of the rows x columns matrix in (stored row by row) to out, so that out holds the matrix column by column.
+//		Used to convert the restart matrix from the row dataset to the column dataset (SP800-90B Section 3.1.4.1) in memory,
+//		by restart_main, ea_transpose and the stats90b module. The matrix is copied in blocks, so that each block of in and out stays in the cache.
+void transpose_matrix(const uint8_t *in, uint8_t *out, const long rows, const long columns) {
+
+	const long blockSize = 64;
+
+	for(long rowStart = 0; rowStart < rows; rowStart += blockSize) {
+		long rowEnd = min(rowStart + blockSize, rows);
+		for(long columnStart = 0; columnStart < columns; columnStart += blockSize) {
+			long columnEnd = min(columnStart + blockSize, columns);
+			for(long i = rowStart; i < rowEnd; i++) {
+				for(long j = columnStart; j < columnEnd; j++) {
+					out[j * rows + i] = in[i * columns + j];
+				}
 			}
 		}
 	}
-
-	// map down symbols if less than 2^bits_per_word unique symbols
-	if(dp->alph_size < dp->maxsymbol + 1){
-		for(i = 0; i < dp->len; i++) dp->symbols[i] = (uint8_t)symbol_map_down_table[dp->symbols[i]];
-	} 
-
-	return true;
 }
+// End modification.
 
 bool read_file(const char *file_path, data_t *dp, TestRunBase *testRun){
 
@@ -715,6 +797,125 @@ void FYshuffle(uint8_t data[], uint8_t rawdata[], const int sample_size, uint64_
 	}
 }
 
+// Modification by Teron Labs:
+//		Add a faster shuffle engine for the permutation tests, selected with the shuffle_engine parameter of permutation_tests_res.
+//		SHUFFLE_FY is the Fisher-Yates shuffle above. SHUFFLE_BATCHED (the default) produces exactly the same permutation
+//		from the same xoshiro256** state, so results are reproducible across engines, but:
+//		  - Draws the random numbers in batches of SHUFFLE_BLOCK, and computes a block of swap positions at a time
+//		    with Lemire's multiply-shift bounded sampling (as in randomRange64), prefetching each position.
+//		  - Swaps data and rawdata together as one 16-bit value in a paired buffer, so each swap touches one cache line instead of two.
+//		    The paired buffer is kept between shuffles, so data and rawdata are only unpacked from it after each shuffle.
+//		  - Does not lock a mutex (each thread has its own state and buffers), so the OpenMP threads shuffle at the same time.
+#define SHUFFLE_FY 0
+#define SHUFFLE_BATCHED 1
+#define SHUFFLE_BLOCK 64
+
+// Fill out[0..count-1] with the next count outputs of xoshiro256** (the same outputs as count calls of xoshiro256starstar).
+void xoshiro256starstar_fill(uint64_t out[], const int count, uint64_t *xoshiro256starstarState) {
+	uint64_t s0 = xoshiro256starstarState[0];
+	uint64_t s1 = xoshiro256starstarState[1];
+	uint64_t s2 = xoshiro256starstarState[2];
+	uint64_t s3 = xoshiro256starstarState[3];
+
+	for (int i = 0; i < count; ++i) {
+		const uint64_t t = s1 << 17;
+		out[i] = rotl(s1 * 5, 7) * 9;
+		s2 ^= s0;
+		s3 ^= s1;
+		s1 ^= s2;
+		s0 ^= s3;
+		s2 ^= t;
+		s3 = rotl(s3, 45);
+	}
+
+	xoshiro256starstarState[0] = s0;
+	xoshiro256starstarState[1] = s1;
+	xoshiro256starstarState[2] = s2;
+	xoshiro256starstarState[3] = s3;
+}
+
+// Seed the xoshiro256** state deterministically from a 64-bit value using splitmix64 (as recommended by the xoshiro authors),
+// so that the permutation tests can be repeated with the same random streams.
+void seed_fixed(uint64_t seed_value, uint64_t *xoshiro256starstarState) {
+	for (int i = 0; i < 4; ++i) {
+		uint64_t z = (seed_value += 0x9e3779b97f4a7c15);
+		z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9;
+		z = (z ^ (z >> 27)) * 0x94d049bb133111eb;
+		xoshiro256starstarState[i] = z ^ (z >> 31);
+	}
+}
+
+// Batched Fisher-Yates shuffle of data and rawdata together (see SHUFFLE_BATCHED).
+// paired must have room for sample_size values; it is a buffer owned by the calling thread, which holds the shuffled data and rawdata on return.
+// paired_current may be true if paired already holds data and rawdata (i.e. neither was changed since the last call with this paired buffer),
+// which saves packing them again.
+void FYshuffleBatched(uint8_t data[], uint8_t rawdata[], const int sample_size, uint64_t *xoshiro256starstarState, uint16_t paired[], 
+		const bool paired_current) {
+	uint64_t randoms[SHUFFLE_BLOCK];
+	uint64_t fillState[4];
+	long int swaps[SHUFFLE_BLOCK];
+	int randomsUsed = SHUFFLE_BLOCK;
+	bool filled = false;
+
+	if (!paired_current) {
+		for (long int i = 0; i < sample_size; ++i) {
+			paired[i] = (uint16_t)(data[i] | (rawdata[i] << 8));
+		}
+	}
+
+	for (long int i = sample_size - 1; i > 0; i -= SHUFFLE_BLOCK) {
+		const int blockSize = (i < SHUFFLE_BLOCK) ? (int)i : SHUFFLE_BLOCK;
+
+		// Find the positions to swap with i, i-1, ..., i-blockSize+1. The random numbers are used in the same order as randomRange64 uses them.
+		for (int k = 0; k < blockSize; ++k) {
+			const uint64_t s = (uint64_t)(i - k) + 1; // An integer in the range [0, i-k]
+			uint128_t m;
+			uint64_t l;
+
+			if (randomsUsed == SHUFFLE_BLOCK) {
+				memcpy(fillState, xoshiro256starstarState, sizeof(fillState));
+				xoshiro256starstar_fill(randoms, SHUFFLE_BLOCK, xoshiro256starstarState);
+				randomsUsed = 0;
+				filled = true;
+			}
+			m = (uint128_t)randoms[randomsUsed++] * (uint128_t)s;
+			l = (uint64_t)m;
+			if (l < s) {
+				uint64_t t = ((uint64_t)(-s)) % s;
+				while (l < t) {
+					if (randomsUsed == SHUFFLE_BLOCK) {
+						memcpy(fillState, xoshiro256starstarState, sizeof(fillState));
+						xoshiro256starstar_fill(randoms, SHUFFLE_BLOCK, xoshiro256starstarState);
+						randomsUsed = 0;
+						filled = true;
+					}
+					m = (uint128_t)randoms[randomsUsed++] * (uint128_t)s;
+					l = (uint64_t)m;
+				}
+			}
+			swaps[k] = (long int)(m >> 64U);
+			__builtin_prefetch(&paired[swaps[k]], 1);
+		}
+
+		// The swaps must be done in order, since a later swap may move a value swapped earlier in the block.
+		for (int k = 0; k < blockSize; ++k) {
+			SWAP(paired[swaps[k]], paired[i - k]);
+		}
+	}
+
+	for (long int i = 0; i < sample_size; ++i) {
+		data[i] = (uint8_t)paired[i];
+		rawdata[i] = (uint8_t)(paired[i] >> 8);
+	}
+
+	// Return the unused random numbers of the last batch to the stream, so that the state is the same as after FYshuffle
+	// and the next shuffle uses the same random numbers. The state saved before the last batch is advanced by the numbers used.
+	if (filled) {
+		memcpy(xoshiro256starstarState, fillState, sizeof(fillState));
+		xoshiro256starstar_fill(randoms, randomsUsed, xoshiro256starstarState);
+	}
+}
+
 // Quick sum array  // TODO
 long int sum(const uint8_t arr[], const int sample_size) {
 	long int sum = 0;
@@ -1,5 +1,39 @@
 /* VERSION information is kept in utils.h. Please update when a new version is released */
 
+// transpose_main.cpp was originally produced by NIST (version 1.1.7) and modified by
+// Teron Labs <https://www.teronlabs.com> <info@teronlabs.com> in July 2024.
+//
+// Modification Author(s):
+// Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+//
+// Modifications by Teron Labs to transpose_main.cpp in July 2024 are as follows:
+//     Transpose the restart matrix in memory with transpose_matrix (from utils.h), which is shared with restart_main and the stats90b module,
+//     and write the column data with a single call to fwrite.
+// End modification list.
+//
+// Licence for transpose_main.cpp:
+//
+// NIST-developed software is provided by NIST as a public service.
+// You may use, copy, and distribute copies of the software in any medium, provided that you keep intact this entire notice.
+// You may improve, modify, and create derivative works of the software or any portion of the software,
+// and you may copy and distribute such modifications or works.
+// Modified works should carry a notice stating that you changed the software and should note the date and nature of any such change.
+// Please explicitly acknowledge the National Institute of Standards and Technology as the source of the software.
+
+// NIST-developed software is expressly provided "AS IS." NIST MAKES NO WARRANTY OF ANY KIND, EXPRESS, IMPLIED, IN FACT,
+// OR ARISING BY OPERATION OF LAW, INCLUDING, WITHOUT LIMITATION, THE IMPLIED WARRANTY OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE,
+// NON-INFRINGEMENT, AND DATA ACCURACY. NIST NEITHER REPRESENTS NOR WARRANTS THAT THE OPERATION OF THE SOFTWARE WILL BE UNINTERRUPTED OR ERROR-FREE,
+// OR THAT ANY DEFECTS WILL BE CORRECTED. NIST DOES NOT WARRANT OR MAKE ANY REPRESENTATIONS REGARDING THE USE OF THE SOFTWARE OR THE RESULTS THEREOF,
+// INCLUDING BUT NOT LIMITED TO THE CORRECTNESS, ACCURACY, RELIABILITY, OR USEFULNESS OF THE SOFTWARE.
+
+// You are solely responsible for determining the appropriateness of using and distributing the software and you assume all risks associated
+// with its use, including but not limited to the risks and costs of program errors, compliance with applicable laws, damage to or loss of data,
+// programs or equipment, and the unavailability or interruption of operation. This software is not intended to be used in any situation where a
+// failure could cause risk of injury or damage to property. The software developed by NIST employees is not subject to copyright protection within
+// the United States.
+//
+// End Licence.
+
 #include "shared/utils.h"
 #include "iid/iid_test_run.h"
 #include <stdio.h>
@@ -100,16 +134,24 @@ int main(int argc, char* argv[]) {
         print_usage();
     }
 
-    for (int i = 0; i < c; i++) {
-        for (int j = 0; j < r; j++) {
-            if (fwrite(data.rawsymbols + c * j + i, sizeof (uint8_t), 1, fp) != 1) {
-                perror("Can't write output");
-                exit(-1);
-            }
-        }
+    // Modification by Teron Labs:
+    //     Transpose the restart matrix in memory with transpose_matrix, and write it with one call to fwrite (instead of one per sample).
+    uint8_t *columnData = (uint8_t*) malloc(r * c);
+    if (columnData == NULL) {
+        printf("Error: failure to initialize memory for columns\n");
+        exit(-1);
+    }
+
+    transpose_matrix(data.rawsymbols, columnData, r, c);
+
+    if (fwrite(columnData, sizeof (uint8_t), r * c, fp) != (size_t)(r * c)) {
+        perror("Can't write output");
+        exit(-1);
     }
 
     fclose(fp);
+    free(columnData);
+    // End modification.
     free_data(&data);
     return 0;
 }
@@ -0,0 +1,257 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com> 
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+# Benchmarks for the decimate pipeline.
+#
+# Each benchmark case runs in a fresh process, so that its peak memory (resident set size) is measured separately.
+# Synthetic delta files are generated from a fixed seed before the cases are timed, so runs on the same hardware are comparable across commits.
+# The report is written in JSON format, with the time, throughput (samples per second) and peak memory of each case.
+#
+# Usage:
+#   python benchmarks/bench_decimate.py --out report.json
+#   python benchmarks/bench_decimate.py --quick --out report.json        (smaller inputs, fewer cases)
+#   python benchmarks/bench_decimate.py --only write_decimated_file      (run only cases whose name starts with the given text)
+#
+# NOTE: iid_main requires at least 1,000,000 samples per round, so the iid_main and decimated_binary_search cases
+#       use testSize = 1,000,000 even with --quick.
+
+from decimate.deci import (write_decimated_file, write_decimated_delete_file, write_subfile, write_subDist_id_file, 
+                           decimated_binary_search, unchanged, mod_256, failTable)
+from decimate.synth import synth_write, DependentGroups
+from stats90b import iid_main
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+import argparse
+import datetime
+import platform
+import subprocess
+import tempfile
+import time
+import json
+import sys
+import os
+
+try:
+    import resource
+except ImportError:
+    # Peak memory is not available (e.g. on Windows); it is reported as None.
+    resource = None
+
+
+# The seed used to generate the synthetic delta files.
+seed = 20240707
+
+# Purpose: Write a synthetic delta file with dependent groups of 4 deltas (as in examples/example_decimate_bin_search.py).
+# Parameters:
+#   path: The path of the file to write.
+#   numDeltas: The number of deltas to write.
+#   delta_bytes: The number of bytes per delta (little endian).
+#   seed: The seed of the random number generator.
+def write_synthetic_deltas(path, numDeltas, delta_bytes, seed):
+    synth_write(path, numDeltas, DependentGroups(4, 128, 128), delta_bytes, seed)
+
+
+# Purpose: Return the list of benchmark cases.
+# Parameters:
+#   quick: When True, use smaller inputs and fewer cases.
+# Return value:
+#   A list of dictionaries, each with:
+#       name: The name of the case (the name of the function benchmarked, followed by its parameters).
+#       function: The name of the function in this file that runs the case (see the run_ functions below).
+#       inputs: A list of (name, numDeltas, delta_bytes) of synthetic delta files needed by the case.
+#       params: The parameters passed to the function.
+#       samples: The number of samples (deltas) processed by the case, used to find the throughput.
+def benchmark_cases(quick):
+    numDeltas = 2000000 if quick else 20000000
+    decList = [1, 4, 16] if quick else [1, 4, 16, 64]
+    cases = []
+    for delta_bytes in [1, 8]:
+        deltaFile = (f"deltas_{delta_bytes}.bin", numDeltas, delta_bytes)
+        for dec in decList:
+            # numSets = dec, so the whole input (rounded down to a multiple of dec) is decimated.
+            setSize = numDeltas // dec
+            cases.append({"name": f"write_decimated_file[delta_bytes={delta_bytes},dec={dec}]", "function": "run_write_decimated_file",
+                          "inputs": [deltaFile], "params": {"dec": dec, "numSets": dec, "setSize": setSize, "input_delta_bytes": delta_bytes},
+                          "samples": dec * setSize})
+        cases.append({"name": f"write_decimated_delete_file[delta_bytes={delta_bytes},dec=4]", "function": "run_write_decimated_delete_file",
+                      "inputs": [deltaFile], "params": {"dec": 4, "delIdx": [3], "delta_bytes": delta_bytes}, "samples": numDeltas})
+        cases.append({"name": f"write_subfile[delta_bytes={delta_bytes}]", "function": "run_write_subfile",
+                      "inputs": [deltaFile], "params": {"input_delta_bytes": delta_bytes, "subdist_cutoffs": [64, 128, 192]}, "samples": numDeltas})
+        cases.append({"name": f"write_subDist_id_file[delta_bytes={delta_bytes}]", "function": "run_write_subDist_id_file",
+                      "inputs": [deltaFile], "params": {"input_delta_bytes": delta_bytes, "subdist_cutoffs": [64, 128, 192]}, "samples": numDeltas})
+
+    roundFile = ("round_1.bin", 1000000, 1)
+    for testGroup in (["chi1", "chi2", "LRS"] if quick else ["chi1", "chi2", "LRS", "perm"]):
+        cases.append({"name": f"iid_main[-r {testGroup}]", "function": "run_iid_main", 
+                      "inputs": [roundFile], "params": {"IIDtests": f"-r {testGroup}"}, "samples": 1000000})
+
+    maxDec = 4 if quick else 8
+    numTestsRequested = 2 if quick else 4
+    searchFile = ("search_1.bin", 2 * maxDec * numTestsRequested * 1000000, 1)
+    cases.append({"name": f"decimated_binary_search[maxDec={maxDec},numTestsRequested={numTestsRequested},-r chi1]", 
+                  "function": "run_decimated_binary_search", "inputs": [searchFile], 
+                  "params": {"maxDec": maxDec, "numTestsRequested": numTestsRequested, "IIDtests": "-r chi1"}, "samples": None})
+    return cases
+
+
+# The run_ functions run one benchmark case. Each has parameters:
+#   inputPaths: The paths of the synthetic delta files given in the case's inputs.
+#   workDir: A directory in which output files may be written.
+#   params: The case's params.
+# The run_ functions may return the number of samples processed, when this is only known after the case has run.
+
+def run_write_decimated_file(inputPaths, workDir, params):
+    write_decimated_file(inputPaths[0], os.path.join(workDir, "decimated.bin"), params["dec"], params["numSets"], params["setSize"], 
+                         mod_256, False, params["input_delta_bytes"], 1, 'little')
+
+def run_write_decimated_delete_file(inputPaths, workDir, params):
+    write_decimated_delete_file(inputPaths[0], os.path.join(workDir, "deleted.bin"), params["dec"], params["delIdx"], False, 
+                                params["delta_bytes"], 'little')
+
+def run_write_subfile(inputPaths, workDir, params):
+    write_subfile(inputPaths[0], os.path.join(workDir, "sub"), unchanged, params["input_delta_bytes"], params["input_delta_bytes"], 
+                  params["subdist_cutoffs"], False, 'little')
+
+def run_write_subDist_id_file(inputPaths, workDir, params):
+    write_subDist_id_file(inputPaths[0], os.path.join(workDir, "subdist_id.txt"), params["input_delta_bytes"], params["subdist_cutoffs"], 
+                          False, 'little', True)
+
+def run_iid_main(inputPaths, workDir, params):
+    json.loads(iid_main(f"-q {params['IIDtests']} {inputPaths[0]}"))
+
+def run_decimated_binary_search(inputPaths, workDir, params):
+    # decimated_binary_search writes its temporary files in the current directory.
+    os.chdir(workDir)
+    results, datestampList, passedLevels = decimated_binary_search(inputPaths[0], os.path.join(workDir, "results.txt"), overwrite=True, 
+                                        platform="benchmark", maxDec=params["maxDec"], minDec=1, numTestsRequested=params["numTestsRequested"], 
+                                        maxFails=failTable, testSize=1000000, input_delta_bytes=1, verbose=False, IIDtests=params["IIDtests"])
+    # The samples processed are the deltas of each decimation level tested.
+    return sum(item["dec"] * ((item["roundTotal"] + item["dec"] - 1) // item["dec"]) * 1000000 for item in results)
+
+
+# Purpose: Run one benchmark case (in a fresh process) and measure it.
+# Parameters:
+#   case: The case (see benchmark_cases).
+#   inputPaths: The paths of the case's synthetic delta files.
+#   repeat: How many times to run the case.
+# Return value:
+#   A dictionary with the times of each run (seconds), the samples processed, and the peak resident set size of the process (bytes).
+def measure_case(case, inputPaths, repeat):
+    function = globals()[case["function"]]
+    baselineRSS = peak_rss()
+    times = []
+    samples = case["samples"]
+    for r in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="decimate_bench_") as workDir:
+            start = time.perf_counter()
+            returnedSamples = function(inputPaths, workDir, case["params"])
+            times.append(time.perf_counter() - start)
+            os.chdir(os.path.dirname(workDir))
+        if returnedSamples is not None:
+            samples = returnedSamples
+    return {"times": times, "samples": samples, "baselineRSSBytes": baselineRSS, "peakRSSBytes": peak_rss()}
+
+
+# Purpose: Return the peak resident set size of this process in bytes, or None if it is not available.
+def peak_rss():
+    # On Linux, use the high water mark of this process's memory: ru_maxrss is not reset by exec, 
+    # so in a new process it may report the peak of the parent process.
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+
+# Purpose: Return a description of the machine and software the benchmarks ran on.
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, 
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": sys.version.split()[0], "numpy": np.__version__, "platform": platform.platform(), 
+            "machine": platform.machine(), "processor": platform.processor(), "cpuCount": os.cpu_count()}
+
+
+# Purpose: Run the benchmark cases and return the report.
+# Parameters:
+#   quick: When True, use smaller inputs and fewer cases.
+#   repeat: How many times to run each case.
+#   only: If not "", run only the cases whose name starts with this text.
+#   dataDir: The directory for the synthetic delta files. If None, a temporary directory is used and removed afterwards.
+#   verbose: When True, print the results of each case as it completes.
+def run_benchmarks(quick=False, repeat=3, only="", dataDir=None, verbose=True):
+    cases = [case for case in benchmark_cases(quick) if case["name"].startswith(only)]
+    report = {"datestamp": str(datetime.datetime.now()), "quick": quick, "repeat": repeat, "seed": seed, 
+              "environment": environment(), "benchmarks": []}
+    with tempfile.TemporaryDirectory(prefix="decimate_bench_data_") as tempDir:
+        if dataDir is None:
+            dataDir = tempDir
+        # Generate each synthetic delta file once; files already in dataDir with the right size are reused.
+        for case in cases:
+            for name, numDeltas, delta_bytes in case["inputs"]:
+                path = os.path.join(dataDir, name)
+                if not os.path.exists(path) or os.path.getsize(path) != numDeltas * delta_bytes:
+                    write_synthetic_deltas(path, numDeltas, delta_bytes, seed)
+
+        # Run each case in its own process (using "spawn" so that it does not inherit the memory of this process).
+        context = multiprocessing.get_context("spawn")
+        for case in cases:
+            inputPaths = [os.path.abspath(os.path.join(dataDir, name)) for name, numDeltas, delta_bytes in case["inputs"]]
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                measured = executor.submit(measure_case, case, inputPaths, repeat).result()
+            best = min(measured["times"])
+            entry = {"name": case["name"], "params": case["params"], "samples": measured["samples"], 
+                     "seconds": {"best": best, "mean": sum(measured["times"]) / len(measured["times"]), "all": measured["times"]},
+                     "samplesPerSecond": measured["samples"] / best if measured["samples"] and best > 0 else None,
+                     "peakRSSBytes": measured["peakRSSBytes"], "baselineRSSBytes": measured["baselineRSSBytes"]}
+            report["benchmarks"].append(entry)
+            if verbose:
+                rate = "-" if entry["samplesPerSecond"] is None else f"{entry['samplesPerSecond']:,.0f} samples/s"
+                peak = "-" if entry["peakRSSBytes"] is None else f"{entry['peakRSSBytes'] / 2**20:,.1f} MiB"
+                print(f"{case['name']:70s} {best:10.3f} s  {rate:>24s}  peak {peak}", flush=True)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the decimate pipeline and write a JSON report.")
+    parser.add_argument("--out", default="decimate_benchmark.json", help="Path of the JSON report to write.")
+    parser.add_argument("--quick", action="store_true", help="Use smaller inputs and fewer cases.")
+    parser.add_argument("--repeat", type=int, default=3, help="How many times to run each case (the best time is used for the throughput).")
+    parser.add_argument("--only", default="", help="Run only the cases whose name starts with this text.")
+    parser.add_argument("--data-dir", default=None, help="Directory in which to keep the synthetic delta files between runs.")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.quick, args.repeat, args.only, args.data_dir)
+    with open(args.out, "w") as outFile:
+        outFile.write(json.dumps(report, indent=5))
+    print(f"Wrote benchmark report to {args.out}.")
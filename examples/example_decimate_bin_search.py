@@ -19,6 +19,7 @@
 #    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
 
 from decimate.deci import decimated_binary_search, result_open, result_print, failTable, unchanged
+from decimate.synth import synth_write, DependentGroups
 import json
 import random
 import secrets
@@ -48,14 +49,8 @@ if (not os.path.exists(delta_path)) or (os.path.getsize(delta_path) < numDeltas)
         print(f"generateFile = {generateFile}")
     print(f"\n\n GENERATING A FILE OF SAMPLES \n\twith dependent groups of samples of size {dependencyModulus}:\n\n")
     # Generate a random file for test purposes.
-    with open(delta_path, "wb") as myFile:
-        for i in range(numDeltas):
-            if i%dependencyModulus ==0:
-                lastRand = secrets.randbelow(128)
-                lastNum = lastRand + secrets.randbelow(128)    
-            else:
-                lastNum = lastRand + secrets.randbelow(128)
-            myFile.write(lastNum.to_bytes(length=1, byteorder='little', signed=False))
+    # Each group of dependencyModulus deltas shares a value uniform on 0 to 127, to which each delta adds its own value uniform on 0 to 127.
+    synth_write(delta_path, numDeltas, DependentGroups(dependencyModulus, 128, 128), delta_bytes=1, seed=secrets.randbits(64))
     print(f"Wrote delta file {delta_path} which is {os.path.getsize(delta_path)} bytes long.")
 
 print("\n\n STARTING DECIMATION TESTING:\n\n")
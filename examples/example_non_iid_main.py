@@ -0,0 +1,57 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com> 
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+from decimate.noniid import non_iid_assess, non_iid_samples, non_iid_min_entropy
+from decimate.synth import synth_deltas, DependentGroups
+from stats90b import non_iid_main
+import json
+import numpy as np
+import os
+
+
+# Generate samples for test purposes, held in memory.
+# Each group of 4 samples shares a value uniform on 0 to 7, to which each sample adds its own value uniform on 0 to 7.
+samples = synth_deltas(1000000, DependentGroups(4, 8, 8), seed=1).astype(np.uint8)
+
+# Call the NIST non-IID estimators directly, passing the samples as a buffer (there is no file name in the arguments).
+# `-q` means quiet
+# `-p` means run the estimators in parallel
+# `-r lag -r lz78y` means run only the Lag and LZ78Y prediction estimators (leave out -r to run all of them)
+result_string = non_iid_main("-q -p -r lag -r lz78y", samples)
+
+# Convert the results string to a Python dictionary, and print the results of each estimator.
+res = json.loads(result_string)
+for testCase in res["testCases"]:
+    print(testCase)
+
+# Run all the estimators, using decimate.noniid, which checks the arguments and data first.
+results = non_iid_assess(samples)
+print("\nAssessed min-entropy of the samples:", non_iid_min_entropy(results))
+
+# Only every 4th sample (e.g. after decimation at level 4) is assessed here, using non_iid_samples to read a file of samples.
+samples.tofile("./data/Example_non_iid_main_File1.bin")
+decimated = non_iid_samples("./data/Example_non_iid_main_File1.bin", dec=4)
+print("Assessed min-entropy of every 4th sample:", non_iid_min_entropy(non_iid_assess(decimated)))
+
+# Clean up the temporary file.
+if os.path.exists("./data/Example_non_iid_main_File1.bin"):
+    os.remove("./data/Example_non_iid_main_File1.bin")
@@ -0,0 +1,66 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com> 
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+from decimate.restart import restart_assess, restart_columns, restart_passed, restart_min_entropy
+from decimate.noniid import non_iid_assess, non_iid_min_entropy
+from decimate.synth import synth_deltas, Uniform
+from stats90b import restart_main
+import json
+import numpy as np
+
+
+# Generate a restart matrix for test purposes, held in memory: 1000 restarts of 1000 samples, one restart per row.
+# Each sample is uniform on 0 to 15, so each restart is independent of the others.
+matrix = synth_deltas(1000000, Uniform(0, 16), seed=1).astype(np.uint8).reshape(1000, 1000)
+
+# The initial entropy estimate H_I of the samples, e.g. from the non-IID estimators.
+hInitial = non_iid_min_entropy(non_iid_assess(matrix.reshape(-1)))
+print("Initial entropy estimate H_I:", hInitial)
+
+# Call the NIST restart tests directly, passing the matrix as a buffer (there is no file name in the arguments).
+# `-q` means quiet
+# `-p` means run the non-IID estimators on the rows and columns in parallel
+# `4` is the number of bits per symbol, followed by H_I
+result_string = restart_main(f"-q -p 4 {hInitial}", matrix)
+
+# Convert the results string to a Python dictionary, and print the results of each estimate on the rows (h_r) and columns (h_c).
+res = json.loads(result_string)
+print("errorLevel:", res["errorLevel"])
+for testCase in res["testCases"]:
+    print(testCase)
+
+# Run the restart tests using decimate.restart, which checks the arguments first.
+results = restart_assess(matrix, hInitial)
+if restart_passed(results):
+    print("\nValidated entropy estimate min(H_r, H_c, H_I):", restart_min_entropy(results))
+else:
+    print("\nRestart tests failed:", results["errorMessage"])
+
+# A restart matrix in which every restart produces the same samples fails the sanity check.
+# The failure is reported in the results rather than ending the program.
+repeated = np.tile(matrix[0], (1000, 1))
+results = restart_assess(repeated, hInitial)
+print("Repeated restarts passed:", restart_passed(results), "-", results["errorMessage"])
+
+# The column dataset (the i'th sample of every restart), e.g. to assess it separately.
+columns = restart_columns(matrix)
+print("Column dataset equals the transpose of the matrix:", np.array_equal(columns, matrix.T))
@@ -0,0 +1,239 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+# asyncio interface for decimation testing.
+#
+# test_decimated_file_async, decimated_binary_search_async and decimated_range_test_async take the same parameters as the functions in decimate.deci,
+# and return an AsyncSearch. The search runs in a worker process (iid_main holds the GIL, so a thread would block the event loop), 
+# and its progress is sent back after every round. An AsyncSearch is:
+#   - an async iterator of progress events (see progress_event), 
+#   - awaitable, giving the values returned by the decimate.deci function, 
+#   - cancellable between rounds, with cancel() or by cancelling the task that iterates over or awaits it.
+# E.g.
+#   search = decimated_binary_search_async(delta_path, results_path, platform="Device 1", maxDec=100, numTestsRequested=100)
+#   async for event in search:
+#       print(event)
+#   results, datestampList, passedLevels = await search
+# NOTE: Worker processes are started with the "spawn" method, so the main module of the program must be importable
+#       (i.e. start the event loop under if __name__ == "__main__":), and convert_delta and maxFails must be defined at the top level of a module.
+
+import os
+import asyncio
+import inspect
+import tempfile
+import multiprocessing
+from queue import Empty
+from concurrent.futures import ProcessPoolExecutor
+from decimate.deci import test_decimated_file, decimated_binary_search, decimated_range_test
+from decimate.tracing import Tracer
+
+
+asyncFunctions = {"test_decimated_file": test_decimated_file, "decimated_binary_search": decimated_binary_search, 
+                  "decimated_range_test": decimated_range_test}
+
+
+# Raised by a search that was cancelled (see AsyncSearch.cancel). The results of the rounds completed before cancelling are in the results_path.
+class SearchCancelled(Exception):
+    pass
+
+
+# Purpose: For internal use - Convert a span (see decimate.tracing) into a progress event.
+# Parameters:
+#   span: A span recorded during the search.
+# Return value: A progress event (a dictionary), or None if the span does not mark progress:
+#   {"event": "round", "dec", "round", "passed", "roundPass", "roundTotal", "failure"}: after each round of testing 
+#       (passed is whether the round passed, and failure whether the level has failed so far).
+#   {"event": "level", "dec", "failed", "roundPass", "roundTotal"}: after each decimation level of a search.
+def progress_event(span):
+    if span["name"] != "results write":
+        return None
+    attrs = span["attrs"]
+    if "round" in attrs:
+        return {"event": "round", "dec": attrs["dec"], "round": attrs["round"], "passed": attrs["passed"], 
+                "roundPass": attrs["roundPass"], "roundTotal": attrs["roundTotal"], "failure": attrs["failure"]}
+    if "failed" in attrs:
+        return {"event": "level", "dec": attrs["dec"], "failed": attrs["failed"], "roundPass": attrs["roundPass"], "roundTotal": attrs["roundTotal"]}
+    return None
+
+
+# Purpose: For internal use - Run a decimate.deci function in a worker process, sending progress events to the events queue.
+#          The function runs in its own temporary directory, since the search functions write temporary files to the current directory.
+#          The search is stopped (by raising SearchCancelled) after the results of a round or level are written, once cancelEvent is set.
+# Parameters:
+#   functionName: The name of the function (a key of asyncFunctions).
+#   kwargs: The arguments of the function (with absolute paths).
+#   events: A multiprocessing queue for the progress events.
+#   cancelEvent: A multiprocessing event, set to cancel the search.
+# Return value: The values returned by the function.
+def run_async_worker(functionName, kwargs, events, cancelEvent):
+    pid = os.getpid()
+
+    def observer(span):
+        event = progress_event(span)
+        if event is not None:
+            events.put(event)
+            # Spans from the worker processes of a speculative search are passed on after the search has recorded their results, 
+            # so the search stops at the end of a level of its own.
+            if span["pid"] == pid and cancelEvent.is_set():
+                raise SearchCancelled(f"{functionName} was cancelled after decimation level {event['dec']}" + 
+                                      (f", round {event['round']}." if event["event"] == "round" else "."))
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="decimate_async_") as tempDir:
+        os.chdir(tempDir)
+        try:
+            return asyncFunctions[functionName](**kwargs, tracer=Tracer([observer], record=False))
+        finally:
+            os.chdir(cwd)
+
+
+# A decimate.deci function running in a worker process (returned by test_decimated_file_async, decimated_binary_search_async and
+# decimated_range_test_async). The function starts when the AsyncSearch is first iterated over or awaited.
+# Parameters:
+#   functionName: The name of the function (a key of asyncFunctions).
+#   kwargs: The arguments of the function.
+#   executor: A ProcessPoolExecutor in which to run the function, or None to use a new worker process for this search only.
+#   pollInterval: How often (in seconds) to check for progress events.
+class AsyncSearch():
+    def __init__(self, functionName, kwargs, executor=None, pollInterval=0.2):
+        self.functionName = functionName
+        self.kwargs = kwargs
+        self.executor = executor
+        self.pollInterval = pollInterval
+        self.started = False
+        self.finished = False
+        self.cancelled = False
+        self.future = None
+        self.closeTask = None
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        self.manager = context.Manager()
+        self.events = self.manager.Queue()
+        self.cancelEvent = self.manager.Event()
+        if self.cancelled:
+            self.cancelEvent.set()
+        self.ownExecutor = self.executor is None
+        if self.ownExecutor:
+            self.executor = ProcessPoolExecutor(max_workers=1, mp_context=context)
+        self.future = asyncio.wrap_future(self.executor.submit(run_async_worker, self.functionName, self.kwargs, self.events, self.cancelEvent))
+        self.started = True
+
+    # Ask the search to stop after the round (or, for a speculative search, the level) that it is testing. 
+    # Iterating over or awaiting the search then raises SearchCancelled.
+    def cancel(self):
+        self.cancelled = True
+        if self.started and not self.finished:
+            self.cancelEvent.set()
+
+    def next_event(self):
+        try:
+            return self.events.get_nowait()
+        except Empty:
+            return None
+
+    def close(self):
+        self.finished = True
+        self.manager.shutdown()
+        if self.ownExecutor:
+            self.executor.shutdown(wait=False)
+
+    async def close_when_done(self):
+        try:
+            await self.future
+        except BaseException:
+            pass
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.finished:
+            raise StopAsyncIteration
+        if not self.started:
+            self.start()
+        try:
+            while True:
+                event = self.next_event()
+                if event is not None:
+                    return event
+                if self.future.done():
+                    # The last events may have been sent after the queue was checked.
+                    event = self.next_event()
+                    if event is not None:
+                        return event
+                    self.close()
+                    raise StopAsyncIteration
+                await asyncio.sleep(self.pollInterval)
+        except asyncio.CancelledError:
+            # The task using the search was cancelled: stop the search after the current round, and clean up when it has stopped.
+            self.cancel()
+            self.closeTask = asyncio.ensure_future(self.close_when_done())
+            raise
+
+    # Wait for the search to finish (discarding any progress events not yet read) and return the values returned by the function.
+    async def wait(self):
+        async for event in self:
+            pass
+        return self.future.result()
+
+    def __await__(self):
+        return self.wait().__await__()
+
+
+# Purpose: For internal use - Create an AsyncSearch for a decimate.deci function, with the paths in its arguments made absolute
+#          (the function runs in a temporary directory). Arguments that are not paths (e.g. a round cache object passed as roundCache) are unchanged.
+def async_search(functionName, args, kwargs, executor, pathKeys):
+    arguments = inspect.signature(asyncFunctions[functionName]).bind(*args, **kwargs).arguments
+    for key in pathKeys:
+        if key in arguments and isinstance(arguments[key], (str, os.PathLike)):
+            arguments[key] = os.path.abspath(arguments[key])
+    return AsyncSearch(functionName, dict(arguments), executor)
+
+
+# Purpose: asyncio version of test_decimated_file.
+# Parameters: As for test_decimated_file (except tracer), and
+#   executor: A ProcessPoolExecutor in which to run the testing, or None to use a new worker process.
+# Return value: An AsyncSearch, giving "round" progress events and, when awaited, the values returned by test_decimated_file.
+#   NOTE: The results list passed as results is not updated (the testing runs in another process); 
+#         read the results from results_path or use the returned values.
+def test_decimated_file_async(*args, executor=None, **kwargs):
+    return async_search("test_decimated_file", args, kwargs, executor, ["in_path", "results_path", "temp_path", "roundCache"])
+
+
+# Purpose: asyncio version of decimated_binary_search.
+# Parameters: As for decimated_binary_search (except tracer), and
+#   executor: A ProcessPoolExecutor in which to run the search, or None to use a new worker process.
+# Return value: An AsyncSearch, giving "round" and "level" progress events and, when awaited, the values returned by decimated_binary_search.
+#   NOTE: With numWorkers > 1, the search starts its own worker processes; the round events of each level are sent when the level's results are recorded
+#         (including the rounds of levels tested ahead of the search that are not on the search path), and a cancelled search stops at the end of a level.
+def decimated_binary_search_async(*args, executor=None, **kwargs):
+    return async_search("decimated_binary_search", args, kwargs, executor, ["delta_path", "results_path", "roundCache"])
+
+
+# Purpose: asyncio version of decimated_range_test.
+# Parameters: As for decimated_range_test (except tracer), and
+#   executor: A ProcessPoolExecutor in which to run the search, or None to use a new worker process.
+# Return value: An AsyncSearch, giving "round" and "level" progress events and, when awaited, the values returned by decimated_range_test.
+def decimated_range_test_async(*args, executor=None, **kwargs):
+    return async_search("decimated_range_test", args, kwargs, executor, ["delta_path", "results_path", "roundCache"])
@@ -0,0 +1,432 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+# Results backends for decimate.deci.
+#
+# By default, results are stored as a single JSON list (see exampleResultsList in decimate.deci), which is rewritten in full by result_write.
+# The backends in this module store the same list of result items, but only write the items that changed:
+#   - ResultsJournal: an append-only JSON-lines journal, used for results_path ending in ".jsonl".
+#   - ResultsSQLite: an SQLite database, used for results_path ending in ".sqlite", ".sqlite3" or ".db".
+# result_open and result_write in decimate.deci choose the backend from the results_path, so all functions that take a results_path may use them.
+#
+# Each item is stored under a key that is unique to the process that first wrote it, so several processes may write to the same results_path at once:
+# each process updates its own items, and a file lock (journal) or a database transaction (SQLite) makes each update atomic.
+
+import json
+import os
+import sqlite3
+import uuid
+from decimate.passorder import result_pack_item
+
+try:
+    import fcntl
+except ImportError:
+    # File locking is not available (e.g. on Windows); concurrent writers from several processes are then not safe for the journal.
+    fcntl = None
+
+
+# Purpose: Return the backend to use for a results path, or None if results_path uses the default JSON list format.
+# Parameters:
+#   results_path: The path of the results file.
+# Return value:
+#   A ResultsJournal for paths ending in ".jsonl", a ResultsSQLite for paths ending in ".sqlite", ".sqlite3" or ".db", otherwise None.
+def result_backend(results_path):
+    extension = os.path.splitext(results_path)[1].lower()
+    if extension == ".jsonl":
+        return ResultsJournal(results_path)
+    if extension in (".sqlite", ".sqlite3", ".db"):
+        return ResultsSQLite(results_path)
+    return None
+
+
+# ResultsJournal stores results in an append-only JSON-lines file. Each line is one record:
+#   {"key": key, "put": item}       - store item under key (an existing key keeps its position in the list).
+#   {"key": key, "patch": changes}  - update the item stored under key; dictionaries in changes are merged recursively, other values replace the stored value.
+#   {"key": key, "delete": true}    - remove the item stored under key.
+# The list of results is obtained by replaying the records in order. A record that was only partly written (e.g. if a process was killed) is ignored.
+# A lock on the file results_path + ".lock" is held while records are written, so that records from different processes are not interleaved.
+class ResultsJournal():
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+
+    # Read the journal.
+    # Return values: (keys, results)
+    #   keys: The key of each result item.
+    #   results: The list of result items (same format as exampleResultsList).
+    def load(self):
+        items = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    key = record["key"]
+                    if "put" in record:
+                        items[key] = record["put"]
+                    elif "patch" in record and key in items:
+                        items[key] = result_apply_patch(items[key], record["patch"])
+                    elif "delete" in record:
+                        items.pop(key, None)
+        return list(items.keys()), list(items.values())
+
+    # Append records to the journal in a single write, holding the lock.
+    # Parameters:
+    #   records: A list of records (see above).
+    def append(self, records):
+        if len(records) == 0:
+            return
+        text = "".join(json.dumps(record) + "\n" for record in records)
+        with JournalLock(self.lock_path):
+            with open(self.path, "a") as journal:
+                journal.write(text)
+                journal.flush()
+                os.fsync(journal.fileno())
+
+    # Replace the journal with one record per item, holding the lock.
+    # Parameters:
+    #   keys: The key of each result item.
+    #   results: The list of result items.
+    def replace(self, keys, results):
+        with JournalLock(self.lock_path):
+            self.write_all(keys, results)
+
+    # For internal use - Write one record per item to a new file and then replace the journal with it. The lock must be held.
+    def write_all(self, keys, results):
+        tempPath = self.path + ".tmp"
+        with open(tempPath, "w") as journal:
+            for i in range(len(results)):
+                journal.write(json.dumps({"key": keys[i], "put": results[i]}) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(tempPath, self.path)
+
+    # Write the changes to the stored items (see result_backend_write).
+    # Parameters:
+    #   puts: A list of (key, item) for items to store in full.
+    #   patches: A list of (key, patch, item) for items to update with a patch (item is the updated item).
+    #   deletes: A list of keys of items to remove.
+    def update(self, puts, patches, deletes):
+        records = [{"key": key, "put": item} for key, item in puts]
+        records += [{"key": key, "patch": patch} for key, patch, item in patches]
+        records += [{"key": key, "delete": True} for key in deletes]
+        self.append(records)
+
+    # Rewrite the journal with a single record per item, removing records that are no longer needed.
+    def compact(self):
+        with JournalLock(self.lock_path):
+            keys, results = self.load()
+            self.write_all(keys, results)
+
+
+# JournalLock holds an exclusive lock on a lock file while it is in use in a 'with' statement.
+class JournalLock():
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self.lock_file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.lock_file = open(self.lock_path, "a")
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if self.lock_file is not None:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+
+# ResultsSQLite stores results in an SQLite database, in a table "results" with one row per result item:
+#   seq: the position of the item in the list of results.
+#   key: the key of the item.
+#   item: the item in JSON format.
+# Each update is a single transaction. SQLite's write-ahead log is used so that readers do not block writers.
+class ResultsSQLite():
+    def __init__(self, path):
+        self.path = path
+
+    # Open the database, creating the results table if necessary.
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS results (seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE NOT NULL, item TEXT NOT NULL)")
+        return connection
+
+    # Read the database.
+    # Return values: (keys, results) as for ResultsJournal.load.
+    def load(self):
+        if not os.path.exists(self.path):
+            return [], []
+        connection = self.connect()
+        try:
+            rows = connection.execute("SELECT key, item FROM results ORDER BY seq").fetchall()
+        finally:
+            connection.close()
+        return [row[0] for row in rows], [json.loads(row[1]) for row in rows]
+
+    # Replace the contents of the database in a single transaction.
+    # Parameters: As for ResultsJournal.replace.
+    def replace(self, keys, results):
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM results")
+                connection.executemany("INSERT INTO results (key, item) VALUES (?, ?)",
+                                       [(keys[i], json.dumps(results[i])) for i in range(len(results))])
+        finally:
+            connection.close()
+
+    # Write the changes to the stored items (see ResultsJournal.update) in a single transaction.
+    # Patched items are stored in full, since SQLite updates the row in place.
+    def update(self, puts, patches, deletes):
+        connection = self.connect()
+        try:
+            with connection:
+                for key, item in puts + [(key, item) for key, patch, item in patches]:
+                    connection.execute("INSERT INTO results (key, item) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET item = excluded.item",
+                                       (key, json.dumps(item)))
+                connection.executemany("DELETE FROM results WHERE key = ?", [(key,) for key in deletes])
+        finally:
+            connection.close()
+
+    # Reclaim unused space in the database file.
+    def compact(self):
+        connection = self.connect()
+        try:
+            connection.execute("VACUUM")
+        finally:
+            connection.close()
+
+
+# For internal use - For each results path (stored in a backend) that was opened or written by this process,
+# the list of results last read or written, with the key and the stored (JSON-compatible) copy of each item.
+# This allows result_backend_write to write only the items that changed.
+openedResults = {}
+
+
+# Purpose: For internal use by result_open - Read results from a backend, and remember them so that later writes of the same list only write changed items.
+# Parameters:
+#   backend: The backend returned by result_backend.
+#   overwrite: When True, the backend is not read and an empty list is returned. The first write of this list replaces the contents of the backend.
+# Return value:
+#   results: The list of result items (an empty list if the backend does not exist yet).
+def result_backend_open(backend, overwrite=False):
+    if overwrite:
+        keys, results = [], []
+    else:
+        keys, results = backend.load()
+    # The stored copies are kept separately, since result_open may change the items (e.g. to unpack the passOrder).
+    stored = [json.loads(json.dumps(item)) for item in results]
+    openedResults[os.path.abspath(backend.path)] = {"list": results, "keys": keys, "items": list(results), "stored": stored, "replace": overwrite}
+    return results
+
+
+# Purpose: For internal use by result_write - Write results to a backend.
+#          If results is the list last read from or written to the backend by this process, only the items that were added, replaced or removed are written:
+#          items keep their keys when they are moved in the list, new items are stored under new keys, replaced items are stored as a patch
+#          of the changes (or in full if a value was removed), and the items removed from the list are deleted.
+#          Otherwise (e.g. for the items of a ResultStore, or a list read from another file), each item is matched with a stored item (see result_backend_match),
+#          and only the items that are not already stored are written, so that items written by other processes are kept.
+#          The contents of the backend are only replaced by results when overwrite is True, or when results was returned by result_open with overwrite==True
+#          and has not been written yet.
+#          NOTE: Items are compared by identity, so an item that is modified in place (instead of being replaced, as result_overwrite_last does)
+#                is only written when it is replaced.
+# Parameters:
+#   backend: The backend returned by result_backend.
+#   results: The list of result items.
+#   packPassOrder: When True, the passOrder of each item written is packed (see decimate.passorder).
+#   overwrite: When True, the contents of the backend are replaced by results.
+def result_backend_write(backend, results, packPassOrder=False, overwrite=False):
+    path = os.path.abspath(backend.path)
+    state = openedResults.get(path)
+    if overwrite or (state is not None and state["list"] is results and state["replace"]):
+        keys = [new_result_key() for item in results]
+        stored = [json.loads(json.dumps(stored_item(item, packPassOrder))) for item in results]
+        backend.replace(keys, stored)
+        openedResults[path] = {"list": results, "keys": keys, "items": list(results), "stored": stored, "replace": False}
+        return
+    if state is None or state["list"] is not results:
+        openedResults[path] = result_backend_match(backend, results, packPassOrder, state)
+        return
+
+    # Each item keeps the key of the same item (compared by identity) in the list last written, wherever it has moved to in the list.
+    # An item that replaces an item at the same position (e.g. by result_overwrite_last) is stored under the key of the item it replaced,
+    # as a patch of the changes, if the replaced item is no longer in the list.
+    knownPositions = {}
+    for j in range(len(state["items"])):
+        knownPositions.setdefault(id(state["items"][j]), j)
+    resultIDs = set(id(item) for item in results)
+    positions = [None] * len(results)
+    usedPositions = set()
+    for i in range(len(results)):
+        j = knownPositions.get(id(results[i]))
+        if j is not None and j not in usedPositions:
+            positions[i] = j
+            usedPositions.add(j)
+    for i in range(len(results)):
+        if positions[i] is None and i < len(state["items"]) and i not in usedPositions and id(state["items"][i]) not in resultIDs:
+            positions[i] = i
+            usedPositions.add(i)
+
+    keys = []
+    stored = []
+    puts = []
+    patches = []
+    for i in range(len(results)):
+        j = positions[i]
+        if j is not None and state["items"][j] is results[i]:
+            keys.append(state["keys"][j])
+            stored.append(state["stored"][j])
+            continue
+        newStored = json.loads(json.dumps(stored_item(results[i], packPassOrder)))
+        if j is not None:
+            keys.append(state["keys"][j])
+            patch = result_make_patch(state["stored"][j], newStored)
+            if patch is None:
+                puts.append((state["keys"][j], newStored))
+            elif len(patch) > 0:
+                patches.append((state["keys"][j], patch, newStored))
+        else:
+            keys.append(new_result_key())
+            puts.append((keys[i], newStored))
+        stored.append(newStored)
+    # Only the keys of items that are no longer in the list are deleted.
+    deletes = [state["keys"][j] for j in range(len(state["keys"])) if j not in usedPositions]
+    openedResults[path] = {"list": results, "keys": keys, "items": list(results), "stored": stored, "replace": False}
+
+    if len(puts) > 0 or len(patches) > 0 or len(deletes) > 0:
+        backend.update(puts, patches, deletes)
+
+
+# Purpose: For internal use by result_backend_write - Write a list of results that is not the list last read from or written to the backend by this process.
+#          Each item keeps the key of the same item in the list last read or written by this process (compared by identity), or else the key of a stored item
+#          with the same contents. Items with no match are stored under new keys. Items of the list last read or written by this process that are not in results
+#          are deleted, but other stored items (e.g. those written by other processes since the list was read) are kept.
+# Parameters:
+#   backend: The backend returned by result_backend.
+#   results: The list of result items.
+#   packPassOrder: When True, the passOrder of each item written is packed (see decimate.passorder).
+#   state: The entry of openedResults for the list last read or written by this process, or None.
+# Return value:
+#   The entry of openedResults for results.
+def result_backend_match(backend, results, packPassOrder, state):
+    knownItems = {}
+    if state is not None:
+        for i in range(len(state["items"])):
+            knownItems[id(state["items"][i])] = (state["keys"][i], state["stored"][i])
+
+    # The stored items are only read if an item is not matched by identity. storedKeys[contents] is the list of keys of the stored items with those contents.
+    storedKeys = None
+    usedKeys = set()
+    keys = []
+    stored = []
+    puts = []
+    for item in results:
+        match = knownItems.get(id(item))
+        if match is not None and match[0] not in usedKeys:
+            key, newStored = match
+        else:
+            newStored = json.loads(json.dumps(stored_item(item, packPassOrder)))
+            if storedKeys is None:
+                storedKeys = {}
+                loadedKeys, loadedResults = backend.load()
+                for i in range(len(loadedKeys)):
+                    storedKeys.setdefault(json.dumps(loadedResults[i], sort_keys=True), []).append(loadedKeys[i])
+            key = None
+            for storedKey in storedKeys.get(json.dumps(newStored, sort_keys=True), []):
+                if storedKey not in usedKeys:
+                    key = storedKey
+                    break
+            if key is None:
+                key = new_result_key()
+                puts.append((key, newStored))
+        usedKeys.add(key)
+        keys.append(key)
+        stored.append(newStored)
+
+    deletes = []
+    if state is not None:
+        deletes = [key for key in state["keys"] if key not in usedKeys]
+    if len(puts) > 0 or len(deletes) > 0:
+        backend.update(puts, [], deletes)
+    return {"list": results, "keys": keys, "items": list(results), "stored": stored, "replace": False}
+
+
+# Purpose: For internal use - Return the item to store for a result item.
+def stored_item(item, packPassOrder):
+    if packPassOrder:
+        return result_pack_item(item)
+    return item
+
+
+# For internal use - writerID and keyCount are used to make keys for result items that are unique to this process.
+writerID = uuid.uuid4().hex[:12]
+keyCount = [0]
+
+
+# Purpose: For internal use - Return a new key for a result item that is unique to this process.
+def new_result_key():
+    keyCount[0] += 1
+    return f"{writerID}-{os.getpid()}-{keyCount[0]}"
+
+
+# Purpose: For internal use - Find the changes between two JSON-compatible dictionaries.
+# Parameters:
+#   old: The stored dictionary.
+#   new: The new dictionary.
+# Return value:
+#   A dictionary of the changes (dictionaries are compared recursively), which is empty if there are no changes,
+#   or None if a key of old (or of a dictionary within old) is not in new (then new must be stored in full).
+def result_make_patch(old, new):
+    for key in old:
+        if key not in new:
+            return None
+    patch = {}
+    for key in new:
+        if key not in old:
+            patch[key] = new[key]
+        elif isinstance(old[key], dict) and isinstance(new[key], dict):
+            subPatch = result_make_patch(old[key], new[key])
+            if subPatch is None:
+                return None
+            if len(subPatch) > 0:
+                patch[key] = subPatch
+        elif old[key] != new[key]:
+            patch[key] = new[key]
+    return patch
+
+
+# Purpose: For internal use - Apply changes found by result_make_patch to a dictionary.
+# Parameters:
+#   old: The stored dictionary (modified in place).
+#   patch: The changes.
+# Return value:
+#   The updated dictionary.
+def result_apply_patch(old, patch):
+    for key in patch:
+        if key in old and isinstance(old[key], dict) and isinstance(patch[key], dict):
+            result_apply_patch(old[key], patch[key])
+        else:
+            old[key] = patch[key]
+    return old
@@ -0,0 +1,285 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+# The decimate command: run a manifest of decimation searches on a local pool of worker processes.
+#
+# A manifest is a JSON file:
+#   {
+#     "workers": 16,                              # Processes available to the jobs (default: the number of CPUs).
+#     "groupLimits": {"lab2": 2},                 # Maximum number of jobs of each group that may run at the same time.
+#     "defaults": {"testSize": 1000000, "numTestsRequested": 100, "results_path": "results.jsonl"},
+#     "jobs": [
+#       {"name": "dev1", "delta_path": "dev1.bin", "platform": "Device 1", "maxDec": 100, "priority": 2, "numWorkers": 4},
+#       {"name": "dev2", "delta_path": "dev2.bin", "platform": "Device 2", "input_delta_bytes": 8, "convert_delta": "mod_256", 
+#        "search": "range", "maxDec": 20, "minDec": 10, "group": "lab2", "results_path": "dev2.txt"}
+#     ]
+#   }
+# Each job is the "defaults" updated with the job's own keys. The job keys are:
+#   name: The name of the job (default "job<n>", where n is the position of the job in the manifest).
+#   search: "binary" for decimated_binary_search (the default) or "range" for decimated_range_test.
+#   priority: Jobs with a higher priority are started first (default 0). Jobs with the same priority are started in manifest order.
+#   group: The group of the job, limited by groupLimits (optional).
+#   log: The path of a file to which the job's printed output is written (optional). Without a log file, the job runs with verbose = False.
+#   The parameters of decimated_binary_search or decimated_range_test (delta_path and results_path are required).
+#       convert_delta and maxFails are function names: the name of a function in decimate.deci (e.g. "mod_256", "failTable"), or "module:function".
+#       numWorkers (binary search only) is the number of processes the job uses (see decimated_binary_search); 
+#       the job only starts when this many of the manifest's workers are free.
+#       strategy (binary search only) is the name of a search strategy: "binary", "exponential" or "cost" (see decimated_binary_search).
+#       roundCache is the path of a round cache (see decimate.roundcache); jobs running at the same time may share an SQLite round cache.
+# Relative paths are relative to the directory of the manifest. 
+# Jobs may share a results_path. Jobs sharing a JSON results_path run one at a time, since the whole file is rewritten after every round;
+# jobs sharing a ".jsonl" or ".sqlite" results_path (see "Results backends") may run at the same time.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import importlib
+import traceback
+import multiprocessing
+from queue import Empty
+from decimate.deci import decimated_binary_search, decimated_range_test
+from decimate.backends import result_backend
+
+
+# The parameters of the search functions that may be given in a job.
+searchParameters = {
+    "binary": ["delta_path", "results_path", "overwrite", "platform", "maxDec", "minDec", "numTestsRequested", "maxFails", "testSize", 
+               "dec_multiplier", "input_delta_bytes", "convert_delta", "byte_order", "verbose", "failEarly", "IIDtests", 
+               "numWorkers", "resume", "reuseResults", "reuseMinRounds", "packPassOrder", "screenRounds", "strategy", "roundCache"],
+    "range": ["delta_path", "results_path", "overwrite", "platform", "maxDec", "minDec", "numTestsRequested", "maxFails", "testSize", 
+              "dec_multiplier", "input_delta_bytes", "convert_delta", "byte_order", "verbose", "failEarly", "IIDtests", "packPassOrder", 
+              "screenRounds", "roundCache"],
+}
+searchFunctions = {"binary": decimated_binary_search, "range": decimated_range_test}
+jobKeys = ["name", "search", "priority", "group", "log"]
+
+
+# Purpose: Read a job manifest.
+# Parameters:
+#   manifest_path: The path of the JSON manifest (see the description at the top of this file).
+# Return value: {"workers": workers, "groupLimits": groupLimits, "jobs": jobs}
+#   jobs: A list of job dictionaries, in manifest order, each with all the job keys set and with absolute paths.
+def load_manifest(manifest_path):
+    with open(manifest_path, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+    baseDir = os.path.dirname(os.path.abspath(manifest_path))
+    defaults = manifest.get("defaults", {})
+    jobs = []
+    for index in range(len(manifest.get("jobs", []))):
+        job = dict(defaults)
+        job.update(manifest["jobs"][index])
+        job.setdefault("name", f"job{index}")
+        job.setdefault("search", "binary")
+        job.setdefault("priority", 0)
+        job.setdefault("group", None)
+        job.setdefault("log", None)
+        if job["search"] not in searchParameters:
+            raise Exception(f"Error in function load_manifest - \n\t\tjob {job['name']}: search = {job['search']} \n\t\tsearch must be \"binary\" or \"range\".")
+        unknownKeys = [key for key in job if key not in jobKeys and key not in searchParameters[job["search"]]]
+        if unknownKeys:
+            raise Exception(f"Error in function load_manifest - \n\t\tjob {job['name']}: unknown keys {unknownKeys}.")
+        for key in ["delta_path", "results_path"]:
+            if key not in job:
+                raise Exception(f"Error in function load_manifest - \n\t\tjob {job['name']}: {key} is required.")
+        for key in ["delta_path", "results_path", "log", "roundCache"]:
+            if job.get(key) is not None:
+                job[key] = os.path.join(baseDir, job[key])
+        # Check the function names now, rather than when the job starts.
+        for key in ["convert_delta", "maxFails"]:
+            if key in job:
+                resolve_function(job[key])
+        jobs.append(job)
+    names = [job["name"] for job in jobs]
+    if len(set(names)) < len(names):
+        raise Exception(f"Error in function load_manifest - \n\t\tJob names must be different.")
+    return {"workers": manifest.get("workers", os.cpu_count()), "groupLimits": manifest.get("groupLimits", {}), "jobs": jobs}
+
+
+# Purpose: For internal use - Find a function (e.g. convert_delta or maxFails) from its name.
+# Parameters:
+#   name: The name of a function in decimate.deci (e.g. "mod_256") or "module:function".
+# Return value: The function.
+def resolve_function(name):
+    moduleName, separator, functionName = name.rpartition(":")
+    module = importlib.import_module(moduleName if separator else "decimate.deci")
+    if not hasattr(module, functionName):
+        raise Exception(f"Error in function resolve_function - \n\t\t{name} was not found.")
+    return getattr(module, functionName)
+
+
+# Purpose: For internal use - The number of the manifest's workers used by a job.
+def job_slots(job):
+    if job["search"] == "binary":
+        return max(job.get("numWorkers", 1), 1)
+    return 1
+
+
+# Purpose: For internal use - The resources a job may not share with other running jobs: a JSON results_path 
+#          (which is rewritten after every round, so it can only be written by one job at a time).
+def job_locks(job):
+    if result_backend(job["results_path"]) is None:
+        return {os.path.normcase(job["results_path"])}
+    return set()
+
+
+# Purpose: For internal use - Run one job in a worker process and put a summary of the outcome on the queue.
+#          The job runs in its own temporary directory, since the search functions write temporary files to the current directory.
+# Parameters:
+#   job: A job dictionary from load_manifest.
+#   queue: A multiprocessing queue for the summary, {"name", "status" ("done" or "error"), "passLevels", "datestamps", "seconds", "error"}.
+def run_job(job, queue):
+    startTime = time.time()
+    summary = {"name": job["name"], "status": "done", "passLevels": None, "datestamps": None, "seconds": 0.0, "error": None}
+    kwargs = {key: job[key] for key in searchParameters[job["search"]] if key in job}
+    logFile = None
+    try:
+        for key in ["convert_delta", "maxFails"]:
+            if key in kwargs:
+                kwargs[key] = resolve_function(kwargs[key])
+        if job["log"] is not None:
+            logFile = open(job["log"], "a")
+            sys.stdout = logFile
+            sys.stderr = logFile
+            kwargs.setdefault("verbose", True)
+        else:
+            kwargs.setdefault("verbose", False)
+        with tempfile.TemporaryDirectory(prefix="decimate_job_") as tempDir:
+            os.chdir(tempDir)
+            results, datestamps, passLevels = searchFunctions[job["search"]](**kwargs)
+        summary["passLevels"] = passLevels
+        summary["datestamps"] = datestamps
+    except BaseException as e:
+        summary["status"] = "error"
+        summary["error"] = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+        if logFile is not None:
+            print(summary["error"], flush=True)
+    summary["seconds"] = time.time() - startTime
+    if logFile is not None:
+        logFile.flush()
+    queue.put(summary)
+
+
+# Purpose: Run the jobs of a manifest on a local pool of worker processes.
+#   Jobs are started in priority order (highest first, then manifest order). A job starts when enough workers are free for it (see job_slots),
+#   its group is below its limit and no running job uses the same JSON results_path. 
+#   A job that is only waiting for free workers is not overtaken by lower priority jobs.
+# Parameters:
+#   manifest: The dictionary returned by load_manifest.
+#   workers: The number of workers, or None to use manifest["workers"].
+#   only: A list of job names to run, or None to run all jobs.
+#   verbose: When True, print a line when each job starts and finishes.
+# Return value:
+#   A list of job summaries (see run_job), in the order the jobs finished.
+def run_manifest(manifest, workers=None, only=None, verbose=True):
+    if workers is None:
+        workers = manifest["workers"]
+    pending = [job for job in manifest["jobs"] if only is None or job["name"] in only]
+    pending.sort(key=lambda job: -job["priority"])
+    for job in pending:
+        if job_slots(job) > workers:
+            raise Exception(f"Error in function run_manifest - \n\t\tjob {job['name']} needs {job_slots(job)} workers; only {workers} are available.")
+
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    running = {}
+    summaries = []
+    while pending or running:
+        # Start the jobs that can run now.
+        freeSlots = workers - sum(job_slots(job) for job, process in running.values())
+        lockedPaths = set().union(*[job_locks(job) for job, process in running.values()])
+        groupCounts = {}
+        for job, process in running.values():
+            groupCounts[job["group"]] = groupCounts.get(job["group"], 0) + 1
+        for job in list(pending):
+            if job["group"] is not None and groupCounts.get(job["group"], 0) >= manifest["groupLimits"].get(job["group"], workers):
+                continue
+            if job_locks(job) & lockedPaths:
+                continue
+            if job_slots(job) > freeSlots:
+                break
+            process = context.Process(target=run_job, args=(job, queue))
+            process.start()
+            running[job["name"]] = (job, process)
+            pending.remove(job)
+            freeSlots -= job_slots(job)
+            lockedPaths |= job_locks(job)
+            groupCounts[job["group"]] = groupCounts.get(job["group"], 0) + 1
+            if verbose:
+                print(f"decimate - Started job {job['name']} ({job['search']} search of {job['delta_path']}, "
+                      f"{job_slots(job)} worker(s)); {len(running)} running, {len(pending)} waiting.", flush=True)
+
+        # Wait for a job to finish. A job process that ended without sending its summary (e.g. it was killed) is recorded as an error.
+        summary = None
+        while summary is None:
+            try:
+                summary = queue.get(timeout=1.0)
+            except Empty:
+                for name, (job, process) in running.items():
+                    if process.exitcode is not None and process.exitcode != 0:
+                        summary = {"name": name, "status": "error", "passLevels": None, "datestamps": None, "seconds": None, 
+                                   "error": f"The job process ended with exit code {process.exitcode}."}
+                        break
+        job, process = running.pop(summary["name"])
+        process.join()
+        summaries.append(summary)
+        if verbose:
+            if summary["status"] == "done":
+                print(f"decimate - Finished job {summary['name']} in {summary['seconds']:.1f} s: minimum passing levels {summary['passLevels']}.", flush=True)
+            else:
+                print(f"decimate - Job {summary['name']} FAILED:\n{summary['error']}", flush=True)
+    return summaries
+
+
+# Purpose: The entry point of the decimate command.
+# Parameters:
+#   argv: The command line arguments (default sys.argv[1:]).
+# Return value: 0 if all jobs finished without an error, otherwise 1.
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="decimate", description="Run the decimation searches listed in a job manifest on a local pool of worker processes.")
+    parser.add_argument("manifest", help="Path of the JSON job manifest.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: the manifest's \"workers\", or the number of CPUs).")
+    parser.add_argument("--only", nargs="+", default=None, help="Run only the jobs with these names.")
+    parser.add_argument("--dry-run", action="store_true", help="List the jobs in the order they would be started, without running them.")
+    parser.add_argument("--summary", default=None, help="Path of a JSON file to which the job summaries are written.")
+    parser.add_argument("--quiet", action="store_true", help="Do not print a line when each job starts and finishes.")
+    args = parser.parse_args(argv)
+
+    manifest = load_manifest(args.manifest)
+    if args.dry_run:
+        jobs = [job for job in manifest["jobs"] if args.only is None or job["name"] in args.only]
+        for job in sorted(jobs, key=lambda job: -job["priority"]):
+            print(f"{job['name']}: priority {job['priority']}, {job['search']} search, {job_slots(job)} worker(s), "
+                  f"group {job['group']}, {job['delta_path']} -> {job['results_path']}")
+        return 0
+
+    summaries = run_manifest(manifest, args.workers, args.only, not args.quiet)
+    if args.summary is not None:
+        with open(args.summary, "w") as summary_file:
+            json.dump(summaries, summary_file, indent=4)
+    return 0 if all(summary["status"] == "done" for summary in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+# Reading compressed delta files.
+#
+# Delta files (and files of timestamps) may be compressed with gzip (.gz), bzip2 (.bz2) or xz (.xz). They are decompressed in blocks
+# as they are read, so no decompressed copy of the file is written.
+# The number of bytes in a compressed file can only be found by decompressing it, so the first time it is needed it is found and cached
+# in a sidecar file next to the compressed file (path + sidecarSuffix).
+#
+# The sidecar of a delta file (compressed or not) caches values found by reading the whole file, e.g. its size or its statistics (see decimate.filestats).
+# It records the size and modification time of the delta file, and the cached values are ignored (and rewritten) if the delta file has changed.
+# If the sidecar cannot be written (e.g. the directory is read-only), the values are found again each time they are needed.
+
+import os
+import gzip
+import bz2
+import lzma
+import json
+import tempfile
+
+
+compressionSuffixes = {".gz": gzip, ".bz2": bz2, ".xz": lzma}
+sidecarSuffix = ".decimate.json"
+
+
+# Purpose: Return True if the file at path is compressed (i.e. its name ends in .gz, .bz2 or .xz).
+def is_compressed(path):
+    return os.path.splitext(os.fspath(path))[1].lower() in compressionSuffixes
+
+
+# Purpose: Open a file of deltas (or timestamps) for reading (binary), decompressing it as it is read if it is compressed.
+# Parameters:
+#   path: The path of the file.
+# Return value:
+#   A binary file object.
+def open_delta_file(path):
+    suffix = os.path.splitext(os.fspath(path))[1].lower()
+    if suffix in compressionSuffixes:
+        return compressionSuffixes[suffix].open(path, "rb")
+    return open(path, "rb")
+
+
+# Purpose: For internal use - Return the path of the sidecar file of a delta file.
+def sidecar_path(path):
+    return os.fspath(path) + sidecarSuffix
+
+
+# Purpose: For internal use - Return the identity of a file (its size and modification time) recorded in its sidecar.
+def file_identity(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+# Purpose: Read a value cached in the sidecar of a delta file.
+# Parameters:
+#   path: The path of the delta file.
+#   key: The name of the value.
+# Return value:
+#   The value, or None if there is no sidecar, the value is not in it, or the delta file has changed since the sidecar was written.
+def sidecar_read(path, key):
+    sidecar = sidecar_path(path)
+    if not os.path.exists(sidecar):
+        return None
+    try:
+        with open(sidecar, "r") as sidecarFile:
+            cached = json.load(sidecarFile)
+        if cached.get("identity") != file_identity(path):
+            return None
+        return cached["values"].get(key)
+    except (OSError, ValueError, KeyError, AttributeError):
+        return None
+
+
+# Purpose: Cache a value in the sidecar of a delta file. Values cached for an earlier version of the delta file are discarded.
+# Parameters:
+#   path: The path of the delta file.
+#   key: The name of the value.
+#   value: The value, which must be JSON serializable.
+# Return value:
+#   True if the value was written, or False if the sidecar could not be written (e.g. the directory is read-only).
+def sidecar_write(path, key, value):
+    sidecar = sidecar_path(path)
+    identity = file_identity(path)
+    values = {}
+    if os.path.exists(sidecar):
+        try:
+            with open(sidecar, "r") as sidecarFile:
+                cached = json.load(sidecarFile)
+            if cached.get("identity") == identity:
+                values = cached["values"]
+        except (OSError, ValueError, KeyError):
+            pass
+    values[key] = value
+
+    # Write the sidecar to a temporary file and rename it, so that a process reading it never sees a partly written file.
+    tempPath = None
+    try:
+        fd, tempPath = tempfile.mkstemp(prefix=os.path.basename(sidecar), dir=os.path.dirname(os.path.abspath(sidecar)))
+        with os.fdopen(fd, "w") as sidecarFile:
+            json.dump({"identity": identity, "values": values}, sidecarFile)
+        os.replace(tempPath, sidecar)
+    except OSError:
+        if tempPath is not None and os.path.exists(tempPath):
+            os.remove(tempPath)
+        return False
+    return True
+
+
+# Purpose: Find the number of bytes of data in a file of deltas (or timestamps), after decompression if it is compressed.
+#          Use this in place of os.path.getsize for files that may be compressed.
+# Parameters:
+#   path: The path of the file.
+#   blockSize: How many bytes to decompress at a time when the size is not already cached.
+#   verbose: When True, print a status message if the file has to be decompressed to find its size.
+# Return value:
+#   The number of bytes of (decompressed) data.
+def delta_file_bytes(path, blockSize=1<<24, verbose=False):
+    if not is_compressed(path):
+        return os.path.getsize(path)
+
+    numBytes = sidecar_read(path, "bytes")
+    if numBytes is not None:
+        return numBytes
+
+    if verbose:
+        print("delta_file_bytes - Decompressing", os.fspath(path), "to find its size.")
+    numBytes = 0
+    with open_delta_file(path) as in_file:
+        while True:
+            block = in_file.read(blockSize)
+            if not block:
+                break
+            numBytes += len(block)
+    sidecar_write(path, "bytes", numBytes)
+    return numBytes
@@ -21,12 +21,31 @@
 
 from stats90b import iid_main
 import json
-from math import ceil, floor
+from math import ceil, floor, lgamma, log, exp
 import gc
 import datetime
 import sys
 import os
 from operator import itemgetter
+import tempfile
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from decimate.backends import result_backend, result_backend_open, result_backend_write
+from decimate.passorder import passorder_unpack, result_pack_item, result_unpack_item
+from decimate.tracing import Tracer, trace_span
+from decimate.compressed import open_delta_file, delta_file_bytes
+from decimate.roundcache import round_cache, round_cache_key
+import numpy as np
+
+# Purpose: For internal use - Open a file of deltas for reading (binary).
+# Parameters:
+#       in_path: The path of the file, which is decompressed as it is read if it is compressed (.gz, .bz2 or .xz, see decimate.compressed),
+#                or a binary file-like object with a read method (e.g. a DeltaStream from decimate.timestamps), which is returned unchanged and not closed.
+# Return value: A context manager giving the file object.
+def open_deltas(in_path):
+    if hasattr(in_path, "read"):
+        return nullcontext(in_path)
+    return open_delta_file(in_path)
 
 # A function to return the least signficant 8 bits of a delta
 def mod_256(delta):
@@ -44,11 +63,15 @@ def shr1_mod255(delta):
 def unchanged(delta):
     return delta
 
+# The functions above also work on NumPy arrays of deltas, so write_decimated_file converts a set of deltas at a time when one of them is used.
+vectorConverts = [mod_256, shr1_mod256, shr1_mod255, unchanged]
+
 # Purpose: Sometimes deltas in particular sequence positions are more likely to pass the IID tests than deltas in other sequence positions.
 #          E.g. deltas in sequence position 0 modulo 4 might be more likely to pass IID tests than other deltas.
 #          This function may be used to write deltas in the desired sequence positions to file; other deltas are discarded.
 # Parameters:
 #       in_path: File containing the input deltas
+#                Or a binary file-like object with a read method, e.g. a DeltaStream (see decimate.timestamps) to read deltas derived from timestamps.
 #       out_path: Path to file where desired deltas are to be written 
 #       dec: modulus for the sequence position selection
 #       delIdx: list of sequence positions to be ignored modulo dec (each value must be >= 0 and < dec).
@@ -65,7 +88,7 @@ def write_decimated_delete_file(in_path, out_path, dec=4, delIdx=[3], verbose=Tr
     # Open the output file for writing (binary).
     with open(out_path, "wb") as out_file:
         # Open the input file of deltas for reading (binary).
-        with open(in_path, "rb") as in_file:
+        with open_deltas(in_path) as in_file:
             # i counts how many samples have been read from the input file.
             i = 0
             # samples counts how mnay samples have been written to the output file.
@@ -96,6 +119,7 @@ def write_decimated_delete_file(in_path, out_path, dec=4, delIdx=[3], verbose=Tr
 # Purpose: re-arrange deltas into a decimated order, ready for decimation testing.
 # Parameters: 
 #       in_path: the path to the input file containing the deltas
+#                Or a binary file-like object with a read method, e.g. a DeltaStream (see decimate.timestamps) to read deltas derived from timestamps.
 #       out_path: the path to the output file where the decimated deltas will be written
 #       dec: the decimation level
 #       numSets: How many decimated sets of data will be seprately IID tested
@@ -106,6 +130,8 @@ def write_decimated_delete_file(in_path, out_path, dec=4, delIdx=[3], verbose=Tr
 #                       and a returns an integer that can be represented with no more than output_delta_bytes bytes.
 #       byte_order: The order of the bytes of each delta in the in_path file and out_path file (e.g. 'little')
 #       verbose: Set to True if status updates should be printed.
+#       tracer: A Tracer (see decimate.tracing) to record the time spent reading ("read"), converting ("convert") and writing ("decimated write") the deltas,
+#               or None for no tracing.
 # E.g.
 #       If the in_path contains deltas 0, 1, 2, 3,| 4, 5, 6, 7,| 8, 9, 10, 54, |57, 52, 53, 51, |58, 59, 50, 47, |42, 45, 43, 49,|44, 32, 39, 33 | 35.
 #           and dec = 4
@@ -114,7 +140,7 @@ def write_decimated_delete_file(in_path, out_path, dec=4, delIdx=[3], verbose=Tr
 #       Then the out_path will contain deltas: 0, 4, 8, | 57, 58, 42, | 1, 5, 9, | 52, 59, 45, | 2, 6, 10, | 53, 50, 43, | 3, 7, 54, | 51, 47, 49.
 #       Where the '|' character is not part of the input or output but inserted here for readability.
 def write_decimated_file(in_path, out_path, dec=1, numSets=1, setSize=1000000, convert_delta=unchanged, verbose = True, input_delta_bytes = 8, 
-                          output_delta_bytes = 8, byte_order='little'):
+                          output_delta_bytes = 8, byte_order='little', tracer=None):
 
     # rounds = how many lots of (dec x setSize) deltas we need
     # There are (rounds * setSize) deltas from each conjugate class, and 'dec' conjugate classes.
@@ -122,10 +148,17 @@ def write_decimated_file(in_path, out_path, dec=1, numSets=1, setSize=1000000, c
     #Total number of input deltas needed to be able to output 'numSets' sets of data, each of size 'setSize'
     dataNeeded = rounds* dec*setSize 
 
+    # If convert_delta works on NumPy arrays (see vectorConverts) and the deltas are 1, 2, 4 or 8 bytes, decimate and convert a set of deltas at a time.
+    vectorized = convert_delta in vectorConverts and input_delta_bytes in (1, 2, 4, 8) and output_delta_bytes in (1, 2, 4, 8)
+
     # Set up an array or list into which we can copy the deltas as they are read.
     # The decSamples array/list will contain the deltas in a decimated order.
-    # Use a bytearray if the output is only one byte per delta, otherwise use a list of integers.
-    if output_delta_bytes == 1:
+    # Use a NumPy array if vectorized, a bytearray if the output is only one byte per delta, otherwise use a list of integers.
+    if vectorized:
+        npByteOrder = "<" if byte_order == "little" else ">"
+        inType = np.dtype(f"u{input_delta_bytes}").newbyteorder(npByteOrder)
+        decSamples = np.zeros(dataNeeded, dtype=np.dtype(f"u{output_delta_bytes}").newbyteorder(npByteOrder))
+    elif output_delta_bytes == 1:
         decSamples = bytearray(dataNeeded)
     else:
         decSamples = [0]*(dataNeeded)
@@ -133,7 +166,7 @@ def write_decimated_file(in_path, out_path, dec=1, numSets=1, setSize=1000000, c
     # Open the output file for writing (binary)
     with open(out_path, "wb") as out_file:
         # Open the input file for reading (binary)
-        with open(in_path, "rb") as in_file:
+        with open_deltas(in_path) as in_file:
 
             if verbose:
                 statusStr = "write_decimated_file - Number of data sets read so far: "
@@ -144,50 +177,68 @@ def write_decimated_file(in_path, out_path, dec=1, numSets=1, setSize=1000000, c
                 print(spaces + "0", end = "", flush=True)
 
 
-            # Use i to count how many deltas are read (a total of dataNeeded deltas must be read).
-            for i in range(dataNeeded):
-                # Read the next delta
-                data = in_file.read(input_delta_bytes) 
+            # Read the deltas one set (setSize deltas) at a time (a total of dataNeeded deltas must be read).
+            for setNum in range(dataNeeded//setSize):
+                # Read the next set of deltas
+                with trace_span(tracer, "read", dec=dec, set=setNum) as span:
+                    block = in_file.read(setSize*input_delta_bytes)
+                    span.set(bytes=len(block))
 
                 # Print an error message and exit the program if the input file ended too soon:
-                if not data:
+                if len(block) < setSize*input_delta_bytes:
+                    i = setNum*setSize + len(block)//input_delta_bytes
                     print("write_decimated_file - ERROR: FILE ENDED TOO SOON - i =", i)
                     print("write_decimated_file - NUMBER OF DELTAS REQUIRED: ", dataNeeded, ".")
                     print("write_decimated_file - rounds = ceil(numSets/dec) = ceil(", numSets, "/", dec, ") = ", rounds, ".")
                     print("write_decimated_file - dec x rounds x setSize = ", dec, "x", rounds, "x", setSize)
                     sys.exit(-1)
-                
-                # Work out where to store the delta in the decSamples array/list:
-                # Find the conjugate class for the delta:
-                conjClass = i % dec
-                # Find the number of the delta in this conjugate class:
-                conjDeltaNum = i // dec
-                # Find the index into the decSamples list/array:
-                idx = conjDeltaNum + conjClass * rounds * setSize
-
-                # Convert the delta to an integer, and pass it to the convert_delta function which will reduce the size if necessary.
-                intData = int.from_bytes(data, byteorder=byte_order, signed=False)
-                intData = convert_delta(intData)
-                # Save the converted delta to the decSamples array/list.
-                decSamples[idx]=intData
+
+                with trace_span(tracer, "convert", dec=dec, set=setNum, bytes=len(block)):
+                    if vectorized:
+                        # Convert the deltas, and store each at the index into decSamples found as below.
+                        deltas = convert_delta(np.frombuffer(block, dtype=inType).astype(np.uint64))
+                        if output_delta_bytes < 8 and deltas.max() >= (1 << (8*output_delta_bytes)):
+                            raise Exception(f"Error in function write_decimated_file - \n\t\toutput_delta_bytes = {output_delta_bytes}; converted delta = {deltas.max()} "
+                                            "\n\t\tThe converted deltas must fit in output_delta_bytes bytes.")
+                        positions = np.arange(setNum*setSize, (setNum+1)*setSize)
+                        decSamples[positions // dec + (positions % dec) * rounds * setSize] = deltas
+                    else:
+                        # Use i to count how many deltas are read.
+                        for i in range(setNum*setSize, (setNum+1)*setSize):
+                            data = block[(i - setNum*setSize)*input_delta_bytes : (i - setNum*setSize + 1)*input_delta_bytes]
+
+                            # Work out where to store the delta in the decSamples array/list:
+                            # Find the conjugate class for the delta:
+                            conjClass = i % dec
+                            # Find the number of the delta in this conjugate class:
+                            conjDeltaNum = i // dec
+                            # Find the index into the decSamples list/array:
+                            idx = conjDeltaNum + conjClass * rounds * setSize
+
+                            # Convert the delta to an integer, and pass it to the convert_delta function which will reduce the size if necessary.
+                            intData = int.from_bytes(data, byteorder=byte_order, signed=False)
+                            intData = convert_delta(intData)
+                            # Save the converted delta to the decSamples array/list.
+                            decSamples[idx]=intData
 
                 # Run the garbage collector after reading one set to try to increase performance
-                # Print the status every 40 sets if verbose is True
-                if i % setSize == setSize-1:
-                    collected = gc.collect()
-                    
-                    if ((i+1)//setSize)%1 ==0:
-                        if verbose:
-                            print(backspaces, end = "")
-                            setsRead = f"{((i+1)//setSize):,d}"
-                            spaces = " "*(printLen-len(setsRead))
-                            print(spaces+setsRead, end="", flush=True)
+                # Print the status after every set if verbose is True
+                collected = gc.collect()
+                if verbose:
+                    print(backspaces, end = "")
+                    setsRead = f"{(setNum+1):,d}"
+                    spaces = " "*(printLen-len(setsRead))
+                    print(spaces+setsRead, end="", flush=True)
             if verbose:
                 backspaces = "\b"*(len(statusStr)+printLen)
                 print(backspaces, end = "", flush=True)
         # We have finished reading all the data we need. Now write the decSamples array/list to the output path.
-        for i in range(dataNeeded):
-            out_file.write(decSamples[i].to_bytes(output_delta_bytes, byte_order, signed=False))
+        with trace_span(tracer, "decimated write", dec=dec, bytes=dataNeeded*output_delta_bytes):
+            if vectorized:
+                out_file.write(decSamples.tobytes())
+            else:
+                for i in range(dataNeeded):
+                    out_file.write(decSamples[i].to_bytes(output_delta_bytes, byte_order, signed=False))
 
     # Print a status message if verbose is True
     if verbose:
@@ -195,10 +246,29 @@ def write_decimated_file(in_path, out_path, dec=1, numSets=1, setSize=1000000, c
         print("dec x rounds x setSize = ", dec, "x", rounds, "x", setSize, "; rounds = ceil( numSets =", numSets, " / dec =", dec, ").")
 
 
+# Purpose: Identify a set of deltas in a file written by write_decimated_file. 
+#          Set number setIndex of the output file (i.e. the deltas from setIndex*setSize to (setIndex+1)*setSize - 1) contains deltas from 
+#          a single conjugate class (sequence position modulo dec) of the input file. The set is identified by its conjugate class and its position
+#          within the conjugate class, which do not depend on numSets, so sets tested from decimated files written with different numSets can be compared.
+# Parameters:
+#       dec: the decimation level passed to write_decimated_file
+#       numSets: the numSets passed to write_decimated_file
+#       setIndex: the number of the set in the output file of write_decimated_file (starting at 0).
+# Return value: [conjClass, classSetNum]
+#       conjClass: the conjugate class of the deltas in the set (0 to dec-1).
+#       classSetNum: the number of the set within its conjugate class (starting at 0).
+# E.g. 
+#       With dec = 4 and numSets = 5, each conjugate class has ceil(5/4) = 2 sets, so set number 3 is [1, 1], i.e. the second set of conjugate class 1.
+def decimated_set_id(dec, numSets, setIndex):
+    rounds = ceil(numSets/dec)
+    return [setIndex // rounds, setIndex % rounds]
+
+
 # Purpose: Given an input file of deltas, write a file with the delta replaced with the ID of the subdistribution.
 #
 # Parameters:
 #       in_path: The path to the file of deltas.
+#                Or a binary file-like object with a read method, e.g. a DeltaStream (see decimate.timestamps) to read deltas derived from timestamps.
 #       out_path: The path of the output file. 
 #       input_delta_bytes: Number of bytes per delta in the in_path file.
 #       subdist_cutoffs: A list of cutoffs for the subdistributions. 
@@ -223,9 +293,9 @@ def write_subDist_id_file(in_path, out_path, input_delta_bytes = 8, subdist_cuto
     fileList = []
 
     if writeText and len(subdist_cutoffs)>9+26:
-        raise Exception("Error in function write_subDist_id_file - too many sub-distributions to write to text file; maximum number of cutoffs is 35; try writing in binary instead.\n \t write_subDist_id_file(" + in_path + ", " + out_path + ")")  
+        raise Exception("Error in function write_subDist_id_file - too many sub-distributions to write to text file; maximum number of cutoffs is 35; try writing in binary instead.\n \t write_subDist_id_file(" + str(in_path) + ", " + out_path + ")")  
     elif len(subdist_cutoffs)>255:
-        raise Exception("Error in function write_subDist_id_file - too many sub-distributions to write to binary file; maximum number of cutoffs is 255.\n \t write_subDist_id_file(" + in_path + ", " + out_path + ")")  
+        raise Exception("Error in function write_subDist_id_file - too many sub-distributions to write to binary file; maximum number of cutoffs is 255.\n \t write_subDist_id_file(" + str(in_path) + ", " + out_path + ")")  
 
     try:
         # Open one output file, and set the count of deltas written so far to 0.
@@ -237,7 +307,7 @@ def write_subDist_id_file(in_path, out_path, input_delta_bytes = 8, subdist_cuto
             count.append(0)
 
         # Open the input file (which has already been decimated).
-        with open(in_path, "rb") as in_file:
+        with open_deltas(in_path) as in_file:
             
             # Read the first delta
             data = in_file.read(input_delta_bytes) 
@@ -278,7 +348,7 @@ def write_subDist_id_file(in_path, out_path, input_delta_bytes = 8, subdist_cuto
                 # Read the next delta:
                 data = in_file.read(input_delta_bytes)
     except:
-        raise Exception("Error in function write_subDist_id_file(" + in_path + ", " + out_path + ")")     
+        raise Exception("Error in function write_subDist_id_file(" + str(in_path) + ", " + out_path + ")")     
     finally:
         fileList[0].close()
         if verbose:
@@ -294,6 +364,7 @@ def write_subDist_id_file(in_path, out_path, input_delta_bytes = 8, subdist_cuto
 #           The output files may then be used for non_iid testing to generate an entropy estimate for the decimated data.
 # Parameters:
 #       in_path: The path to the file of decimated deltas.
+#                Or a binary file-like object with a read method, e.g. a DeltaStream (see decimate.timestamps) to read deltas derived from timestamps.
 #       out_path: The prefix for the path of the output files ("_<number>.bin" is appended for each output file). 
 #       input_delta_bytes: Number of bytes per delta in the in_path file.
 #       output_delta_bytes: Number of bytes per delta to write to the out_path files.
@@ -329,7 +400,7 @@ def write_subfile(in_path, out_path, convert_delta=unchanged, input_delta_bytes
             count.append(0)
 
         # Open the input file (which has already been decimated).
-        with open(in_path, "rb") as in_file:
+        with open_deltas(in_path) as in_file:
             
             # Read the first delta
             data = in_file.read(input_delta_bytes) 
@@ -365,7 +436,7 @@ def write_subfile(in_path, out_path, convert_delta=unchanged, input_delta_bytes
                 # Read the next delta:
                 data = in_file.read(input_delta_bytes)
     except:
-        raise Exception("Error in function write_subfile(" + in_path + ", " + out_path + ")") 
+        raise Exception("Error in function write_subfile(" + str(in_path) + ", " + out_path + ")") 
  
     finally:
         # Close all the output files and if verbose = True, print a status message.
@@ -410,6 +481,210 @@ def failTable(numTests):
         return 7
 
 
+# BinomialMaxFails is a maxFails function (like failTable) that computes the exact binomial cutoff for any number of testing rounds,
+# false reject rate and significance level. Cutoffs are remembered, so each is only computed once.
+# With the default parameters it returns the same values as failTable for up to 1,330 rounds, and continues beyond 1,330 rounds.
+# Parameters:
+#   falseRejectRate: p = the designed false reject rate for each of the individual IID tests (1/1000 for the NIST tests).
+#   alpha: Pr(data that is IID fails numTests rounds of IID testing) = p-value or significance.
+#   numIIDtests: The number of different individual IID tests in each round (22 for the NIST tests).
+# Calling the object with numTests returns Cutoff = binomial_cdf_inverse(n=numTests, p=falseRejectRate, 1-q)
+#   where q = 1 - (1-alpha)^(1/numIIDtests), i.e. the least number of failures c such that Pr(more than c failures) <= q for a single IID test.
+#   As for failTable, 0 is returned when numTests <= 1.
+# Usage: maxFails = BinomialMaxFails(alpha=0.001), then pass maxFails in place of failTable.
+#   A BinomialMaxFails object may be used with numWorkers > 1 in decimated_binary_search, unlike a lambda.
+class BinomialMaxFails():
+    def __init__(self, falseRejectRate=1/1000, alpha=0.01, numIIDtests=22):
+        self.falseRejectRate = falseRejectRate
+        self.alpha = alpha
+        self.numIIDtests = numIIDtests
+        self.q = 1 - (1 - alpha)**(1/numIIDtests)
+        self.cutoffs = {}
+
+    def __call__(self, numTests):
+        if numTests <= 1:
+            return 0
+        if numTests not in self.cutoffs:
+            # Add up the binomial probabilities until Pr(more than c failures) <= q.
+            cumulative = 0.0
+            c = 0
+            while True:
+                cumulative += binomial_pmf(numTests, self.falseRejectRate, c)
+                if 1 - cumulative <= self.q or c == numTests:
+                    break
+                c += 1
+            self.cutoffs[numTests] = c
+        return self.cutoffs[numTests]
+
+
+# Purpose: For internal use - Return Pr(X = k) where X has the binomial distribution with n trials and probability p.
+def binomial_pmf(n, p, k):
+    if p <= 0:
+        return 1.0 if k == 0 else 0.0
+    if p >= 1:
+        return 1.0 if k == n else 0.0
+    return exp(lgamma(n + 1) - lgamma(k + 1) - lgamma(n - k + 1) + k*log(p) + (n - k)*log(1 - p))
+
+
+# Purpose: Return the probability that testing a decimation level gives an overall FAIL, 
+#          when one of the individual IID tests fails each round with probability failRate.
+# Parameters:
+#   numTests: The number of testing rounds.
+#   failRate: The probability that the individual IID test fails in each round.
+#   maxFails: The maxFails function used to decide the outcome, e.g. failTable or a BinomialMaxFails object.
+# Return value:
+#   Pr(more than maxFails(numTests) failures in numTests rounds).
+#   NOTE: Only one individual IID test is considered, so this is a lower bound when more than one test tends to fail.
+def fail_probability(numTests, failRate, maxFails=failTable):
+    cutoff = maxFails(numTests)
+    return max(0.0, 1 - sum(binomial_pmf(numTests, failRate, k) for k in range(min(cutoff, numTests) + 1)))
+
+
+# Purpose: Find the minimum number of testing rounds (numTestsRequested) needed so that a decimation level 
+#          that is not IID is found to FAIL with the requested confidence.
+# Parameters:
+#   failRate: The probability that one of the individual IID tests fails in each round for the level, e.g. estimated from earlier testing.
+#             The designed false reject rate of the NIST tests is 1/1000, so failRate should be larger than this.
+#   confidence: The required probability that the level is found to FAIL.
+#   maxFails: The maxFails function used to decide the outcome, e.g. failTable or a BinomialMaxFails object.
+#   maxNumTests: The largest number of rounds to consider.
+# Return value:
+#   numTests: The least number of rounds for which fail_probability(numTests, failRate, maxFails) >= confidence, 
+#             or None if more than maxNumTests rounds would be needed.
+def plan_num_tests(failRate, confidence=0.99, maxFails=failTable, maxNumTests=10000):
+    for numTests in range(1, maxNumTests + 1):
+        if fail_probability(numTests, failRate, maxFails) >= confidence:
+            return numTests
+    return None
+
+
+# Purpose: Plan the number of testing rounds for a decimation level of a delta file: 
+#          the rounds needed (see plan_num_tests), limited by the data available for that level.
+# Parameters:
+#   delta_path: The path of the file containing the un-decimated deltas.
+#   dec: The decimation level (including any dec_multiplier).
+#   testSize: How many deltas are tested in each IID test.
+#   failRate, confidence, maxFails, maxNumTests: As for plan_num_tests.
+#   input_delta_bytes: Number of bytes per delta in the delta_path file.
+# Return values: (numTests, achievedConfidence)
+#   numTests: The number of rounds to request (as numTestsRequested). If there is not enough data for the rounds needed,
+#             this is the number of rounds there is data for (and if the rounds needed exceed maxNumTests, it is the rounds there is data for, up to maxNumTests).
+#   achievedConfidence: fail_probability(numTests, failRate, maxFails), the probability that the level is found to FAIL with numTests rounds.
+def plan_level_num_tests(delta_path, dec, testSize, failRate, confidence=0.99, maxFails=failTable, maxNumTests=10000, input_delta_bytes=1):
+    numTestsNeeded = plan_num_tests(failRate, confidence, maxFails, maxNumTests)
+    if numTestsNeeded is None:
+        numTestsNeeded = maxNumTests
+    numTests = level_num_tests(delta_path, dec, numTestsNeeded, testSize, input_delta_bytes)
+    if numTests == 0:
+        return 0, 0.0
+    return numTests, fail_probability(numTests, failRate, maxFails)
+
+
+# Purpose: Return the IID test arguments in the form recorded in the results, so that results of testing with the same arguments can be matched.
+#          Extra white space is removed, and "" (run all tests) is recorded as "-r all".
+# Parameters:
+#       IIDtests: The arguments passed to iid_main from stats90b, e.g. "-r chi1", or "" to run all IID tests.
+# Return value:
+#       The arguments with words separated by single spaces.
+def normalise_iid_tests(IIDtests):
+    if IIDtests.strip() == "":
+        return "-r all"
+    return " ".join(IIDtests.split())
+
+
+# The cheap IID tests (the -r option and the name of its result), in the order iid_main runs them.
+# They are deterministic and are run before the permutation tests, so they can be used to screen decimation levels (see screen_level).
+screenTests = [("chi1", "chiSqIndependence"), ("chi2", "chiSqGoodnessFit"), ("LRS", "longestRepeatedSubstring")]
+
+
+# Purpose: For internal use - Find the arguments to pass to iid_main to screen a decimation level with the cheap IID tests of IIDtests.
+# Parameters:
+#       IIDtests: The arguments for the full testing (as for test_decimated_file).
+# Return values: (screenArgs, screenNames, abort)
+#       screenArgs: The arguments of IIDtests, with the -r options replaced by those of the cheap tests run by IIDtests (without abort1fail),
+#                   or None if screening would not save any time (IIDtests does not run the permutation tests, or runs none of the cheap tests).
+#       screenNames: The names of the results of the cheap tests run by IIDtests, in the order iid_main runs them.
+#       abort: True if IIDtests includes "-r abort1fail".
+def screen_iid_tests(IIDtests):
+    tokens = IIDtests.split()
+    otherArgs = []
+    runOpts = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == "-r" and i + 1 < len(tokens):
+            runOpts.append(tokens[i+1])
+            i += 2
+            continue
+        if tokens[i].startswith("-r") and len(tokens[i]) > 2:
+            runOpts.append(tokens[i][2:])
+        else:
+            otherArgs.append(tokens[i])
+        i += 1
+    abort = "abort1fail" in runOpts
+    runs = {opt for opt in runOpts if opt in ("chi1", "chi2", "LRS", "perm")}
+    if "all" in runOpts or not runs:
+        # iid_main runs all the tests when none are requested.
+        runs = {"chi1", "chi2", "LRS", "perm"}
+    cheap = [(opt, name) for opt, name in screenTests if opt in runs]
+    if "perm" not in runs or not cheap:
+        return None, [], abort
+    return " ".join(otherArgs + [f"-r {opt}" for opt, name in cheap]), [name for opt, name in cheap], abort
+
+
+# Purpose: Screen a decimation level with the cheap IID tests (chi1, chi2 and LRS) before the full testing with IIDtests.
+#          The first screenRounds sets of the decimated data are tested with the cheap tests of IIDtests only. These are the same sets that the 
+#          full testing tests first, and the cheap tests are deterministic, so the full testing would record at least the failures of the cheap tests 
+#          found by the screen (with "-r abort1fail", only those failures it would record are counted: a cheap test is not run after an earlier test 
+#          failed in the same round). If a cheap test fails more than maxFails(numTests) times, the full testing is certain to fail the level, 
+#          and the level is rejected without it. Otherwise the level must be fully tested; the screen cannot show that a level passes.
+# Parameters:
+#       dec_path: The path of the decimated data, written by write_decimated_file with dec and numSets = numTests.
+#       numTests: The number of rounds of the full testing.
+#       screenRounds: The number of rounds of screening (at most numTests).
+#       IIDtests: The arguments for the full testing.
+#       delta_path: The path of the un-decimated delta file, recorded as the filename in the result item.
+#       platform, dec, maxFails, testSize, tracer, roundCache: As for test_decimated_file.
+# Return values: (rejected, screenItem)
+#       rejected: True if the full testing is certain to fail the level.
+#       screenItem: The result item of the screen (as for exampleResultItem; "IIDtests" are the screen's arguments, "screenFor" the arguments of the full testing), 
+#                   or None if the level was not screened (screenRounds is 0, or screening would not save any time, see screen_iid_tests).
+def screen_level(dec_path, platform, dec, numTests, screenRounds, maxFails, testSize, IIDtests, delta_path, tracer=None, roundCache=None):
+    screenArgs, screenNames, abort = screen_iid_tests(IIDtests)
+    screenRounds = min(screenRounds, numTests)
+    if screenArgs is None or screenRounds <= 0:
+        return False, None
+
+    with trace_span(tracer, "screen", dec=dec, numTests=screenRounds) as span:
+        with tempfile.TemporaryDirectory(prefix="decimate_") as tempDir:
+            screenResults = []
+            testResults = test_decimated_file(dec_path, os.path.join(tempDir, "results.txt"), True, platform, dec, screenRounds, maxFails, testSize, 
+                                              False, False, False, IIDtests=screenArgs, temp_path=os.path.join(tempDir, "round_data.bin"), 
+                                              results=screenResults, filename=delta_path, roundCache=roundCache)
+        passOrderList = testResults[5]
+
+        # Count the failures of each cheap test that the full testing would record.
+        fails = {name: 0 for name in screenNames}
+        for i in range(screenRounds):
+            for name in screenNames:
+                if passOrderList.get(name, {}).get(i, 0) == 1:
+                    fails[name] += 1
+                    if abort:
+                        break
+        rejected = any(fails[name] > maxFails(numTests) for name in fails)
+        span.set(rejected=rejected)
+
+    screenItem = screenResults[-1]
+    screenItem["sets"] = [decimated_set_id(dec, numTests, i) for i in range(screenRounds)]
+    screenItem["screenFor"] = normalise_iid_tests(IIDtests)
+    return rejected, screenItem
+
+
+# Purpose: For internal use - Return the values returned by test_decimated_file for the testing recorded in a result item.
+def item_test_results(item, failed):
+    return (failed, {test: item["passList"][test][0] for test in item["passList"]}, {test: item["passList"][test][1] for test in item["passList"]}, 
+            item["roundPass"], item["roundTotal"], item["passOrder"])
+
+
 # Purpose: Run IID testing on a decimated data file. Split the data into tests of 'setSize' deltas each, and record results of each test.
 #          Save results in the format of exampleResultsList to the results_path. 
 #          If overwrite==False, the previous contents of results_path is also written.
@@ -436,6 +711,32 @@ def failTable(numTests):
 #       IID tests: The arguments to pass to iid_main from stats90b, e.g. if only the chi1 test should be performed, use "-r chi1".
 #             If testing for a single round should stop as soon as one of the 22 individual tests fails, use "-r abort1fail"
 #             Leaving the string empty is equivalent to running all IID tests without aborting the round on the first failure.
+#       temp_path: The temporary file used to store the deltas for one round of testing. 
+#             Use a different temp_path for each concurrent call (e.g. when testing several decimation levels in parallel).
+#       results: The list of results to which the results of this testing are appended (and which is written to results_path after every round).
+#             When results is None, the list is read from results_path (or is empty if overwrite is True).
+#             Callers that test many decimation levels may pass their own list to avoid re-reading results_path for every level.
+#       filename: The file name recorded in the results. Leave as "" to record in_path. 
+#             Callers testing a decimated copy of a delta file should record the path of the un-decimated delta file.
+#       resumeFrom: A result item (same format as exampleResultItem) recording the earlier, incomplete, testing of this decimation level 
+#             on the same in_path, e.g. written to results_path before the testing was killed. 
+#             Testing continues from round resumeFrom["roundTotal"] (the rounds already recorded are not repeated), and the counts in 
+#             resumeFrom are included in the results. If resumeFrom is in results, it is moved to the end of results and updated in place.
+#             To keep resumeFrom unchanged and record the combined results as a new item, pass a copy of the item.
+#             Leave as None to start from round 0.
+#       recordSets: Set to True when in_path was written by write_decimated_file with dec and numSets = numTests.
+#             Each round then records in the results (as "sets") which set of the decimated data it tested, as [conjugate class, set number within the class].
+#             When resuming an item with "sets", only sets that were not tested before are tested, even if the earlier testing used a different numTests 
+#             (which changes the order of the sets in the decimated file).
+#       packPassOrder: When True, the passOrder of each item is written to results_path as bitsets (see result_write).
+#       tracer: A Tracer (see decimate.tracing) to record the time spent in the stages of each round: writing the set to temp_path ("set write"),
+#             iid_main ("iid_main"), decoding its results ("json decode") and writing the results ("results write"). Leave as None for no tracing.
+#             With a roundCache, the lookup of each round is recorded as "round cache" (with hit = True or False).
+#       roundCache: A round cache (see decimate.roundcache), or the path of one (see round_cache), to store the result of iid_main for each set tested.
+#             A round whose set (with the same IIDtests) is in the cache uses the stored result instead of calling iid_main.
+#             By default, the cache is only used when the results of iid_main are reproducible: IIDtests seeds the permutation tests with -S <seed>,
+#             or does not run them (see requireSeed in decimate.roundcache).
+#             The hit rate of the cache is printed with the overall result when verboseRounds or verboseFinal is True. Leave as None for no cache.
 # Return values: ('failure', 'totalPasses', 'totals', 'roundPassCount', 'roundTotalCount', 'passOrderList') 
 #       failure: a boolean indicating whether the overall testing result for all rounds is a failure.
 #       totalPasses: a dictionary providing the number of total passes for each of the 22 individual IID tests.
@@ -452,7 +753,8 @@ def failTable(numTests):
 #
 def test_decimated_file(in_path, results_path, overwrite="", platform="<unspecified>", dec=0, numTests=1, maxFails=failTable, 
                         setSize=1000000, verboseRounds=True, verboseFinal=False, failEarly=False, 
-                        messageStart="", messageEnd="", IIDtests=""):
+                        messageStart="", messageEnd="", IIDtests="", temp_path="temp_test_decimated_file.bin", results=None, filename="", 
+                        resumeFrom=None, recordSets=False, packPassOrder=False, tracer=None, roundCache=None):
 
     # Initialise status messages:
     if messageStart == "":
@@ -467,14 +769,59 @@ def test_decimated_file(in_path, results_path, overwrite="", platform="<unspecif
     roundTotalCount =0
     passOrderList = {}
     # Set a temporary file name for storing enough deltas for one round of testing.
-    out_path = "temp_test_decimated_file.bin"
+    out_path = temp_path
+    # Set the file name and IID test arguments recorded in the results.
+    if filename == "":
+        filename = in_path
+    if IIDtests == "":
+        IIDtests = " -r all "
+    recordIIDtests = normalise_iid_tests(IIDtests)
 
     # If we are not overwriting the contents of the results_path, read the existing results:
-    results = result_open(results_path, overwrite)
+    if results is None:
+        results = result_open(results_path, overwrite)
+
+    # Open the round cache, if any, and count the rounds whose results were found in it.
+    # Unless the cache was made with requireSeed=False, it is not used when the randomised permutation tests are run without a seed.
+    roundCache = round_cache(roundCache)
+    useCache = roundCache is not None and roundCache.usable(IIDtests)
+    cacheHits = 0
+    cacheLookups = 0
 
     # So far, the testing has not failed.
     failure = False
 
+    # setOrder[i] is the number of the set of setSize deltas in in_path tested in round i, and setList records which sets were tested.
+    setOrder = list(range(numTests))
+    setList = []
+
+    # When resuming earlier testing, start from the counts recorded so far, 
+    # and move the item being resumed to the end of the results so it can be updated after each round.
+    startRound = 0
+    if resumeFrom is not None:
+        totalPasses = {test: resumeFrom["passList"][test][0] for test in resumeFrom["passList"]}
+        totals = {test: resumeFrom["passList"][test][1] for test in resumeFrom["passList"]}
+        roundPassCount = resumeFrom["roundPass"]
+        roundTotalCount = resumeFrom["roundTotal"]
+        resumePassOrder = passorder_unpack(resumeFrom["passOrder"])
+        passOrderList = {test: {int(k): v for k, v in resumePassOrder[test].items()} for test in resumePassOrder}
+        startRound = roundTotalCount
+        # Test only the sets of decimated data that were not tested before.
+        if recordSets and "sets" in resumeFrom:
+            setList = [list(testedSet) for testedSet in resumeFrom["sets"]]
+            testedSets = {tuple(testedSet) for testedSet in setList}
+            untestedSets = [j for j in range(ceil(numTests/dec)*dec) if tuple(decimated_set_id(dec, numTests, j)) not in testedSets]
+            setOrder = [None]*startRound + untestedSets
+        for testName in totals.keys():
+            if totals[testName] - totalPasses[testName] > maxFails(numTests):
+                failure = True
+        for j in range(len(results)):
+            if results[j] is resumeFrom:
+                results.append(results.pop(j))
+                break
+        else:
+            results.append(resumeFrom)
+
     # Open the delta file.
     with open(in_path, "rb") as in_file:
 
@@ -485,30 +832,53 @@ def test_decimated_file(in_path, results_path, overwrite="", platform="<unspecif
             print("{ ", end="")
 
         # For each round of testing...
-        for i in range(numTests):
+        for i in range(startRound, numTests):
+
+            # A resumed test may already have failed; if so, there is nothing left to do when failing early.
+            if failEarly and failure:
+                break
 
             # Store the deltas for this round of testing in the temporary file.  
             # If there are no deltas to read, print an error message and exit the program. 
-            with open(out_path, "wb") as out_file:
-                data = in_file.read(setSize)
-                if not data:
-                    raise Exception(f"test_decimated_file: ERROR: INPUT FILE ", in_path, " ENDED TOO SOON.\ntest_decimated_file: Needed {numTests} sets of size {setSize} deltas; only read i = {i} sets.")
-                    sys.exit(-1)
-                out_file.write(data)
+            with trace_span(tracer, "set write", dec=dec, round=i) as span:
+                with open(out_path, "wb") as out_file:
+                    in_file.seek(setOrder[i] * setSize)
+                    data = in_file.read(setSize)
+                    if not data:
+                        raise Exception(f"test_decimated_file: ERROR: INPUT FILE ", in_path, " ENDED TOO SOON.\ntest_decimated_file: Needed {numTests} sets of size {setSize} deltas; only read i = {i} sets.")
+                        sys.exit(-1)
+                    out_file.write(data)
+                span.set(bytes=len(data))
+            if recordSets:
+                setList.append(decimated_set_id(dec, numTests, setOrder[i]))
 
             # Get ready the arguments to pass to the NIST testing suite. 
             # -q means 'quiet'
             # -r all means run all available IID tests
             # (other options are -r chi1, -r chi2, -r LRS, -r perm)
-            if IIDtests == "":
-                IIDtests = " -r all "
             argStr = "-q " + IIDtests + " " + out_path
 
-            # Call the NIST IID testing tool, and store the results in a string.
-            resStr = iid_main(argStr)
+            # Use the results of testing the same set with the same arguments from the round cache, if they are there.
+            resStr = None
+            if useCache:
+                with trace_span(tracer, "round cache", dec=dec, round=i, bytes=len(data)) as span:
+                    cacheKey = round_cache_key(data, IIDtests)
+                    resStr = roundCache.get(cacheKey)
+                    span.set(hit=resStr is not None)
+                cacheLookups += 1
+                if resStr is not None:
+                    cacheHits += 1
+
+            # Otherwise, call the NIST IID testing tool, and store the results in a string.
+            if resStr is None:
+                with trace_span(tracer, "iid_main", dec=dec, round=i, bytes=len(data)):
+                    resStr = iid_main(argStr)
+                if useCache:
+                    roundCache.put(cacheKey, resStr, IIDtests)
 
             # Convert the results string to a Python dictionary.
-            res = json.loads(resStr)
+            with trace_span(tracer, "json decode", dec=dec, round=i, bytes=len(resStr)):
+                res = json.loads(resStr)
 
             # Assume this round of testing passed until proven otherwise.
             thisTestPass = True
@@ -550,7 +920,7 @@ def test_decimated_file(in_path, results_path, overwrite="", platform="<unspecif
 
             # If printed output is required, write whether this round of testing passed or failed in a dictionary format.
             if verboseRounds:
-                if i > 0:
+                if i > startRound:
                     print(", \t", end="")
                 if thisTestPass:
                     print(i, ": \"pass\"", end="", flush=True)
@@ -560,11 +930,15 @@ def test_decimated_file(in_path, results_path, overwrite="", platform="<unspecif
             # Save the results to the results_path
             if i == 0:
                 result_append(results, dec, totalPasses, totals, roundPassCount, roundTotalCount, passOrderList, 
-                              platform, filename=in_path, datestamp=str(datetime.datetime.now()))
+                              platform, filename=filename, datestamp=str(datetime.datetime.now()), testSize=setSize, IIDtests=recordIIDtests, 
+                              sets=setList if recordSets else None)
             else:
                 result_overwrite_last(results, dec, totalPasses, totals, roundPassCount, roundTotalCount, passOrderList, 
-                                      platform, filename=in_path, datestamp=str(datetime.datetime.now()))
-            result_write(results, results_path)
+                                      platform, filename=filename, datestamp=str(datetime.datetime.now()), testSize=setSize, IIDtests=recordIIDtests, 
+                                      sets=setList if recordSets else None)
+            with trace_span(tracer, "results write", dec=dec, round=i, passed=thisTestPass, roundPass=roundPassCount, roundTotal=roundTotalCount, 
+                            failure=failure):
+                result_write(results, results_path, packPassOrder)
 
 
             # If we are to stop testing as soon as more tests than allowed have failed, check if we have failed.
@@ -614,7 +988,12 @@ def test_decimated_file(in_path, results_path, overwrite="", platform="<unspecif
             print(" - pass   ", end="")
         if minPass < minTotal:
             print("-", minKey, end="")
-        print(" |\n")
+        print(" |")
+        if useCache:
+            print(f"\t| Round cache hits: {cacheHits} / {cacheLookups} = {cacheHits/max(cacheLookups, 1)*100:6.2f}% |")
+        elif roundCache is not None:
+            print("\t| Round cache not used: the permutation tests are not seeded (use -S <seed> in IIDtests, or a cache with requireSeed=False) |")
+        print("")
 
     return failure, totalPasses, totals, roundPassCount, roundTotalCount, passOrderList
 
@@ -715,6 +1094,19 @@ class BinSearchItem():
         # Since this item's value is equal to the maximum, self.left = self.value
         self.left = self.myMax - (self.myMax-(self.value+1-1))//2 
 
+    # Initialise an item of a search tree built by a search strategy (see init_search_tree). 
+    # The range still needing testing if this item is reached is from myMin to myMax (including value).
+    # right is the value tested next if this item passes, and left is the value tested next if this item fails 
+    # (this item's own value if there is nothing left to test on that side).
+    def set_node(self, parent, value, myMin, myMax, right, left):
+        self.initialized = True
+        self.parent = parent
+        self.value = value
+        self.myMin = myMin
+        self.myMax = myMax
+        self.right = right
+        self.left = left
+
     # Save the decimation results (failed, passCount, passTotalCount, roundPassCount, roundTotalCount) for a decimation level in a BinSearchItem.
     # Also compute and save the results self.totalIndividualPasses and self.totalIndividualTests by summing the values in passCount and passTotalCount.
     def set_results(self, failed, passCount, passTotalCount, roundPassCount, roundTotalCount):
@@ -764,6 +1156,151 @@ def init_binary_tree(value, minDec):
     return tree
 
 
+# The relative costs used by the "cost" search strategy when no costModel is given: the time to decimate one delta,
+# and the time for one round of testing of 1,000,000 deltas (see planner.calibrate_costs to measure these on the current machine).
+defaultSecondsPerDelta = 1e-7
+defaultSecondsPerRound = 10.0
+
+
+# Purpose: For internal use - Recursively initialise the search tree items for the range of levels myMin to myMax, 
+#          using choose to pick the level tested first in each range. It should only be called by the search strategies.
+# Parameters:
+#   tree: A list of BinSearchItems, with indicies up to the maximum decimation level.
+#   parent: The value of the item tested before this range is reached (None for the root).
+#   myMin, myMax: The range of levels still needing testing.
+#   choose: A function (myMin, myMax) returning the level in myMin to myMax to test first.
+# Return value: 
+#   The value of the item tested first in the range, or None if the range is empty.
+def init_sub_search_tree(tree, parent, myMin, myMax, choose):
+    if myMin > myMax:
+        return None
+    value = choose(myMin, myMax)
+    # If this level passes, every level above it passes, so the levels below it remain. If it fails, the levels above it remain.
+    right = init_sub_search_tree(tree, value, myMin, value - 1, choose)
+    left = init_sub_search_tree(tree, value, value + 1, myMax, choose)
+    tree[value].set_node(parent, value, myMin, myMax, value if right is None else right, value if left is None else left)
+    return value
+
+
+# Purpose: The "binary" search strategy (the default) - Start at the maximum level and halve the range of levels remaining after each level is tested.
+# Parameters:
+#   maxLevel, minLevel: The maximum and minimum levels to be tested.
+#   levelCost: Not used.
+# Return value: (tree, root)
+#   tree: A list of initialised BinSearchItems (see init_binary_tree).
+#   root: The value of the first level tested.
+def binary_search_tree(maxLevel, minLevel, levelCost=None):
+    return init_binary_tree(maxLevel, minLevel), maxLevel
+
+
+# Purpose: The "exponential" search strategy - Gallop up from the minimum level, testing minLevel, minLevel+1, minLevel+3, minLevel+7, ... 
+#          (doubling the step each time) until a level passes (or maxLevel fails), then halve the range between the last failing level 
+#          and the passing level. This tests few levels when the lowest passing level is close to minLevel.
+# Parameters:
+#   maxLevel, minLevel: The maximum and minimum levels to be tested.
+#   levelCost: Not used.
+# Return value: (tree, root)
+#   tree: A list of initialised BinSearchItems.
+#   root: The value of the first level tested.
+def exponential_search_tree(maxLevel, minLevel, levelCost=None):
+    tree = [BinSearchItem() for i in range(maxLevel+1)]
+    gallop = []
+    step = 1
+    level = minLevel
+    while level < maxLevel:
+        gallop.append(level)
+        level = minLevel + 2*step - 1
+        step *= 2
+    gallop.append(maxLevel)
+
+    halve = lambda myMin, myMax: (myMin + myMax)//2
+    for i, value in enumerate(gallop):
+        myMin = gallop[i-1] + 1 if i > 0 else minLevel
+        # If this level passes, the levels between the last failing level and this level remain; if it fails, gallop to the next level.
+        right = init_sub_search_tree(tree, value, myMin, value - 1, halve)
+        left = gallop[i+1] if i + 1 < len(gallop) else value
+        tree[value].set_node(gallop[i-1] if i > 0 else None, value, myMin, maxLevel, value if right is None else right, left)
+    return tree, minLevel
+
+
+# Purpose: The "cost" search strategy - Choose the levels to test so that the expected total cost of the search is a minimum, 
+#          when the lowest passing level is equally likely to be any level from minLevel to maxLevel (or none passing).
+#          The cost of each level is given by levelCost, e.g. the time to decimate its data and to test its rounds, 
+#          so the search avoids testing costly levels (levels needing more deltas than the others, or testing more rounds) unless that saves testing other levels.
+#          The tree is found by dynamic programming over the ranges of levels, taking O((maxLevel-minLevel)^3) operations (vectorized with numpy).
+# Parameters:
+#   maxLevel, minLevel: The maximum and minimum levels to be tested.
+#   levelCost: A function returning the cost of testing a level (e.g. search_level_cost). If None, every level has the same cost.
+# Return value: (tree, root)
+#   tree: A list of initialised BinSearchItems.
+#   root: The value of the first level tested.
+def cost_search_tree(maxLevel, minLevel, levelCost=None):
+    tree = [BinSearchItem() for i in range(maxLevel+1)]
+    numLevels = maxLevel - minLevel + 1
+    if numLevels < 1:
+        return tree, maxLevel
+    costs = np.array([1.0 if levelCost is None else levelCost(level) for level in range(minLevel, maxLevel+1)])
+    # expected[a, c] is the expected cost of finding the lowest passing level when the levels minLevel+a to minLevel+c-1 remain,
+    # and best[a, c] is the level to test first. The lowest passing level is one of the c-a+1 levels minLevel+a to minLevel+c.
+    expected = np.zeros((numLevels+1, numLevels+1))
+    best = np.zeros((numLevels+1, numLevels+1), dtype=np.int64)
+    for size in range(1, numLevels+1):
+        for a in range(0, numLevels - size + 1):
+            c = a + size
+            probes = np.arange(a, c)
+            # A probe passes when the lowest passing level is at or below it, leaving the levels below it, and fails otherwise.
+            probeCosts = costs[a:c] + ((probes - a + 1) * expected[a, a:c] + (c - probes) * expected[a+1:c+1, c]) / (size + 1)
+            i = int(np.argmin(probeCosts))
+            expected[a, c] = probeCosts[i]
+            best[a, c] = a + i
+
+    choose = lambda myMin, myMax: minLevel + int(best[myMin - minLevel, myMax - minLevel + 1])
+    root = init_sub_search_tree(tree, None, minLevel, maxLevel, choose)
+    return tree, root
+
+
+# The search strategies of decimated_binary_search, by name.
+searchStrategies = {"binary": binary_search_tree, "exponential": exponential_search_tree, "cost": cost_search_tree}
+
+
+# Purpose: Initialise the search tree of a search strategy. 
+#          Every strategy tests levels from maxLevel down to minLevel until the lowest passing level is found, 
+#          so when every level above a passing level also passes, all strategies find the same lowest passing level.
+# Parameters:
+#   strategy: The name of a strategy in searchStrategies ("binary", "exponential" or "cost"), 
+#             or a function (maxLevel, minLevel, levelCost) returning (tree, root) like those strategies.
+#   maxLevel, minLevel: The maximum and minimum levels to be tested.
+#   levelCost: A function returning the cost of testing a level (used by the "cost" strategy), or None.
+# Return value: (tree, root)
+#   tree: A list of initialised BinSearchItems, one for each level up to maxLevel. 
+#         The item tested after tree[value] is tree[value].right if it passes and tree[value].left if it fails, and the search ends 
+#         when it reaches an item that has already been tested.
+#   root: The value of the first level tested.
+def init_search_tree(strategy, maxLevel, minLevel, levelCost=None):
+    if not callable(strategy):
+        if strategy not in searchStrategies:
+            raise Exception(f"Error in function init_search_tree - \n\t\tstrategy = {strategy} \n\t\tstrategy must be one of {list(searchStrategies)} or a function.")
+        strategy = searchStrategies[strategy]
+    return strategy(maxLevel, minLevel, levelCost)
+
+
+# Purpose: Find the cost of testing a decimation level, for the "cost" search strategy.
+# Parameters:
+#   delta_path, numTestsRequested, testSize, input_delta_bytes: As for decimated_binary_search.
+#   dec: The decimation level (including any dec_multiplier).
+#   costModel: An object with a level_seconds(numDeltas, numRounds, testSize) method, like planner.CostModel. 
+#              If None, defaultSecondsPerDelta and defaultSecondsPerRound are used.
+# Return value:
+#   The estimated time to decimate the deltas read for the level and to test all of its rounds (fewer if there is insufficient data, see level_num_tests).
+def search_level_cost(delta_path, dec, numTestsRequested, testSize, input_delta_bytes, costModel=None):
+    numTests = level_num_tests(delta_path, dec, numTestsRequested, testSize, input_delta_bytes)
+    # write_decimated_file reads all the deltas for numTests sets.
+    numDeltas = ceil(numTests/dec) * dec * testSize if numTests > 0 else 0
+    if costModel is not None:
+        return costModel.level_seconds(numDeltas, numTests, testSize)
+    return numDeltas * defaultSecondsPerDelta + numTests * defaultSecondsPerRound * testSize / 1000000
+
+
 
 exampleResultItem =      {
     "dec": 2, # Decimation level tested
@@ -852,32 +1389,46 @@ exampleResultsList = [exampleResultItem, exampleResultItem2]
 # Pupose: Read the decimation testing results from file.
 # Parameters:
 #   results_path: The path where the results should be read in JSON format (same format as exampleResultsList).
+#           Paths ending in ".jsonl" are read as an append-only journal, and paths ending in ".sqlite", ".sqlite3" or ".db" as an SQLite database 
+#           (see decimate.backends). These store the same list of results, but result_write only writes the items that changed.
 #   overwrite: When True, instead of reading the file, an empty list is returned.
+#           For a backend, the first result_write of this list replaces the contents of results_path; otherwise result_write keeps the items
+#           stored by other processes, so several processes may open and write the same results_path at once.
 # Return value:
 #   results: The results read from results_path, or an empty list when the file does not exist, its size is 0, or overwrite==True.
 def result_open(results_path, overwrite):
+    backend = result_backend(results_path)
     if overwrite or (not os.path.exists(results_path)) or os.path.getsize(results_path)==0:
         results = []
+        if backend is not None:
+            # The empty list is recorded by the backend, so that result_write keeps the items stored by other processes in the meantime
+            # (or replaces the stored items if overwrite==True), instead of treating it as a list that was not read from results_path.
+            results = result_backend_open(backend, bool(overwrite))
     else:
-        with open(results_path, "r") as resFile:
-            results = json.loads(resFile.read())
-            if not isinstance(results, list):
-                raise Exception(f"Error in function result_open - \n\t\tFile = {results_path} \n\t\tFile did not contain a JSON/Python list.")
-            for i in range(len(results)):
-                if "dec" not in results[i].keys():
-                    raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"dec\" with decimation level.")  
-                if "passList" not in results[i].keys():
-                    raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"passList\" with list of how many passes for each IID test type.")  
-                if "roundPass" not in results[i].keys():
-                    raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"roundPass\" with total number of passing rounds.")  
-                if "roundTotal" not in results[i].keys():
-                    raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"roundTotal\" with total number of rounds tested.")
-                if "platform" not in results[i].keys():
-                    raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"platform\" with details of platform being tested.")
-                if "filename" not in results[i].keys():
-                    raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"filename\" with details of filename of data being tested.")
-                if "datestamp" not in results[i].keys():
-                    raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"datestamp\" with details of when test was run.")
+        if backend is not None:
+            results = result_backend_open(backend)
+        else:
+            with open(results_path, "r") as resFile:
+                results = json.loads(resFile.read())
+        if not isinstance(results, list):
+            raise Exception(f"Error in function result_open - \n\t\tFile = {results_path} \n\t\tFile did not contain a JSON/Python list.")
+        for i in range(len(results)):
+            if "dec" not in results[i].keys():
+                raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"dec\" with decimation level.")  
+            if "passList" not in results[i].keys():
+                raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"passList\" with list of how many passes for each IID test type.")  
+            if "roundPass" not in results[i].keys():
+                raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"roundPass\" with total number of passing rounds.")  
+            if "roundTotal" not in results[i].keys():
+                raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"roundTotal\" with total number of rounds tested.")
+            if "platform" not in results[i].keys():
+                raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"platform\" with details of platform being tested.")
+            if "filename" not in results[i].keys():
+                raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"filename\" with details of filename of data being tested.")
+            if "datestamp" not in results[i].keys():
+                raise Exception(f"Error in function result_open - \n\t\tList index = {i}; File = {results_path} \n\t\tList index does not contain key \"datestamp\" with details of when test was run.")
+            # Items written with packPassOrder=True are unpacked, so the passOrder is always in the usual format.
+            result_unpack_item(results[i])
     return results
 
 
@@ -885,9 +1436,40 @@ def result_open(results_path, overwrite):
 # Parameters:
 #   results: The list of results (same format as exampleResultsList)
 #   results_path: The path where the results should be written in JSON format.
-def result_write(results, results_path):
-    with open(results_path, "w") as resFile:
-        resFile.write(json.dumps(results, indent=5))
+#           For ".jsonl", ".sqlite", ".sqlite3" and ".db" paths (see result_open), only the items added, changed or removed since 
+#           the list was last read or written are stored, instead of rewriting the whole file.
+#   packPassOrder: When True, the passOrder of each item is written as bitsets (see decimate.passorder), which is much smaller
+#           than the usual format for items with many rounds. result_open unpacks these items when reading.
+#           The items in results are not changed.
+#   overwrite: For ".jsonl", ".sqlite", ".sqlite3" and ".db" paths, when True the stored results are replaced by results. Otherwise, items stored by
+#           other processes are kept, and items of a list that was not read from results_path (e.g. a ResultStore) are matched with the stored items.
+#           The default JSON format is always overwritten.
+def result_write(results, results_path, packPassOrder=False, overwrite=False):
+    if hasattr(results, "datestamp_range"):
+        # A ResultStore (see decimate.resultstore) is written as its list of items.
+        results = results.items
+    backend = result_backend(results_path)
+    if backend is not None:
+        result_backend_write(backend, results, packPassOrder, overwrite)
+    else:
+        if packPassOrder:
+            results = [result_pack_item(item) for item in results]
+        with open(results_path, "w") as resFile:
+            resFile.write(json.dumps(results, indent=5))
+
+
+# Purpose: Copy a results file to another results file, e.g. to import a JSON results file into an SQLite database or 
+#   a journal, or to export one of these back to a JSON file. The list of results is copied unchanged.
+# Parameters:
+#   in_path: The path of the results to read (any format accepted by result_open).
+#   out_path: The path of the results to write (any format accepted by result_write). Any results already in out_path are replaced.
+#   packPassOrder: As for result_write.
+# Return value:
+#   results: The list of results copied.
+def result_convert(in_path, out_path, packPassOrder=False):
+    results = result_open(in_path, False)
+    result_write(results, out_path, packPassOrder, overwrite=True)
+    return results
 
 
 
@@ -905,24 +1487,44 @@ def result_write(results, results_path):
 #       platform: A string that describes the data that were tested, e.g. the OE name, project name, etc.
 #       filename: The file path of the un-decimated deltas that were tested.
 #       datestamp: A string with the datestamp of when the testing completed.
+#       testSize: The number of deltas in each IID testing round, or None if not known (then it is not recorded).
+#       IIDtests: The arguments passed to iid_main (as returned by normalise_iid_tests), or None if not known (then they are not recorded).
+#       sets: A list with the set of decimated data tested in each round, as [conjugate class, set number within the class] (see decimated_set_id), 
+#           or None if not known (then it is not recorded).
+#           testSize, IIDtests and sets are used to find matching results when resuming testing or reusing earlier results.
 # Outcome:
 #   A new item with the details provided is appended to results.
 #
 def result_append(results, dec, passList, passListTotals, roundPass, roundTotal, passOrderList, 
-                  platform="", filename="", datestamp=""):
+                  platform="", filename="", datestamp="", testSize=None, IIDtests=None, sets=None):
     newRoundPass = {test:[passList[test], passListTotals[test]] for test in passList}
     results.append({"dec": dec, "passList": newRoundPass, "roundPass": roundPass, "passOrder": passOrderList, 
                     "roundTotal": roundTotal, "platform": platform, "filename": filename, "datestamp": str(datestamp)})
+    if testSize is not None:
+        results[-1]["testSize"] = testSize
+    if IIDtests is not None:
+        results[-1]["IIDtests"] = IIDtests
+    if sets is not None:
+        results[-1]["sets"] = sets
 
 
 # Purpose: Sort the recorded results by the following values: platform, then decimation level, then total testing rounds, then total passing individual IID tests.
 # Parameters: 
-#   results: The current list of results (same format as exampleResultsList)
+#   results: The current list of results (same format as exampleResultsList), or a ResultStore (see decimate.resultstore).
 # Note: results is modified by sorting. There is no return value.
 #
 def result_sort(results):
-    results.sort(key=lambda d: d['platform']+"!!!"+str(((1000000+d['dec'])*1000000+d['roundTotal'])*10000000+
-                                                       sum( map(itemgetter(0), d['passList'].values()) )))
+    if hasattr(results, "sorted_items"):
+        # A ResultStore (see decimate.resultstore) sorts its items with its own sort keys, which are the same as result_sort_key.
+        results.sort()
+    else:
+        results.sort(key=result_sort_key)
+
+
+# Purpose: For internal use - Return the key used by result_sort to sort a result item.
+def result_sort_key(d):
+    return d['platform']+"!!!"+str(((1000000+d['dec'])*1000000+d['roundTotal'])*10000000+
+                                   sum( map(itemgetter(0), d['passList'].values()) ))
     
 
 
@@ -941,14 +1543,15 @@ def result_sort(results):
 #       platform: A string that describes the data that were tested, e.g. the OE name, project name, etc.
 #       filename: The file path of the un-decimated deltas that were tested.
 #       datestamp: A string with the datestamp of when the testing completed.
+#       testSize, IIDtests, sets: As for result_append.
 # Outcome:
 #   The last item in results is removed, and a new item with the details provided is appended in its place.
 #
 def result_overwrite_last(results, dec, passList, passListTotals, roundPass, roundTotal, passOrderList, 
-                          platform="", filename="", datestamp=""):
+                          platform="", filename="", datestamp="", testSize=None, IIDtests=None, sets=None):
     results.pop()
     result_append(results, dec, passList, passListTotals,  roundPass,  roundTotal, passOrderList, 
-                  platform=platform, filename=filename, datestamp=datestamp)
+                  platform=platform, filename=filename, datestamp=datestamp, testSize=testSize, IIDtests=IIDtests, sets=sets)
 
     
 
@@ -1051,10 +1654,28 @@ def result_outcome(results, resNum, minTests, testID="", maxFails=failTable):
 #                     fall between the strings you specify (e.g. you may need to add a second to the last datestamp to retrieve all desired items).
 # Return value: newResults
 #   newResults: Items from results within the specified dateRange.
+#   If results is a ResultStore (see decimate.resultstore), its datestamp index is used instead of checking every item.
 def result_datestamp_range(results, dateRange):
+    if hasattr(results, "datestamp_range"):
+        return results.datestamp_range(dateRange)
+
     # Set results to a new list containing only those results with dates in the desired datestamp range.
-    # A start datestamp of "" or "earliest" means include dates starting from the earliest datestamp in the list.
-    # An end datestamp of "" or "latest" means include dates going to the latest datestamp in the list.
+    startDate, endDate = result_date_bounds(dateRange)
+
+    if (startDate != "earliest"):
+        # Return only results with datestamp > startdate and < endDate
+        newResults = [results[i] for i in range(len(results)) if (results[i]["datestamp"]>= startDate) and results[i]["datestamp"]<= endDate]
+    else:
+        # Return results with datestamp < endDate
+        newResults = [results[i] for i in range(len(results)) if results[i]["datestamp"]<= endDate]
+    return newResults
+
+
+# Purpose: For internal use - Return the start and end datestamps of a dateRange (see result_datestamp_range).
+# Return values: startDate, endDate
+#   A start datestamp of "" or "earliest" means include dates starting from the earliest datestamp in the list, and startDate = "earliest".
+#   An end datestamp of "" or "latest" means include dates going to the latest datestamp in the list, and endDate is the current date/time.
+def result_date_bounds(dateRange):
     if dateRange[1] == "" or dateRange[1]=="latest":
         endDate = str(datetime.datetime.now())[:]
     else:
@@ -1064,14 +1685,7 @@ def result_datestamp_range(results, dateRange):
         startDate = "earliest"
     else:
         startDate = dateRange[0]
-
-    if (startDate != "earliest"):
-        # Return only results with datestamp > startdate and < endDate
-        newResults = [results[i] for i in range(len(results)) if (results[i]["datestamp"]>= startDate) and results[i]["datestamp"]<= endDate]
-    else:
-        # Return results with datestamp < endDate
-        newResults = [results[i] for i in range(len(results)) if results[i]["datestamp"]<= endDate]
-    return newResults
+    return startDate, endDate
 
 
 
@@ -1117,7 +1731,10 @@ def result_print(resultsList, maxFails=failTable, minTests=1, printLowRounds=Tru
                  shortDatestamp=False, printAllIndividTests=False, printSorted=True):
     
     # When printing sorted results, copy the results so they may be sorted without modifying them.
-    if printSorted:
+    # A ResultStore (see decimate.resultstore) provides its items in sorted order from its index.
+    if hasattr(resultsList, "sorted_items"):
+        results = resultsList
+    elif printSorted:
         results = resultsList.copy()
         result_sort(results)
     else:
@@ -1155,20 +1772,16 @@ def result_print(resultsList, maxFails=failTable, minTests=1, printLowRounds=Tru
     # If required, set results to a new list containing only those results with dates in the desired datestamp range.
     # A start datestamp of "" or "earliest" means include dates starting from the earliest datestamp in the list.
     # An end datestamp of "" or "latest" means include dates going to the latest datestamp in the list.
-    results = result_datestamp_range(results, dateRange)
+    if hasattr(resultsList, "sorted_items"):
+        results = resultsList.select(dateRange=dateRange, sort=printSorted)
+    else:
+        results = result_datestamp_range(results, dateRange)
 
     # Print the time that the results are printed.
     print(f"\n Decimation results printed at: {datetime.datetime.now()}\n")
 
     # Provide information about which options were passed to the function, and which results out of the list will be printed.
-    if dateRange[1] == "" or dateRange[1]=="latest":
-        endDate = str(datetime.datetime.now())[:]
-    else:
-        endDate = dateRange[1]
-    if (dateRange[0] == "" or dateRange[0]=="earliest"):
-        startDate = "earliest"
-    else:
-        startDate = dateRange[0]
+    startDate, endDate = result_date_bounds(dateRange)
     print(f"   There are a total of {totalResultsInList} results in the list and {len(results)} results in {[startDate, endDate]}.")
     if not printLowRounds:
         print(f"   Results with fewer than {minTests} rounds of testing will not be printed.")
@@ -1195,6 +1808,11 @@ def result_print(resultsList, maxFails=failTable, minTests=1, printLowRounds=Tru
     if len(platformList) == 0:
         platformList = sorted({ results[j]["platform"] for j in range(len(results)) })
 
+    # Group the results by platform (keeping their order), so that each platform's results are found without rescanning the list.
+    platformResults = {}
+    for j in range(len(results)):
+        platformResults.setdefault(results[j]["platform"], []).append(results[j])
+
     # Now we are ready to start printing results for each platform...
     for plat in range(len(platformList)):
 
@@ -1207,7 +1825,7 @@ def result_print(resultsList, maxFails=failTable, minTests=1, printLowRounds=Tru
         print("")
 
         # Create a list of the results for this platform only.
-        platResults = [results[j] for j in range(len(results)) if results[j]["platform"]==platformList[plat]]
+        platResults = platformResults.get(platformList[plat], [])
 
         # If filenames were requested, list these at the beginning of the output for each platform
         # and assign a file ID to be printed in the result listing.
@@ -1437,6 +2055,10 @@ def result_print(resultsList, maxFails=failTable, minTests=1, printLowRounds=Tru
 
 def result_min_pass_level(results, maxFails=failTable, minTests=1, checkLowRounds=True, platformList=[], dateRange=["",""]):
 
+    # A ResultStore (see decimate.resultstore) finds the levels from its indexes.
+    if hasattr(results, "min_pass_level"):
+        return results.min_pass_level(maxFails, minTests, checkLowRounds, platformList, dateRange)
+
     # If required, set results to a new list containing only those results with dates in the desired datestamp range.
     # A start datestamp of "" or "earliest" means include dates starting from the earliest datestamp in the list.
     # An end datestamp of "" or "latest" means include dates going to the latest datestamp in the list.
@@ -1504,6 +2126,188 @@ def result_min_pass_level(results, maxFails=failTable, minTests=1, checkLowRound
 
 
 
+# Purpose: Find the latest result item recorded for testing a decimation level with the given platform, delta file and test configuration.
+#          This is used to resume testing that was killed before it completed.
+# Parameters:
+#   results: The list of results (same format as exampleResultsList)
+#   platform: The platform of the result item.
+#   filename: The path of the un-decimated delta file recorded in the result item.
+#   dec: The decimation level of the result item.
+#   testSize: The number of deltas in each IID testing round recorded in the result item.
+#   IIDtests: The arguments passed to iid_main (compared after using normalise_iid_tests).
+# Return value:
+#   The matching result item with the latest datestamp and at least one round of testing, or None if there is no matching item.
+#   NOTE: Items without "testSize", "IIDtests" and "sets" (recorded by earlier versions of decimate) never match.
+def result_find_resume(results, platform, filename, dec, testSize, IIDtests):
+    IIDtests = normalise_iid_tests(IIDtests)
+    latest = None
+    for item in results:
+        if result_item_matches(item, platform, filename, dec, testSize, IIDtests) and item["roundTotal"] > 0:
+            if latest is None or item["datestamp"] >= latest["datestamp"]:
+                latest = item
+    return latest
+
+
+# Purpose: Find the earlier result item with the most rounds of testing for a decimation level with the given platform, delta file and test configuration.
+#          This is used to reuse historical results instead of testing a decimation level again.
+# Parameters:
+#   results, platform, filename, dec, testSize, IIDtests: As for result_find_resume.
+#   minRounds: Only items with at least minRounds rounds of testing are returned.
+# Return value:
+#   The matching result item with the most rounds of testing (the latest of these if there is more than one), 
+#   or None if there is no matching item with at least minRounds (and at least one) rounds of testing.
+#   NOTE: Items without "testSize", "IIDtests" and "sets" (recorded by earlier versions of decimate) never match.
+def result_find_reuse(results, platform, filename, dec, testSize, IIDtests, minRounds=1):
+    IIDtests = normalise_iid_tests(IIDtests)
+    best = None
+    for item in results:
+        if result_item_matches(item, platform, filename, dec, testSize, IIDtests) and item["roundTotal"] >= max(minRounds, 1):
+            if best is None or (item["roundTotal"], item["datestamp"]) >= (best["roundTotal"], best["datestamp"]):
+                best = item
+    return best
+
+
+# Purpose: For internal use - Find whether a result item records testing of the given decimation level with the given platform, delta file and test configuration,
+#          and records which sets of decimated data were tested (so that testing can continue without testing any set again).
+# Parameters: As for result_find_resume, with IIDtests already normalised by normalise_iid_tests.
+# Return value: True if the item matches.
+def result_item_matches(item, platform, filename, dec, testSize, IIDtests):
+    return item["platform"] == platform and item["filename"] == filename and item["dec"] == dec \
+        and item.get("testSize") == testSize and item.get("IIDtests") == IIDtests and len(item.get("sets", [])) == item["roundTotal"]
+
+
+# Purpose: Find whether a result item is an overall failure in the same way as test_decimated_file, 
+#          i.e. whether any individual IID test has more than maxFails(numTests) failures.
+# Parameters:
+#   item: A result item (same format as exampleResultItem).
+#   numTests: The number of testing rounds requested for the decimation level.
+#   maxFails: A function such as failTable (see test_decimated_file).
+# Return value:
+#   True if the item is a failure.
+def result_level_failed(item, numTests, maxFails=failTable):
+    return any(item["passList"][test][1] - item["passList"][test][0] > maxFails(numTests) for test in item["passList"])
+
+
+# Purpose: Find whether a result item records the complete testing of a decimation level, i.e. whether test_decimated_file would have 
+#          stopped testing after the rounds recorded in the item.
+# Parameters:
+#   item: A result item (same format as exampleResultItem).
+#   numTests: The number of testing rounds requested for the decimation level.
+#   maxFails: A function such as failTable (see test_decimated_file).
+#   failEarly: As for test_decimated_file.
+# Return value:
+#   True if at least numTests rounds were tested, or if failEarly is True and the item is already a failure.
+def result_level_complete(item, numTests, maxFails=failTable, failEarly=False):
+    return item["roundTotal"] >= numTests or (failEarly and result_level_failed(item, numTests, maxFails))
+
+
+# Purpose: For internal use - Find the earlier result item (if any) from which the testing of a decimation level should continue in decimated_binary_search.
+# Parameters:
+#   results, platform, filename, dec, testSize, IIDtests: As for result_find_resume.
+#   numTests: The number of rounds of testing for the level (no item is returned when numTests is 0).
+#   resume, reuseResults, reuseMinRounds: As for decimated_binary_search.
+# Return value:
+#   The item found by result_find_resume when resuming, otherwise a copy of the item found by result_find_reuse when reusing results
+#   (so that the earlier item is kept unchanged), or None.
+def level_resume_item(results, platform, filename, dec, testSize, IIDtests, numTests, resume, reuseResults, reuseMinRounds):
+    if numTests == 0:
+        return None
+    if resume:
+        item = result_find_resume(results, platform, filename, dec, testSize, IIDtests)
+        if item is not None:
+            return item
+    if reuseResults:
+        item = result_find_reuse(results, platform, filename, dec, testSize, IIDtests, reuseMinRounds)
+        if item is not None:
+            return json.loads(json.dumps(item))
+    return None
+
+
+# Purpose: For internal use - Choose the decimation levels to test at the same time in a speculative (parallel) binary search.
+#          Starting at tree[dec], the untested levels of the binary tree are taken in breadth-first order 
+#          (this level, both of its children, then its grandchildren, ...) until numWorkers levels have been chosen.
+#          With numWorkers = 3, a level is tested together with both of the levels that could be tested after it; 
+#          with numWorkers = 7, three levels of the binary tree are tested at the same time, etc.
+# Parameters:
+#   tree: The search tree returned by init_search_tree (e.g. the binary tree returned by init_binary_tree).
+#   dec: The value of the tree item that must be tested next.
+#   numWorkers: The number of decimation levels to return.
+# Return value:
+#   A list of tree values to test, starting with dec.
+def speculative_levels(tree, dec, numWorkers):
+    levels = []
+    queue = [dec]
+    while len(queue) > 0 and len(levels) < numWorkers:
+        value = queue.pop(0)
+        # Levels with results end the search, so there is nothing to test below them.
+        if value in levels or tree[value].results:
+            continue
+        levels.append(value)
+        # The right item is tested if this level passes, and the left item is tested if this level fails.
+        # An item whose left or right value is its own value has no child on that side.
+        for child in (tree[value].right, tree[value].left):
+            if child != value:
+                queue.append(child)
+    return levels
+
+
+# Purpose: For internal use - Find how many rounds of testing can be performed for a decimation level, given the size of the delta file.
+# Parameters:
+#   delta_path: The path of the file containing the un-decimated deltas.
+#   dec: The decimation level (including any dec_multiplier).
+#   numTestsRequested, testSize, input_delta_bytes: As for decimated_binary_search.
+# Return value:
+#   numTests: numTestsRequested, or fewer if there is insufficient data (0 if there is not enough data for any testing).
+def level_num_tests(delta_path, dec, numTestsRequested, testSize, input_delta_bytes):
+    numDeltasAvail = delta_file_bytes(delta_path) // input_delta_bytes
+    numDeltasNeeded = ceil(numTestsRequested/dec) * dec * testSize
+    if numDeltasAvail < numDeltasNeeded:
+        return (numDeltasAvail//(dec*testSize))*dec
+    return numTestsRequested
+
+
+# Purpose: For internal use - Decimate and test one decimation level in a worker process of a speculative (parallel) binary search.
+#          The decimated data, the data for each round and the results are written to a private temporary directory, 
+#          so that several levels may be tested at the same time. Nothing is written to the caller's results_path;
+#          the caller records the results of the levels on the search path and discards the others.
+# Parameters: As for decimated_binary_search, except that dec is the decimation level to test (including any dec_multiplier)
+#          and numTests is the number of rounds of testing to perform.
+#          resumeFrom: As for test_decimated_file.
+#          NOTE: convert_delta and maxFails are sent to the worker process, so they must be defined at the top level of a module (not lambdas).
+#          trace: When True, the stages of decimation and testing are traced (see decimate.tracing) and the spans are returned.
+#          screenRounds: As for decimated_binary_search. A level being resumed (resumeFrom is not None) is not screened.
+#          roundCache: As for test_decimated_file. A round cache sent to the worker process must be picklable (the round caches of decimate.roundcache are).
+# Return values: (testResults, sets, spans, screenItem)
+#   testResults: The values returned by test_decimated_file.
+#   sets: The sets of decimated data tested, as recorded in the result item (see test_decimated_file, recordSets).
+#   spans: The list of spans recorded (see Tracer), or an empty list if trace is False.
+#   screenItem: If the level was rejected by screening (see screen_level), the result item of the screen to be recorded instead of 
+#       a result item made from testResults and sets (which are those of the screen). Otherwise None.
+def speculative_test_level(delta_path, platform, dec, numTests, maxFails, testSize, input_delta_bytes, convert_delta, byte_order, 
+                           failEarly, IIDtests, resumeFrom=None, trace=False, screenRounds=0, roundCache=None):
+    tracer = Tracer() if trace else None
+    with tempfile.TemporaryDirectory(prefix="decimate_") as tempDir:
+        with trace_span(tracer, "level", dec=dec, numTests=numTests):
+            dec_path = os.path.join(tempDir, "decimated_data.bin")
+            write_decimated_file(delta_path, dec_path, dec, numTests, testSize, convert_delta, False, input_delta_bytes, 1, byte_order, tracer)
+            # Screen the level with the cheap IID tests first, unless continuing earlier testing of it.
+            rejected, screenItem = False, None
+            if resumeFrom is None:
+                rejected, screenItem = screen_level(dec_path, platform, dec, numTests, screenRounds, maxFails, testSize, IIDtests, delta_path, tracer, 
+                                                    roundCache)
+            if rejected:
+                testResults, sets = item_test_results(screenItem, True), screenItem["sets"]
+            else:
+                screenItem = None
+                workerResults = []
+                testResults = test_decimated_file(dec_path, os.path.join(tempDir, "results.txt"), True, platform, dec, numTests, maxFails, testSize, 
+                                                  False, False, failEarly, IIDtests=IIDtests, temp_path=os.path.join(tempDir, "round_data.bin"), 
+                                                  results=workerResults, filename=delta_path, resumeFrom=resumeFrom, recordSets=True, tracer=tracer, 
+                                                  roundCache=roundCache)
+                sets = workerResults[-1]["sets"]
+        return testResults, sets, tracer.spans if trace else [], screenItem
+
+
 # Purpose: Use a binary search to find the lowest passing decimation level for a given file of (un-decimated) deltas.
 # Parameters:
 #   delta_path: The path of the file containing the un-decimated deltas.
@@ -1530,6 +2334,59 @@ def result_min_pass_level(results, maxFails=failTable, minTests=1, checkLowRound
 ##   IIDtests: The arguments to pass to iid_main from stats90b, e.g. if only the chi1 test should be performed, use "-r chi1".
 #             If testing for a single round should stop as soon as one of the 22 individual tests fails, use "-r abort1fail"
 #             Leaving the string empty is equivalent to running all IID tests without aborting the round on the first failure.
+#   numWorkers: When numWorkers > 1, the search is speculative: the level to be tested next and the levels that could be tested after it
+#             (both children in the binary tree, then grandchildren, ...) are tested at the same time, numWorkers levels at once, in separate processes.
+#             The search then follows the tree using these results and discards the results of levels that are not on the search path, 
+#             so the levels recorded and the minimum passing level are the same as for numWorkers = 1.
+#             With numWorkers = 2**k - 1, k levels of the tree are resolved at a time, so the number of sequential steps 
+#             is reduced from about log2(maxDec) to about log2(maxDec)/k.
+#             NOTE: convert_delta and maxFails must be defined at the top level of a module (not lambdas) so they can be sent to the worker processes.
+#             NOTE: Results for speculative levels are only written to results_path once all rounds for that level are complete.
+#   resume: When True, continue a search that was killed before it completed, using the results read from results_path (so overwrite must be False).
+#             For each level the search reaches, the latest result item with the same platform, delta_path (as filename), decimation level, 
+#             testSize and IIDtests is found. If that level was completely tested (numTests rounds, or a failure with failEarly), its recorded results are used 
+#             without testing it again. If it was only partly tested, testing continues from the last recorded round, and the new results replace the partial result item.
+#             Since decimation is deterministic, no round that was already recorded is tested again.
+#             NOTE: Only results recorded with testSize and IIDtests (i.e. by this version of decimate) can be resumed.
+#             NOTE: The returned datestampList starts at the earliest datestamp of the results that were reused, so it covers all levels of the search.
+#   reuseResults: When True, seed the search with earlier results read from results_path (so overwrite must be False), e.g. to re-qualify a platform with more rounds.
+#             For each level the search reaches, the result item with the most rounds and the same platform, delta_path (as filename), decimation level, 
+#             testSize and IIDtests is found (see result_find_reuse). If it has at least numTests rounds (or is a failure with failEarly), 
+#             the level is not tested again. If it has at least reuseMinRounds rounds, the level is topped up: only the missing rounds are tested, 
+#             on sets of decimated data that were not tested before, and the combined results are recorded as a new item (the earlier item is kept).
+#             When resume is also True, a partly tested level from the interrupted search is resumed in preference to reusing an older item.
+#   reuseMinRounds: The minimum number of rounds an earlier result item must have to be reused when reuseResults is True.
+#   packPassOrder: When True, the passOrder of each item is written to results_path as bitsets (see result_write).
+#   tracer: A Tracer (see decimate.tracing) to record the time spent testing each level ("level") and in the stages of decimation and testing
+#             (see write_decimated_file and test_decimated_file). Leave as None for no tracing.
+#             With numWorkers > 1, the spans recorded in the worker processes are added to the tracer when the workers finish (with the worker's pid).
+#   executor: An executor with a submit method returning futures (like concurrent.futures.ProcessPoolExecutor) to test the levels on, 
+#             e.g. a TaskQueueExecutor (see decimate.taskqueue) to test the levels on the workers of a task queue on many hosts. 
+#             When an executor is given, the search is speculative (as for numWorkers > 1), testing numWorkers levels at a time on the executor.
+#             The executor is not shut down by the search. Leave as None to use a ProcessPoolExecutor with numWorkers processes when numWorkers > 1.
+#             The levels are submitted with absolute paths (of delta_path, and of roundCache if it is a path), since the workers may run in another directory.
+#   screenRounds: When screenRounds > 0, each level is first screened with the cheap IID tests of IIDtests (chi1, chi2 and LRS) on its first screenRounds sets 
+#             of decimated data, before the (much slower) permutation tests are run (see screen_level). The cheap tests are deterministic and are run on the same sets
+#             by the full testing, so if one of them fails more than maxFails(numTests) times in the screen, the level is certain to fail 
+#             and it is rejected without the full testing; its result item is that of the screen (with the screen's IIDtests, and "screenFor" 
+#             recording IIDtests). All other levels are fully tested, so the verdict of every level is the same as without screening.
+#             Screening is skipped if IIDtests does not run the permutation tests.
+#             A level being resumed or topped up (see resume and reuseResults) is not screened.
+#   strategy: The search strategy, which chooses the order in which levels are tested (see init_search_tree):
+#             "binary" (the default) starts at maxDec and halves the range of levels remaining after each level is tested.
+#             "exponential" gallops up from minDec (minDec, minDec+1, minDec+3, minDec+7, ...) until a level passes, then halves the remaining range;
+#             it is best when the lowest passing level is expected to be small.
+#             "cost" minimises the expected total cost of the search, using the cost of each level from search_level_cost 
+#             (the deltas decimated and the rounds tested, which depend on dec and on how much data there is for the level).
+#             A function (maxLevel, minLevel, levelCost) returning (tree, root) may be given instead (see binary_search_tree).
+#             When every level above a passing level also passes, all strategies find the same passLevel; they differ in the levels tested.
+#             With numWorkers > 1, the levels tested ahead of the search are chosen from the strategy's tree.
+#   costModel: The costs used by the "cost" strategy, e.g. a CostModel from planner.calibrate_costs. 
+#             Leave as None to use defaultSecondsPerDelta and defaultSecondsPerRound.
+#   roundCache: A round cache, or the path of one, used by test_decimated_file for every level tested (see decimate.roundcache).
+#             Rounds of sets that were tested before with the same IIDtests, e.g. by an earlier or overlapping search of the same delta file, 
+#             use the stored results instead of calling iid_main. With numWorkers > 1 or an executor, the cache is used by the worker processes 
+#             (use an SQLite cache, see round_cache, when they run at the same time). Leave as None for no cache.
 ## Returned values: (results, datestampList, passedLevels)
 #   results: The list of results (including prior results from results_path if overwrite==False). 
 #   datestampList: The new results have datestamps between datestampList[0] and datestampList[1].
@@ -1538,6 +2395,7 @@ def result_min_pass_level(results, maxFails=failTable, minTests=1, checkLowRound
 #           decimation level with a passing worst test having at least numTestsRequested tests.
 #       passStarLevel = None if no round has a worst test that passed (including rounds/tests with less than numTestsRequested tests). 
 #           Otherwise, the minimim decimation level with a worst test that passed (including rounds/tests with less than numTestsRequested tests).
+#       passedLevels are found from the result items of the levels on the search path only (including any items reused when resume or reuseResults is True).
 #   NOTE: If verbose is True, results are printed as they are generated. However, for a summary of results,
 #           call the result_print function after calling this one. Function result_print will sort the results by decimation level if requested.
 #   NOTE: results in the format of exampleResultsList will be written to the results_path. If overwrite==False, the previous contents of results_path is also written.
@@ -1545,7 +2403,9 @@ def result_min_pass_level(results, maxFails=failTable, minTests=1, checkLowRound
 #       Results are written and overwritten as they are generated, so if the testing is killed before it completes, all results generated so far may be read from results_path.
 #
 def decimated_binary_search(delta_path, results_path, overwrite=False, platform="", maxDec=200, minDec=1, numTestsRequested=1, maxFails=failTable, testSize=1000000, dec_multiplier=1,
-                            input_delta_bytes=1, convert_delta=unchanged, byte_order='little', verbose=False, failEarly=False, IIDtests=""):
+                            input_delta_bytes=1, convert_delta=unchanged, byte_order='little', verbose=False, failEarly=False, IIDtests="", 
+                            numWorkers=1, resume=False, reuseResults=False, reuseMinRounds=1, packPassOrder=False, tracer=None, 
+                            executor=None, screenRounds=0, strategy="binary", costModel=None, roundCache=None):
 
     # The NIST testing requires deltas to be one byte in size:
     output_delta_bytes = 1
@@ -1555,88 +2415,216 @@ def decimated_binary_search(delta_path, results_path, overwrite=False, platform=
 
     # If we are not overwriting the contents of the results_path, read the existing results:
     results = result_open(results_path, overwrite)
+
+    # For a speculative search, start the worker processes.
+    # speculativeResults stores the results of levels tested ahead of the search, indexed by tree value.
+    # A given executor (e.g. a TaskQueueExecutor from decimate.taskqueue) is used instead of starting worker processes, and is not shut down.
+    speculativeResults = {}
+    ownExecutor = executor is None and numWorkers > 1
+    if ownExecutor:
+        executor = ProcessPoolExecutor(max_workers=numWorkers)
+    # The workers of an executor may run in another directory (e.g. the workers of a TaskQueueExecutor), so the levels are submitted with absolute paths.
+    # The results still record delta_path as it was given.
+    taskDeltaPath = delta_path
+    taskRoundCache = roundCache
+    if executor is not None:
+        taskDeltaPath = os.path.abspath(delta_path)
+        if isinstance(roundCache, (str, os.PathLike)):
+            taskRoundCache = os.path.abspath(roundCache)
   
-    # Initialise the binary search tree so that it can be used to select the next decimation level to test and store the results.
+    # Initialise the search tree of the strategy so that it can be used to select the next decimation level to test and store the results.
     # If decimation levels must be multiples of the dec_multiplier, then the tree will not store the actual decimation levels.
     # The true decimation level will be the value stored in the tree multiplied by the dec_multiplier.
-    tree = init_binary_tree(maxDec//dec_multiplier, ceil(minDec/dec_multiplier))
+    levelCost = lambda level: search_level_cost(delta_path, level*dec_multiplier, numTestsRequested, testSize, input_delta_bytes, costModel)
+    tree, root = init_search_tree(strategy, maxDec//dec_multiplier, ceil(minDec/dec_multiplier), levelCost)
     
     # Use dec to store the decimation level we are currently testing 
     # (or more accurately the multiple of the dec_multiplier that we are currently testing)
-    # Start at the largest possible decimation level.
-    dec = maxDec//dec_multiplier
+    # Start at the first level of the strategy (the largest possible decimation level for a binary search).
+    dec = root
 
     # Set the starting date/time so that results between these datestamps can be retrieved.
     startDate = str(datetime.datetime.now())
     if verbose:
         print(f"Starting testing at {startDate}.")
 
+    # Record the result item for each level on the search path.
+    searchItems = []
+
     # Loop over the decimation levels being tested.
-    while True:
-        # If there are already results for the decimation level we need to test next, then
-        # we are finished testing and can find the lowest passing decimation level and return the results.
-        # Results may be printed by the calling function using the result_print function if desired.
-        # Results are not printed here, except for those printed as they are generated by the test_decimated_file function when verbose is True.
-        if tree[dec].results:
-            endDate = str(datetime.datetime.now())
-            passLevels = result_min_pass_level(results, maxFails=maxFails, minTests=numTestsRequested, checkLowRounds=True, 
-                                       platformList=[platform], dateRange=[startDate, endDate])
+    try:
+        while True:
+            # If there are already results for the decimation level we need to test next, then
+            # we are finished testing and can find the lowest passing decimation level and return the results.
+            # Results may be printed by the calling function using the result_print function if desired.
+            # Results are not printed here, except for those printed as they are generated by the test_decimated_file function when verbose is True.
+            if tree[dec].results:
+                endDate = str(datetime.datetime.now())
+                passLevels = result_min_pass_level(searchItems, maxFails=maxFails, minTests=numTestsRequested, checkLowRounds=True, 
+                                           platformList=[platform], dateRange=["", ""])
     
-            if verbose:
-                print(f"\t  Minimum passing level (at least {numTestsRequested:6d} tests):         {passLevels[0]}.")
-                print(f"\t  Minimum passing level (no minimum tests requirement):  {passLevels[1]} *.")
-            # Delete the temporary file
-            if tempFileCreated and os.path.exists(dec_path):
-                os.remove(dec_path)
+                if verbose:
+                    print(f"\t  Minimum passing level (at least {numTestsRequested:6d} tests):         {passLevels[0]}.")
+                    print(f"\t  Minimum passing level (no minimum tests requirement):  {passLevels[1]} *.")
+                # Delete the temporary file.
+                if tempFileCreated and os.path.exists(dec_path):
+                    os.remove(dec_path)
             
-            return results, [startDate, endDate], passLevels
-
-        # There were no results for this decimation level already existing. Test this level.
-
-        # Find how many deltas there are available to work with by using file size / input_delta_bytes.
-        numDeltasAvail = os.path.getsize(delta_path) // input_delta_bytes
-        # Find how many deltas we need to do the requested amount of testing.
-        numDeltasNeeded = ceil(numTestsRequested/(dec*dec_multiplier)) * dec * dec_multiplier * testSize
-        numTests = numTestsRequested
-        # Reduce the number of tests we will do, numTests, if there is insufficient data.
-        if numDeltasAvail < numDeltasNeeded:
-            numTests = (numDeltasAvail//(dec*dec_multiplier*testSize))*(dec * dec_multiplier)
-            if verbose:
-                print("decimated_binary_search - Decimation level: ", dec * dec_multiplier, " - Reducing number of tests to ", numTests, 
-                      "instead of ", numTestsRequested, " due to insufficient data (only " + f"{numDeltasAvail:,d}" + " deltas available; would have needed "+ 
-                      f"{numDeltasNeeded:,d}" + ").")
-
-        
-        if numTests == 0:
-            # We are doing no tests, probably due to insufficient data; go to the right as this will give a smaller decimation level 
-            # which is more likely to have enough data.
-            tree[dec].set_results(True, {}, {}, 0, 0)
-            result_append(results, dec= dec * dec_multiplier, passList = {}, passListTotals={}, roundPass=0, roundTotal=0, 
-                          passOrderList={}, platform=platform, filename=delta_path, datestamp=str(datetime.datetime.now())) 
-            result_write(results, results_path)
-            dec = tree[dec].right
-        else:
-            # Decimate the data and save it in the temporary file path.
-            write_decimated_file(delta_path, dec_path, dec*dec_multiplier, numTests, testSize, 
-                                convert_delta, verbose, input_delta_bytes, output_delta_bytes, byte_order)
-            tempFileCreated=True
-
-            # Do the decimation testing.
-            failed, b, c, d, e, f = test_decimated_file(dec_path, results_path, overwrite, platform, dec*dec_multiplier, numTests, maxFails, testSize, verbose, False, failEarly, 
-                                            "Starting testing for decimation level " + f"{(dec*dec_multiplier):,d}" + " ...",
-                                            "Overall result for decimation = " + f"{(dec*dec_multiplier):,d}" + ":", IIDtests)
-
-            # Save the results of the decimation testing in the binary tree.
-            tree[dec].set_results(failed, b, c, d, e)
-            # Save the results in the 'results' list as well as writing the updated list to the results_path.
-            result_append(results, dec= dec * dec_multiplier, passList = b, passListTotals=c, roundPass=d, roundTotal=e, 
-                          passOrderList=f, platform=platform, filename=delta_path, datestamp=str(datetime.datetime.now()))
-            result_write(results, results_path)
-
-            if failed:
-                dec = tree[dec].left
-            else:
+                return results, [startDate, endDate], passLevels
+
+            # There were no results for this decimation level already existing. Test this level.
+
+            # Find how many deltas there are available to work with by using file size / input_delta_bytes.
+            # (For a compressed file, the size after decompression is used; see decimate.compressed.)
+            numDeltasAvail = delta_file_bytes(delta_path) // input_delta_bytes
+            # Find how many deltas we need to do the requested amount of testing.
+            numDeltasNeeded = ceil(numTestsRequested/(dec*dec_multiplier)) * dec * dec_multiplier * testSize
+            numTests = numTestsRequested
+            # Reduce the number of tests we will do, numTests, if there is insufficient data.
+            if numDeltasAvail < numDeltasNeeded:
+                numTests = (numDeltasAvail//(dec*dec_multiplier*testSize))*(dec * dec_multiplier)
+                if verbose:
+                    print("decimated_binary_search - Decimation level: ", dec * dec_multiplier, " - Reducing number of tests to ", numTests, 
+                          "instead of ", numTestsRequested, " due to insufficient data (only " + f"{numDeltasAvail:,d}" + " deltas available; would have needed "+ 
+                          f"{numDeltasNeeded:,d}" + ").")
+
+
+            # When resuming, find the latest results recorded for this level with the same platform, delta file, testSize and IIDtests.
+            # When reusing earlier results, find the results with the most rounds instead. 
+            # A reused item is copied, so that the earlier item is kept and the combined results are recorded as a new item.
+            resumeItem = level_resume_item(results, platform, delta_path, dec*dec_multiplier, testSize, IIDtests, numTests, 
+                                           resume, reuseResults, reuseMinRounds)
+
+            if numTests == 0:
+                # We are doing no tests, probably due to insufficient data; go to the right as this will give a smaller decimation level 
+                # which is more likely to have enough data.
+                tree[dec].set_results(True, {}, {}, 0, 0)
+                result_append(results, dec= dec * dec_multiplier, passList = {}, passListTotals={}, roundPass=0, roundTotal=0, 
+                              passOrderList={}, platform=platform, filename=delta_path, datestamp=str(datetime.datetime.now())) 
+                result_write(results, results_path, packPassOrder)
+                searchItems.append(results[-1])
                 dec = tree[dec].right
+            elif resumeItem is not None and result_level_complete(resumeItem, numTests, maxFails, failEarly):
+                # This level was completely tested before the search was restarted. Use the recorded results instead of testing it again.
+                failed = result_level_failed(resumeItem, numTests, maxFails)
+                tree[dec].set_results(failed, {t: resumeItem["passList"][t][0] for t in resumeItem["passList"]}, 
+                                      {t: resumeItem["passList"][t][1] for t in resumeItem["passList"]}, resumeItem["roundPass"], resumeItem["roundTotal"])
+                # Include the recorded results in the date range of this search.
+                startDate = min(startDate, resumeItem["datestamp"])
+                searchItems.append(resumeItem)
+                if verbose:
+                    print("decimated_binary_search - Decimation level", f"{(dec*dec_multiplier):,d}", ": using results recorded at", 
+                          resumeItem["datestamp"], "-", "FAILED" if failed else "pass", f"- rounds passed: {resumeItem['roundPass']} / {resumeItem['roundTotal']}")
+
+                if failed:
+                    dec = tree[dec].left
+                else:
+                    dec = tree[dec].right
+            elif executor is not None:
+                # Speculative search: if this level was not tested ahead of the search, 
+                # test it together with the levels that could be tested after it, and keep their results until they are needed.
+                # Results of levels that were tested ahead of the search but are not on the search path are discarded.
+                if dec not in speculativeResults:
+                    futures = {}
+                    for level in speculative_levels(tree, dec, numWorkers):
+                        levelTests = level_num_tests(delta_path, level*dec_multiplier, numTestsRequested, testSize, input_delta_bytes)
+                        levelResume = level_resume_item(results, platform, delta_path, level*dec_multiplier, testSize, IIDtests, levelTests, 
+                                                        resume, reuseResults, reuseMinRounds)
+                        # Completely tested levels are not tested again; the search uses their recorded results when it reaches them.
+                        if levelResume is not None and result_level_complete(levelResume, levelTests, maxFails, failEarly):
+                            continue
+                        if levelTests > 0:
+                            futures[level] = executor.submit(speculative_test_level, taskDeltaPath, platform, level*dec_multiplier, levelTests, 
+                                                             maxFails, testSize, input_delta_bytes, convert_delta, byte_order, failEarly, IIDtests, 
+                                                             levelResume, tracer is not None, screenRounds, taskRoundCache)
+                    if verbose:
+                        print("decimated_binary_search - Testing decimation levels", [level*dec_multiplier for level in futures], "in parallel.")
+                    speculativeResults = {level: futures[level].result() for level in futures}
+                    # Add the spans recorded by the worker processes to the tracer.
+                    if tracer is not None:
+                        for level in speculativeResults:
+                            tracer.merge(speculativeResults[level][2])
+
+                (failed, b, c, d, e, f), g, spans, screenItem = speculativeResults.pop(dec)
+                if verbose:
+                    print("decimated_binary_search - Decimation level", f"{(dec*dec_multiplier):,d}", ":", "FAILED" if failed else "pass", 
+                          f"- rounds passed: {d} / {e}", "(rejected by screening)" if screenItem is not None else "")
+
+                # Save the results of the decimation testing in the binary tree.
+                tree[dec].set_results(failed, b, c, d, e)
+                # The results of a resumed level replace the incomplete results recorded before the search was restarted.
+                if resumeItem is not None:
+                    results[:] = [item for item in results if item is not resumeItem]
+                # Save the results in the 'results' list as well as writing the updated list to the results_path.
+                # A level rejected by screening is recorded with the result item of the screen.
+                if screenItem is not None:
+                    screenItem["filename"] = delta_path
+                    results.append(screenItem)
+                else:
+                    result_append(results, dec= dec * dec_multiplier, passList = b, passListTotals=c, roundPass=d, roundTotal=e, 
+                                  passOrderList=f, platform=platform, filename=delta_path, datestamp=str(datetime.datetime.now()), 
+                                  testSize=testSize, IIDtests=normalise_iid_tests(IIDtests), sets=g)
+                with trace_span(tracer, "results write", dec=dec*dec_multiplier, failed=failed, roundPass=d, roundTotal=e):
+                    result_write(results, results_path, packPassOrder)
+                searchItems.append(results[-1])
+
+                if failed:
+                    dec = tree[dec].left
+                else:
+                    dec = tree[dec].right
+            else:
+                # Time the testing of this level (the stages of decimation and testing are timed separately).
+                with trace_span(tracer, "level", dec=dec*dec_multiplier, numTests=numTests):
+                    # Decimate the data and save it in the temporary file path.
+                    write_decimated_file(delta_path, dec_path, dec*dec_multiplier, numTests, testSize, 
+                                        convert_delta, verbose, input_delta_bytes, output_delta_bytes, byte_order, tracer)
+                    tempFileCreated=True
+
+                    # Screen the level with the cheap IID tests first, unless continuing earlier testing of it.
+                    # A level rejected by screening is recorded with the result item of the screen.
+                    rejected = False
+                    if resumeItem is None:
+                        rejected, screenItem = screen_level(dec_path, platform, dec*dec_multiplier, numTests, screenRounds, maxFails, testSize, IIDtests, 
+                                                            delta_path, tracer, roundCache)
+                    if rejected:
+                        failed, b, c, d, e, f = item_test_results(screenItem, True)
+                        tree[dec].set_results(failed, b, c, d, e)
+                        results.append(screenItem)
+                        if verbose:
+                            print("decimated_binary_search - Decimation level", f"{(dec*dec_multiplier):,d}", ": FAILED - rejected by screening with", 
+                                  screenItem["IIDtests"], f"- rounds passed: {d} / {e}")
+                        with trace_span(tracer, "results write", dec=dec*dec_multiplier, failed=failed, roundPass=d, roundTotal=e):
+                            result_write(results, results_path, packPassOrder)
+                    else:
+                        # Do the decimation testing.
+                        # The results of each round are added to the 'results' list and written to the results_path as they are generated.
+                        # When resuming, testing continues from the last round recorded for this level.
+                        failed, b, c, d, e, f = test_decimated_file(dec_path, results_path, overwrite, platform, dec*dec_multiplier, numTests, maxFails, testSize, verbose, False, failEarly, 
+                                                        "Starting testing for decimation level " + f"{(dec*dec_multiplier):,d}" + " ...",
+                                                        "Overall result for decimation = " + f"{(dec*dec_multiplier):,d}" + ":", IIDtests, 
+                                                        results=results, filename=delta_path, resumeFrom=resumeItem, recordSets=True, 
+                                                        packPassOrder=packPassOrder, tracer=tracer, roundCache=roundCache)
+
+                        # Save the results of the decimation testing in the binary tree.
+                        tree[dec].set_results(failed, b, c, d, e)
+                        # Save the final results for this level in the 'results' list (in place of the results saved after the last round) 
+                        # as well as writing the updated list to the results_path.
+                        result_overwrite_last(results, dec= dec * dec_multiplier, passList = b, passListTotals=c, roundPass=d, roundTotal=e, 
+                                      passOrderList=f, platform=platform, filename=delta_path, datestamp=str(datetime.datetime.now()), 
+                                      testSize=testSize, IIDtests=normalise_iid_tests(IIDtests), sets=results[-1].get("sets"))
+                        with trace_span(tracer, "results write", dec=dec*dec_multiplier, failed=failed, roundPass=d, roundTotal=e):
+                            result_write(results, results_path, packPassOrder)
+                searchItems.append(results[-1])
+
+                if failed:
+                    dec = tree[dec].left
+                else:
+                    dec = tree[dec].right
+    finally:
+        # Stop the worker processes started by the search, cancelling the levels that have not started, including when the search is stopped
+        # by an exception (e.g. a failed level test or a KeyboardInterrupt).
+        if ownExecutor:
+            executor.shutdown(cancel_futures=True)
     
 
 
@@ -1666,6 +2654,16 @@ def decimated_binary_search(delta_path, results_path, overwrite=False, platform=
 #   IIDtests: The arguments to pass to iid_main from stats90b, e.g. if only the chi1 test should be performed, use "-r chi1".
 #             If testing for a single round should stop as soon as one of the 22 individual tests fails, use "-r abort1fail"
 #             Leaving the string empty is equivalent to running all IID tests without aborting the round on the first failure.
+#   packPassOrder: When True, the passOrder of each item is written to results_path as bitsets (see result_write).
+#   tracer: A Tracer (see decimate.tracing) to record the time spent testing each level ("level") and in the stages of decimation and testing
+#             (see write_decimated_file and test_decimated_file). Leave as None for no tracing.
+#   screenRounds: When screenRounds > 0, each level is first screened with the cheap IID tests of IIDtests (chi1, chi2 and LRS) on its first screenRounds sets 
+#             of decimated data, before the (much slower) permutation tests are run (see screen_level). The cheap tests are deterministic and are run on the same sets
+#             by the full testing, so if one of them fails more than maxFails(numTests) times in the screen, the level is certain to fail 
+#             and it is rejected without the full testing; its result item is that of the screen (with the screen's IIDtests, and "screenFor" 
+#             recording IIDtests). All other levels are fully tested, so the verdict of every level is the same as without screening.
+#             Screening is skipped if IIDtests does not run the permutation tests.
+#   roundCache: As for decimated_binary_search.
 #   Returned values: (results, datestampList, passLevels)
 #   results: The list of results (including prior results from results_path if overwrite==False). 
 #   datestampList: The new results have datestamps between datestampList[0] and datestampList[1].
@@ -1682,7 +2680,8 @@ def decimated_binary_search(delta_path, results_path, overwrite=False, platform=
 #
 def decimated_range_test(delta_path, results_path, overwrite=False, platform="", maxDec=200, minDec=1, numTestsRequested=1, maxFails=failTable, 
                          testSize=1000000, dec_multiplier=1,
-                        input_delta_bytes=1, convert_delta=unchanged, byte_order='little', verbose=False, failEarly=False, IIDtests=""):
+                        input_delta_bytes=1, convert_delta=unchanged, byte_order='little', verbose=False, failEarly=False, IIDtests="", 
+                        packPassOrder=False, tracer=None, screenRounds=0, roundCache=None):
 
     # The NIST testing requires deltas to be one byte in size:
     output_delta_bytes = 1
@@ -1708,7 +2707,8 @@ def decimated_range_test(delta_path, results_path, overwrite=False, platform="",
         # Test this level.
 
         # Find how many deltas there are available to work with by using file size / input_delta_bytes.
-        numDeltasAvail = os.path.getsize(delta_path) // input_delta_bytes
+        # (For a compressed file, the size after decompression is used; see decimate.compressed.)
+        numDeltasAvail = delta_file_bytes(delta_path) // input_delta_bytes
         # Find how many deltas we need to do the requested amount of testing.
         numDeltasNeeded = ceil(numTestsRequested/(dec*dec_multiplier)) * dec * dec_multiplier * testSize
         numTests = numTestsRequested
@@ -1725,23 +2725,43 @@ def decimated_range_test(delta_path, results_path, overwrite=False, platform="",
             # which is more likely to have enough data.
             result_append(results, dec= dec * dec_multiplier, passList = {}, passListTotals={}, roundPass=0, roundTotal=0, 
                           passOrderList={}, platform=platform, filename=delta_path, datestamp=str(datetime.datetime.now())) 
-            result_write(results, results_path)
+            result_write(results, results_path, packPassOrder)
         else:
-            # Decimate the data and save it in the temporary file path.
-            write_decimated_file(delta_path, dec_path, dec*dec_multiplier, numTests, testSize, 
-                                convert_delta, verbose, input_delta_bytes, output_delta_bytes, byte_order)
-            tempFileCreated=True
-
-            # Do the decimation testing.
-            failed, b, c, d, e, f = test_decimated_file(dec_path, results_path, overwrite, platform, dec*dec_multiplier, 
-                                            numTests, maxFails, testSize, verbose, False, failEarly, 
-                                            "Starting testing for decimation level " + f"{(dec*dec_multiplier):,d}" + " ...",
-                                            "Overall result for decimation = " + f"{(dec*dec_multiplier):,d}" + ":", IIDtests)
-
-            # Save the results in the 'results' list as well as writing the updated list to the results_path.
-            result_append(results, dec= dec * dec_multiplier, passList = b, passListTotals=c, roundPass=d, roundTotal=e, 
-                          passOrderList=f, platform=platform, filename=delta_path, datestamp=str(datetime.datetime.now()))
-            result_write(results, results_path)
+            # Time the testing of this level (the stages of decimation and testing are timed separately).
+            with trace_span(tracer, "level", dec=dec*dec_multiplier, numTests=numTests):
+                # Decimate the data and save it in the temporary file path.
+                write_decimated_file(delta_path, dec_path, dec*dec_multiplier, numTests, testSize, 
+                                    convert_delta, verbose, input_delta_bytes, output_delta_bytes, byte_order, tracer)
+                tempFileCreated=True
+
+                # Screen the level with the cheap IID tests first. A level rejected by screening is recorded with the result item of the screen.
+                rejected, screenItem = screen_level(dec_path, platform, dec*dec_multiplier, numTests, screenRounds, maxFails, testSize, IIDtests, 
+                                                    delta_path, tracer, roundCache)
+                if rejected:
+                    results.append(screenItem)
+                    if verbose:
+                        print("decimated_range_test - Decimation level", f"{(dec*dec_multiplier):,d}", ": FAILED - rejected by screening with", 
+                              screenItem["IIDtests"], f"- rounds passed: {screenItem['roundPass']} / {screenItem['roundTotal']}")
+                    with trace_span(tracer, "results write", dec=dec*dec_multiplier, failed=True, roundPass=screenItem["roundPass"], 
+                                    roundTotal=screenItem["roundTotal"]):
+                        result_write(results, results_path, packPassOrder)
+                else:
+                    # Do the decimation testing.
+                    # The results of each round are added to the 'results' list and written to the results_path as they are generated.
+                    failed, b, c, d, e, f = test_decimated_file(dec_path, results_path, overwrite, platform, dec*dec_multiplier, 
+                                                    numTests, maxFails, testSize, verbose, False, failEarly, 
+                                                    "Starting testing for decimation level " + f"{(dec*dec_multiplier):,d}" + " ...",
+                                                    "Overall result for decimation = " + f"{(dec*dec_multiplier):,d}" + ":", IIDtests, 
+                                                    results=results, filename=delta_path, recordSets=True, packPassOrder=packPassOrder, 
+                                                    tracer=tracer, roundCache=roundCache)
+
+                    # Save the final results for this level in the 'results' list (in place of the results saved after the last round) 
+                    # as well as writing the updated list to the results_path.
+                    result_overwrite_last(results, dec= dec * dec_multiplier, passList = b, passListTotals=c, roundPass=d, roundTotal=e, 
+                                  passOrderList=f, platform=platform, filename=delta_path, datestamp=str(datetime.datetime.now()), 
+                                  testSize=testSize, IIDtests=normalise_iid_tests(IIDtests), sets=results[-1].get("sets"))
+                    with trace_span(tracer, "results write", dec=dec*dec_multiplier, failed=failed, roundPass=d, roundTotal=e):
+                        result_write(results, results_path, packPassOrder)
 
     # we are finished testing and can find the lowest passing decimation level and return the results.
     # Results may be printed by the calling function using the result_print function if desired.
@@ -0,0 +1,227 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+# Statistics of a delta file, found in one pass and cached in the file's sidecar (see decimate.compressed).
+#
+# file_stats reads the delta file a chunk at a time with NumPy and records the number of deltas, their minimum, maximum and mean,
+# a histogram, a set of quantiles and the counts of the symbols after each of the built-in conversions (mod_256, shr1_mod256 and shr1_mod255).
+# The statistics are cached in the sidecar of the delta file, so they are only found once for each version of the file.
+#
+# The histogram is exact ("histogram": [[value, count], ...]) when every delta is less than 2**exactBits. It is always also recorded 
+# log-bucketed ("logHistogram": [[low, high, count], ...]), with 2**subBits buckets per power of two, so deltas of any size can be summarised 
+# (each bucket is at most 1/2**subBits of its lower bound wide). Quantiles found from the log-bucketed histogram are the upper bound of a bucket.
+#
+# suggest_cutoffs uses the quantiles to suggest subdist_cutoffs for write_subfile and write_subDist_id_file, 
+# so that each sub-distribution has about the same number of deltas.
+
+import numpy as np
+from math import log2
+from decimate.compressed import open_delta_file, is_compressed, sidecar_read, sidecar_write
+from decimate.deci import mod_256, shr1_mod256, shr1_mod255
+
+
+# The built-in conversions for which symbol counts are recorded.
+statsConverts = [mod_256, shr1_mod256, shr1_mod255]
+# The quantiles recorded in the statistics.
+statsQuantiles = [0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 0.999]
+
+
+# Purpose: For internal use - Return the bit length of each value in an array of unsigned integers (0 for 0).
+def bit_lengths(values):
+    values = values.astype(np.uint64)
+    lengths = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = values >= np.uint64(1 << shift)
+        lengths += big * shift
+        values = np.where(big, values >> np.uint64(shift), values)
+    return lengths + (values > 0)
+
+
+# Purpose: For internal use - Return the log-bucket index of each value in an array of unsigned integers.
+#          Values less than 2**(subBits+1) each have their own bucket. Larger values are bucketed by their top subBits+1 bits.
+def log_buckets(values, subBits):
+    shifts = np.maximum(bit_lengths(values) - (subBits + 1), 0)
+    return shifts * (1 << subBits) + (values.astype(np.uint64) >> shifts.astype(np.uint64)).astype(np.int64)
+
+
+# Purpose: For internal use - Return the lowest and highest values in a log bucket (see log_buckets).
+def log_bucket_bounds(bucket, subBits):
+    shift = max(bucket // (1 << subBits) - 1, 0)
+    mantissa = bucket - shift * (1 << subBits)
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+# Purpose: Find the statistics of a file of deltas, or read them from the file's sidecar if they were found before.
+# Parameters:
+#   delta_path: The path of the file of deltas (which may be compressed, see decimate.compressed).
+#   input_delta_bytes: Number of bytes per delta in the delta_path file (1, 2, 4 or 8).
+#   byte_order: The order of the bytes of each delta (e.g. 'little').
+#   exactBits: An exact histogram is recorded if every delta is less than 2**exactBits.
+#   subBits: The log-bucketed histogram has 2**subBits buckets per power of two.
+#   chunkSize: How many deltas are read at a time.
+#   useCache: When True, read the statistics from the sidecar if they are there, and write them to the sidecar when they are found.
+#   verbose: When True, print a status message when the file is read.
+# Return value: A dictionary with keys:
+#   "count": The number of deltas. "bytes": The number of bytes of (decompressed) data.
+#   "min", "max", "mean": The minimum, maximum and mean of the deltas (None if there are no deltas).
+#   "histogram": [[value, count], ...] for each value that occurs, or None if a delta is at least 2**exactBits.
+#   "logHistogram": [[low, high, count], ...] for each log bucket containing deltas.
+#   "quantiles": {q: value} for each q in statsQuantiles (see stats_quantile).
+#   "conversions": For each of the built-in conversions, by name: {"counts": the count of each symbol 0 to 255, "alphabet": the number of symbols that occur,
+#                  "minEntropy": -log2(the proportion of deltas converted to the most common symbol)}.
+#   "input_delta_bytes", "byte_order", "exactBits", "subBits": As for the parameters.
+def file_stats(delta_path, input_delta_bytes=1, byte_order='little', exactBits=16, subBits=4, chunkSize=1<<20, useCache=True, verbose=False):
+    if input_delta_bytes not in (1, 2, 4, 8):
+        raise Exception(f"Error in function file_stats - \n\t\tinput_delta_bytes = {input_delta_bytes} \n\t\tDeltas must be 1, 2, 4 or 8 bytes.")
+    cacheKey = f"stats/{input_delta_bytes}/{byte_order}/{exactBits}/{subBits}"
+    if useCache:
+        stats = sidecar_read(delta_path, cacheKey)
+        if stats is not None:
+            return stats
+
+    if verbose:
+        print("file_stats - Reading", delta_path)
+    dtype = np.dtype(f"u{input_delta_bytes}").newbyteorder("<" if byte_order == "little" else ">")
+    count = 0
+    numBytes = 0
+    total = 0
+    minDelta = None
+    maxDelta = None
+    exactCounts = np.zeros(1 << exactBits, dtype=np.int64)
+    exact = True
+    logCounts = np.zeros(65 * (1 << subBits), dtype=np.int64)
+    convertCounts = {convert.__name__: np.zeros(256, dtype=np.int64) for convert in statsConverts}
+
+    with open_delta_file(delta_path) as in_file:
+        leftover = b""
+        while True:
+            block = in_file.read(chunkSize*input_delta_bytes)
+            if not block:
+                break
+            numBytes += len(block)
+            block = leftover + block
+            usable = len(block) - len(block) % input_delta_bytes
+            leftover = block[usable:]
+            if usable == 0:
+                continue
+            deltas = np.frombuffer(block[:usable], dtype=dtype).astype(np.uint64)
+
+            count += len(deltas)
+            # Sum the high and low 32 bits separately so that the sum of 8 byte deltas does not overflow.
+            total += (int((deltas >> np.uint64(32)).sum()) << 32) + int((deltas & np.uint64(0xFFFFFFFF)).sum())
+            blockMin = int(deltas.min())
+            blockMax = int(deltas.max())
+            minDelta = blockMin if minDelta is None else min(minDelta, blockMin)
+            maxDelta = blockMax if maxDelta is None else max(maxDelta, blockMax)
+            if exact and blockMax >= (1 << exactBits):
+                exact = False
+            if exact:
+                exactCounts += np.bincount(deltas.astype(np.int64), minlength=1 << exactBits)
+            logCounts += np.bincount(log_buckets(deltas, subBits), minlength=len(logCounts))
+            for convert in statsConverts:
+                convertCounts[convert.__name__] += np.bincount(convert(deltas).astype(np.int64), minlength=256)
+
+    logHistogram = []
+    for bucket in np.flatnonzero(logCounts):
+        low, high = log_bucket_bounds(int(bucket), subBits)
+        logHistogram.append([low, high, int(logCounts[bucket])])
+    conversions = {}
+    for name in convertCounts:
+        counts = convertCounts[name]
+        conversions[name] = {"counts": counts.tolist(), "alphabet": int(np.count_nonzero(counts)), 
+                             "minEntropy": -log2(int(counts.max()) / count) if count else None}
+    stats = {"count": count, "bytes": numBytes, "min": minDelta, "max": maxDelta, "mean": total / count if count else None,
+             "histogram": [[int(value), int(exactCounts[value])] for value in np.flatnonzero(exactCounts)] if exact else None,
+             "logHistogram": logHistogram, "conversions": conversions, 
+             "input_delta_bytes": input_delta_bytes, "byte_order": byte_order, "exactBits": exactBits, "subBits": subBits}
+    stats["quantiles"] = {str(q): stats_quantile(stats, q) for q in statsQuantiles}
+
+    if useCache:
+        sidecar_write(delta_path, cacheKey, stats)
+        # The size of a compressed file was found as well (see delta_file_bytes).
+        if is_compressed(delta_path):
+            sidecar_write(delta_path, "bytes", numBytes)
+    return stats
+
+
+# Purpose: Find a quantile of the deltas from their statistics.
+# Parameters:
+#   stats: The statistics returned by file_stats.
+#   q: The quantile, from 0 to 1.
+# Return value:
+#   The smallest value v such that at least a proportion q of the deltas are <= v (from the exact histogram), 
+#   or the upper bound of the log bucket containing that value if there is no exact histogram. None if there are no deltas.
+def stats_quantile(stats, q):
+    if stats["count"] == 0:
+        return None
+    target = q * stats["count"]
+    cumulative = 0
+    if stats["histogram"] is not None:
+        for value, valueCount in stats["histogram"]:
+            cumulative += valueCount
+            if cumulative >= target:
+                return value
+        return stats["max"]
+    for low, high, bucketCount in stats["logHistogram"]:
+        cumulative += bucketCount
+        if cumulative >= target:
+            return min(high, stats["max"])
+    return stats["max"]
+
+
+# Purpose: Suggest subdist_cutoffs for write_subfile and write_subDist_id_file, so that each sub-distribution has about the same number of deltas.
+# Parameters:
+#   stats: The statistics returned by file_stats.
+#   numSubDists: The number of sub-distributions wanted.
+# Return value:
+#   A list of up to numSubDists - 1 increasing cutoffs. Cutoff i is one more than the (i+1)/numSubDists quantile (see stats_quantile), 
+#   so deltas up to and including the quantile are in the earlier sub-distributions. 
+#   Fewer cutoffs are returned when there are fewer distinct values (or log buckets) than sub-distributions.
+# E.g.
+#   stats = file_stats("deltas.bin", input_delta_bytes=8)
+#   write_subfile("deltas.bin", "deltas_sub", convert_delta=mod_256, input_delta_bytes=8, output_delta_bytes=1, subdist_cutoffs=suggest_cutoffs(stats, 4))
+def suggest_cutoffs(stats, numSubDists=2):
+    cutoffs = []
+    for i in range(1, numSubDists):
+        value = stats_quantile(stats, i / numSubDists)
+        if value is None or value >= stats["max"]:
+            break
+        if not cutoffs or value + 1 > cutoffs[-1]:
+            cutoffs.append(value + 1)
+    return cutoffs
+
+
+# Purpose: Print the statistics of a delta file.
+# Parameters:
+#   stats: The statistics returned by file_stats.
+# Return value: None
+def print_file_stats(stats):
+    print(f"Deltas: {stats['count']:,d} ({stats['input_delta_bytes']} bytes each)")
+    if stats["count"] == 0:
+        return
+    print(f"    min = {stats['min']:,d}, max = {stats['max']:,d}, mean = {stats['mean']:,.3f}")
+    print("    quantiles:", ", ".join(f"{q}: {stats['quantiles'][q]:,d}" for q in stats["quantiles"]))
+    if stats["histogram"] is not None:
+        print(f"    distinct values: {len(stats['histogram']):,d}")
+    for name in stats["conversions"]:
+        conversion = stats["conversions"][name]
+        print(f"    {name}: {conversion['alphabet']} symbols, min-entropy {conversion['minEntropy']:.3f} bits per symbol")
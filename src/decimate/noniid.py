@@ -0,0 +1,156 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+# Non-IID entropy assessment of data held in memory, using the non-IID estimators (SP 800-90B Section 6.3) of non_iid_main from stats90b.
+#
+# non_iid_main runs the estimators of NIST's ea_non_iid in-process on a buffer (bytes, bytearray, memoryview or a NumPy array of uint8),
+# so a full assessment of data decimate already holds does not need the data to be written to, and read back from, a file.
+#   - non_iid_samples reads the samples to assess from a delta file (decompressing it if it is compressed), optionally keeping 
+#     only every dec'th delta (e.g. at the decimation level that passed the IID tests) and converting the deltas to 8-bit samples.
+#   - non_iid_assess runs the requested estimators (all of them by default) on the samples, in parallel by default, and returns their results.
+#   - non_iid_min_entropy returns the assessed min-entropy from the results.
+#
+# NOTE: As with iid_main, non_iid_main prints its usage and exits the process when it is given invalid arguments or data it cannot assess,
+#       so non_iid_assess checks the arguments and data first and raises an Exception instead.
+
+import os
+import json
+import numpy as np
+from stats90b import non_iid_main
+from decimate.deci import open_deltas, unchanged, vectorConverts
+
+
+# The estimators that may be requested (the -r options of non_iid_main), in the order non_iid_main reports them.
+nonIidEstimators = ["mcv", "collision", "markov", "compression", "tuple", "LRS", "multimcw", "lag", "multimmc", "lz78y"]
+
+
+# Purpose: Read the samples to assess from a file of deltas.
+# Parameters:
+#       in_path: File containing the deltas, which is decompressed as it is read if it is compressed (.gz, .bz2 or .xz, see decimate.compressed).
+#                Or a binary file-like object with a read method, e.g. a DeltaStream (see decimate.timestamps) to read deltas derived from timestamps.
+#       numSamples: The number of samples to return, or None to return all the samples in the file.
+#       dec: Keep only every dec'th delta (those in sequence position 0 modulo dec), e.g. the decimation level that passed the IID tests. 
+#            The default of 1 keeps every delta.
+#       convert_delta: The function to convert each delta to a sample (e.g. mod_256). The converted samples must fit in one byte.
+#       input_delta_bytes: The number of bytes in each delta: 1, 2, 4 or 8.
+#       byte_order: The byte order of the deltas (e.g. 'little').
+#       blockSize: The number of deltas read at a time.
+# Return value: A NumPy array of the samples (uint8), which may be passed to non_iid_assess.
+def non_iid_samples(in_path, numSamples=None, dec=1, convert_delta=unchanged, input_delta_bytes=1, byte_order='little', blockSize=1<<24):
+    if input_delta_bytes not in (1, 2, 4, 8):
+        raise Exception(f"Error in function non_iid_samples - \n\t\tinput_delta_bytes = {input_delta_bytes} \n\t\tinput_delta_bytes must be 1, 2, 4 or 8.")
+    if dec < 1:
+        raise Exception(f"Error in function non_iid_samples - \n\t\tdec = {dec} \n\t\tdec must be at least 1.")
+
+    npByteOrder = "<" if byte_order == "little" else ">"
+    inType = np.dtype(f"u{input_delta_bytes}").newbyteorder(npByteOrder)
+    # Read whole multiples of dec deltas at a time, so that the kept deltas are at the same position in each block.
+    blockDeltas = max(1, blockSize // dec) * dec
+
+    blocks = []
+    numKept = 0
+    with open_deltas(in_path) as in_file:
+        while numSamples is None or numKept < numSamples:
+            block = in_file.read(blockDeltas*input_delta_bytes)
+            if not block:
+                break
+            deltas = np.frombuffer(block[:len(block) - len(block) % input_delta_bytes], dtype=inType)[::dec]
+            if numSamples is not None:
+                deltas = deltas[:numSamples - numKept]
+
+            # Convert the deltas, a block at a time if convert_delta works on NumPy arrays (see vectorConverts).
+            if convert_delta in vectorConverts:
+                samples = convert_delta(deltas.astype(np.uint64))
+            else:
+                samples = np.array([convert_delta(int(delta)) for delta in deltas], dtype=np.uint64)
+            if len(samples) > 0 and samples.max() > 255:
+                raise Exception(f"Error in function non_iid_samples - \n\t\tconverted delta = {samples.max()} "
+                                "\n\t\tThe converted deltas must fit in one byte. Use a convert_delta such as mod_256.")
+
+            blocks.append(samples.astype(np.uint8))
+            numKept += len(samples)
+
+    if numSamples is not None and numKept < numSamples:
+        raise Exception(f"Error in function non_iid_samples - \n\t\tnumSamples = {numSamples}, dec = {dec} \n\t\tThe file only has {numKept} samples.")
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.uint8)
+
+
+# Purpose: Run the non-IID estimators of non_iid_main from stats90b on samples held in memory.
+# Parameters:
+#       data: The samples, one per byte: bytes, bytearray, memoryview or a NumPy array of uint8 (e.g. from non_iid_samples).
+#             Or the path of a file of 1-byte samples, which is read with non_iid_samples.
+#       estimators: A list of the estimators to run (see nonIidEstimators), or None to run all of them.
+#             When only some estimators are run, the assessed min-entropy is the minimum of their estimates only.
+#       bitsPerSymbol: The number of bits per symbol (1 to 8), or None to infer it from the data.
+#       conditioned: If True, make the conditioned sequential dataset estimate h' (-c); otherwise make the initial entropy estimate (-i).
+#       truncate: If True, truncate the bitstring assessed to 1,000,000 bits (-t); otherwise assess all of it (-a).
+#       parallel: If True, run the estimators in parallel (-p). The results are the same either way.
+#       verbose: If True, print the output of non_iid_main; otherwise run it in quiet mode (-q).
+# Return value: The results of non_iid_main as a dictionary. results["testCases"] is a list with a dictionary for each estimator run 
+#       (its "testCaseDesc" and estimates, e.g. "hOriginal" and "hBitstring"), followed by the "Overall" test case with the assessed 
+#       min-entropy "hAssessed" (see non_iid_min_entropy).
+def non_iid_assess(data, estimators=None, bitsPerSymbol=None, conditioned=False, truncate=False, parallel=True, verbose=False):
+    if isinstance(data, (str, os.PathLike)):
+        data = non_iid_samples(data)
+    if isinstance(data, np.ndarray) and data.dtype != np.uint8:
+        raise Exception(f"Error in function non_iid_assess - \n\t\tdata.dtype = {data.dtype} \n\t\tThe samples must be one byte each (uint8). See non_iid_samples.")
+    if isinstance(data, np.ndarray):
+        data = np.ascontiguousarray(data)
+
+    # Check the arguments and data that non_iid_main would exit on.
+    if estimators is not None:
+        for estimator in estimators:
+            if estimator not in nonIidEstimators + ["all"]:
+                raise Exception(f"Error in function non_iid_assess - \n\t\testimator = {estimator} \n\t\testimators must be from {nonIidEstimators}.")
+    if bitsPerSymbol is not None and not (1 <= bitsPerSymbol <= 8):
+        raise Exception(f"Error in function non_iid_assess - \n\t\tbitsPerSymbol = {bitsPerSymbol} \n\t\tbitsPerSymbol must be between 1 and 8.")
+    samples = np.frombuffer(data, dtype=np.uint8)
+    if len(samples) == 0:
+        raise Exception(f"Error in function non_iid_assess - \n\t\tThere are no samples to assess.")
+    if bitsPerSymbol is not None and samples.max() >= (1 << bitsPerSymbol):
+        raise Exception(f"Error in function non_iid_assess - \n\t\tbitsPerSymbol = {bitsPerSymbol}; sample = {samples.max()} \n\t\tThe samples must fit in bitsPerSymbol bits.")
+    if samples.min() == samples.max():
+        raise Exception(f"Error in function non_iid_assess - \n\t\tEvery sample is {samples.min()}. No entropy can be awarded.")
+
+    # Get ready the arguments to pass to non_iid_main. The samples are passed as a buffer, so there is no file name.
+    argStr = "" if verbose else "-q "
+    argStr += "-c " if conditioned else "-i "
+    argStr += "-t " if truncate else "-a "
+    if parallel:
+        argStr += "-p "
+    if estimators is not None:
+        argStr += "".join(f"-r {estimator} " for estimator in estimators)
+    if bitsPerSymbol is not None:
+        argStr += str(bitsPerSymbol)
+
+    return json.loads(non_iid_main(argStr, data))
+
+
+# Purpose: Find the assessed min-entropy in the results of non_iid_assess.
+# Parameters:
+#       results: The results returned by non_iid_assess.
+# Return value: The assessed min-entropy per sample ("hAssessed" of the "Overall" test case).
+def non_iid_min_entropy(results):
+    for testCase in results["testCases"]:
+        if testCase["testCaseDesc"] == "Overall":
+            return testCase["hAssessed"]
+    raise Exception(f"Error in function non_iid_min_entropy - \n\t\tThe results have no Overall test case.")
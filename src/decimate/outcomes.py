@@ -0,0 +1,181 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+# Batch evaluation of the outcomes of many result items at once.
+#
+# result_outcome in decimate.deci evaluates one result item at a time. ResultArrays loads the passList counts of a list of results into
+# NumPy arrays once, and then evaluates the outcome of every item (and the minimum passing levels) in a few array operations.
+# maxFails is only called once for each distinct number of tests, so re-scoring a whole history under a different maxFails policy is fast.
+
+import numpy as np
+from decimate.deci import failTable, result_date_bounds
+
+
+# The outcomes returned by ResultArrays.outcomes. Outcomes 0 to 3 are those returned by result_outcome.
+# "NO DATA" is returned for items with an empty passList (for which result_outcome cannot be used).
+outcomeNames = np.array(["pass", "pass *", "FAIL *", "FAIL", "NO DATA"])
+
+
+# The passList counts and other details of a list of results, stored as NumPy arrays.
+# Parameters:
+#   results: The list of results (same format as exampleResultsList), or a ResultStore (see decimate.resultstore).
+# Attributes: (n is the number of items and k the number of different individual IID tests in results)
+#   tests: The list of the k individual IID test names; column t of the matrices below is for test tests[t].
+#   passes, totals: n x k integer matrices with passList[test][0] and passList[test][1] of each item (0 if the item does not have the test).
+#   present: n x k boolean matrix; True if the item's passList has the test.
+#   position: n x k integer matrix with the position of the test in the item's passList (used to choose between tests that are equally 'worst').
+#   dec, roundTotal: Integer arrays with the decimation level and number of rounds of each item.
+#   platform, filename, datestamp: String arrays with the platform, filename and datestamp of each item.
+class ResultArrays():
+    def __init__(self, results):
+        items = list(results)
+        n = len(items)
+        columns = {}
+        for item in items:
+            for test in item["passList"]:
+                if test not in columns:
+                    columns[test] = len(columns)
+        self.tests = list(columns)
+        k = len(self.tests)
+        self.passes = np.zeros((n, k), dtype=np.int64)
+        self.totals = np.zeros((n, k), dtype=np.int64)
+        self.present = np.zeros((n, k), dtype=bool)
+        self.position = np.zeros((n, k), dtype=np.int64)
+        for i in range(n):
+            passList = items[i]["passList"]
+            j = 0
+            for test in passList:
+                t = columns[test]
+                self.passes[i, t] = passList[test][0]
+                self.totals[i, t] = passList[test][1]
+                self.present[i, t] = True
+                self.position[i, t] = j
+                j += 1
+        self.dec = np.array([item["dec"] for item in items], dtype=np.int64)
+        self.roundTotal = np.array([item["roundTotal"] for item in items], dtype=np.int64)
+        self.platform = np.array([item["platform"] for item in items], dtype=str)
+        self.filename = np.array([item["filename"] for item in items], dtype=str)
+        self.datestamp = np.array([item["datestamp"] for item in items], dtype=str)
+
+    def __len__(self):
+        return len(self.dec)
+
+    # Find the outcome of every item, as result_outcome(results, i, minTests, testID="", maxFails=maxFails) does for item i.
+    # Return values: (outcomes, needStarMessage, worst)
+    #   outcomes: String array with the outcome of each item ("pass", "pass *", "FAIL *" or "FAIL", or "NO DATA" if the item's passList is empty).
+    #   needStarMessage: Boolean array; True when the outcome was "FAIL *" or "pass *".
+    #   worst: Integer array with the column (in self.tests) of the 'worst' test of each item, or -1 if the item's passList is empty.
+    #          'Worst' is chosen as for result_outcome: from the failing tests, or from all tests if none fail, the tests having the lowest
+    #          number of passes, and of those, the first test in the item's passList with the maximum total tests.
+    def outcomes(self, minTests=1, maxFails=failTable):
+        n = len(self)
+        hasTests = self.present.any(axis=1)
+        itemMaxFails = max_fails_array(maxFails, self.totals, self.present)
+        failing = self.present & ((self.totals - self.passes) > itemMaxFails)
+        # Search the failing tests, or all tests if none fail.
+        search = np.where(failing.any(axis=1)[:, None], failing, self.present)
+        big = np.iinfo(np.int64).max
+        passing = np.where(search, self.passes, big).min(axis=1, initial=big)
+        candidates = search & (self.passes == passing[:, None])
+        total = np.where(candidates, self.totals, -1).max(axis=1, initial=-1)
+        candidates &= (self.totals == total[:, None])
+        worst = np.where(candidates, self.position, big).argmin(axis=1) if self.present.shape[1] > 0 else np.zeros(n, dtype=np.int64)
+        worst = np.where(hasTests, worst, -1)
+
+        thisFails = np.where(hasTests, total - passing, 0)
+        thisMaxFails = max_fails_array(maxFails, total, hasTests)
+        maxMaxFails = maxFails(minTests)
+        outcomeCodes = np.where(thisFails > thisMaxFails,
+                                np.where(thisFails > maxMaxFails, 3, 2),
+                                np.where(total < minTests, 1, 0))
+        outcomeCodes = np.where(hasTests, outcomeCodes, 4)
+        needStarMessage = (outcomeCodes == 1) | (outcomeCodes == 2)
+        return outcomeNames[outcomeCodes], needStarMessage, worst
+
+    # Return a boolean array selecting the items that result_min_pass_level checks for the given parameters (see result_min_pass_level).
+    def checked(self, minTests=1, checkLowRounds=True, platformList=[], dateRange=["",""]):
+        startDate, endDate = result_date_bounds(dateRange)
+        selected = self.datestamp <= endDate
+        if startDate != "earliest":
+            selected &= self.datestamp >= startDate
+        if len(platformList) != 0:
+            selected &= np.isin(self.platform, np.array(platformList, dtype=str))
+        if not checkLowRounds:
+            selected &= self.roundTotal >= minTests
+        # Items with no rounds, an empty passList, or no individual tests run are not checked.
+        selected &= (self.roundTotal != 0) & self.present.any(axis=1) & (self.totals.sum(axis=1) != 0)
+        return selected
+
+    # Return the minimum passing decimation levels for each platform.
+    # Parameters: maxFails, minTests, checkLowRounds, platformList and dateRange are as for result_min_pass_level.
+    # Return value: passLevels
+    #   passLevels[platform] = [passLevel, passStarLevel] as returned by result_min_pass_level for that platform alone, for each platform in platformList
+    #   (or each platform in the results if platformList == []).
+    def min_pass_levels(self, maxFails=failTable, minTests=1, checkLowRounds=True, platformList=[], dateRange=["",""]):
+        outcomes, needStarMessage, worst = self.outcomes(minTests, maxFails)
+        selected = self.checked(minTests, checkLowRounds, platformList, dateRange)
+        if len(platformList) == 0:
+            platformList = sorted(set(self.platform.tolist()))
+        platforms, platformIndex = np.unique(self.platform, return_inverse=True)
+        levels = {}
+        for j, outcomeSet in enumerate((["pass"], ["pass", "pass *"])):
+            passing = selected & np.isin(outcomes, outcomeSet)
+            minLevels = np.full(len(platforms), np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(minLevels, platformIndex[passing], self.dec[passing])
+            levels[j] = {platforms[p]: int(minLevels[p]) for p in range(len(platforms)) if minLevels[p] != np.iinfo(np.int64).max}
+        return {platform: [levels[0].get(platform), levels[1].get(platform)] for platform in platformList}
+
+    # Return the minimum passing decimation levels over all the platforms in platformList, as result_min_pass_level does.
+    def min_pass_level(self, maxFails=failTable, minTests=1, checkLowRounds=True, platformList=[], dateRange=["",""]):
+        outcomes, needStarMessage, worst = self.outcomes(minTests, maxFails)
+        selected = self.checked(minTests, checkLowRounds, platformList, dateRange)
+        levels = []
+        for outcomeSet in (["pass"], ["pass", "pass *"]):
+            passing = selected & np.isin(outcomes, outcomeSet)
+            if passing.any():
+                levels.append(int(self.dec[passing].min()))
+            else:
+                levels.append(None)
+        return levels
+
+
+# Purpose: Find the outcome of every item in a list of results, as result_outcome does for a single item.
+# Parameters:
+#   results: The list of results (same format as exampleResultsList), or a ResultArrays to avoid loading the results again.
+#   minTests, maxFails: As for result_outcome.
+# Return value:
+#   A list with (outcome, needStarMessage) for each item, as returned by result_outcome(results, i, minTests, testID="", maxFails=maxFails).
+#   The outcome is "NO DATA" (and needStarMessage False) for items with an empty passList.
+def result_outcomes(results, minTests=1, maxFails=failTable):
+    if not isinstance(results, ResultArrays):
+        results = ResultArrays(results)
+    outcomes, needStarMessage, worst = results.outcomes(minTests, maxFails)
+    return list(zip(outcomes.tolist(), needStarMessage.tolist()))
+
+
+# Purpose: For internal use - Apply maxFails to the values of an integer array where mask is True (other values are set to 0), 
+#          calling maxFails once for each distinct value.
+def max_fails_array(maxFails, values, mask):
+    maxFailsValues = np.zeros(values.shape, dtype=np.int64)
+    distinct, inverse = np.unique(values[mask], return_inverse=True)
+    distinctMaxFails = np.array([maxFails(int(value)) for value in distinct], dtype=np.int64)
+    maxFailsValues[mask] = distinctMaxFails[inverse.reshape(-1)]
+    return maxFailsValues
@@ -0,0 +1,146 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+# Compact encoding of the "passOrder" of result items (see exampleResultItem in decimate.deci).
+#
+# The passOrder of a result item records whether each individual IID test (and each round) passed or failed in each round,
+# as a dictionary for each test mapping the round number to 0 (pass) or 1 (fail). Stored in JSON, this takes one key/value pair
+# per test per round. The packed form stores each test as a bitset instead:
+#   {"encoding": "bitset",
+#    "rounds": number of rounds (one more than the largest round number),
+#    "fail": {test: base64 of the bitset of rounds that failed, ...},
+#    "ran": {test: base64 of the bitset of rounds in which the test was run, ...}}
+# Bit r of a bitset is bit (r % 8) of byte (r // 8). A test is only listed in "ran" if it was not run in every round from 0 to rounds-1
+# (e.g. when testing used the "-r abort1fail" option, or when a round number is missing).
+# result_write in decimate.deci packs the passOrder of each item when packPassOrder=True, and result_open unpacks packed items,
+# so functions reading results always see the usual dictionaries.
+
+import base64
+import numpy as np
+
+
+# Purpose: Return True if passOrder is in the packed form returned by passorder_pack.
+def passorder_is_packed(passOrder):
+    return passOrder.get("encoding") == "bitset"
+
+
+# Purpose: Pack the passOrder of a result item into bitsets.
+# Parameters:
+#   passOrder: The passOrder of a result item, with round numbers as integers or strings (e.g. as read from JSON).
+# Return value:
+#   The packed passOrder, which contains only JSON-compatible values. If passOrder is already packed, it is returned unchanged.
+def passorder_pack(passOrder):
+    if passorder_is_packed(passOrder):
+        return passOrder
+    rounds = 0
+    for test in passOrder:
+        for r in passOrder[test]:
+            rounds = max(rounds, int(r) + 1)
+    packed = {"encoding": "bitset", "rounds": rounds, "fail": {}, "ran": {}}
+    for test in passOrder:
+        fail = np.zeros(rounds, dtype=bool)
+        ran = np.zeros(rounds, dtype=bool)
+        for r, outcome in passOrder[test].items():
+            ran[int(r)] = True
+            fail[int(r)] = (outcome == 1)
+        packed["fail"][test] = bits_to_base64(fail)
+        if not ran.all():
+            packed["ran"][test] = bits_to_base64(ran)
+    return packed
+
+
+# Purpose: Unpack a passOrder packed by passorder_pack.
+# Parameters:
+#   passOrder: The packed passOrder.
+# Return value:
+#   The passOrder as dictionaries mapping round numbers (as strings, as when read from JSON) to 0 (pass) or 1 (fail).
+#   If passOrder is not packed, it is returned unchanged.
+def passorder_unpack(passOrder):
+    if not passorder_is_packed(passOrder):
+        return passOrder
+    unpacked = {}
+    for test, fail, ran in passorder_bits(passOrder):
+        unpacked[test] = {str(r): int(fail[r]) for r in np.flatnonzero(ran)}
+    return unpacked
+
+
+# Purpose: Return the pass/fail results of a passOrder as NumPy boolean matrices with one row per round and one column per test.
+# Parameters:
+#   passOrder: The passOrder of a result item, packed or unpacked.
+#   tests: The tests to include, in the order of the columns. If tests is None, all the tests in passOrder are included
+#          (including "round", the result of each whole round).
+# Return values: (fails, ran, tests)
+#   fails: fails[r, t] is True if test tests[t] failed in round r.
+#   ran: ran[r, t] is True if test tests[t] was run in round r (fails[r, t] is False when it was not run).
+#   tests: The list of tests, in the order of the columns.
+def passorder_matrix(passOrder, tests=None):
+    packed = passorder_pack(passOrder)
+    if tests is None:
+        tests = list(packed["fail"])
+    rounds = packed["rounds"]
+    fails = np.zeros((rounds, len(tests)), dtype=bool)
+    ran = np.zeros((rounds, len(tests)), dtype=bool)
+    columns = {tests[t]: t for t in range(len(tests))}
+    for test, testFail, testRan in passorder_bits(packed):
+        if test in columns:
+            fails[:, columns[test]] = testFail
+            ran[:, columns[test]] = testRan
+    return fails, ran, tests
+
+
+# Purpose: Return a copy of a result item in which the passOrder is packed (see passorder_pack). The item itself is not changed.
+def result_pack_item(item):
+    if "passOrder" not in item or passorder_is_packed(item["passOrder"]):
+        return item
+    packedItem = dict(item)
+    packedItem["passOrder"] = passorder_pack(item["passOrder"])
+    return packedItem
+
+
+# Purpose: Unpack the passOrder of a result item in place (see passorder_unpack).
+def result_unpack_item(item):
+    if "passOrder" in item and passorder_is_packed(item["passOrder"]):
+        item["passOrder"] = passorder_unpack(item["passOrder"])
+
+
+# Purpose: For internal use - Return a list of (test, fail, ran) for each test of a packed passOrder, where fail and ran are NumPy boolean arrays with one value per round.
+def passorder_bits(packed):
+    rounds = packed["rounds"]
+    testBits = []
+    for test in packed["fail"]:
+        fail = base64_to_bits(packed["fail"][test], rounds)
+        if test in packed["ran"]:
+            ran = base64_to_bits(packed["ran"][test], rounds)
+        else:
+            ran = np.ones(rounds, dtype=bool)
+        testBits.append((test, fail, ran))
+    return testBits
+
+
+# Purpose: For internal use - Convert a NumPy boolean array to a base64 string of its bits.
+def bits_to_base64(bits):
+    return base64.b64encode(np.packbits(bits, bitorder="little").tobytes()).decode("ascii")
+
+
+# Purpose: For internal use - Convert a base64 string of bits to a NumPy boolean array of the given length.
+def base64_to_bits(text, length):
+    packedBytes = np.frombuffer(base64.b64decode(text), dtype=np.uint8)
+    return np.unpackbits(packedBytes, count=length, bitorder="little").astype(bool)
@@ -0,0 +1,175 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+# Phase scan: find the sequence positions (modulo a modulus) whose deltas fail IID testing.
+#
+# Deltas in some sequence positions modulo m may behave differently to the others (e.g. every 4th delta includes an interrupt), 
+# which write_decimated_delete_file can remove with delIdx. phase_scan finds delIdx in one pass: the delta file is read once and split 
+# into the m residue streams (the deltas in sequence positions 0, 1, ..., m-1 modulo m, as write_decimated_file does with dec = m), 
+# and numTests rounds of IID testing are performed on every residue at the same time, in separate processes.
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decimate.deci import write_decimated_file, test_decimated_file, level_num_tests, failTable, unchanged
+from decimate.tracing import Tracer, trace_span
+
+
+# Purpose: For internal use - Perform the IID testing of one residue of a phase scan (in a worker process).
+# Parameters:
+#   residue_path: The file of the (converted, one byte) deltas of the residue, numTests * testSize deltas long.
+#   delta_path: The path of the delta file, recorded as the filename in the results.
+#   residue: The residue (sequence position modulo modulus) being tested.
+#   trace: When True, the stages of testing are traced (see decimate.tracing) and the spans are returned.
+#   The other parameters are as for phase_scan.
+# Return values: (testResults, spans)
+#   testResults: The values returned by test_decimated_file.
+#   spans: The list of spans recorded (see Tracer), or an empty list if trace is False.
+def test_residue(residue_path, delta_path, platform, modulus, residue, numTests, maxFails, testSize, failEarly, IIDtests, trace=False, roundCache=None):
+    tracer = Tracer() if trace else None
+    with tempfile.TemporaryDirectory(prefix="decimate_") as tempDir:
+        with trace_span(tracer, "level", dec=modulus, residue=residue, numTests=numTests):
+            testResults = test_decimated_file(residue_path, os.path.join(tempDir, "results.txt"), True, platform, modulus, numTests, maxFails, testSize, 
+                                              False, False, failEarly, IIDtests=IIDtests, temp_path=os.path.join(tempDir, "round_data.bin"), 
+                                              results=[], filename=delta_path, tracer=tracer, roundCache=roundCache)
+    return testResults, tracer.spans if trace else []
+
+
+# Purpose: Find the pass rate of the IID testing of the deltas in each sequence position modulo modulus, and suggest which positions to delete.
+# Parameters:
+#   delta_path: The path of the file containing the un-decimated deltas (which may be compressed, see decimate.compressed).
+#   modulus: The number of residues (sequence positions) to test, i.e. the dec to be passed to write_decimated_delete_file.
+#   numTests: The number of rounds of IID testing to perform on each residue. If there are insufficient deltas, fewer rounds are performed.
+#   maxFails: As for decimated_binary_search. A residue fails if any of the 22 individual IID tests fails more than maxFails(numTests) times.
+#   testSize: How many deltas are tested in each round.
+#   input_delta_bytes, convert_delta, byte_order, failEarly, IIDtests: As for decimated_binary_search.
+#   platform: A string that describes the data being tested, recorded in the result items.
+#   numWorkers: The number of residues tested at the same time, in separate processes. Leave as None for min(modulus, the number of CPUs).
+#             With numWorkers = 1, the residues are tested one at a time in this process.
+#             NOTE: convert_delta and maxFails must be defined at the top level of a module (not lambdas) so they can be sent to the worker processes.
+#   verbose: When True, print the result of each residue as it completes.
+#   tracer: A Tracer (see decimate.tracing) to record the time spent decimating the deltas and testing each residue ("level", with a residue attribute), 
+#             or None for no tracing.
+#   roundCache: As for decimated_binary_search (see decimate.roundcache). Repeating a phase scan of the same file with a round cache 
+#             uses the stored results of the rounds already tested.
+# Return value: A dictionary with keys:
+#   "modulus", "numTests", "testSize": As for the parameters (numTests is the number of rounds actually performed on each residue).
+#   "residues": A list with a dictionary for each residue, in order of residue, with keys:
+#       "residue": The sequence position modulo modulus.
+#       "roundPass", "roundTotal": How many rounds passed (all IID tests passed), and how many rounds were performed.
+#       "passRate": roundPass / roundTotal.
+#       "failed": True if the residue failed (see maxFails).
+#       "passList": As for a result item (see exampleResultItem), i.e. [passes, total] for each of the individual IID tests.
+#   "delIdx": The suggested delIdx for write_decimated_delete_file: the residues that failed. 
+#       If every residue failed, deleting positions modulo modulus does not help and delIdx is [].
+#   "allFailed": True if every residue failed.
+# E.g.
+#   scan = phase_scan("deltas.bin", modulus=4, numTests=20, testSize=1000000)
+#   if scan["delIdx"]:
+#       write_decimated_delete_file("deltas.bin", "deltas_deleted.bin", dec=4, delIdx=scan["delIdx"], delta_bytes=1)
+def phase_scan(delta_path, modulus=4, numTests=10, maxFails=failTable, testSize=1000000, input_delta_bytes=1, convert_delta=unchanged, 
+               byte_order='little', failEarly=False, IIDtests="", platform="", numWorkers=None, verbose=True, tracer=None, roundCache=None):
+    if modulus < 1:
+        raise Exception(f"Error in function phase_scan - \n\t\tmodulus = {modulus} \n\t\tmodulus must be at least 1.")
+
+    # Reduce the number of rounds per residue if there is insufficient data.
+    numTests = level_num_tests(delta_path, modulus, modulus*numTests, testSize, input_delta_bytes) // modulus
+    if numTests == 0:
+        raise Exception(f"Error in function phase_scan - \n\t\tdelta_path = {delta_path}; modulus = {modulus}; testSize = {testSize} "
+                        "\n\t\tThere are not enough deltas for one round of testing of each residue.")
+    if numWorkers is None:
+        numWorkers = min(modulus, os.cpu_count() or 1)
+
+    residueBytes = numTests * testSize
+    residueResults = {}
+    with tempfile.TemporaryDirectory(prefix="decimate_") as tempDir:
+        # Read the delta file once. With dec = modulus and numSets = modulus * numTests, write_decimated_file writes 
+        # the numTests sets of residue 0, then the numTests sets of residue 1, ... so each residue is split into its own file.
+        dec_path = os.path.join(tempDir, "decimated_data.bin")
+        write_decimated_file(delta_path, dec_path, modulus, modulus*numTests, testSize, convert_delta, False, input_delta_bytes, 1, byte_order, tracer)
+        residuePaths = [os.path.join(tempDir, f"residue_{residue}.bin") for residue in range(modulus)]
+        with open(dec_path, "rb") as dec_file:
+            for residue in range(modulus):
+                with open(residuePaths[residue], "wb") as residue_file:
+                    for testNum in range(numTests):
+                        residue_file.write(dec_file.read(testSize))
+        os.remove(dec_path)
+
+        residueArgs = [(residuePaths[residue], delta_path, platform, modulus, residue, numTests, maxFails, testSize, failEarly, IIDtests, tracer is not None, 
+                        roundCache) for residue in range(modulus)]
+        if verbose:
+            print(f"phase_scan - Testing {modulus} residues with {numTests} rounds of {testSize:,d} deltas each, {numWorkers} at a time.")
+        if numWorkers > 1:
+            with ProcessPoolExecutor(max_workers=numWorkers) as executor:
+                futures = {executor.submit(test_residue, *residueArgs[residue]): residue for residue in range(modulus)}
+                for future in as_completed(futures):
+                    residueResults[futures[future]] = future.result()
+                    if verbose:
+                        print_residue(futures[future], residueResults[futures[future]][0])
+        else:
+            for residue in range(modulus):
+                residueResults[residue] = test_residue(*residueArgs[residue])
+                if verbose:
+                    print_residue(residue, residueResults[residue][0])
+
+    # Add the spans recorded by the worker processes to the tracer.
+    if tracer is not None:
+        for residue in range(modulus):
+            tracer.merge(residueResults[residue][1])
+
+    residues = []
+    for residue in range(modulus):
+        failed, totalPasses, totals, roundPass, roundTotal, passOrder = residueResults[residue][0]
+        residues.append({"residue": residue, "roundPass": roundPass, "roundTotal": roundTotal, "passRate": roundPass/roundTotal if roundTotal else 0.0, 
+                         "failed": failed, "passList": {test: [totalPasses[test], totals[test]] for test in totals}})
+    failedResidues = [item["residue"] for item in residues if item["failed"]]
+    allFailed = len(failedResidues) == modulus
+    return {"modulus": modulus, "numTests": numTests, "testSize": testSize, "residues": residues, 
+            "delIdx": [] if allFailed else failedResidues, "allFailed": allFailed}
+
+
+# Purpose: For internal use - Print the result of testing one residue of a phase scan.
+def print_residue(residue, testResults):
+    failed, totalPasses, totals, roundPass, roundTotal, passOrder = testResults
+    print(f"phase_scan - Residue {residue}: {'FAILED' if failed else 'pass'} - rounds passed: {roundPass} / {roundTotal}")
+
+
+# Purpose: Print the results of a phase scan.
+# Parameters:
+#   scan: The dictionary returned by phase_scan.
+#   printTests: When True, also print the pass rate of each of the individual IID tests for each residue.
+# Return value: None
+def print_phase_scan(scan, printTests=False):
+    print(f"Phase scan modulo {scan['modulus']}: {scan['numTests']} rounds of {scan['testSize']:,d} deltas per residue.")
+    for item in scan["residues"]:
+        print(f"    Residue {item['residue']:>3}: {'FAILED' if item['failed'] else 'pass  '}  rounds passed {item['roundPass']:>4} / {item['roundTotal']:<4}"
+              f"  ({100*item['passRate']:.1f}%)")
+        if printTests:
+            for test in item["passList"]:
+                passes, total = item["passList"][test]
+                print(f"        {test}: {passes} / {total}")
+    if scan["allFailed"]:
+        print("    Every residue failed: deleting sequence positions modulo", scan["modulus"], "will not give IID data.")
+    elif scan["delIdx"]:
+        print("    Suggested delIdx for write_decimated_delete_file with dec =", scan["modulus"], ":", scan["delIdx"])
+    else:
+        print("    Every residue passed: no sequence positions need to be deleted.")
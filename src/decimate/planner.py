@@ -0,0 +1,287 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+# Runtime cost model and time estimates for decimation searches.
+#
+# calibrate_costs times the decimation of a few sets of deltas and a few rounds of IID testing on the current machine (using a Tracer),
+# and returns a CostModel with the time per delta decimated and the time per round of testing.
+# plan_search uses the cost model to predict the deltas and bytes read, the rounds of testing and the time taken by decimated_binary_search
+# or decimated_range_test, following the same search tree (init_search_tree), numTests reductions (level_num_tests) and failEarly rules as the search.
+# LiveETA is a Tracer observer that updates the estimate of the time remaining as the search runs.
+
+import os
+import time
+import datetime
+import tempfile
+from math import ceil
+from decimate.deci import write_decimated_file, test_decimated_file, init_search_tree, level_num_tests, failTable, unchanged
+from decimate.tracing import Tracer
+from decimate.compressed import delta_file_bytes
+
+
+# The stages (span names, see decimate.tracing) that are counted as decimation and as testing rounds.
+decimateStages = ["read", "convert", "decimated write"]
+roundStages = ["set write", "round cache", "iid_main", "json decode", "results write"]
+
+
+# The cost of decimation and testing on one machine.
+# Parameters:
+#   secondsPerDelta: The time taken by write_decimated_file per delta read from the delta file.
+#   secondsPerRound: The time taken by one round of test_decimated_file (writing the set, iid_main, decoding and writing the results) 
+#                    with testSize deltas per round.
+#   testSize: The number of deltas per round when secondsPerRound was measured.
+#   IIDtests: The IIDtests used when secondsPerRound was measured.
+class CostModel():
+    def __init__(self, secondsPerDelta, secondsPerRound, testSize, IIDtests=""):
+        self.secondsPerDelta = secondsPerDelta
+        self.secondsPerRound = secondsPerRound
+        self.testSize = testSize
+        self.IIDtests = IIDtests
+
+    def __repr__(self):
+        return (f"CostModel(secondsPerDelta={self.secondsPerDelta!r}, secondsPerRound={self.secondsPerRound!r}, "
+                f"testSize={self.testSize!r}, IIDtests={self.IIDtests!r})")
+
+    # Return the estimated time for one round of testing with testSize deltas.
+    # The time is assumed to be proportional to testSize, so the estimate is best when testSize is the calibrated testSize.
+    def round_seconds(self, testSize):
+        return self.secondsPerRound * testSize / self.testSize
+
+    # Return the estimated time to decimate numDeltas deltas and run numRounds rounds of testSize deltas.
+    def level_seconds(self, numDeltas, numRounds, testSize):
+        return numDeltas * self.secondsPerDelta + numRounds * self.round_seconds(testSize)
+
+
+# Purpose: Measure the cost of decimation and testing on the current machine with short probe runs.
+# Parameters:
+#   delta_path: The path of the file containing the un-decimated deltas (at least probeSets*testSize deltas are needed).
+#   testSize: How many deltas are tested in each IID test.
+#   input_delta_bytes, convert_delta, byte_order, IIDtests: As for decimated_binary_search.
+#   probeSets: How many sets of testSize deltas to decimate.
+#   probeRounds: How many rounds of IID testing to run (no more than probeSets).
+#   verbose: When True, print the measured costs.
+# Return value:
+#   A CostModel with the measured costs.
+#   NOTE: The cost of writing the results is measured with an empty results list. Writing a large JSON results file takes longer 
+#         (use a ".jsonl" or ".sqlite" results_path, see "Results backends", to keep it small).
+def calibrate_costs(delta_path, testSize=1000000, input_delta_bytes=1, convert_delta=unchanged, byte_order='little', IIDtests="", 
+                    probeSets=2, probeRounds=1, verbose=False):
+    probeSets = min(probeSets, delta_file_bytes(delta_path) // input_delta_bytes // testSize)
+    probeRounds = min(probeRounds, probeSets)
+    if probeRounds < 1:
+        raise Exception(f"calibrate_costs: ERROR: {delta_path} has fewer than testSize = {testSize} deltas.")
+
+    tracer = Tracer()
+    with tempfile.TemporaryDirectory(prefix="decimate_") as tempDir:
+        dec_path = os.path.join(tempDir, "decimated_data.bin")
+        write_decimated_file(delta_path, dec_path, 1, probeSets, testSize, convert_delta, False, input_delta_bytes, 1, byte_order, tracer)
+        test_decimated_file(dec_path, os.path.join(tempDir, "results.txt"), True, "calibration", 1, probeRounds, failTable, testSize, 
+                            False, False, False, IIDtests=IIDtests, temp_path=os.path.join(tempDir, "round_data.bin"), results=[], tracer=tracer)
+
+    summary = tracer.summary()
+    decimateSeconds = sum(summary[name]["seconds"] for name in decimateStages if name in summary)
+    roundSeconds = sum(summary[name]["seconds"] for name in roundStages if name in summary)
+    costModel = CostModel(decimateSeconds / (probeSets*testSize), roundSeconds / probeRounds, testSize, IIDtests)
+    if verbose:
+        print(f"calibrate_costs - {costModel.secondsPerDelta*1e9:.1f} ns per delta decimated, {costModel.secondsPerRound:.3f} s per round of "
+              f"{testSize:,d} deltas ({probeSets} sets decimated, {probeRounds} rounds tested).")
+    return costModel
+
+
+# Purpose: For internal use - Find the levels tested by a search, and whether each passes, when every level >= passLevel passes 
+#          and every level below passLevel fails.
+# Parameters:
+#   search: "binary" for decimated_binary_search, or "range" for decimated_range_test.
+#   maxDec, minDec, dec_multiplier: As for decimated_binary_search.
+#   passLevel: The lowest passing decimation level (larger than maxDec if no level passes).
+#   levelTests: A function returning the number of rounds of testing of a decimation level (including any dec_multiplier).
+#   searchTree: The (tree, root) of a binary search, from init_search_tree with the levels divided by dec_multiplier.
+#             If None, the tree of the "binary" strategy is used.
+# Return value:
+#   A list of [dec, passed] for the levels tested, in the order tested (dec includes any dec_multiplier).
+def search_path(search, maxDec, minDec, dec_multiplier, passLevel, levelTests, searchTree=None):
+    if search == "range":
+        return [[dec*dec_multiplier, dec*dec_multiplier >= passLevel] 
+                for dec in range(maxDec//dec_multiplier, max(ceil(minDec/dec_multiplier) - 1, 0), -1)]
+    if searchTree is None:
+        searchTree = init_search_tree("binary", maxDec//dec_multiplier, ceil(minDec/dec_multiplier))
+    tree, dec = searchTree
+    path = []
+    tested = set()
+    # As in decimated_binary_search, the search ends when it reaches a level that was already tested.
+    # A level with no data for testing is recorded without testing, and the search continues as if it passed.
+    while dec not in tested:
+        tested.add(dec)
+        passed = dec*dec_multiplier >= passLevel or levelTests(dec*dec_multiplier) == 0
+        path.append([dec*dec_multiplier, passed])
+        dec = tree[dec].right if passed else tree[dec].left
+    return path
+
+
+# Purpose: Predict the deltas and bytes read, the rounds of testing and the time taken by decimated_binary_search or decimated_range_test.
+# Parameters:
+#   delta_path: The path of the file containing the un-decimated deltas (used to find how many rounds each level can be tested for).
+#   costModel: A CostModel, e.g. from calibrate_costs.
+#   maxDec, minDec, numTestsRequested, maxFails, testSize, dec_multiplier, input_delta_bytes, failEarly: As for decimated_binary_search.
+#   search: "binary" for decimated_binary_search, or "range" for decimated_range_test.
+#   strategy: The strategy of a binary search, as for decimated_binary_search. The "cost" strategy uses the costs of costModel.
+#   passLevel: The expected lowest passing decimation level, or None if it is not known.
+#             The levels tested by a binary search, and the rounds of failing levels when failEarly is True, depend on which levels pass.
+#             Every level >= passLevel is assumed to pass and every level below it to fail.
+# Return value: A dictionary with the prediction for passLevel, or for the longest search (over all lowest passing levels) if passLevel is None:
+#   "path": A list with a dictionary for each level tested, in the order tested: 
+#           {"dec", "passed", "numTests", "rounds", "deltasRead", "bytesRead", "seconds"}
+#   "deltasRead": The deltas read from delta_path by write_decimated_file.
+#   "bytesRead": The bytes read from delta_path and from the decimated files tested.
+#   "rounds": The rounds of testing.
+#   "seconds": The estimated time taken.
+#   "passLevel": The lowest passing level of the prediction (None if no level passes).
+#   "bestSeconds", "meanSeconds", "worstSeconds": The shortest, mean and longest time over all lowest passing levels in minDec to maxDec 
+#           (or none passing), each being equally likely.
+#   "secondsPerDelta", "secondsPerRound", "input_delta_bytes": The costs used (for LiveETA).
+#   NOTE: Failing levels are assumed to fail every round, so with failEarly they are tested for maxFails(numTests)+1 rounds.
+#   NOTE: The prediction is for numWorkers = 1, without resume or reuseResults.
+def plan_search(delta_path, costModel, maxDec=200, minDec=1, numTestsRequested=1, maxFails=failTable, testSize=1000000, dec_multiplier=1, 
+                input_delta_bytes=1, failEarly=False, search="binary", passLevel=None, strategy="binary"):
+    numTestsCache = {}
+    def levelTests(dec):
+        if dec not in numTestsCache:
+            numTestsCache[dec] = level_num_tests(delta_path, dec, numTestsRequested, testSize, input_delta_bytes)
+        return numTestsCache[dec]
+
+    def levelCost(level):
+        dec = level * dec_multiplier
+        numTests = levelTests(dec)
+        return costModel.level_seconds(ceil(numTests/dec) * dec * testSize if numTests > 0 else 0, numTests, testSize)
+
+    # The tree is only built once, since the "cost" strategy takes a while for a large range of levels.
+    searchTree = None
+    if search == "binary":
+        searchTree = init_search_tree(strategy, maxDec//dec_multiplier, ceil(minDec/dec_multiplier), levelCost)
+
+    def predict(levelPassLevel):
+        path = []
+        for dec, passed in search_path(search, maxDec, minDec, dec_multiplier, levelPassLevel, levelTests, searchTree):
+            numTests = levelTests(dec)
+            rounds = numTests
+            if failEarly and not passed:
+                rounds = min(numTests, maxFails(numTests) + 1)
+            # write_decimated_file reads all the deltas for numTests sets, even if testing stops early.
+            deltasRead = ceil(numTests/dec) * dec * testSize if numTests > 0 else 0
+            path.append({"dec": dec, "passed": passed, "numTests": numTests, "rounds": rounds, "deltasRead": deltasRead, 
+                         "bytesRead": deltasRead*input_delta_bytes + rounds*testSize, 
+                         "seconds": costModel.level_seconds(deltasRead, rounds, testSize)})
+        return {"path": path, 
+                "deltasRead": sum(level["deltasRead"] for level in path), 
+                "bytesRead": sum(level["bytesRead"] for level in path), 
+                "rounds": sum(level["rounds"] for level in path), 
+                "seconds": sum(level["seconds"] for level in path), 
+                "passLevel": levelPassLevel if levelPassLevel <= maxDec else None}
+
+    # Each possible lowest passing level (or none passing).
+    passLevels = list(range(ceil(minDec/dec_multiplier)*dec_multiplier, maxDec+1, dec_multiplier)) + [maxDec+1]
+    predictions = [predict(level) for level in passLevels]
+    if passLevel is None:
+        plan = max(predictions, key=lambda prediction: prediction["seconds"])
+    else:
+        plan = predict(passLevel)
+    seconds = [prediction["seconds"] for prediction in predictions]
+    plan["bestSeconds"] = min(seconds)
+    plan["meanSeconds"] = sum(seconds) / len(seconds)
+    plan["worstSeconds"] = max(seconds)
+    plan["secondsPerDelta"] = costModel.secondsPerDelta
+    plan["secondsPerRound"] = costModel.round_seconds(testSize)
+    plan["input_delta_bytes"] = input_delta_bytes
+    return plan
+
+
+# Purpose: For internal use - format a number of seconds as hours:minutes:seconds.
+def format_seconds(seconds):
+    return str(datetime.timedelta(seconds=round(seconds)))
+
+
+# Purpose: Print a plan returned by plan_search.
+# Parameters:
+#   plan: The dictionary returned by plan_search.
+#   printPath: When True, print the prediction for each level tested.
+def print_plan(plan, printPath=True):
+    if printPath:
+        print(f"{'dec':>8} {'result':>7} {'numTests':>9} {'rounds':>7} {'deltas read':>16} {'time':>12}")
+        for level in plan["path"]:
+            print(f"{level['dec']:8,d} {'pass' if level['passed'] else 'FAIL':>7} {level['numTests']:9d} {level['rounds']:7d} "
+                  f"{level['deltasRead']:16,d} {format_seconds(level['seconds']):>12}")
+    print(f"Lowest passing level: {plan['passLevel']} | Levels tested: {len(plan['path'])} | Rounds: {plan['rounds']:,d} | "
+          f"Deltas read: {plan['deltasRead']:,d} | Bytes read: {plan['bytesRead']:,d}")
+    print(f"Estimated time: {format_seconds(plan['seconds'])} (best {format_seconds(plan['bestSeconds'])}, "
+          f"mean {format_seconds(plan['meanSeconds'])}, worst {format_seconds(plan['worstSeconds'])})")
+
+
+# A Tracer observer (see decimate.tracing) that estimates the time remaining while a search runs.
+# The work remaining is the work in the plan (from plan_search) less the deltas decimated and rounds tested so far.
+# Once some deltas have been decimated and some rounds tested, their measured times are used instead of the planned costs.
+# Parameters:
+#   plan: The dictionary returned by plan_search.
+#   verbose: When True, print the estimate after every printEvery rounds.
+#   printEvery: How often to print the estimate (in rounds).
+# E.g.
+#   eta = LiveETA(plan_search(delta_path, calibrate_costs(delta_path), ...))
+#   decimated_binary_search(delta_path, ..., tracer=Tracer([eta], record=False))
+class LiveETA():
+    def __init__(self, plan, verbose=True, printEvery=1):
+        self.plan = plan
+        self.verbose = verbose
+        self.printEvery = printEvery
+        self.startTime = time.time()
+        self.deltasDone = 0
+        self.roundsDone = 0
+        self.decimateSeconds = 0.0
+        self.roundSeconds = 0.0
+
+    def __call__(self, span):
+        name = span["name"]
+        if name in decimateStages:
+            self.decimateSeconds += span["duration"]
+            if name == "convert":
+                self.deltasDone += span["attrs"].get("bytes", 0) // self.plan["input_delta_bytes"]
+        # The results written at the end of each level are not part of a round.
+        elif name in roundStages and "round" in span["attrs"]:
+            self.roundSeconds += span["duration"]
+            # A round whose result was found in the round cache does not run iid_main.
+            if name == "iid_main" or (name == "round cache" and span["attrs"].get("hit")):
+                self.roundsDone += 1
+                if self.verbose and self.roundsDone % self.printEvery == 0:
+                    print(self.status(), flush=True)
+
+    # Return the estimated time remaining in seconds.
+    def remaining_seconds(self):
+        secondsPerDelta = self.decimateSeconds / self.deltasDone if self.deltasDone > 0 else self.plan["secondsPerDelta"]
+        secondsPerRound = self.roundSeconds / self.roundsDone if self.roundsDone > 0 else self.plan["secondsPerRound"]
+        return (max(self.plan["deltasRead"] - self.deltasDone, 0) * secondsPerDelta + 
+                max(self.plan["rounds"] - self.roundsDone, 0) * secondsPerRound)
+
+    # Return a one line status message with the progress and the estimated time remaining.
+    def status(self):
+        remaining = self.remaining_seconds()
+        finish = datetime.datetime.now() + datetime.timedelta(seconds=remaining)
+        return (f"ETA - rounds {self.roundsDone:,d} / {self.plan['rounds']:,d}, deltas decimated {self.deltasDone:,d} / {self.plan['deltasRead']:,d}"
+                f" | elapsed {format_seconds(time.time() - self.startTime)}, remaining about {format_seconds(remaining)}"
+                f", finishing about {finish.strftime('%Y-%m-%d %H:%M:%S')}")
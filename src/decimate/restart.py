@@ -0,0 +1,166 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+# Restart testing (SP 800-90B Section 3.1.4) of a restart matrix held in memory, using restart_main and transpose from stats90b.
+#
+# A restart matrix holds the samples of 1000 restarts of the noise source, 1000 samples per restart, one restart per row (the "row dataset").
+# restart_main runs the restart sanity check and validation test of NIST's ea_restart in-process on a buffer, transposing the matrix into
+# the "column dataset" in memory, so the matrix does not need to be written to a file, transposed by ea_transpose and read back.
+#   - restart_matrix reads a restart matrix from a file of deltas (decompressing it if it is compressed), as non_iid_samples does.
+#   - restart_columns returns the column dataset (the transpose of the matrix), e.g. to assess it with non_iid_assess.
+#   - restart_assess runs the restart tests on the matrix, with the non-IID estimators of the rows and columns in parallel by default, and returns their results.
+#   - restart_passed and restart_min_entropy return whether the matrix passed and min(H_r, H_c, H_I) from the results.
+#
+# NOTE: As with iid_main, restart_main prints its usage and exits the process when it is given invalid arguments,
+#       so restart_assess checks the arguments first and raises an Exception instead.
+#       Data that fails the restart tests (or cannot be tested) is reported in the results, with errorLevel -1 and an errorMessage.
+
+import os
+import json
+import numpy as np
+from stats90b import restart_main, transpose
+from decimate.deci import unchanged
+from decimate.noniid import non_iid_samples
+
+
+# The shape of a restart matrix: the number of restarts (rows) and the number of samples per restart (columns).
+restartShape = (1000, 1000)
+
+# The minimum (and default) number of simulation rounds used by restart_main to establish the sanity check cutoff.
+minSimulationRounds = 5000000
+
+
+# Purpose: Read a restart matrix from a file of deltas.
+# Parameters:
+#       in_path: File containing the deltas, with the deltas of each restart following those of the previous restart.
+#                The file is decompressed as it is read if it is compressed (.gz, .bz2 or .xz, see decimate.compressed).
+#       convert_delta: The function to convert each delta to a sample (e.g. mod_256). The converted samples must fit in one byte.
+#       input_delta_bytes: The number of bytes in each delta: 1, 2, 4 or 8.
+#       byte_order: The byte order of the deltas (e.g. 'little').
+#       index: Read the index'th restart matrix in the file (0 for the first), as ea_transpose -l <index> does.
+# Return value: A NumPy array (uint8) of shape restartShape, with one restart per row, which may be passed to restart_assess.
+def restart_matrix(in_path, convert_delta=unchanged, input_delta_bytes=1, byte_order='little', index=0):
+    if index < 0:
+        raise Exception(f"Error in function restart_matrix - \n\t\tindex = {index} \n\t\tindex must be at least 0.")
+
+    matrixSize = restartShape[0] * restartShape[1]
+    samples = non_iid_samples(in_path, numSamples=(index + 1)*matrixSize, convert_delta=convert_delta,
+                              input_delta_bytes=input_delta_bytes, byte_order=byte_order)
+    return samples[index*matrixSize:].reshape(restartShape)
+
+
+# Purpose: For internal use - Check a restart matrix and return it as a contiguous buffer of samples that stats90b can read.
+# Parameters:
+#       matrix: The restart matrix: a NumPy array of uint8 of shape restartShape, or bytes, bytearray or memoryview of its samples row by row.
+#       functionName: The name of the calling function, for error messages.
+# Return value: The samples of the matrix, row by row, as a contiguous NumPy array of uint8.
+def restart_buffer(matrix, functionName):
+    if isinstance(matrix, np.ndarray):
+        if matrix.dtype != np.uint8:
+            raise Exception(f"Error in function {functionName} - \n\t\tmatrix.dtype = {matrix.dtype} \n\t\tThe samples must be one byte each (uint8).")
+        if matrix.ndim != 1 and matrix.shape != restartShape:
+            raise Exception(f"Error in function {functionName} - \n\t\tmatrix.shape = {matrix.shape} \n\t\tThe matrix must have shape {restartShape}: one restart per row.")
+        samples = np.ascontiguousarray(matrix).reshape(-1)
+    else:
+        samples = np.frombuffer(matrix, dtype=np.uint8)
+
+    if len(samples) != restartShape[0] * restartShape[1]:
+        raise Exception(f"Error in function {functionName} - \n\t\tThe matrix has {len(samples)} samples "
+                        f"\n\t\tThe matrix must have {restartShape[0]} restarts of {restartShape[1]} samples.")
+    return samples
+
+
+# Purpose: Transpose a restart matrix into the column dataset (SP 800-90B Section 3.1.4.1), using transpose from stats90b.
+# Parameters:
+#       matrix: The restart matrix: a NumPy array of uint8 of shape restartShape, or bytes, bytearray or memoryview of its samples row by row.
+# Return value: A NumPy array (uint8) of shape restartShape, whose i'th row is the i'th sample of every restart.
+#       Its samples, row by row, are those ea_transpose writes to its output file.
+def restart_columns(matrix):
+    samples = restart_buffer(matrix, "restart_columns")
+    columns = transpose(samples, restartShape[0], restartShape[1])
+    return np.frombuffer(columns, dtype=np.uint8).reshape(restartShape[1], restartShape[0])
+
+
+# Purpose: Run the restart tests of restart_main from stats90b on a restart matrix held in memory.
+# Parameters:
+#       matrix: The restart matrix: a NumPy array of uint8 of shape restartShape (e.g. from restart_matrix),
+#               or bytes, bytearray or memoryview of its samples row by row. Or the path of a file of 1-byte samples, which is read with restart_matrix.
+#       hInitial: The initial entropy estimate H_I of the samples (e.g. from non_iid_min_entropy).
+#       iid: If True, the samples are IID (-i): the rows and columns are assessed with the Most Common Value estimate and tested with the IID tests.
+#            Otherwise (-n), the rows and columns are assessed with the non-IID estimators.
+#       bitsPerSymbol: The number of bits per symbol (1 to 8), or None to infer it from the data.
+#       simulationRounds: The number of simulation rounds used to establish the sanity check cutoff (-s), at least minSimulationRounds,
+#            or None for the default of minSimulationRounds.
+#       parallel: If True, run the non-IID estimators on the rows and columns in parallel (-p). The results are the same either way.
+#       verbose: If True, print the output of restart_main; otherwise run it in quiet mode (-q).
+# Return value: The results of restart_main as a dictionary. results["errorLevel"] is 0 if the matrix passed the sanity check and validation test,
+#       and -1 otherwise, with the reason in results["errorMessage"] (see restart_passed). results["testCases"] is a list with a dictionary
+#       for each estimate ("testCaseDesc", with "h_r" for the rows and "h_c" for the columns), followed by the "Overall" test case
+#       with "h_r", "h_c" and "h_i" (see restart_min_entropy). The Overall test case is missing if the sanity check failed.
+def restart_assess(matrix, hInitial, iid=False, bitsPerSymbol=None, simulationRounds=None, parallel=True, verbose=False):
+    if isinstance(matrix, (str, os.PathLike)):
+        matrix = restart_matrix(matrix)
+    samples = restart_buffer(matrix, "restart_assess")
+
+    # Check the arguments that restart_main would exit on.
+    if hInitial < 0:
+        raise Exception(f"Error in function restart_assess - \n\t\thInitial = {hInitial} \n\t\thInitial must be nonnegative.")
+    if bitsPerSymbol is not None and not (1 <= bitsPerSymbol <= 8):
+        raise Exception(f"Error in function restart_assess - \n\t\tbitsPerSymbol = {bitsPerSymbol} \n\t\tbitsPerSymbol must be between 1 and 8.")
+    if bitsPerSymbol is not None and samples.max() >= (1 << bitsPerSymbol):
+        raise Exception(f"Error in function restart_assess - \n\t\tbitsPerSymbol = {bitsPerSymbol}; sample = {samples.max()} \n\t\tThe samples must fit in bitsPerSymbol bits.")
+    if simulationRounds is not None and simulationRounds < minSimulationRounds:
+        raise Exception(f"Error in function restart_assess - \n\t\tsimulationRounds = {simulationRounds} \n\t\tsimulationRounds must be at least {minSimulationRounds}.")
+
+    # Get ready the arguments to pass to restart_main. The matrix is passed as a buffer, so there is no file name.
+    argStr = "" if verbose else "-q "
+    argStr += "-i " if iid else "-n "
+    if simulationRounds is not None:
+        argStr += f"-s {simulationRounds} "
+    if parallel:
+        argStr += "-p "
+    if bitsPerSymbol is not None:
+        argStr += f"{bitsPerSymbol} "
+    argStr += repr(float(hInitial))
+
+    return json.loads(restart_main(argStr, samples))
+
+
+# Purpose: Find whether a restart matrix passed the restart tests, from the results of restart_assess.
+# Parameters:
+#       results: The results returned by restart_assess.
+# Return value: True if the matrix passed the sanity check and validation test, and False otherwise.
+def restart_passed(results):
+    return results["errorLevel"] == 0
+
+
+# Purpose: Find the validated entropy estimate in the results of restart_assess.
+# Parameters:
+#       results: The results returned by restart_assess, which must have passed (see restart_passed).
+# Return value: min(H_r, H_c, H_I), the validated entropy assessment per sample (or the value used to derive h_in if conditioning is used).
+def restart_min_entropy(results):
+    if not restart_passed(results):
+        raise Exception(f"Error in function restart_min_entropy - \n\t\t{results.get('errorMessage')} \n\t\tThe restart tests did not pass.")
+    for testCase in results["testCases"]:
+        if testCase["testCaseDesc"] == "Overall":
+            return min(testCase["h_r"], testCase["h_c"], testCase["h_i"])
+    raise Exception(f"Error in function restart_min_entropy - \n\t\tThe results have no Overall test case.")
@@ -0,0 +1,259 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+# ResultStore: an indexed list of results for fast queries over large histories of results.
+#
+# The functions in decimate.deci scan the whole list of results for each query. A ResultStore holds the same list of result items
+# (same format as exampleResultsList in decimate.deci), and keeps indexes by platform, filename, decimation level and datestamp,
+# so that queries by platform, level and date range only look at the matching items.
+# A ResultStore may be passed in place of a list of results to result_sort, result_datestamp_range, result_print, result_min_pass_level and result_write.
+
+from bisect import bisect_left, bisect_right
+from decimate.deci import failTable, result_outcome, result_sort_key, result_date_bounds
+
+
+# A list of results with indexes by platform, filename, decimation level and datestamp.
+# Items are added with append or extend, and may be removed with pop. Other changes to the list (e.g. assigning to an index or slice) are supported,
+# but cause the indexes to be rebuilt at the next query.
+# NOTE: Items must not be modified in place after they are added (replace them instead, as result_overwrite_last does), since the indexes would not be updated.
+# Parameters:
+#   results: A list of results to store (same format as exampleResultsList). The list is copied; the items are not.
+# Attributes:
+#   items: The list of result items, in the order they were added.
+class ResultStore():
+    def __init__(self, results=None):
+        self.items = []
+        self.reindex()
+        if results is not None:
+            self.extend(results)
+
+    # Clear the indexes and rebuild them from self.items.
+    def reindex(self):
+        # platformIndex[platform][dec] is the list of positions in self.items of the items for that platform and decimation level.
+        self.platformIndex = {}
+        # filenameIndex[filename] is the list of positions in self.items of the items for that filename.
+        self.filenameIndex = {}
+        # decIndex[dec] is the list of positions in self.items of the items for that decimation level.
+        self.decIndex = {}
+        # dateKeys holds the datestamps in sorted order, and datePositions the position in self.items of each of them.
+        self.dateKeys = []
+        self.datePositions = []
+        # sortKeys holds result_sort_key of each item, and sortedOrder the positions of the items in sorted order (None until it is needed).
+        self.sortKeys = []
+        self.sortedOrder = None
+        self.dirty = False
+        items = self.items
+        self.items = []
+        for item in items:
+            self.append(item)
+
+    # Rebuild the indexes if the list was changed other than by append, extend or pop.
+    def check_index(self):
+        if self.dirty:
+            self.reindex()
+
+    def append(self, item):
+        self.check_index()
+        position = len(self.items)
+        self.items.append(item)
+        self.platformIndex.setdefault(item["platform"], {}).setdefault(item["dec"], []).append(position)
+        self.filenameIndex.setdefault(item["filename"], []).append(position)
+        self.decIndex.setdefault(item["dec"], []).append(position)
+        datePosition = bisect_right(self.dateKeys, item["datestamp"])
+        self.dateKeys.insert(datePosition, item["datestamp"])
+        self.datePositions.insert(datePosition, position)
+        self.sortKeys.append(result_sort_key(item))
+        self.sortedOrder = None
+
+    def extend(self, results):
+        for item in results:
+            self.append(item)
+
+    def pop(self, index=-1):
+        self.check_index()
+        if index != -1 and index != len(self.items) - 1:
+            self.dirty = True
+            return self.items.pop(index)
+        item = self.items.pop()
+        position = len(self.items)
+        decPositions = self.platformIndex[item["platform"]][item["dec"]]
+        decPositions.pop()
+        if len(decPositions) == 0:
+            del self.platformIndex[item["platform"]][item["dec"]]
+            if len(self.platformIndex[item["platform"]]) == 0:
+                del self.platformIndex[item["platform"]]
+        for keyIndex, key in ((self.filenameIndex, item["filename"]), (self.decIndex, item["dec"])):
+            keyIndex[key].pop()
+            if len(keyIndex[key]) == 0:
+                del keyIndex[key]
+        # The last item has the largest position, so it is the last of the positions with its datestamp.
+        datePosition = bisect_right(self.dateKeys, item["datestamp"]) - 1
+        while self.datePositions[datePosition] != position:
+            datePosition -= 1
+        del self.dateKeys[datePosition]
+        del self.datePositions[datePosition]
+        self.sortKeys.pop()
+        self.sortedOrder = None
+        return item
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __setitem__(self, index, value):
+        self.items[index] = value
+        self.dirty = True
+
+    def __delitem__(self, index):
+        del self.items[index]
+        self.dirty = True
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def copy(self):
+        return ResultStore(self.items)
+
+    # Sort the items in place in the same order as result_sort.
+    def sort(self):
+        self.items[:] = self.sorted_items()
+        self.reindex()
+
+    # Return a list of the items in the same order as result_sort, without changing the order of the store.
+    def sorted_items(self):
+        self.check_index()
+        if self.sortedOrder is None:
+            self.sortedOrder = sorted(range(len(self.items)), key=self.sortKeys.__getitem__)
+        return [self.items[i] for i in self.sortedOrder]
+
+    # Return the sorted list of platforms in the store.
+    def platforms(self):
+        self.check_index()
+        return sorted(self.platformIndex)
+
+    # Return the positions in self.items of the items with datestamps in dateRange (same format as for result_datestamp_range), in sorted order.
+    def date_positions(self, dateRange):
+        startDate, endDate = result_date_bounds(dateRange)
+        if startDate == "earliest":
+            first = 0
+        else:
+            first = bisect_left(self.dateKeys, startDate)
+        last = bisect_right(self.dateKeys, endDate)
+        return sorted(self.datePositions[first:last])
+
+    # Return a list of the items with datestamps in dateRange, in the order they were added (the same items as result_datestamp_range).
+    def datestamp_range(self, dateRange):
+        self.check_index()
+        return [self.items[i] for i in self.date_positions(dateRange)]
+
+    # Return a list of the items matching all of the given conditions.
+    # Parameters:
+    #   platformList: A list of platforms to select. If platformList == [], all platforms are selected.
+    #   dateRange: As for result_datestamp_range.
+    #   filename: If not None, select only items with this filename.
+    #   dec: If not None, select only items with this decimation level.
+    #   sort: When True, the items are returned in the same order as result_sort; otherwise in the order they were added.
+    def select(self, platformList=[], dateRange=["",""], filename=None, dec=None, sort=False):
+        self.check_index()
+        # Start from the smallest index that applies, then check the remaining conditions on each item.
+        candidates = []
+        if len(platformList) > 0:
+            positions = []
+            for platform in set(platformList):
+                for decPositions in self.platformIndex.get(platform, {}).values():
+                    positions += decPositions
+            candidates.append(positions)
+        if filename is not None:
+            candidates.append(self.filenameIndex.get(filename, []))
+        if dec is not None:
+            candidates.append(self.decIndex.get(dec, []))
+        if dateRange[0] not in ("", "earliest") or dateRange[1] not in ("", "latest") or len(candidates) == 0:
+            candidates.append(self.date_positions(dateRange))
+        positions = sorted(min(candidates, key=len))
+
+        startDate, endDate = result_date_bounds(dateRange)
+        selected = []
+        for i in positions:
+            item = self.items[i]
+            if len(platformList) > 0 and item["platform"] not in platformList:
+                continue
+            if filename is not None and item["filename"] != filename:
+                continue
+            if dec is not None and item["dec"] != dec:
+                continue
+            if (startDate != "earliest" and item["datestamp"] < startDate) or item["datestamp"] > endDate:
+                continue
+            selected.append(i)
+        if sort:
+            selected.sort(key=self.sortKeys.__getitem__)
+        return [self.items[i] for i in selected]
+
+    # Return the minimum passing decimation levels for each platform.
+    # Parameters: maxFails, minTests, checkLowRounds, platformList and dateRange are as for result_min_pass_level.
+    # Return value: passLevels
+    #   passLevels[platform] = [passLevel, passStarLevel] as returned by result_min_pass_level for that platform alone.
+    # NOTE: Levels are checked from the lowest decimation level up, so only the items for levels up to the minimum passing level are checked.
+    def min_pass_levels(self, maxFails=failTable, minTests=1, checkLowRounds=True, platformList=[], dateRange=["",""]):
+        self.check_index()
+        startDate, endDate = result_date_bounds(dateRange)
+        if len(platformList) == 0:
+            platformList = self.platforms()
+        passLevels = {}
+        for platform in platformList:
+            passingDecLevel = None
+            passingStarDecLevel = None
+            decPositions = self.platformIndex.get(platform, {})
+            for dec in sorted(decPositions):
+                for i in decPositions[dec]:
+                    item = self.items[i]
+                    if (startDate != "earliest" and item["datestamp"] < startDate) or item["datestamp"] > endDate:
+                        continue
+                    # Skip items as result_min_pass_level does.
+                    if not checkLowRounds and item["roundTotal"] < minTests:
+                        continue
+                    if item["roundTotal"]==0 or len(item["passList"]) == 0:
+                        continue
+                    if sum(test[1] for test in item["passList"].values()) == 0:
+                        continue
+                    outcome, needStarMessage = result_outcome(self.items, i, minTests, testID="", maxFails=maxFails)
+                    if outcome == "pass" and passingDecLevel is None:
+                        passingDecLevel = dec
+                    if outcome in ("pass", "pass *") and passingStarDecLevel is None:
+                        passingStarDecLevel = dec
+                # A passing level is also a pass * level, so no lower levels remain to be found.
+                if passingDecLevel is not None:
+                    break
+            passLevels[platform] = [passingDecLevel, passingStarDecLevel]
+        return passLevels
+
+    # Return the minimum passing decimation levels over all the platforms in platformList, as result_min_pass_level does.
+    def min_pass_level(self, maxFails=failTable, minTests=1, checkLowRounds=True, platformList=[], dateRange=["",""]):
+        passLevels = self.min_pass_levels(maxFails, minTests, checkLowRounds, platformList, dateRange)
+        levels = []
+        for j in range(2):
+            platformLevels = [passLevels[platform][j] for platform in passLevels if passLevels[platform][j] is not None]
+            if len(platformLevels) == 0:
+                levels.append(None)
+            else:
+                levels.append(min(platformLevels))
+        return levels
@@ -0,0 +1,276 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+# Content-addressed cache of the results of IID testing rounds.
+#
+# The same set of deltas is often tested more than once: by overlapping searches of the same delta file, when a search is rerun after a crash,
+# or by several people testing the same capture. A round cache stores the result string returned by iid_main for each set tested, 
+# under a key made from a hash of the set's bytes and the iid_main arguments (which include any -S seed), so that test_decimated_file 
+# can use the stored result instead of calling iid_main again.
+#   - RoundCacheFile: a JSON-lines file, used for cache paths ending in anything other than the SQLite extensions. 
+#   - RoundCacheSQLite: an SQLite database, used for cache paths ending in ".sqlite", ".sqlite3" or ".db". Best when the cache is shared by many processes.
+# Both keep at most maxEntries results, evicting the least recently used ("lru") or the oldest ("fifo") results first.
+#
+# NOTE: Without -S <seed>, the permutation tests of iid_main are randomised, and a cached result would be the result of one earlier run.
+#       So by default (requireSeed=True), a cache is only used for the rounds whose results are reproducible (seeded, or without the permutation tests):
+#       the results of other rounds are neither looked up nor stored. Use requireSeed=False to also replay the results of unseeded rounds.
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from decimate.backends import JournalLock
+
+
+# The eviction policies of the round caches.
+roundCacheEvictions = ["lru", "fifo"]
+
+
+# Purpose: Find the cache key of a round of testing.
+# Parameters:
+#   data: The bytes of the set of deltas tested.
+#   IIDtests: The arguments passed to iid_main (other than -q and the file name).
+# Return value:
+#   The key: the BLAKE2b hash of data (128 bits, in hex), its length and the arguments, normalised so that the spacing of the arguments does not matter.
+def round_cache_key(data, IIDtests):
+    arguments = " ".join(IIDtests.split())
+    return f"{hashlib.blake2b(data, digest_size=16).hexdigest()}:{len(data)}:{arguments}"
+
+
+# Purpose: For internal use - Return True if the results of iid_main with the arguments IIDtests are reproducible:
+#          the permutation tests are seeded with -S, or are not run.
+def round_cache_seeded(IIDtests):
+    tokens = IIDtests.split()
+    if "-S" in tokens or any(token.startswith("-S") and len(token) > 2 for token in tokens):
+        return True
+    runOpts = [tokens[i+1] for i in range(len(tokens) - 1) if tokens[i] == "-r"] + [token[2:] for token in tokens if token.startswith("-r") and len(token) > 2]
+    runs = [opt for opt in runOpts if opt in ("chi1", "chi2", "LRS", "perm", "all")]
+    # iid_main runs all the tests when none are requested.
+    return len(runs) > 0 and "perm" not in runs and "all" not in runs
+
+
+# RoundCacheFile stores the cached results in a JSON-lines file. Each line is one record:
+#   {"key": key, "result": result, "time": t}    - store result (the string returned by iid_main) under key.
+#   {"key": key, "time": t}                      - the result under key was used at time t (only used by the "lru" eviction policy).
+# The file is read when the cache is first used by a process. When there are more than maxEntries results, the results evicted first 
+# are removed until there are evictTo * maxEntries left, and the file is rewritten. 
+# A lock on the file path + ".lock" is held while records are written. Results written by other processes after the file was read are not seen
+# (use a RoundCacheSQLite to share a cache between processes running at the same time).
+# Parameters:
+#   path: The path of the cache file.
+#   maxEntries: The maximum number of results kept.
+#   eviction: "lru" to evict the least recently used results first, or "fifo" to evict the oldest results first.
+#   requireSeed: When True, the cache is only used for rounds whose results are reproducible (see round_cache_seeded and usable).
+#                When False, the result of an unseeded round is the result of one earlier run of iid_main.
+#   evictTo: The fraction of maxEntries kept after evicting results.
+class RoundCacheFile():
+    def __init__(self, path, maxEntries=100000, eviction="lru", requireSeed=True, evictTo=0.9):
+        if eviction not in roundCacheEvictions:
+            raise Exception(f"Error in function RoundCacheFile - \n\t\teviction = {eviction} \n\t\teviction must be one of {roundCacheEvictions}.")
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.maxEntries = maxEntries
+        self.eviction = eviction
+        self.requireSeed = requireSeed
+        self.evictTo = evictTo
+        self.hits = 0
+        self.misses = 0
+        # entries maps each key to [result, time], in the order of eviction (first evicted first). It is read when first needed.
+        self.entries = None
+        self.records = 0
+
+    # The entries are not sent to worker processes; each process reads the file when it first uses the cache.
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["entries"] = None
+        state["records"] = 0
+        return state
+
+    # For internal use - Read the file, if it has not been read.
+    def load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        self.records = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r") as cacheFile:
+                for line in cacheFile:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.records += 1
+                    key = record["key"]
+                    if "result" in record:
+                        self.entries.pop(key, None)
+                        self.entries[key] = [record["result"], record["time"]]
+                    elif key in self.entries and self.eviction == "lru":
+                        self.entries[key] = [self.entries.pop(key)[0], record["time"]]
+
+    # For internal use - Append records to the file in a single write, holding the lock.
+    def append(self, records):
+        text = "".join(json.dumps(record) + "\n" for record in records)
+        with JournalLock(self.lock_path):
+            with open(self.path, "a") as cacheFile:
+                cacheFile.write(text)
+        self.records += len(records)
+
+    # For internal use - Evict results down to evictTo * maxEntries, and rewrite the file with one record per result.
+    def evict(self):
+        keep = int(self.evictTo * self.maxEntries)
+        for key in list(self.entries.keys())[:len(self.entries) - keep]:
+            del self.entries[key]
+        with JournalLock(self.lock_path):
+            tempPath = self.path + ".tmp"
+            with open(tempPath, "w") as cacheFile:
+                for key, (result, usedTime) in self.entries.items():
+                    cacheFile.write(json.dumps({"key": key, "result": result, "time": usedTime}) + "\n")
+            os.replace(tempPath, self.path)
+        self.records = len(self.entries)
+
+    # Return the result stored under key, or None if there is none.
+    def get(self, key):
+        self.load()
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.eviction == "lru":
+            entry[1] = time.time()
+            self.entries[key] = self.entries.pop(key)
+            self.append([{"key": key, "time": entry[1]}])
+            self.compact()
+        return entry[0]
+
+    # Return True if the cache is used for rounds run with the arguments IIDtests: always if requireSeed is False, otherwise only if their results are reproducible.
+    def usable(self, IIDtests):
+        return not self.requireSeed or round_cache_seeded(IIDtests)
+
+    # Store result under key (nothing is stored if the cache is not used for IIDtests, see usable).
+    def put(self, key, result, IIDtests=""):
+        if not self.usable(IIDtests):
+            return
+        self.load()
+        now = time.time()
+        self.entries.pop(key, None)
+        self.entries[key] = [result, now]
+        self.append([{"key": key, "result": result, "time": now}])
+        if len(self.entries) > self.maxEntries:
+            self.evict()
+        self.compact()
+
+    # For internal use - Rewrite the file when it holds many more records than results (e.g. "lru" use records).
+    def compact(self):
+        if self.records > 2 * self.maxEntries:
+            self.evict()
+
+
+# RoundCacheSQLite stores the cached results in an SQLite database, in a table "rounds" with one row per result:
+#   key: the key of the result (see round_cache_key).
+#   result: the string returned by iid_main.
+#   created: the time the result was stored.
+#   used: the time the result was last used (or stored).
+# Each lookup and store is a single transaction, so the cache may be shared by many processes. SQLite's write-ahead log is used so that readers do not block writers.
+# Parameters: As for RoundCacheFile (evictTo is not used: the results over maxEntries are evicted when a result is stored).
+class RoundCacheSQLite():
+    def __init__(self, path, maxEntries=100000, eviction="lru", requireSeed=True):
+        if eviction not in roundCacheEvictions:
+            raise Exception(f"Error in function RoundCacheSQLite - \n\t\teviction = {eviction} \n\t\teviction must be one of {roundCacheEvictions}.")
+        self.path = path
+        self.maxEntries = maxEntries
+        self.eviction = eviction
+        self.requireSeed = requireSeed
+        self.hits = 0
+        self.misses = 0
+
+    # Open the database, creating the rounds table if necessary.
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS rounds (key TEXT PRIMARY KEY, result TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS rounds_created ON rounds (created)")
+        connection.execute("CREATE INDEX IF NOT EXISTS rounds_used ON rounds (used)")
+        return connection
+
+    # Return the result stored under key, or None if there is none.
+    def get(self, key):
+        connection = self.connect()
+        try:
+            with connection:
+                row = connection.execute("SELECT result FROM rounds WHERE key = ?", (key,)).fetchone()
+                if row is not None and self.eviction == "lru":
+                    connection.execute("UPDATE rounds SET used = ? WHERE key = ?", (time.time(), key))
+        finally:
+            connection.close()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    # Return True if the cache is used for rounds run with the arguments IIDtests (see RoundCacheFile.usable).
+    def usable(self, IIDtests):
+        return not self.requireSeed or round_cache_seeded(IIDtests)
+
+    # Store result under key (nothing is stored if the cache is not used for IIDtests, see usable), 
+    # and evict the results over maxEntries.
+    def put(self, key, result, IIDtests=""):
+        if not self.usable(IIDtests):
+            return
+        order = "used" if self.eviction == "lru" else "created"
+        now = time.time()
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute("INSERT INTO rounds (key, result, created, used) VALUES (?, ?, ?, ?) "
+                                   "ON CONFLICT(key) DO UPDATE SET result = excluded.result, used = excluded.used", (key, result, now, now))
+                connection.execute(f"DELETE FROM rounds WHERE key IN (SELECT key FROM rounds ORDER BY {order} DESC LIMIT -1 OFFSET ?)", 
+                                   (self.maxEntries,))
+        finally:
+            connection.close()
+
+
+# Purpose: Return the round cache to use for a cache path.
+# Parameters:
+#   roundCache: The path of the cache, or a round cache (returned unchanged), or None.
+#   maxEntries, eviction, requireSeed: As for RoundCacheFile.
+# Return value:
+#   A RoundCacheSQLite for paths ending in ".sqlite", ".sqlite3" or ".db", a RoundCacheFile for other paths, roundCache if it is already a round cache, 
+#   or None if roundCache is None.
+def round_cache(roundCache, maxEntries=100000, eviction="lru", requireSeed=True):
+    if roundCache is None or not isinstance(roundCache, str):
+        return roundCache
+    extension = os.path.splitext(roundCache)[1].lower()
+    if extension in (".sqlite", ".sqlite3", ".db"):
+        return RoundCacheSQLite(roundCache, maxEntries, eviction, requireSeed)
+    return RoundCacheFile(roundCache, maxEntries, eviction, requireSeed)
+
+
+# Purpose: Return the hits, misses and hit rate of a round cache since it was created (in this process).
+# Parameters:
+#   cache: A round cache.
+# Return value:
+#   {"hits", "misses", "hitRate"} (hitRate is 0 when the cache has not been used).
+def round_cache_stats(cache):
+    lookups = cache.hits + cache.misses
+    return {"hits": cache.hits, "misses": cache.misses, "hitRate": cache.hits / lookups if lookups > 0 else 0.0}
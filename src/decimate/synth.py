@@ -0,0 +1,219 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+# Synthetic delta files for testing and benchmarking.
+#
+# The generators below produce deltas with controllable dependence, using NumPy to generate a block of deltas at a time:
+#   - Uniform: independent deltas, uniform on a range.
+#   - Jitter: independent deltas from a rounded normal distribution (e.g. multi-byte timer deltas).
+#   - DependentGroups: groups of groupSize consecutive deltas share a common component (as in examples/example_decimate_bin_search.py).
+#   - MarkovChain: deltas from a Markov chain with a given transition matrix.
+#   - PeriodicBias: the distribution of each delta depends on its sequence position modulo a period.
+#   - Mixture: each delta is taken from one of several generators (sub-distributions), chosen at random with given weights.
+# synth_write writes the deltas to file in chunks, so files larger than memory may be written, and synth_deltas returns them as an array.
+# The output is fully determined by the generator, the seed and the chunkSize.
+
+import numpy as np
+
+
+# Purpose: Write a file of synthetic deltas.
+# Parameters:
+#   out_path: The path of the file to write.
+#   numDeltas: The number of deltas to write.
+#   generator: The generator of the deltas (e.g. DependentGroups()).
+#   delta_bytes: The number of bytes per delta written (1, 2, 4 or 8). Deltas must be >= 0 and fit in delta_bytes bytes.
+#   seed: The seed of the random number generator.
+#   byte_order: The order of the bytes of each delta in the out_path file (e.g. 'little').
+#   chunkSize: How many deltas are generated and written at a time.
+#   verbose: When True, print a status message when the file has been written.
+# Return value:
+#   The number of deltas written.
+def synth_write(out_path, numDeltas, generator, delta_bytes=1, seed=0, byte_order='little', chunkSize=1<<22, verbose=False):
+    dtype = output_dtype(delta_bytes, byte_order)
+    with open(out_path, "wb") as out_file:
+        for deltas in synth_chunks(numDeltas, generator, seed, chunkSize):
+            out_file.write(check_deltas(deltas, delta_bytes).astype(dtype).tobytes())
+    if verbose:
+        print("synth_write - Wrote " + f"{numDeltas:,d}" + " deltas to " + out_path)
+    return numDeltas
+
+
+# Purpose: Return an array of synthetic deltas (the same deltas that synth_write writes with the same parameters).
+# Parameters: numDeltas, generator, seed and chunkSize are as for synth_write.
+# Return value:
+#   A NumPy array of numDeltas integer deltas.
+def synth_deltas(numDeltas, generator, seed=0, chunkSize=1<<22):
+    chunks = list(synth_chunks(numDeltas, generator, seed, chunkSize))
+    if len(chunks) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(chunks)
+
+
+# Purpose: For internal use - Generate numDeltas deltas, chunkSize at a time.
+def synth_chunks(numDeltas, generator, seed, chunkSize):
+    rng = np.random.default_rng(seed)
+    generator.reset()
+    for start in range(0, numDeltas, chunkSize):
+        yield generator.generate(rng, start, min(chunkSize, numDeltas - start))
+
+
+# Purpose: For internal use - Return the NumPy type of deltas with delta_bytes bytes in the given byte order.
+def output_dtype(delta_bytes, byte_order):
+    if delta_bytes not in (1, 2, 4, 8):
+        raise Exception(f"Error in function synth_write - \n\t\tdelta_bytes = {delta_bytes} \n\t\tdelta_bytes must be 1, 2, 4 or 8.")
+    return np.dtype(f"u{delta_bytes}").newbyteorder("<" if byte_order == "little" else ">")
+
+
+# Purpose: For internal use - Check that deltas fit in delta_bytes bytes, and return them.
+def check_deltas(deltas, delta_bytes):
+    if len(deltas) > 0 and (deltas.min() < 0 or (delta_bytes < 8 and deltas.max() >= 1 << (8*delta_bytes))):
+        raise Exception(f"Error in function synth_write - \n\t\tdelta_bytes = {delta_bytes}; deltas from {deltas.min()} to {deltas.max()} \n\t\tDeltas must be >= 0 and fit in delta_bytes bytes.")
+    return deltas
+
+
+# Each generator has the methods:
+#   reset(): Start a new sequence of deltas (called by synth_write before the first chunk).
+#   generate(rng, start, count): Return a NumPy integer array of the next count deltas, where start is the sequence position of the first of them
+#                                and rng is the NumPy random number generator to use.
+
+# Independent deltas, uniform on low to high-1.
+class Uniform():
+    def __init__(self, low=0, high=256):
+        self.low = low
+        self.high = high
+
+    def reset(self):
+        pass
+
+    def generate(self, rng, start, count):
+        return rng.integers(self.low, self.high, count, dtype=np.int64)
+
+
+# Independent deltas from a normal distribution with the given mean and standard deviation, rounded to integers and limited to low to high-1.
+# E.g. Jitter(4000, 30) with delta_bytes=2 gives timer-like deltas.
+class Jitter():
+    def __init__(self, mean=4000, sd=30, low=0, high=1<<16):
+        self.mean = mean
+        self.sd = sd
+        self.low = low
+        self.high = high
+
+    def reset(self):
+        pass
+
+    def generate(self, rng, start, count):
+        return np.clip(np.rint(rng.normal(self.mean, self.sd, count)), self.low, self.high - 1).astype(np.int64)
+
+
+# Groups of groupSize consecutive deltas (starting at sequence position 0) share a common component:
+# each delta is the sum of its group's value, uniform on 0 to groupRange-1, and its own value, uniform on 0 to ownRange-1.
+# The defaults give the deltas of examples/example_decimate_bin_search.py, which are IID at decimation levels that are multiples of groupSize.
+class DependentGroups():
+    def __init__(self, groupSize=4, groupRange=128, ownRange=128):
+        self.groupSize = groupSize
+        self.groupRange = groupRange
+        self.ownRange = ownRange
+
+    def reset(self):
+        self.groupValue = None
+
+    def generate(self, rng, start, count):
+        # The first group may have started in the previous chunk, in which case its value is kept.
+        firstGroup = start // self.groupSize
+        lastGroup = (start + count - 1) // self.groupSize
+        groupValues = rng.integers(0, self.groupRange, lastGroup - firstGroup + 1, dtype=np.int64)
+        if start % self.groupSize != 0 and self.groupValue is not None:
+            groupValues[0] = self.groupValue
+        self.groupValue = groupValues[-1]
+        groups = (np.arange(start, start + count) // self.groupSize) - firstGroup
+        return groupValues[groups] + rng.integers(0, self.ownRange, count, dtype=np.int64)
+
+
+# Deltas from a Markov chain: transitions[i][j] is the probability that a delta in state i is followed by a delta in state j,
+# and the delta for state i is values[i] (or i if values is None).
+# To generate a block of deltas at once, the block is split into lanes of laneLength consecutive deltas, which are generated side by side.
+# The first state of each lane is chosen from the stationary distribution of the chain, so the dependence between deltas is broken every laneLength deltas.
+class MarkovChain():
+    def __init__(self, transitions, values=None, laneLength=4096):
+        self.transitions = np.asarray(transitions, dtype=float)
+        self.cumulative = np.cumsum(self.transitions, axis=1)
+        self.cumulative[:, -1] = 1.0
+        numStates = self.transitions.shape[0]
+        self.values = np.arange(numStates, dtype=np.int64) if values is None else np.asarray(values, dtype=np.int64)
+        self.laneLength = laneLength
+        # The stationary distribution is the left eigenvector of the transition matrix with eigenvalue 1.
+        eigenvalues, eigenvectors = np.linalg.eig(self.transitions.T)
+        stationary = np.abs(np.real(eigenvectors[:, np.argmin(np.abs(eigenvalues - 1))]))
+        self.stationaryCumulative = np.cumsum(stationary / stationary.sum())
+        self.stationaryCumulative[-1] = 1.0
+
+    def reset(self):
+        pass
+
+    def generate(self, rng, start, count):
+        numLanes = -(-count // self.laneLength)
+        states = np.empty((numLanes, self.laneLength), dtype=np.int64)
+        states[:, 0] = np.searchsorted(self.stationaryCumulative, rng.random(numLanes), side="right")
+        uniforms = rng.random((numLanes, self.laneLength))
+        for step in range(1, self.laneLength):
+            previous = states[:, step - 1]
+            # For each lane, the next state is the first state whose cumulative transition probability exceeds the uniform value.
+            states[:, step] = (self.cumulative[previous] <= uniforms[:, step, None]).sum(axis=1)
+        return self.values[states.reshape(-1)[:count]]
+
+
+# Deltas whose distribution depends on their sequence position modulo len(offsets):
+# the delta at position i is uniform on 0 to valueRange-1, plus offsets[i % len(offsets)].
+# E.g. PeriodicBias([0, 0, 0, 64]) makes every 4th delta larger.
+class PeriodicBias():
+    def __init__(self, offsets, valueRange=192):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.valueRange = valueRange
+
+    def reset(self):
+        pass
+
+    def generate(self, rng, start, count):
+        positions = np.arange(start, start + count) % len(self.offsets)
+        return rng.integers(0, self.valueRange, count, dtype=np.int64) + self.offsets[positions]
+
+
+# A mixture of sub-distributions: each delta is taken from one of the generators in components, chosen at random with the probabilities in weights.
+# E.g. Mixture([Uniform(0, 64), Uniform(192, 256)], [0.9, 0.1]).
+# Each component generates a delta for every position (so that each component's own dependence is kept), and the chosen one is used.
+class Mixture():
+    def __init__(self, components, weights):
+        self.components = components
+        weights = np.asarray(weights, dtype=float)
+        self.cumulative = np.cumsum(weights / weights.sum())
+        self.cumulative[-1] = 1.0
+
+    def reset(self):
+        for component in self.components:
+            component.reset()
+
+    def generate(self, rng, start, count):
+        choice = np.searchsorted(self.cumulative, rng.random(count), side="right")
+        deltas = np.empty(count, dtype=np.int64)
+        for c in range(len(self.components)):
+            componentDeltas = self.components[c].generate(rng, start, count)
+            deltas[choice == c] = componentDeltas[choice == c]
+        return deltas
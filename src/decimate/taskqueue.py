@@ -0,0 +1,387 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+# A task queue in an SQLite database, for spreading decimation testing over many worker processes on many hosts.
+#
+# The coordinator publishes tasks (one decimation level each: decimating the deltas and running all the rounds of testing) to the queue. 
+# Any number of workers (run_worker, or "python -m decimate.taskqueue worker queue_path") claim tasks, run them and store their results in the queue. 
+# A claimed task is leased to its worker for leaseSeconds; the worker renews the lease while the task runs, 
+# so a task whose worker has died is claimed again by another worker once its lease expires.
+# The coordinator merges the results into its results_path:
+#   - decimated_binary_search(..., numWorkers=n, executor=TaskQueueExecutor(queue_path)) tests n levels of the search tree at a time (see numWorkers).
+#   - queue_range_test tests all the levels of a range at once.
+# The queue database, the delta file and the code (including convert_delta and maxFails) must be available at the same paths on every host.
+# NOTE: Tasks and their results are stored with pickle, so only use a queue that is written by trusted hosts.
+
+import os
+import sys
+import time
+import pickle
+import socket
+import sqlite3
+import argparse
+import datetime
+import threading
+import traceback
+from math import ceil
+from decimate.deci import (speculative_test_level, level_num_tests, result_open, result_append, result_write, result_min_pass_level, 
+                           normalise_iid_tests, failTable, unchanged)
+
+
+# The states of a task.
+#   "pending": waiting to be claimed by a worker (or claimed by a worker whose lease expired).
+#   "running": claimed by a worker, whose lease ends at lease_expires.
+#   "done": finished; result holds the pickled return value.
+#   "failed": the task raised an exception (or was claimed maxAttempts times without finishing); result holds the pickled exception.
+#   "cancelled": cancelled by the coordinator before it was claimed.
+taskStates = ["pending", "running", "done", "failed", "cancelled"]
+
+
+# A task queue stored in an SQLite database.
+# Parameters:
+#   queue_path: The path of the database (created if it does not exist). Use a path on a filesystem shared by all the hosts.
+#   maxAttempts: The number of times a task may be claimed before it is marked as failed (e.g. because its workers keep dying).
+# NOTE: The database uses SQLite's default (rollback) journal rather than WAL, since WAL does not work on network filesystems.
+class TaskQueue():
+    def __init__(self, queue_path, maxAttempts=3):
+        self.path = queue_path
+        self.maxAttempts = maxAttempts
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute("CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, state TEXT NOT NULL, payload BLOB NOT NULL, "
+                                   "result BLOB, description TEXT, worker TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+                                   "created REAL NOT NULL, finished REAL)")
+                connection.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, id)")
+        finally:
+            connection.close()
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    # Purpose: Publish a task.
+    # Parameters:
+    #   function, args, kwargs: The task calls function(*args, **kwargs). The function must be defined at the top level of a module.
+    #   description: A description of the task (e.g. the decimation level), shown by status.
+    # Return value: The id of the task.
+    def submit(self, function, args=(), kwargs={}, description=""):
+        payload = pickle.dumps((function, tuple(args), dict(kwargs)))
+        connection = self.connect()
+        try:
+            cursor = connection.execute("INSERT INTO tasks (state, payload, description, created) VALUES ('pending', ?, ?, ?)", 
+                                        (payload, description, time.time()))
+            return cursor.lastrowid
+        finally:
+            connection.close()
+
+    # Purpose: Claim the oldest pending task (or running task with an expired lease).
+    # Parameters:
+    #   worker: The name of the worker claiming the task.
+    #   leaseSeconds: How long the task is leased to the worker (see renew).
+    # Return value: (taskID, function, args, kwargs), or None if there is no task to claim.
+    def claim(self, worker, leaseSeconds=600):
+        connection = self.connect()
+        try:
+            # BEGIN IMMEDIATE takes the write lock, so two workers cannot claim the same task.
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                while True:
+                    row = connection.execute("SELECT id, payload, attempts FROM tasks WHERE state = 'pending' OR (state = 'running' AND lease_expires < ?) "
+                                             "ORDER BY id LIMIT 1", (now,)).fetchone()
+                    if row is None:
+                        connection.execute("COMMIT")
+                        return None
+                    taskID, payload, attempts = row
+                    if attempts >= self.maxAttempts:
+                        error = Exception(f"Error in task {taskID} - the task was claimed {attempts} times without finishing.")
+                        connection.execute("UPDATE tasks SET state = 'failed', result = ?, finished = ? WHERE id = ?", (pickle.dumps(error), now, taskID))
+                        continue
+                    connection.execute("UPDATE tasks SET state = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?", 
+                                       (worker, now + leaseSeconds, taskID))
+                    connection.execute("COMMIT")
+                    function, args, kwargs = pickle.loads(payload)
+                    return taskID, function, args, kwargs
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        finally:
+            connection.close()
+
+    # Purpose: Extend the lease of a running task.
+    # Return value: True if the worker still holds the lease (False if the lease expired and the task was claimed by another worker).
+    def renew(self, taskID, worker, leaseSeconds=600):
+        connection = self.connect()
+        try:
+            cursor = connection.execute("UPDATE tasks SET lease_expires = ? WHERE id = ? AND state = 'running' AND worker = ?", 
+                                        (time.time() + leaseSeconds, taskID, worker))
+            return cursor.rowcount == 1
+        finally:
+            connection.close()
+
+    # Purpose: Store the result of a task (the return value if failed is False, otherwise the exception raised).
+    #   The result is only stored if the worker still holds the lease.
+    # Return value: True if the result was stored.
+    def complete(self, taskID, worker, result, failed=False):
+        connection = self.connect()
+        try:
+            cursor = connection.execute("UPDATE tasks SET state = ?, result = ?, finished = ? WHERE id = ? AND state = 'running' AND worker = ?", 
+                                        ("failed" if failed else "done", pickle.dumps(result), time.time(), taskID, worker))
+            return cursor.rowcount == 1
+        finally:
+            connection.close()
+
+    # Purpose: Cancel a task that has not been claimed.
+    # Return value: True if the task was cancelled.
+    def cancel(self, taskID):
+        connection = self.connect()
+        try:
+            cursor = connection.execute("UPDATE tasks SET state = 'cancelled', finished = ? WHERE id = ? AND state = 'pending'", (time.time(), taskID))
+            return cursor.rowcount == 1
+        finally:
+            connection.close()
+
+    # Purpose: Find the state of a task.
+    # Return value: (state, result), where result is the unpickled return value ("done") or exception ("failed"), and None otherwise.
+    def poll(self, taskID):
+        connection = self.connect()
+        try:
+            state, result = connection.execute("SELECT state, result FROM tasks WHERE id = ?", (taskID,)).fetchone()
+        finally:
+            connection.close()
+        return state, pickle.loads(result) if result is not None else None
+
+    # Purpose: Summarise the tasks in the queue.
+    # Return value: A list of {"id", "state", "description", "worker", "attempts", "created", "finished"} for each task.
+    def status(self):
+        connection = self.connect()
+        try:
+            rows = connection.execute("SELECT id, state, description, worker, attempts, created, finished FROM tasks ORDER BY id").fetchall()
+        finally:
+            connection.close()
+        return [{"id": row[0], "state": row[1], "description": row[2], "worker": row[3], "attempts": row[4], "created": row[5], "finished": row[6]} 
+                for row in rows]
+
+    # Purpose: Delete finished (done, failed or cancelled) tasks from the queue.
+    def purge(self):
+        connection = self.connect()
+        try:
+            connection.execute("DELETE FROM tasks WHERE state IN ('done', 'failed', 'cancelled')")
+        finally:
+            connection.close()
+
+
+# The result of a task submitted by TaskQueueExecutor. Like a concurrent.futures Future, result() waits for the task and returns its value.
+class TaskFuture():
+    def __init__(self, queue, taskID, pollInterval):
+        self.queue = queue
+        self.taskID = taskID
+        self.pollInterval = pollInterval
+
+    def done(self):
+        return self.queue.poll(self.taskID)[0] in ("done", "failed", "cancelled")
+
+    def cancel(self):
+        return self.queue.cancel(self.taskID)
+
+    # Wait for the task and return its value (or raise the exception it raised).
+    def result(self, timeout=None):
+        startTime = time.time()
+        while True:
+            state, result = self.queue.poll(self.taskID)
+            if state == "done":
+                return result
+            if state == "failed":
+                raise result
+            if state == "cancelled":
+                raise Exception(f"Error in TaskFuture.result - task {self.taskID} was cancelled.")
+            if timeout is not None and time.time() - startTime > timeout:
+                raise TimeoutError(f"Task {self.taskID} did not finish within {timeout} seconds.")
+            time.sleep(self.pollInterval)
+
+
+# An executor (like concurrent.futures.ProcessPoolExecutor) that runs tasks on the workers of a task queue.
+# E.g. decimated_binary_search(..., numWorkers=8, executor=TaskQueueExecutor("/shared/queue.sqlite")) tests 8 levels at a time on the queue's workers.
+# Parameters:
+#   queue_path: The path of the queue database (see TaskQueue).
+#   pollInterval: How often (in seconds) to check whether a task has finished.
+#   maxAttempts: As for TaskQueue.
+class TaskQueueExecutor():
+    def __init__(self, queue_path, pollInterval=5.0, maxAttempts=3):
+        self.queue = TaskQueue(queue_path, maxAttempts)
+        self.pollInterval = pollInterval
+        self.futures = []
+
+    def submit(self, function, *args, **kwargs):
+        description = f"{function.__name__}"
+        if function is speculative_test_level:
+            description += f" - dec {args[2]}, {args[3]} rounds, {args[0]}"
+        future = TaskFuture(self.queue, self.queue.submit(function, args, kwargs, description), self.pollInterval)
+        self.futures.append(future)
+        return future
+
+    # Cancel the tasks submitted by this executor that have not been claimed.
+    def shutdown(self, wait=True):
+        for future in self.futures:
+            future.cancel()
+
+
+# Purpose: For internal use - Renew the lease of a task every leaseSeconds/3 seconds until stopEvent is set.
+def renew_lease(queue, taskID, worker, leaseSeconds, stopEvent):
+    while not stopEvent.wait(leaseSeconds / 3):
+        if not queue.renew(taskID, worker, leaseSeconds):
+            return
+
+
+# Purpose: Run tasks from a task queue until stopped.
+# Parameters:
+#   queue_path: The path of the queue database (see TaskQueue).
+#   worker: The name of the worker, recorded with the tasks it claims. Leave as None to use "<host name>:<process id>".
+#   leaseSeconds: How long a claimed task is leased to this worker. The lease is renewed while the task runs.
+#   pollInterval: How long to wait (in seconds) before checking again when there is no task to claim.
+#   idleTimeout: Stop after this many seconds without a task to claim, or None to run until killed.
+#   maxTasks: Stop after running this many tasks, or None for no limit.
+#   verbose: When True, print a line when each task starts and finishes.
+# Return value: The number of tasks run.
+def run_worker(queue_path, worker=None, leaseSeconds=600, pollInterval=5.0, idleTimeout=None, maxTasks=None, verbose=True):
+    if worker is None:
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+    queue = TaskQueue(queue_path)
+    tasksRun = 0
+    idleSince = time.time()
+    while maxTasks is None or tasksRun < maxTasks:
+        task = queue.claim(worker, leaseSeconds)
+        if task is None:
+            if idleTimeout is not None and time.time() - idleSince > idleTimeout:
+                break
+            time.sleep(pollInterval)
+            continue
+        taskID, function, args, kwargs = task
+        if verbose:
+            print(f"{datetime.datetime.now()} {worker} - Starting task {taskID} ({function.__name__}).", flush=True)
+        stopEvent = threading.Event()
+        renewer = threading.Thread(target=renew_lease, args=(queue, taskID, worker, leaseSeconds, stopEvent), daemon=True)
+        renewer.start()
+        try:
+            result = function(*args, **kwargs)
+            failed = False
+        except Exception as e:
+            result = e
+            failed = True
+            if verbose:
+                traceback.print_exc()
+        finally:
+            stopEvent.set()
+            renewer.join()
+        stored = queue.complete(taskID, worker, result, failed)
+        tasksRun += 1
+        idleSince = time.time()
+        if verbose:
+            print(f"{datetime.datetime.now()} {worker} - Finished task {taskID}: {'FAILED' if failed else 'done'}" + 
+                  ("" if stored else " (the lease had expired, so the result was not stored)") + ".", flush=True)
+    return tasksRun
+
+
+# Purpose: Test all the decimation levels in a given range, as decimated_range_test does, with the levels tested by the workers of a task queue.
+#   All the levels are published at once. The results of each level are written to results_path when the level finishes, 
+#   in the order of decimated_range_test (from maxDec down to minDec).
+# Parameters: As for decimated_range_test (except verbose only prints the level results), and
+#   queue_path: The path of the queue database (see TaskQueue).
+#   pollInterval: How often (in seconds) to check whether a level has finished.
+# Return values: (results, datestampList, passedLevels) as for decimated_range_test.
+#   NOTE: convert_delta and maxFails are sent to the workers, so they must be defined at the top level of a module (not lambdas).
+#   NOTE: A roundCache is used by the workers, so its path must be the same on every host (e.g. an SQLite cache on a shared file system).
+def queue_range_test(queue_path, delta_path, results_path, overwrite=False, platform="", maxDec=200, minDec=1, numTestsRequested=1, maxFails=failTable, 
+                     testSize=1000000, dec_multiplier=1, input_delta_bytes=1, convert_delta=unchanged, byte_order='little', verbose=False, failEarly=False, 
+                     IIDtests="", packPassOrder=False, pollInterval=5.0, screenRounds=0, roundCache=None):
+    executor = TaskQueueExecutor(queue_path, pollInterval)
+    delta_path = os.path.abspath(delta_path)
+    results = result_open(results_path, overwrite)
+    startDate = str(datetime.datetime.now())
+    if verbose:
+        print(f"Starting testing at {startDate}.")
+
+    levels = [dec*dec_multiplier for dec in range(maxDec//dec_multiplier, max(ceil(minDec/dec_multiplier) - 1, 0), -1)]
+    futures = {}
+    for dec in levels:
+        numTests = level_num_tests(delta_path, dec, numTestsRequested, testSize, input_delta_bytes)
+        if numTests > 0:
+            futures[dec] = executor.submit(speculative_test_level, delta_path, platform, dec, numTests, maxFails, testSize, input_delta_bytes, 
+                                           convert_delta, byte_order, failEarly, IIDtests, None, False, screenRounds, roundCache)
+    try:
+        for dec in levels:
+            if dec not in futures:
+                # There is insufficient data to test this level.
+                result_append(results, dec=dec, passList={}, passListTotals={}, roundPass=0, roundTotal=0, passOrderList={}, platform=platform, 
+                              filename=delta_path, datestamp=str(datetime.datetime.now()))
+            else:
+                (failed, b, c, d, e, f), g, spans, screenItem = futures[dec].result()
+                # A level rejected by screening is recorded with the result item of the screen.
+                if screenItem is not None:
+                    results.append(screenItem)
+                else:
+                    result_append(results, dec=dec, passList=b, passListTotals=c, roundPass=d, roundTotal=e, passOrderList=f, platform=platform, 
+                                  filename=delta_path, datestamp=str(datetime.datetime.now()), testSize=testSize, IIDtests=normalise_iid_tests(IIDtests), sets=g)
+                if verbose:
+                    print("queue_range_test - Decimation level", f"{dec:,d}", ":", "FAILED" if failed else "pass", f"- rounds passed: {d} / {e}", 
+                          "(rejected by screening)" if screenItem is not None else "")
+            result_write(results, results_path, packPassOrder)
+    finally:
+        # If a level failed, do not leave the remaining levels for the workers.
+        executor.shutdown()
+
+    endDate = str(datetime.datetime.now())
+    passLevels = result_min_pass_level(results, maxFails=maxFails, minTests=numTestsRequested, checkLowRounds=True, 
+                                       platformList=[platform], dateRange=[startDate, endDate])
+    if verbose:
+        print(f"\t  Minimum passing level (at least {numTestsRequested:6d} tests):         {passLevels[0]}.")
+        print(f"\t  Minimum passing level (no minimum tests requirement):  {passLevels[1]} *.")
+    return results, [startDate, endDate], passLevels
+
+
+# Purpose: The command line interface: run a worker, or print the status of a queue.
+#   python -m decimate.taskqueue worker queue_path [--lease 600] [--poll 5] [--idle-timeout 3600] [--max-tasks 10]
+#   python -m decimate.taskqueue status queue_path
+#   python -m decimate.taskqueue purge queue_path
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m decimate.taskqueue", description="Run a decimate task queue worker, or show the tasks in a queue.")
+    parser.add_argument("command", choices=["worker", "status", "purge"], help="worker: run tasks from the queue; status: list the tasks; purge: delete finished tasks.")
+    parser.add_argument("queue_path", help="Path of the queue database.")
+    parser.add_argument("--name", default=None, help="Name of the worker (default: host name:process id).")
+    parser.add_argument("--lease", type=float, default=600, help="Lease time of a claimed task in seconds.")
+    parser.add_argument("--poll", type=float, default=5.0, help="Seconds to wait before checking again when there is no task.")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="Stop after this many seconds without a task.")
+    parser.add_argument("--max-tasks", type=int, default=None, help="Stop after running this many tasks.")
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        run_worker(args.queue_path, args.name, args.lease, args.poll, args.idle_timeout, args.max_tasks)
+    elif args.command == "status":
+        for task in TaskQueue(args.queue_path).status():
+            print(f"{task['id']:6d} {task['state']:<10} {str(task['worker']):<24} attempts {task['attempts']} - {task['description']}")
+    else:
+        TaskQueue(args.queue_path).purge()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
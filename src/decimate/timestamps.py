@@ -0,0 +1,216 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+# Deriving deltas from a file of raw timestamps (e.g. 64-bit cycle counter values).
+#
+# The timestamps are read and differenced a chunk at a time with NumPy, so captures larger than memory may be processed quickly.
+#   - write_deltas writes the deltas to a delta file.
+#   - DeltaStream is a file-like object whose read method returns the deltas, so the deltas may be passed straight to 
+#     write_decimated_file, write_decimated_delete_file, write_subfile or write_subDist_id_file in place of in_path, 
+#     without writing an intermediate delta file.
+#   - timestamp_delta_chunks returns the deltas as a sequence of NumPy arrays.
+# Deltas are found in one of three modes:
+#   "wrap": t[i] - t[i-1] modulo 2**timestamp_bits, so a counter that wraps around gives the correct (positive) delta. This is the default.
+#   "signed": the difference modulo 2**timestamp_bits as a signed number (from -2**(timestamp_bits-1) to 2**(timestamp_bits-1)-1), 
+#             written in two's complement in delta_bytes bytes (so a delta of -1 is read back as 2**(8*delta_bytes)-1 by the decimate functions).
+#   "absolute": the absolute value of the "signed" difference.
+# With pairing=False, a delta is found for each pair of consecutive timestamps (t[1]-t[0], t[2]-t[1], ...).
+# With pairing=True, the timestamps are taken in pairs, e.g. the start and end time of an event, and one delta is found per pair 
+# (t[1]-t[0], t[3]-t[2], ...); a final unpaired timestamp is ignored.
+
+import numpy as np
+from decimate.compressed import open_delta_file, delta_file_bytes
+
+
+deltaModes = ["wrap", "signed", "absolute"]
+
+
+# Purpose: For internal use - Return the NumPy type of unsigned (or signed) integers with numBytes bytes in the given byte order.
+def numpy_dtype(numBytes, byte_order, signed=False):
+    if numBytes not in (1, 2, 4, 8):
+        raise Exception(f"Error in function numpy_dtype - \n\t\tnumBytes = {numBytes} \n\t\tTimestamps and deltas must be 1, 2, 4 or 8 bytes.")
+    return np.dtype(f"{'i' if signed else 'u'}{numBytes}").newbyteorder("<" if byte_order == "little" else ">")
+
+
+# Purpose: Find the deltas of an array of timestamps.
+# Parameters:
+#   timestamps: A NumPy array of unsigned integer timestamps.
+#   mode: "wrap", "signed" or "absolute" (see above).
+#   timestamp_bits: The number of bits in the timestamp counter (the counter wraps around at 2**timestamp_bits). At most 64.
+#   pairing: When True, find one delta per pair of timestamps (see above).
+#   previous: The timestamp before timestamps[0] (e.g. the last timestamp of the previous chunk), or None. Only used when pairing is False.
+# Return value:
+#   A NumPy array of deltas (np.uint64, or np.int64 in "signed" mode).
+def timestamps_to_deltas(timestamps, mode="wrap", timestamp_bits=64, pairing=False, previous=None):
+    if mode not in deltaModes:
+        raise Exception(f"Error in function timestamps_to_deltas - \n\t\tmode = {mode} \n\t\tmode must be one of {deltaModes}.")
+    timestamps = np.asarray(timestamps).astype(np.uint64)
+    if pairing:
+        numPairs = len(timestamps) // 2
+        differences = timestamps[1:2*numPairs:2] - timestamps[0:2*numPairs:2]
+    else:
+        if previous is not None:
+            timestamps = np.concatenate([np.array([previous], dtype=np.uint64), timestamps])
+        # Subtraction of unsigned 64-bit integers wraps around modulo 2**64.
+        differences = timestamps[1:] - timestamps[:-1]
+    if timestamp_bits < 64:
+        differences &= np.uint64((1 << timestamp_bits) - 1)
+    if mode == "wrap":
+        return differences
+    # Interpret the difference as a signed timestamp_bits number.
+    signedDifferences = differences.astype(np.int64)
+    if timestamp_bits < 64:
+        signedDifferences = np.where(differences >= np.uint64(1 << (timestamp_bits - 1)), signedDifferences - (1 << timestamp_bits), signedDifferences)
+    if mode == "signed":
+        return signedDifferences
+    # The absolute value of -2**63 does not fit in an int64, so find it as an unsigned number.
+    return np.where(signedDifferences < 0, (-signedDifferences).astype(np.uint64), signedDifferences.astype(np.uint64))
+
+
+# Purpose: Read a file of timestamps and return its deltas a chunk at a time.
+# Parameters:
+#   in_path: The path of the file of timestamps, which may be compressed (.gz, .bz2 or .xz, see decimate.compressed).
+#   timestamp_bytes: The number of bytes per timestamp in the in_path file (1, 2, 4 or 8).
+#   mode, pairing: As for timestamps_to_deltas.
+#   timestamp_bits: The number of bits in the timestamp counter, or None for 8*timestamp_bytes.
+#   byte_order: The order of the bytes of each timestamp (e.g. 'little').
+#   chunkSize: How many timestamps are read at a time.
+# Return value:
+#   A generator of NumPy arrays of deltas (see timestamps_to_deltas).
+def timestamp_delta_chunks(in_path, timestamp_bytes=8, mode="wrap", timestamp_bits=None, pairing=False, byte_order='little', chunkSize=1<<20):
+    if timestamp_bits is None:
+        timestamp_bits = 8*timestamp_bytes
+    dtype = numpy_dtype(timestamp_bytes, byte_order)
+    # With pairing, read an even number of timestamps at a time so that pairs are not split between chunks.
+    chunkSize = max(chunkSize - chunkSize % 2, 2)
+    previous = None
+    with open_delta_file(in_path) as in_file:
+        while True:
+            data = in_file.read(chunkSize*timestamp_bytes)
+            numTimestamps = len(data) // timestamp_bytes
+            if numTimestamps == 0:
+                break
+            timestamps = np.frombuffer(data, dtype=dtype, count=numTimestamps)
+            yield timestamps_to_deltas(timestamps, mode, timestamp_bits, pairing, previous)
+            previous = timestamps[-1]
+
+
+# Purpose: Return the number of deltas that will be found from a file of timestamps.
+# Parameters: As for timestamp_delta_chunks.
+def timestamp_num_deltas(in_path, timestamp_bytes=8, pairing=False):
+    numTimestamps = delta_file_bytes(in_path) // timestamp_bytes
+    if pairing:
+        return numTimestamps // 2
+    return max(numTimestamps - 1, 0)
+
+
+# Purpose: For internal use - Convert an array of deltas to bytes, checking that the deltas fit in delta_bytes bytes.
+def deltas_to_bytes(deltas, delta_bytes, byte_order, mode):
+    signed = mode == "signed"
+    if delta_bytes < 8 and len(deltas) > 0:
+        if signed:
+            tooBig = deltas.min() < -(1 << (8*delta_bytes - 1)) or deltas.max() >= 1 << (8*delta_bytes - 1)
+        else:
+            tooBig = deltas.max() >= np.uint64(1 << (8*delta_bytes))
+        if tooBig:
+            raise Exception(f"Error in function deltas_to_bytes - \n\t\tdelta_bytes = {delta_bytes}; deltas from {deltas.min()} to {deltas.max()} \n\t\t"
+                            "Deltas must fit in delta_bytes bytes.")
+    return deltas.astype(numpy_dtype(delta_bytes, byte_order, signed)).tobytes()
+
+
+# Purpose: Write the deltas of a file of timestamps to a delta file.
+# Parameters:
+#   in_path: The path of the file of timestamps.
+#   out_path: The path of the delta file to write.
+#   timestamp_bytes, mode, timestamp_bits, pairing, byte_order, chunkSize: As for timestamp_delta_chunks.
+#   delta_bytes: The number of bytes per delta written (1, 2, 4 or 8). An exception is raised if a delta does not fit.
+#   verbose: When True, print a status message when the file has been written.
+# Return value:
+#   The number of deltas written.
+def write_deltas(in_path, out_path, timestamp_bytes=8, delta_bytes=8, mode="wrap", timestamp_bits=None, pairing=False, byte_order='little', 
+                 chunkSize=1<<20, verbose=False):
+    numDeltas = 0
+    with open(out_path, "wb") as out_file:
+        for deltas in timestamp_delta_chunks(in_path, timestamp_bytes, mode, timestamp_bits, pairing, byte_order, chunkSize):
+            out_file.write(deltas_to_bytes(deltas, delta_bytes, byte_order, mode))
+            numDeltas += len(deltas)
+    if verbose:
+        print("write_deltas - Wrote " + f"{numDeltas:,d}" + " deltas to " + out_path)
+    return numDeltas
+
+
+# A read-only binary file-like object returning the deltas of a file of timestamps, as they would be written by write_deltas.
+# Pass it in place of in_path to write_decimated_file, write_decimated_delete_file, write_subfile or write_subDist_id_file 
+# (with input_delta_bytes or delta_bytes = delta_bytes) to process a capture in one pass.
+# Parameters: As for write_deltas (except out_path and verbose).
+# E.g.
+#   with DeltaStream("capture.bin", timestamp_bytes=8, delta_bytes=8) as deltas:
+#       write_decimated_file(deltas, "decimated.bin", dec=4, numSets=100, setSize=1000000, convert_delta=mod_256, input_delta_bytes=8, output_delta_bytes=1)
+class DeltaStream():
+    def __init__(self, in_path, timestamp_bytes=8, delta_bytes=8, mode="wrap", timestamp_bits=None, pairing=False, byte_order='little', chunkSize=1<<20):
+        self.name = in_path
+        self.delta_bytes = delta_bytes
+        self.byte_order = byte_order
+        self.mode = mode
+        self.chunks = timestamp_delta_chunks(in_path, timestamp_bytes, mode, timestamp_bits, pairing, byte_order, chunkSize)
+        self.buffer = b""
+        self.position = 0
+        self.closed = False
+
+    # Return up to size bytes of deltas (all the remaining deltas if size is negative); b"" once all deltas have been read.
+    def read(self, size=-1):
+        if self.closed:
+            raise ValueError("read from a closed DeltaStream")
+        # Functions such as write_subfile read one delta at a time, so return data from the buffer without copying the rest of it when possible.
+        if 0 <= size <= len(self.buffer) - self.position:
+            data = self.buffer[self.position:self.position + size]
+            self.position += size
+            return data
+        parts = [self.buffer[self.position:]]
+        available = len(parts[0])
+        while size < 0 or available < size:
+            deltas = next(self.chunks, None)
+            if deltas is None:
+                break
+            parts.append(deltas_to_bytes(deltas, self.delta_bytes, self.byte_order, self.mode))
+            available += len(parts[-1])
+        self.buffer = b"".join(parts)
+        if size < 0:
+            size = len(self.buffer)
+        data = self.buffer[:size]
+        self.position = len(data)
+        return data
+
+    def readable(self):
+        return True
+
+    def close(self):
+        if not self.closed:
+            self.chunks.close()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        self.close()
+        return False
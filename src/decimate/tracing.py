@@ -0,0 +1,193 @@
+# This file is part of Teron Labs' Decimate distribution.
+# Copyright (C) 2024 Teron Labs <https://www.teronlabs.com/>, <info@teronlabs.com>
+#
+# Licensed under the GNU General Public License v3.0 (GPLv3). For details see the LICENSE.md file.
+#
+# Author(s)
+# Yvonne Cliff, Teron Labs <yvonne@teronlabs.com>.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, version 3 of the License.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https:#www.gnu.org/licenses/>.
+
+
+
+# Stage-level tracing of decimation and testing.
+#
+# A Tracer records timed spans for the stages of write_decimated_file, test_decimated_file, decimated_binary_search and decimated_range_test
+# (pass tracer=Tracer() to these functions). Each span has a name (e.g. "read", "iid_main"), a start time, a duration and attributes such as
+# the decimation level ("dec"), the testing round ("round") and the number of bytes handled ("bytes").
+# Observers are called with each span as it finishes, e.g. to print progress or to estimate the time remaining.
+# The recorded spans may be summarised (summary, print_summary) or exported as a Chrome trace (write_chrome_trace) 
+# and viewed with chrome://tracing or https://ui.perfetto.dev.
+
+import time
+import json
+import os
+import threading
+
+
+# The names of the spans recorded by the decimate functions. The spans of test_decimated_file have the testing round as attribute "round".
+#   "level": testing of one decimation level in decimated_binary_search or decimated_range_test (including decimation).
+#   "read": reading one set of deltas from the delta file in write_decimated_file.
+#   "convert": converting one set of deltas (convert_delta) and storing them in decimated order in write_decimated_file.
+#   "decimated write": writing the decimated deltas to the output file in write_decimated_file.
+#   "screen": screening one decimation level with the cheap IID tests (see screen_level in decimate.deci), with the attribute "rejected".
+#   "set write": writing the set of deltas for one round to the temporary file.
+#   "round cache": looking up the result of one round in the round cache (see decimate.roundcache), with the attribute "hit".
+#   "iid_main": running the IID tests for one round.
+#   "json decode": decoding the results returned by iid_main.
+#   "results write": writing the results to the results_path. 
+#       After each round of test_decimated_file, the span also has the attributes "passed" (whether the round passed), "roundPass", "roundTotal"
+#       and "failure" (whether the level has failed so far). At the end of each level of a search, it has "failed", "roundPass" and "roundTotal" instead.
+traceStages = ["level", "read", "convert", "decimated write", "screen", "set write", "round cache", "iid_main", "json decode", "results write"]
+
+
+# A span that is being timed. Returned by Tracer.span.
+# Use set to add attributes (e.g. the number of bytes read) before the span finishes.
+class TraceSpan():
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.time()
+        self.startCounter = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        duration = time.perf_counter() - self.startCounter
+        if excType is not None:
+            self.attrs["error"] = excType.__name__
+        self.tracer.emit({"name": self.name, "start": self.start, "duration": duration, "pid": os.getpid(), 
+                          "tid": threading.get_ident(), "attrs": self.attrs})
+        return False
+
+
+# A span that is not timed, used when no tracer is given (see trace_span).
+class NullSpan():
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        return False
+
+nullSpan = NullSpan()
+
+
+# Records timed spans and passes them to observers.
+# Parameters:
+#   observers: A list of functions, each called with a span (a dictionary, see below) when the span finishes.
+#   record: When True, the spans are kept in self.spans so they can be summarised or exported. 
+#           Use record=False with observers for long searches where only the observers are needed.
+# Spans are dictionaries: {"name": name, "start": start time (seconds since the epoch), "duration": seconds, 
+#                          "pid": process id, "tid": thread id, "attrs": {attribute: value}}
+# If the code in a span raises an exception, the span is still recorded, with attrs["error"] set to the exception name.
+# E.g.
+#   tracer = Tracer()
+#   decimated_binary_search(..., tracer=tracer)
+#   tracer.print_summary()
+#   tracer.write_chrome_trace("search_trace.json")
+class Tracer():
+    def __init__(self, observers=None, record=True):
+        self.observers = list(observers) if observers is not None else []
+        self.record = record
+        self.spans = []
+        self.lock = threading.Lock()
+
+    # Return a span (a context manager) that times the code in its 'with' block.
+    # E.g. with tracer.span("read", dec=4, set=0) as span: ... span.set(bytes=len(data))
+    def span(self, name, **attrs):
+        return TraceSpan(self, name, attrs)
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    # Record a finished span and pass it to the observers.
+    def emit(self, span):
+        if self.record:
+            with self.lock:
+                self.spans.append(span)
+        for observer in self.observers:
+            observer(span)
+
+    # Add spans recorded by another tracer (e.g. one used in a worker process) to this tracer.
+    def merge(self, spans):
+        for span in spans:
+            self.emit(span)
+
+    # Purpose: Summarise the recorded spans by name.
+    # Return value: A dictionary {name: {"count", "seconds", "mean", "max", "bytes", "bytesPerSecond"}} where
+    #   count is the number of spans, seconds the total duration, mean and max the mean and maximum duration,
+    #   bytes the total of the "bytes" attributes (0 if there are none) and bytesPerSecond = bytes / seconds.
+    #   NOTE: Spans may contain other spans (e.g. "level" contains "iid_main"), so the seconds of different names should not be added.
+    def summary(self):
+        summary = {}
+        with self.lock:
+            spans = list(self.spans)
+        for span in spans:
+            if span["name"] not in summary:
+                summary[span["name"]] = {"count": 0, "seconds": 0.0, "mean": 0.0, "max": 0.0, "bytes": 0, "bytesPerSecond": 0.0}
+            entry = summary[span["name"]]
+            entry["count"] += 1
+            entry["seconds"] += span["duration"]
+            entry["max"] = max(entry["max"], span["duration"])
+            entry["bytes"] += span["attrs"].get("bytes", 0)
+        for entry in summary.values():
+            entry["mean"] = entry["seconds"] / entry["count"]
+            if entry["seconds"] > 0:
+                entry["bytesPerSecond"] = entry["bytes"] / entry["seconds"]
+        return summary
+
+    # Print the summary, one line per span name, in the order of traceStages (other names follow).
+    def print_summary(self):
+        summary = self.summary()
+        names = [name for name in traceStages if name in summary] + [name for name in summary if name not in traceStages]
+        print(f"{'stage':<16} {'count':>8} {'seconds':>12} {'mean':>10} {'max':>10} {'MB':>10} {'MB/s':>10}")
+        for name in names:
+            entry = summary[name]
+            print(f"{name:<16} {entry['count']:8d} {entry['seconds']:12.3f} {entry['mean']:10.4f} {entry['max']:10.4f} "
+                  f"{entry['bytes']/1e6:10.2f} {entry['bytesPerSecond']/1e6:10.2f}")
+
+    # Purpose: Convert the recorded spans to the Chrome trace event format.
+    # Return value: A dictionary {"traceEvents": [...], "displayTimeUnit": "ms"} with one complete ("X") event per span.
+    #   Times are in microseconds. The span attributes are the event's "args".
+    def chrome_trace(self):
+        with self.lock:
+            spans = list(self.spans)
+        events = []
+        for span in spans:
+            events.append({"name": span["name"], "cat": "decimate", "ph": "X", "ts": span["start"]*1e6, "dur": span["duration"]*1e6, 
+                           "pid": span["pid"], "tid": span["tid"], "args": span["attrs"]})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    # Write the Chrome trace (see chrome_trace) to the file out_path.
+    def write_chrome_trace(self, out_path):
+        with open(out_path, "w") as out_file:
+            json.dump(self.chrome_trace(), out_file)
+
+
+# Purpose: For internal use - return a span from the tracer, or a span that does nothing if tracer is None.
+# Parameters:
+#   tracer: A Tracer, or None when tracing is not required.
+#   name, attrs: The span name and attributes (see Tracer.span).
+# Return value: A context manager.
+def trace_span(tracer, name, **attrs):
+    if tracer is None:
+        return nullSpan
+    return tracer.span(name, **attrs)
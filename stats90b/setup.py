@@ -22,7 +22,9 @@ from setuptools import setup, Extension
 
 module = Extension(
     'stats90b',
-    sources=['stats90b.cpp', '../SP800-90B_EntropyAssessment/cpp/iid_main.cpp'],
+    # stats90b.cpp includes iid_main.cpp, non_iid_main.cpp and restart_main.cpp (see stats90b.cpp), so they are listed as dependencies rather than sources.
+    sources=['stats90b.cpp'],
+    depends=['../SP800-90B_EntropyAssessment/cpp/iid_main.cpp', '../SP800-90B_EntropyAssessment/cpp/non_iid_main.cpp', '../SP800-90B_EntropyAssessment/cpp/restart_main.cpp'],
     extra_link_args=["-std=c++11", "-fopenmp", "-O2", "-ffloat-store", "-I/usr/include/jsoncpp", "-msse2", "-march=native"],
     extra_compile_args=["-std=c++11", "-fopenmp", "-O2", "-ffloat-store", "-I/usr/include/jsoncpp", "-msse2", "-march=native"],
     libraries = ["bz2", "pthread", "divsufsort", "divsufsort64", "jsoncpp", "crypto"]
@@ -31,7 +33,7 @@ module = Extension(
 setup(
     name='stats90b',
     version='1.1.7.post1',
-    description='A Python C-extension to run the NIST SP 800-90B IID statistical tests',
+    description='A Python C-extension to run the NIST SP 800-90B IID statistical tests, non-IID entropy estimators and restart tests',
     author='Teron Labs and NIST', 
     author_email='yvonne@teronlabs.com',
     license = "Files authored by NIST are released under NIST's license. Files authored by Teron Labs are released under the GNU General Public License v3.0 (GPLv3).",
@@ -22,7 +22,14 @@
 
 
 #include <Python.h>
-#include "../SP800-90B_EntropyAssessment/cpp/iid_main.h"
+
+// The NIST code defines its functions in its header files, so iid_main.cpp, non_iid_main.cpp and restart_main.cpp
+// are compiled here as the one translation unit, rather than as separate sources which would define the functions twice.
+// STATS90B_MODULE leaves out the main functions of non_iid_main.cpp and restart_main.cpp.
+#define STATS90B_MODULE
+#include "../SP800-90B_EntropyAssessment/cpp/iid_main.cpp"
+#include "../SP800-90B_EntropyAssessment/cpp/non_iid_main.cpp"
+#include "../SP800-90B_EntropyAssessment/cpp/restart_main.cpp"
 #include <iostream>
 #include <string>
 #include <vector>
@@ -94,10 +101,148 @@ static PyObject *method_iid_main(PyObject *self, PyObject *args) {
 }
 
 
+// Create the method that will call the non-IID entropy estimators from the NIST suite.
+// The samples are read from the file named in the arguments or, if a second argument is given,
+// from that buffer (e.g. bytes, bytearray, memoryview or a NumPy array of uint8), in which case the arguments do not name a file.
+static PyObject *method_non_iid_main(PyObject *self, PyObject *args) {
+
+    char *str  = NULL;
+    Py_buffer buffer = {NULL, NULL};
+
+    // Create the string to pass as argv to NIST's non_iid_main.cpp
+    // The string starts with the program name, ea_non_iid:
+    string argvStart="ea_non_iid ";
+
+    /* Parse arguments */
+    // Store the arguments passed from Python in a single char*, str, and the optional buffer of samples in buffer.
+    if(!PyArg_ParseTuple(args, "s|y*", &str, &buffer)) {
+
+        return NULL;
+
+    }
+    // argv is a vector to store each word in the arguments.
+    vector < char * > argv;
+    // Convert str to a C++ string, argvEnd.
+    string argvEnd(str);
+    // Create a C++ string (argvStr) containing the program name (argvStart) and arguments from Python (argvEnd).
+    string argvStr = argvStart + argvEnd;
+    // Split argvStr into a vector of words, argv.
+    customSplit(argvStr, &argv);
+
+    // Call NIST's non_iid_main.cpp with argc = argv.size, and argv, and the buffer if there is one.
+    // Save the results in string res.
+    string res;
+    if (buffer.obj != NULL) {
+        res = non_iid_main(argv.size(), &argv[0], (const uint8_t *)buffer.buf, (long)buffer.len);
+        PyBuffer_Release(&buffer);
+    } else {
+        res = non_iid_main(argv.size(), &argv[0]);
+    }
+
+    // Delete each word in argv.
+    for ( size_t i = 0 ; i < argv.size() ; i++ )
+            delete [] argv[i];
+
+    // Return the results in string res.
+    return PyUnicode_FromString(res.c_str());
+
+}
+
+
+// Create the method that will call the restart testing from the NIST suite.
+// The restart matrix is read from the file named in the arguments or, if a second argument is given,
+// from that buffer (e.g. bytes, bytearray, memoryview or a NumPy array of uint8), in which case the arguments do not name a file.
+static PyObject *method_restart_main(PyObject *self, PyObject *args) {
+
+    char *str  = NULL;
+    Py_buffer buffer = {NULL, NULL};
+
+    // Create the string to pass as argv to NIST's restart_main.cpp
+    // The string starts with the program name, ea_restart:
+    string argvStart="ea_restart ";
+
+    /* Parse arguments */
+    // Store the arguments passed from Python in a single char*, str, and the optional buffer holding the restart matrix in buffer.
+    if(!PyArg_ParseTuple(args, "s|y*", &str, &buffer)) {
+
+        return NULL;
+
+    }
+    // argv is a vector to store each word in the arguments.
+    vector < char * > argv;
+    // Convert str to a C++ string, argvEnd.
+    string argvEnd(str);
+    // Create a C++ string (argvStr) containing the program name (argvStart) and arguments from Python (argvEnd).
+    string argvStr = argvStart + argvEnd;
+    // Split argvStr into a vector of words, argv.
+    customSplit(argvStr, &argv);
+
+    // Call NIST's restart_main.cpp with argc = argv.size, and argv, and the buffer if there is one.
+    // Save the results in string res. Whether the restart data passed is recorded in res (errorLevel), so passed is not requested.
+    string res;
+    if (buffer.obj != NULL) {
+        res = restart_main(argv.size(), &argv[0], (const uint8_t *)buffer.buf, (long)buffer.len);
+        PyBuffer_Release(&buffer);
+    } else {
+        res = restart_main(argv.size(), &argv[0]);
+    }
+
+    // Delete each word in argv.
+    for ( size_t i = 0 ; i < argv.size() ; i++ )
+            delete [] argv[i];
+
+    // Return the results in string res.
+    return PyUnicode_FromString(res.c_str());
+
+}
+
+
+// Create the method that transposes a restart matrix in memory, as ea_transpose does for a file.
+// The arguments are a buffer holding the matrix row by row, and optionally the number of rows and columns (1000 each by default).
+// The matrix is returned column by column as bytes.
+static PyObject *method_transpose(PyObject *self, PyObject *args) {
+
+    Py_buffer buffer = {NULL, NULL};
+    long rows = 1000;
+    long columns = 1000;
+
+    /* Parse arguments */
+    if(!PyArg_ParseTuple(args, "y*|ll", &buffer, &rows, &columns)) {
+
+        return NULL;
+
+    }
+
+    // The buffer must hold exactly rows x columns samples.
+    if ((rows <= 0) || (columns <= 0) || (buffer.len != rows * columns)) {
+        PyBuffer_Release(&buffer);
+        PyErr_Format(PyExc_ValueError, "transpose: the buffer holds %zd samples rather than rows x columns = %ld x %ld samples", buffer.len, rows, columns);
+        return NULL;
+    }
+
+    // Create the bytes object to return, and transpose the matrix into it.
+    PyObject *res = PyBytes_FromStringAndSize(NULL, buffer.len);
+    if (res == NULL) {
+        PyBuffer_Release(&buffer);
+        return NULL;
+    }
+
+    transpose_matrix((const uint8_t *)buffer.buf, (uint8_t *)PyBytes_AS_STRING(res), rows, columns);
+
+    PyBuffer_Release(&buffer);
+
+    return res;
+
+}
+
+
 // List the methods exported from the NIST SP 800-90B statistical testing code.
-// Currently, only the IID testing is exported.
+// The IID testing, the non-IID entropy estimators, the restart testing and the transpose of a restart matrix are exported.
 static PyMethodDef Stats90bMethods[] = {
     {"iid_main", method_iid_main, METH_VARARGS, "Python interface for IID testing from ea_iid"},
+    {"non_iid_main", method_non_iid_main, METH_VARARGS, "Python interface for the non-IID entropy estimators from ea_non_iid"},
+    {"restart_main", method_restart_main, METH_VARARGS, "Python interface for restart testing from ea_restart"},
+    {"transpose", method_transpose, METH_VARARGS, "Transpose a restart matrix in memory, as ea_transpose does for a file"},
     {NULL, NULL, 0, NULL}
 };
 